@@ -23,7 +23,6 @@ from formencode.validators import (
     Int,
     StringBool,
 )
-from maasserver import locks
 from maasserver.api.interfaces import DISPLAYED_INTERFACE_FIELDS
 from maasserver.api.logger import maaslog
 from maasserver.api.nodes import (
@@ -219,6 +218,83 @@ def get_allocation_parameters(request):
     return agent_name, bridge_all, bridge_fd, bridge_stp, comment
 
 
+def get_allocation_constraints(request):
+    """Returns the validated constraints form for allocate operations.
+
+    :return: A ``(form, input_constraints)`` tuple, where `form` is a valid
+        `AcquireNodeForm`, and `input_constraints` is a list of the
+        parameters given, for reporting.
+    """
+    form = AcquireNodeForm(data=request.data)
+    # XXX AndresRodriguez 2016-10-27: If new params are added and are not
+    # constraints, these need to be added to IGNORED_FIELDS in
+    # src/maasserver/node_constraint_filter_forms.py.
+    input_constraints = [
+        param for param in request.data.lists() if param[0] != 'op']
+    maaslog.info(
+        "Request from user %s to acquire a machine with constraints: %s",
+        request.user.username, str(input_constraints))
+    if not form.is_valid():
+        raise MAASAPIValidationError(form.errors)
+    return form, input_constraints
+
+
+def get_unavailable_message(form, input_constraints, count=1):
+    """Returns the error message for when too few machines are available."""
+    constraints = form.describe_constraints()
+    if constraints == '':
+        # No constraints. That means no machines at all were available.
+        if count == 1:
+            return "No machine available."
+        else:
+            return "Fewer than %d machines available." % count
+    elif count == 1:
+        return (
+            'No available machine matches constraints: %s '
+            '(resolved to "%s")' % (str(input_constraints), constraints))
+    else:
+        return (
+            'Fewer than %d available machines match constraints: %s '
+            '(resolved to "%s")' % (
+                count, str(input_constraints), constraints))
+
+
+def set_constraints_by_type(machine, storage, interfaces, verbose=False):
+    """Set `constraints_by_type` on an allocated machine, for display.
+
+    :param storage: The storage constraints map from `filter_nodes`.
+    :param interfaces: The interfaces constraints map from `filter_nodes`.
+    :param verbose: Whether to include the full constraint maps too.
+    """
+    machine.constraint_map = storage.get(machine.id, {})
+    machine.constraints_by_type = {}
+    # Need to get the interface constraints map into the proper format
+    # to return it here.
+    # Backward compatibility: provide the storage constraints in both
+    # formats.
+    if len(machine.constraint_map) > 0:
+        machine.constraints_by_type['storage'] = {}
+        new_storage = machine.constraints_by_type['storage']
+        # Convert this to the "new style" constraints map format.
+        for storage_key in machine.constraint_map:
+            # Each key in the storage map is actually a value which
+            # contains the ID of the matching storage device.
+            # Convert this to a label: list-of-matches format, to
+            # match how the constraints will be done going forward.
+            new_key = machine.constraint_map[storage_key]
+            matches = new_storage.get(new_key, [])
+            matches.append(storage_key)
+            new_storage[new_key] = matches
+    if len(interfaces) > 0:
+        machine.constraints_by_type['interfaces'] = {
+            label: interfaces.get(label, {}).get(machine.id)
+            for label in interfaces
+        }
+    if verbose:
+        machine.constraints_by_type['verbose_storage'] = storage
+        machine.constraints_by_type['verbose_interfaces'] = interfaces
+
+
 class MachineHandler(NodeHandler, OwnerDataMixin, PowerMixin):
     """Manage an individual Machine.
 
@@ -516,20 +592,20 @@ class MachineHandler(NodeHandler, OwnerDataMixin, PowerMixin):
             system_id=system_id, user=request.user,
             perm=NODE_PERMISSION.VIEW)
         if machine.status == NODE_STATUS.READY:
-            with locks.node_acquire:
-                if machine.owner is not None and machine.owner != request.user:
-                    raise NodeStateViolation(
-                        "Can't allocate a machine belonging to another user.")
-                agent_name, bridge_all, bridge_fd, bridge_stp, comment = (
-                    get_allocation_parameters(request))
-                maaslog.info(
-                    "Request from user %s to acquire machine: %s (%s)",
-                    request.user.username, machine.fqdn, machine.system_id)
-                machine.acquire(
-                    request.user, get_oauth_token(request),
-                    agent_name=agent_name, comment=comment,
-                    bridge_all=bridge_all, bridge_stp=bridge_stp,
-                    bridge_fd=bridge_fd)
+            machine.lock_for_update()
+            if machine.owner is not None and machine.owner != request.user:
+                raise NodeStateViolation(
+                    "Can't allocate a machine belonging to another user.")
+            agent_name, bridge_all, bridge_fd, bridge_stp, comment = (
+                get_allocation_parameters(request))
+            maaslog.info(
+                "Request from user %s to acquire machine: %s (%s)",
+                request.user.username, machine.fqdn, machine.system_id)
+            machine.acquire(
+                request.user, get_oauth_token(request),
+                agent_name=agent_name, comment=comment,
+                bridge_all=bridge_all, bridge_stp=bridge_stp,
+                bridge_fd=bridge_fd)
         if NODE_STATUS.DEPLOYING not in NODE_TRANSITIONS[machine.status]:
             raise NodeStateViolation(
                 "Can't deploy a machine that is in the '{}' state".format(
@@ -1561,15 +1637,7 @@ class MachinesHandler(NodesHandler, PowersMixin):
         Returns 409 if a suitable machine matching the constraints could not be
         found.
         """
-        form = AcquireNodeForm(data=request.data)
-        # XXX AndresRodriguez 2016-10-27: If new params are added and are not
-        # constraints, these need to be added to IGNORED_FIELDS in
-        # src/maasserver/node_constraint_filter_forms.py.
-        input_constraints = [
-            param for param in request.data.lists() if param[0] != 'op']
-        maaslog.info(
-            "Request from user %s to acquire a machine with constraints: %s",
-            request.user.username, str(input_constraints))
+        form, input_constraints = get_allocation_constraints(request)
         agent_name, bridge_all, bridge_fd, bridge_stp, comment = (
             get_allocation_parameters(request))
         verbose = get_optional_param(
@@ -1577,106 +1645,123 @@ class MachinesHandler(NodesHandler, PowersMixin):
         dry_run = get_optional_param(
             request.POST, 'dry_run', default=False, validator=StringBool)
 
-        if not form.is_valid():
-            raise MAASAPIValidationError(form.errors)
+        machines = (
+            self.base_model.objects.get_available_machines_for_acquisition(
+                request.user))
+        machines, storage, interfaces = form.filter_nodes(machines)
+        if dry_run:
+            machine = get_first(machines)
+        else:
+            # Lock the chosen machine's row, skipping any that concurrent
+            # allocations have already locked, so that the machine cannot
+            # become unavailable before our transaction commits.
+            machine = get_first(
+                self.base_model.objects.claim_machines_for_acquisition(
+                    machines))
+        if machine is None:
+            cores = form.cleaned_data.get('cpu_count')
+            if cores is not None:
+                cores = int(cores)
+            memory = form.cleaned_data.get('mem')
+            if memory is not None:
+                memory = int(memory)
+            architecture = None
+            architectures = form.cleaned_data.get('arch')
+            if architectures is not None:
+                architecture = (
+                    None if len(architectures) == 0
+                    else min(architectures))
+            storage = form.cleaned_data.get('storage')
+            data = {
+                "cores": cores,
+                "memory": memory,
+                "architecture": architecture,
+                "storage": storage,
+            }
+            pods = Pod.objects.all()
+            # We don't want to compose a machine from a pod if the
+            # constraints contain tags.
+            if pods and not any(
+                    'tags' in constraint
+                    for constraint in input_constraints):
+                if form.cleaned_data.get('pod'):
+                    pods = pods.filter(name=form.cleaned_data.get('pod'))
+                elif form.cleaned_data.get('pod_type'):
+                    pods = pods.filter(
+                        power_type=form.cleaned_data.get('pod_type'))
+                compose_form = ComposeMachineForPodsForm(
+                    request=request, data=data, pods=pods)
+                if compose_form.is_valid():
+                    machine = compose_form.compose()
+                    if machine is not None:
+                        # Set the storage variable so the constraint_map is
+                        # set correct for the composed machine.
+                        storage = nodes_by_storage(
+                            storage, node_ids=[machine.id])
+                        if storage is None:
+                            storage = {}
+        if machine is None:
+            raise NodesNotAvailable(
+                get_unavailable_message(form, input_constraints))
+        if not dry_run:
+            machine.acquire(
+                request.user, get_oauth_token(request),
+                agent_name=agent_name, comment=comment,
+                bridge_all=bridge_all, bridge_stp=bridge_stp,
+                bridge_fd=bridge_fd)
+        set_constraints_by_type(machine, storage, interfaces, verbose)
+        return machine
+
+    @operation(idempotent=False)
+    def allocate_many(self, request):
+        """Allocate several available machines for deployment.
+
+        Accepts the same constraints and parameters as the 'allocate'
+        operation, and allocates `count` machines that each match all of
+        them. Either all of the machines are allocated, or none are.
 
-        # This lock prevents a machine we've picked as available from
-        # becoming unavailable before our transaction commits.
-        with locks.node_acquire:
+        Machines are not composed in pods to make up the numbers; compose
+        them first if need be.
+
+        :param count: The number of machines to allocate.
+        :type count: positive integer
+
+        Returns 409 if fewer than `count` machines matching the constraints
+        could be found.
+        """
+        count = get_mandatory_param(
+            request.data, 'count', validator=Int(min=1))
+        form, input_constraints = get_allocation_constraints(request)
+        agent_name, bridge_all, bridge_fd, bridge_stp, comment = (
+            get_allocation_parameters(request))
+        verbose = get_optional_param(
+            request.POST, 'verbose', default=False, validator=StringBool)
+        dry_run = get_optional_param(
+            request.POST, 'dry_run', default=False, validator=StringBool)
+
+        machines = (
+            self.base_model.objects.get_available_machines_for_acquisition(
+                request.user))
+        machines, storage, interfaces = form.filter_nodes(machines)
+        if dry_run:
+            machines = list(machines[:count])
+        else:
             machines = (
-                self.base_model.objects.get_available_machines_for_acquisition(
-                    request.user)
-                )
-            machines, storage, interfaces = form.filter_nodes(machines)
-            machine = get_first(machines)
-            if machine is None:
-                cores = form.cleaned_data.get('cpu_count')
-                if cores is not None:
-                    cores = int(cores)
-                memory = form.cleaned_data.get('mem')
-                if memory is not None:
-                    memory = int(memory)
-                architecture = None
-                architectures = form.cleaned_data.get('arch')
-                if architectures is not None:
-                    architecture = (
-                        None if len(architectures) == 0
-                        else min(architectures))
-                storage = form.cleaned_data.get('storage')
-                data = {
-                    "cores": cores,
-                    "memory": memory,
-                    "architecture": architecture,
-                    "storage": storage,
-                }
-                pods = Pod.objects.all()
-                # We don't want to compose a machine from a pod if the
-                # constraints contain tags.
-                if pods and not any(
-                        'tags' in constraint
-                        for constraint in input_constraints):
-                    if form.cleaned_data.get('pod'):
-                        pods = pods.filter(name=form.cleaned_data.get('pod'))
-                    elif form.cleaned_data.get('pod_type'):
-                        pods = pods.filter(
-                            power_type=form.cleaned_data.get('pod_type'))
-                    compose_form = ComposeMachineForPodsForm(
-                        request=request, data=data, pods=pods)
-                    if compose_form.is_valid():
-                        machine = compose_form.compose()
-                        if machine is not None:
-                            # Set the storage variable so the constraint_map is
-                            # set correct for the composed machine.
-                            storage = nodes_by_storage(
-                                storage, node_ids=[machine.id])
-                            if storage is None:
-                                storage = {}
-            if machine is None:
-                constraints = form.describe_constraints()
-                if constraints == '':
-                    # No constraints. That means no machines at all were
-                    # available.
-                    message = "No machine available."
-                else:
-                    message = (
-                        'No available machine matches constraints: %s '
-                        '(resolved to "%s")' % (
-                            str(input_constraints), constraints))
-                raise NodesNotAvailable(message)
+                self.base_model.objects.claim_machines_for_acquisition(
+                    machines, count))
+        if len(machines) < count:
+            raise NodesNotAvailable(
+                get_unavailable_message(form, input_constraints, count))
+        token = get_oauth_token(request)
+        for machine in machines:
             if not dry_run:
                 machine.acquire(
-                    request.user, get_oauth_token(request),
+                    request.user, token,
                     agent_name=agent_name, comment=comment,
                     bridge_all=bridge_all, bridge_stp=bridge_stp,
                     bridge_fd=bridge_fd)
-            machine.constraint_map = storage.get(machine.id, {})
-            machine.constraints_by_type = {}
-            # Need to get the interface constraints map into the proper format
-            # to return it here.
-            # Backward compatibility: provide the storage constraints in both
-            # formats.
-            if len(machine.constraint_map) > 0:
-                machine.constraints_by_type['storage'] = {}
-                new_storage = machine.constraints_by_type['storage']
-                # Convert this to the "new style" constraints map format.
-                for storage_key in machine.constraint_map:
-                    # Each key in the storage map is actually a value which
-                    # contains the ID of the matching storage device.
-                    # Convert this to a label: list-of-matches format, to
-                    # match how the constraints will be done going forward.
-                    new_key = machine.constraint_map[storage_key]
-                    matches = new_storage.get(new_key, [])
-                    matches.append(storage_key)
-                    new_storage[new_key] = matches
-            if len(interfaces) > 0:
-                machine.constraints_by_type['interfaces'] = {
-                    label: interfaces.get(label, {}).get(machine.id)
-                    for label in interfaces
-                }
-            if verbose:
-                machine.constraints_by_type['verbose_storage'] = storage
-                machine.constraints_by_type['verbose_interfaces'] = interfaces
-            return machine
+            set_constraints_by_type(machine, storage, interfaces, verbose)
+        return machines
 
     @admin_method
     @operation(idempotent=False)
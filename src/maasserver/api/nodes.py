@@ -19,6 +19,7 @@ from django.shortcuts import get_object_or_404
 from maasserver.api.support import (
     admin_method,
     AnonymousOperationsHandler,
+    emit_json_list,
     operation,
     OperationsHandler,
 )
@@ -46,12 +47,16 @@ from maasserver.fields import MAC_RE
 from maasserver.forms import BulkNodeActionForm
 from maasserver.forms.ephemeral import TestForm
 from maasserver.models import (
+    Device,
     Filesystem,
     Interface,
     ISCSIBlockDevice,
+    Machine,
     Node,
     OwnerData,
     PhysicalBlockDevice,
+    RackController,
+    RegionController,
     VirtualBlockDevice,
 )
 from maasserver.models.nodeprobeddetails import get_single_probed_details
@@ -190,6 +195,28 @@ def store_node_power_parameters(node, request):
     node.save()
 
 
+def iter_nodes_with_related(nodes, chunk_size=500):
+    """Yield `nodes` ordered by ID, with their related objects prefetched.
+
+    Nodes are fetched `chunk_size` at a time, so that a long list of nodes
+    and everything related to them is not all in memory at once.
+    """
+    nodes = nodes.select_related(*NODES_SELECT_RELATED)
+    nodes = prefetch_queryset(nodes, NODES_PREFETCH).order_by('id')
+    chunk = list(nodes[:chunk_size])
+    while len(chunk) != 0:
+        for node in chunk:
+            # Set related node parents so no extra queries are needed.
+            for interface in node.interface_set.all():
+                interface.node = node
+            for block_device in node.blockdevice_set.all():
+                block_device.node = node
+            yield node
+        if len(chunk) < chunk_size:
+            break
+        chunk = list(nodes.filter(id__gt=chunk[-1].id)[:chunk_size])
+
+
 def filtered_nodes_list_from_request(request, model=None):
     """List Nodes visible to the user, optionally filtered by criteria.
 
@@ -556,34 +583,21 @@ class NodesHandler(OperationsHandler):
         """
 
         if self.base_model == Node:
-            # Avoid circular dependencies
-            from maasserver.api.devices import DevicesHandler
-            from maasserver.api.machines import MachinesHandler
-            from maasserver.api.rackcontrollers import RackControllersHandler
-            from maasserver.api.regioncontrollers import (
-                RegionControllersHandler
-            )
-            racks = RackControllersHandler().read(request).order_by("id")
-            nodes = list(chain(
-                DevicesHandler().read(request).order_by("id"),
-                MachinesHandler().read(request).order_by("id"),
+            racks = filtered_nodes_list_from_request(request, RackController)
+            regions = filtered_nodes_list_from_request(
+                request, RegionController).exclude(id__in=racks)
+            querysets = [
+                filtered_nodes_list_from_request(request, Device),
+                filtered_nodes_list_from_request(request, Machine),
                 racks,
-                RegionControllersHandler().read(request).exclude(
-                    id__in=racks).order_by("id"),
-            ))
-            return nodes
+                regions,
+            ]
         else:
-            nodes = filtered_nodes_list_from_request(request, self.base_model)
-            nodes = nodes.select_related(*NODES_SELECT_RELATED)
-            nodes = prefetch_queryset(
-                nodes, NODES_PREFETCH).order_by('id')
-            # Set related node parents so no extra queries are needed.
-            for node in nodes:
-                for interface in node.interface_set.all():
-                    interface.node = node
-                for block_device in node.blockdevice_set.all():
-                    block_device.node = node
-            return nodes
+            querysets = [
+                filtered_nodes_list_from_request(request, self.base_model),
+            ]
+        return emit_json_list(request, self, chain.from_iterable(
+            iter_nodes_with_related(nodes) for nodes in querysets))
 
     @operation(idempotent=True)
     def is_registered(self, request):
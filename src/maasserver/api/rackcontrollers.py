@@ -156,6 +156,21 @@ class RackControllerHandler(NodeHandler, PowerMixin):
             system_id=system_id, user=request.user, perm=NODE_PERMISSION.VIEW)
         return rack.list_boot_images()
 
+    @admin_method
+    @operation(idempotent=True)
+    def rpc_metrics(self, request, system_id):
+        """Return metrics for the RPC commands handled by this rack.
+
+        For each command: the number of calls and errors, the number of calls
+        in flight, and histograms of latency and request/response sizes.
+
+        Returns 404 if the rack controller is not found.
+        Returns 503 if the rack controller is not connected.
+        """
+        rack = self.model.objects.get_node_or_404(
+            system_id=system_id, user=request.user, perm=NODE_PERMISSION.VIEW)
+        return rack.get_rpc_metrics()
+
     @classmethod
     def resource_uri(cls, rackcontroller=None):
         rackcontroller_id = "system_id"
@@ -11,11 +11,19 @@ from maasserver.api.nodes import (
     NodeHandler,
     NodesHandler,
 )
-from maasserver.api.support import admin_method
+from maasserver.api.support import (
+    admin_method,
+    operation,
+)
+from maasserver.config_cache import config_cache
 from maasserver.enum import NODE_PERMISSION
 from maasserver.exceptions import MAASAPIValidationError
 from maasserver.forms import ControllerForm
 from maasserver.models import RegionController
+from maasserver.utils.prepared import get_prepared_statement_stats
+from metadataserver.nodekey_cache import nodekey_cache
+from metadataserver.status_queue import status_queue_metrics
+from provisioningserver.rpc.metrics import rpc_metrics
 
 # Region controller's fields exposed on the API.
 DISPLAYED_REGION_CONTROLLER_FIELDS = (
@@ -122,6 +130,81 @@ class RegionControllersHandler(NodesHandler):
     api_doc_section_name = "RegionControllers"
     base_model = RegionController
 
+    @admin_method
+    @operation(idempotent=True)
+    def rpc_metrics(self, request):
+        """Return metrics for the RPC commands handled by this region process.
+
+        Each region controller runs several processes; the metrics returned
+        are for the process that handled this request, identified by `pid`.
+
+        For each command: the number of calls and errors, the number of calls
+        in flight, and histograms of latency, time spent waiting for and
+        running in a database thread, and request/response sizes.
+
+        For each connection to a rack controller: the number of calls made
+        on it and still in flight, and a moving average of their latency.
+        These are used to choose which connection to make a call on.
+        """
+        return rpc_metrics.asdict()
+
+    @admin_method
+    @operation(idempotent=True)
+    def query_stats(self, request):
+        """Return statistics for the prepared queries run by this process.
+
+        Each region controller runs several processes; the statistics
+        returned are for the process that handled this request.
+
+        For each query: the number of times it was prepared, the number of
+        calls and errors, and the total, mean and maximum execution time.
+        """
+        return get_prepared_statement_stats()
+
+    @admin_method
+    @operation(idempotent=True)
+    def status_queue_metrics(self, request):
+        """Return metrics for the queue of node status messages.
+
+        Each region controller runs several processes; the metrics returned
+        are for the process that handled this request, identified by `pid`.
+
+        This includes the number of messages queued and being processed, and
+        histograms of batch sizes and of the time from receiving each message
+        to committing it to the database.
+        """
+        return status_queue_metrics.asdict()
+
+    @admin_method
+    @operation(idempotent=True)
+    def nodekey_cache_stats(self, request):
+        """Return statistics for the cache of node keys.
+
+        Each region controller runs several processes; the statistics
+        returned are for the process that handled this request, identified
+        by `pid`.
+
+        This includes the number of keys cached, the number of lookups that
+        hit and missed the cache, and the number of keys invalidated.
+        """
+        return nodekey_cache.asdict()
+
+    @admin_method
+    @operation(idempotent=True)
+    def config_cache_stats(self, request):
+        """Return statistics for the cache of configuration values.
+
+        Each region controller runs several processes; the statistics
+        returned are for the process that handled this request, identified
+        by `pid`.
+
+        This includes whether values are cached at all (`read_through` is
+        true when they are not), the number of values cached, the number of
+        lookups that hit and missed the cache, and the number of times it has
+        been invalidated.
+        """
+        return config_cache.asdict()
+
     @classmethod
     def resource_uri(cls, *args, **kwargs):
         return ('regioncontrollers_handler', [])
@@ -6,22 +6,33 @@
 __all__ = [
     'admin_method',
     'AnonymousOperationsHandler',
+    'emit_json_list',
     'operation',
     'OperationsHandler',
     ]
 
 from functools import wraps
+import zlib
 
 from django.core.exceptions import PermissionDenied
-from django.http import Http404
+from django.http import (
+    Http404,
+    HttpResponse,
+)
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
 from maasserver.api.doc import get_api_description_hash
 from maasserver.exceptions import MAASAPIBadRequest
 from piston3.authentication import NoAuthentication
-from piston3.emitters import Emitter
+from piston3.emitters import (
+    Emitter,
+    JSONEmitter,
+)
 from piston3.handler import (
     AnonymousBaseHandler,
     BaseHandler,
     HandlerMetaClass,
+    typemapper,
 )
 from piston3.resource import Resource
 from piston3.utils import (
@@ -330,6 +341,71 @@ class AnonymousOperationsHandler(
     """Anonymous base handler that supports operation dispatch."""
 
 
+def indent_json(text, prefix="    "):
+    """Indent each line of JSON `text` by `prefix`.
+
+    JSON encoders escape newlines within strings, so every line break in
+    `text` is between tokens.
+    """
+    return "\n".join(prefix + line for line in text.split("\n"))
+
+
+def emit_json_list(request, handler, objects):
+    """Return a response listing `objects` in JSON, as Piston would.
+
+    Piston converts every object to a dict, encodes the lot in one go, and
+    then `GZipMiddleware` compresses that. For thousands of nodes this needs
+    hundreds of megabytes. Instead, `objects` is consumed one at a time: each
+    is encoded by Piston's emitter, indented to sit in the list exactly as it
+    would have been, and compressed straight away if the client accepts gzip.
+
+    The response is built before returning, i.e. within the request's
+    transaction, so `objects` may be lazily fetched from the database.
+
+    If another format or a JSONP callback is requested, `objects` is returned
+    as a list for Piston to emit as usual.
+    """
+    emitter_format = request.GET.get('format', 'json')
+    if emitter_format != 'json' or 'callback' in request.GET:
+        return list(objects)
+
+    accepts_gzip = re_accepts_gzip.search(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if accepts_gzip:
+        # Compress with a gzip header, as `GZipMiddleware` does.
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        compressor = None
+    chunks = []
+
+    def write(text):
+        data = text.encode("utf-8")
+        if compressor is not None:
+            data = compressor.compress(data)
+        if len(data) != 0:
+            chunks.append(data)
+
+    count = 0
+    for obj in objects:
+        emitter = JSONEmitter(
+            obj, typemapper, handler, handler.fields, handler.is_anonymous)
+        write("[\n" if count == 0 else ",\n")
+        write(indent_json(emitter.render(request)))
+        count += 1
+    write("[]" if count == 0 else "\n]")
+    if compressor is not None:
+        chunks.append(compressor.flush())
+
+    response = HttpResponse(
+        chunks, content_type='application/json; charset=utf-8')
+    response['Content-Length'] = str(len(response.content))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if compressor is not None:
+        # `GZipMiddleware` leaves this response alone.
+        response['Content-Encoding'] = 'gzip'
+    return response
+
+
 def method_fields_reserved_fields_patch(self, handler, fields):
     """Return the field callables that map to a handler.
 
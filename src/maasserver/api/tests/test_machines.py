@@ -8,6 +8,7 @@ __all__ = []
 import http.client
 import json
 import random
+from unittest.mock import ANY
 
 from django.conf import settings
 from django.test import RequestFactory
@@ -788,16 +789,28 @@ class TestMachinesAPI(APITestCase.ForUser):
         machine = Machine.objects.get(system_id=machine.system_id)
         self.assertEqual(self.user, machine.owner)
 
-    def test_POST_allocate_uses_machine_acquire_lock(self):
-        # The "allocate" operation allocates the machine it returns.
-        available_status = NODE_STATUS.READY
+    def test_POST_allocate_skips_machines_claimed_elsewhere(self):
+        # Machines locked by a concurrent allocation are not claimed.
         factory.make_Node(
-            status=available_status, owner=None, with_boot_disk=True)
-        machine_acquire = self.patch(machines_module.locks, 'node_acquire')
-        self.client.post(reverse('machines_handler'), {'op': 'allocate'})
-        self.assertThat(machine_acquire.__enter__, MockCalledOnceWith())
-        self.assertThat(
-            machine_acquire.__exit__, MockCalledOnceWith(None, None, None))
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        claim = self.patch(
+            Machine.objects, 'claim_machines_for_acquisition')
+        claim.return_value = []
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate'})
+        self.assertEqual(http.client.CONFLICT, response.status_code)
+        self.assertThat(claim, MockCalledOnceWith(ANY))
+
+    def test_POST_allocate_dry_run_does_not_claim_machine(self):
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        claim = self.patch(
+            Machine.objects, 'claim_machines_for_acquisition')
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate', 'dry_run': True})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertThat(claim, MockNotCalled())
+        self.assertIsNone(reload_object(machine).owner)
 
     def test_POST_allocate_sets_agent_name(self):
         available_status = NODE_STATUS.READY
@@ -1463,6 +1476,68 @@ class TestMachinesAPI(APITestCase.ForUser):
         oauth_key = self.client.token.key
         self.assertEqual(oauth_key, machine.token.key)
 
+    def test_POST_allocate_many_allocates_machines(self):
+        machines = [
+            factory.make_Node(
+                status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+            for _ in range(3)
+        ]
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate_many', 'count': 2})
+        self.assertThat(response, HasStatusCode(http.client.OK))
+        system_ids = [
+            machine['system_id'] for machine in json.loads(
+                response.content.decode(settings.DEFAULT_CHARSET))]
+        self.assertEqual(2, len(set(system_ids)))
+        self.assertItemsEqual(
+            system_ids, [
+                machine.system_id for machine in machines
+                if reload_object(machine).owner == self.user
+            ])
+
+    def test_POST_allocate_many_obeys_constraints(self):
+        tag = factory.make_Tag()
+        tagged = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        tagged.tags.add(tag)
+        factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        response = self.client.post(
+            reverse('machines_handler'),
+            {'op': 'allocate_many', 'count': 1, 'tags': [tag.name]})
+        self.assertThat(response, HasStatusCode(http.client.OK))
+        self.assertEqual(
+            [tagged.system_id], [
+                machine['system_id'] for machine in json.loads(
+                    response.content.decode(settings.DEFAULT_CHARSET))])
+
+    def test_POST_allocate_many_allocates_none_if_too_few_available(self):
+        machines = [
+            factory.make_Node(
+                status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+            for _ in range(2)
+        ]
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate_many', 'count': 3})
+        self.assertThat(response, HasStatusCode(http.client.CONFLICT))
+        self.assertEqual(
+            [None, None],
+            [reload_object(machine).owner for machine in machines])
+
+    def test_POST_allocate_many_requires_positive_count(self):
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate_many', 'count': 0})
+        self.assertThat(response, HasStatusCode(http.client.BAD_REQUEST))
+
+    def test_POST_allocate_many_dry_run_does_not_allocate(self):
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        response = self.client.post(
+            reverse('machines_handler'),
+            {'op': 'allocate_many', 'count': 1, 'dry_run': True})
+        self.assertThat(response, HasStatusCode(http.client.OK))
+        self.assertIsNone(reload_object(machine).owner)
+
     def test_POST_accept_gets_machine_out_of_declared_state(self):
         # This will change when we add provisioning.  Until then,
         # acceptance gets a machine straight to Ready state.
@@ -5,9 +5,11 @@
 
 __all__ = []
 
+import gzip
 import http.client
 import json
 import random
+from unittest.mock import Mock
 
 from django.conf import settings
 from django.http import QueryDict
@@ -20,11 +22,13 @@ from maasserver.enum import (
     NODE_TYPE_CHOICES,
 )
 from maasserver.exceptions import MAASAPIValidationError
+from maasserver.models import Node
 from maasserver.testing.api import APITestCase
 from maasserver.testing.factory import factory
 from maasserver.utils import ignore_unused
 from maasserver.utils.django_urls import reverse
 from maasserver.utils.orm import reload_object
+from maastesting.matchers import MockCalledOnce
 
 
 class TestIsRegisteredAPI(APITestCase.ForAnonymousAndUserAndAdmin):
@@ -282,6 +286,26 @@ class TestFilteredNodesListFromRequest(APITestCase.ForUser):
             extract_system_ids_from_nodes(node_list))
 
 
+class TestIterNodesWithRelated(APITestCase.ForUser):
+
+    def test__yields_all_nodes_in_chunks_ordered_by_id(self):
+        nodes = [factory.make_Node() for _ in range(5)]
+        self.assertEqual(
+            sorted(node.id for node in nodes),
+            [node.id for node in nodes_module.iter_nodes_with_related(
+                Node.objects.all(), chunk_size=2)])
+
+    def test__sets_node_on_related_objects(self):
+        node = factory.make_Node(interface=True)
+        factory.make_PhysicalBlockDevice(node=node)
+        [yielded] = nodes_module.iter_nodes_with_related(
+            Node.objects.filter(id=node.id))
+        for interface in yielded.interface_set.all():
+            self.assertIs(yielded, interface.node)
+        for block_device in yielded.blockdevice_set.all():
+            self.assertIs(yielded, block_device.node)
+
+
 class TestNodesAPI(APITestCase.ForUser):
     """Tests for /api/2.0/nodes/."""
 
@@ -289,6 +313,43 @@ class TestNodesAPI(APITestCase.ForUser):
         self.assertEqual(
             '/api/2.0/nodes/', reverse('nodes_handler'))
 
+    def test_GET_encodes_nodes_incrementally(self):
+        emit_json_list = self.patch(
+            nodes_module, "emit_json_list",
+            Mock(wraps=nodes_module.emit_json_list))
+        iter_nodes_with_related = self.patch(
+            nodes_module, "iter_nodes_with_related",
+            Mock(wraps=nodes_module.iter_nodes_with_related))
+        node = factory.make_Node()
+        response = self.client.get(reverse('nodes_handler'))
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertThat(emit_json_list, MockCalledOnce())
+        # Devices, machines, rack controllers, then region controllers.
+        self.assertEqual(4, iter_nodes_with_related.call_count)
+        parsed_result = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertEqual(
+            [node.system_id],
+            [parsed_node.get('system_id') for parsed_node in parsed_result])
+
+    def test_GET_compresses_nodes_when_client_accepts_gzip(self):
+        emit_json_list = self.patch(
+            nodes_module, "emit_json_list",
+            Mock(wraps=nodes_module.emit_json_list))
+        node = factory.make_Node()
+        response = self.client.get(
+            reverse('nodes_handler'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(http.client.OK, response.status_code)
+        # The body was compressed as it was encoded, not by GZipMiddleware.
+        self.assertThat(emit_json_list, MockCalledOnce())
+        self.assertEqual('gzip', response['Content-Encoding'])
+        parsed_result = json.loads(
+            gzip.decompress(response.content).decode(
+                settings.DEFAULT_CHARSET))
+        self.assertEqual(
+            [node.system_id],
+            [parsed_node.get('system_id') for parsed_node in parsed_result])
+
     def test_GET_lists_nodes(self):
         # The api allows for fetching the list of Nodes.
         node1 = factory.make_Node()
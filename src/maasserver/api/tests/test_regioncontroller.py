@@ -5,6 +5,7 @@
 
 import http.client
 
+from maasserver.api import regioncontrollers as regioncontrollers_module
 from maasserver.testing.api import APITestCase
 from maasserver.testing.factory import factory
 from maasserver.utils.converters import json_load_bytes
@@ -97,3 +98,67 @@ class TestRegionControllersAPI(APITestCase.ForUser):
                 'other_test_status_name',
             ],
             list(parsed_result[0]))
+
+    def test_query_stats_returns_prepared_statement_stats(self):
+        self.become_admin()
+        stats = {factory.make_name("query"): {"calls": 1}}
+        self.patch(
+            regioncontrollers_module,
+            "get_prepared_statement_stats").return_value = stats
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'query_stats'})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual(stats, json_load_bytes(response.content))
+
+    def test_query_stats_requires_admin(self):
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'query_stats'})
+        self.assertEqual(http.client.FORBIDDEN, response.status_code)
+
+    def test_status_queue_metrics_returns_metrics(self):
+        self.become_admin()
+        metrics = {"queued": 1, "processing": 2}
+        self.patch(
+            regioncontrollers_module,
+            "status_queue_metrics").asdict.return_value = metrics
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'status_queue_metrics'})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual(metrics, json_load_bytes(response.content))
+
+    def test_status_queue_metrics_requires_admin(self):
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'status_queue_metrics'})
+        self.assertEqual(http.client.FORBIDDEN, response.status_code)
+
+    def test_nodekey_cache_stats_returns_stats(self):
+        self.become_admin()
+        stats = {"hits": 1, "misses": 2}
+        self.patch(
+            regioncontrollers_module,
+            "nodekey_cache").asdict.return_value = stats
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'nodekey_cache_stats'})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual(stats, json_load_bytes(response.content))
+
+    def test_nodekey_cache_stats_requires_admin(self):
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'nodekey_cache_stats'})
+        self.assertEqual(http.client.FORBIDDEN, response.status_code)
+
+    def test_config_cache_stats_returns_stats(self):
+        self.become_admin()
+        stats = {"hits": 1, "misses": 2}
+        self.patch(
+            regioncontrollers_module,
+            "config_cache").asdict.return_value = stats
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'config_cache_stats'})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual(stats, json_load_bytes(response.content))
+
+    def test_config_cache_stats_requires_admin(self):
+        response = self.client.get(
+            self.get_region_uri(), {'op': 'config_cache_stats'})
+        self.assertEqual(http.client.FORBIDDEN, response.status_code)
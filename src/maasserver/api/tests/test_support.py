@@ -7,6 +7,7 @@ __all__ = []
 
 
 from collections import namedtuple
+import gzip
 import http.client
 from unittest.mock import (
     call,
@@ -15,10 +16,12 @@ from unittest.mock import (
 )
 
 from django.core.exceptions import PermissionDenied
+from django.test.client import RequestFactory
 from maasserver.api.doc import get_api_description_hash
 from maasserver.api.support import (
     admin_method,
     AdminRestrictedResource,
+    emit_json_list,
     OperationsHandlerMixin,
     OperationsResource,
     RestrictedResource,
@@ -33,6 +36,8 @@ from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils.django_urls import reverse
 from maastesting.testcase import MAASTestCase
 from piston3.authentication import NoAuthentication
+from piston3.emitters import JSONEmitter
+from piston3.handler import typemapper
 from testtools.matchers import (
     Equals,
     Is,
@@ -185,3 +190,69 @@ class TestOperationsHandlerMixin(MAASTestCase):
         handler.decorate(lambda thing: str(thing).upper())
         self.assertEqual({"foo": "SENTINEL.FOO"}, handler.exports)
         self.assertEqual({"bar": "SENTINEL.BAR"}, handler.anonymous.exports)
+
+
+class TestEmitJSONList(MAASTestCase):
+
+    def make_objects(self, count=3):
+        return [
+            {
+                "name": factory.make_name("name"),
+                "values": [factory.make_name("value"), {"nested": None}],
+                "empty": {},
+            }
+            for _ in range(count)
+        ]
+
+    def make_handler(self):
+        return Mock(fields=(), is_anonymous=False)
+
+    def emit_with_piston(self, request, handler, objects):
+        emitter = JSONEmitter(
+            objects, typemapper, handler, handler.fields,
+            handler.is_anonymous)
+        return emitter.render(request).encode("utf-8")
+
+    def test__emits_same_json_as_piston(self):
+        request = RequestFactory().get("/")
+        handler, objects = self.make_handler(), self.make_objects()
+        response = emit_json_list(request, handler, iter(objects))
+        self.assertEqual(
+            self.emit_with_piston(request, handler, objects),
+            response.content)
+        self.assertEqual(
+            "application/json; charset=utf-8", response["Content-Type"])
+        self.assertEqual(
+            str(len(response.content)), response["Content-Length"])
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test__emits_same_json_as_piston_for_empty_list(self):
+        request = RequestFactory().get("/")
+        handler = self.make_handler()
+        response = emit_json_list(request, handler, iter([]))
+        self.assertEqual(
+            self.emit_with_piston(request, handler, []), response.content)
+
+    def test__compresses_when_client_accepts_gzip(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        handler, objects = self.make_handler(), self.make_objects()
+        response = emit_json_list(request, handler, iter(objects))
+        self.assertEqual("gzip", response["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", response["Vary"])
+        self.assertEqual(
+            self.emit_with_piston(request, handler, objects),
+            gzip.decompress(response.content))
+
+    def test__returns_list_for_other_formats(self):
+        request = RequestFactory().get("/", {"format": "yaml"})
+        objects = self.make_objects()
+        self.assertEqual(
+            objects,
+            emit_json_list(request, self.make_handler(), iter(objects)))
+
+    def test__returns_list_for_jsonp_callback(self):
+        request = RequestFactory().get("/", {"callback": "callback"})
+        objects = self.make_objects()
+        self.assertEqual(
+            objects,
+            emit_json_list(request, self.make_handler(), iter(objects)))
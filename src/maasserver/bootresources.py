@@ -15,13 +15,13 @@ __all__ = [
     "SIMPLESTREAMS_URL_REGEXP",
 ]
 
+from concurrent.futures import wait
 from datetime import timedelta
 from operator import itemgetter
 import os
 from subprocess import CalledProcessError
 from textwrap import dedent
 import threading
-import time
 
 from django.db import (
     connection,
@@ -77,7 +77,10 @@ from maasserver.utils.orm import (
     transactional,
     with_connection,
 )
-from maasserver.utils.threads import deferToDatabase
+from maasserver.utils.threads import (
+    deferToDatabase,
+    deferToDatabaseQueue,
+)
 from provisioningserver.config import is_dev_environment
 from provisioningserver.events import EVENT_TYPES
 from provisioningserver.import_images.download_descriptions import (
@@ -85,6 +88,10 @@ from provisioningserver.import_images.download_descriptions import (
     image_passes_filter,
     validate_product,
 )
+from provisioningserver.import_images.download_pool import (
+    DownloadPool,
+    get_content_source_host,
+)
 from provisioningserver.import_images.helpers import (
     get_os_from_product,
     get_signing_policy,
@@ -420,7 +427,10 @@ class BootResourceStore(ObjectStore):
     # Number of threads to run at the same time to write the contents of
     # files from simplestreams into the database. Increasing this number
     # might cause high network and database load.
-    write_threads = 2
+    write_threads = 4
+
+    # Number of those threads that may download from any one host at once.
+    write_threads_per_host = 2
 
     # Read at 10MiB per chunk.
     read_size = 1024 * 1024 * 10
@@ -814,35 +824,38 @@ class BootResourceStore(ObjectStore):
     def perform_write(self):
         """Performs all writing of content into the object storage.
 
-        This method will spawn threads to perform the writing. Maximum of
-        `write_threads` will be running at once."""
-        threads = []
-        while True:
-            # Update list to only those that are still running.
-            threads = [thread for thread in threads if thread.isAlive()]
-            if len(threads) >= self.write_threads:
-                # Cannot start any more threads as the maximum is already
-                # running. Lets wait a second and try again.
-                time.sleep(1)
-                continue
-
-            if self._cancel_finalize or len(self._content_to_finalize) == 0:
-                # No more threads to spawn because the finalization has been
-                # cancelled or all of the content has been de-queued. Wait for
-                # all the remaining running threads to finish.
-                for thread in threads:
-                    thread.join()
-                break
-
-            # Spawn a writer thread with a resource file and reader from
-            # the queue of content to be saved.
-            rid, reader = self._content_to_finalize.popitem()
-            # FIXME: Use deferToDatabase and the coiterator if possible.
-            thread = threading.Thread(
-                target=self.write_content_thread,
-                args=(rid, reader))
-            thread.start()
-            threads.append(thread)
+        This method uses a `DownloadPool` to perform the writing. Maximum of
+        `write_threads` will be running at once, and of those a maximum of
+        `write_threads_per_host` will be downloading from the same host."""
+        # FIXME: Use deferToDatabase and the coiterator if possible.
+        pool = DownloadPool(self.write_threads, self.write_threads_per_host)
+
+        @with_connection
+        def write_content(rid):
+            # Content is only de-queued once writing starts, so that content
+            # never written because finalization was cancelled is deleted by
+            # `delete_content_to_finalize`.
+            if not self._cancel_finalize:
+                reader = self._content_to_finalize.pop(rid)
+                self.write_content_thread(rid, reader)
+
+        futures = []
+        try:
+            for rid, reader in list(self._content_to_finalize.items()):
+                futures.append(pool.submit(
+                    get_content_source_host(reader), write_content, rid))
+            # Every write must finish before finalization moves on to
+            # cleaning up resources.
+            wait(futures)
+        except BaseException:
+            pool.cancel()
+            raise
+        finally:
+            pool.shutdown()
+        for future in futures:
+            if not future.cancelled() and future.exception() is not None:
+                maaslog.error(
+                    "Failed to finalize boot image: %s", future.exception())
 
     def _other_resources_exists(self, os, arch, subarch, series):
         """Return `True` when simplestreams provided an image with the same
@@ -1251,7 +1264,8 @@ def _import_resources(notify=None):
     from maasserver.clusterrpc.boot_images import RackControllersImporter
 
     # Sync boot resources into the region.
-    d = deferToDatabase(_import_resources_with_lock, notify=notify)
+    d = deferToDatabaseQueue(
+        "bulk", _import_resources_with_lock, notify=notify)
 
     def cb_import(_):
         d = deferToDatabase(RackControllersImporter.new)
@@ -1351,7 +1365,7 @@ def _import_resources_in_thread(notify=None):
     :param notify: Instance of `Deferred` that is called when all the metadata
         has been downloaded and the image data download has been started.
     """
-    d = deferToDatabase(_import_resources, notify=notify)
+    d = deferToDatabaseQueue("bulk", _import_resources, notify=notify)
     d.addErrback(_handle_import_failures)
     return d
 
@@ -0,0 +1,48 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Expire boot configurations cached by rack controllers."""
+
+__all__ = [
+    "expire_boot_configs",
+]
+
+from maasserver.rpc import getAllClients
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.rpc.cluster import ExpireBootConfigs
+from provisioningserver.utils.twisted import asynchronous
+from twisted.internet.defer import DeferredList
+from twisted.protocols.amp import UnhandledCommand
+
+
+log = LegacyLogger()
+
+
+@asynchronous
+def expire_boot_configs(macs=None):
+    """Expire the boot configurations cached by connected rack controllers.
+
+    Rack controllers cache the boot configurations they generate for a short
+    while; this ensures that a machine which has changed, e.g. its status, is
+    given a fresh configuration the next time it boots. Failures are logged
+    and otherwise ignored: a rack controller that misses this will serve the
+    old configuration until its cache entry expires anyway.
+
+    :param macs: The MAC addresses of the machines that have changed, or
+        `None` to expire all boot configurations.
+    """
+    if macs is None:
+        kwargs = {}
+    else:
+        kwargs = {"macs": list(macs)}
+
+    def expire(client):
+        d = client(ExpireBootConfigs, **kwargs)
+        # Rack controllers from before 2.3 do not cache boot configurations.
+        d.addErrback(lambda failure: failure.trap(UnhandledCommand))
+        d.addErrback(
+            log.err, "Failed to expire boot configurations on rack "
+            "controller '%s'." % client.ident)
+        return d
+
+    return DeferredList(map(expire, getAllClients()))
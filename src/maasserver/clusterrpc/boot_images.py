@@ -27,6 +27,7 @@ from maasserver.rpc import (
     getAllClients,
     getClientFor,
 )
+from maasserver.rpc.boot_images import reported_boot_images
 from maasserver.utils import async
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
@@ -85,6 +86,9 @@ def is_import_boot_images_running():
 def get_boot_images(rack_controller):
     """Obtain the avaliable boot images of this rack controller.
 
+    The rack controller's most recent report of its boot images is used if
+    it has made one; see `reported_boot_images`. Otherwise it is asked.
+
     :param rack_controller: The RackController.
 
     :raises NoConnectionsAvailable: When no connections to the rack controller
@@ -92,6 +96,9 @@ def get_boot_images(rack_controller):
     :raises crochet.TimeoutError: If a response has not been received within
         30 seconds.
     """
+    images = reported_boot_images.get(rack_controller.system_id)
+    if images is not None:
+        return images
     client = getClientFor(rack_controller.system_id, timeout=1)
     try:
         call = client(ListBootImagesV2)
@@ -106,7 +113,15 @@ def _get_available_boot_images():
     """Obtain boot images available on connected rack controllers."""
     listimages_v1 = lambda client: partial(client, ListBootImages)
     listimages_v2 = lambda client: partial(client, ListBootImagesV2)
-    clients_v2 = getAllClients()
+    # Rack controllers that have reported their boot images need not be
+    # asked for them.
+    clients_v2 = []
+    for client in getAllClients():
+        images = reported_boot_images.get(client.ident)
+        if images is None:
+            clients_v2.append(client)
+        else:
+            yield frozenset(frozenset(image.items()) for image in images)
     responses_v2 = async.gather(map(listimages_v2, clients_v2))
     clients_v1 = []
     for i, response in enumerate(responses_v2):
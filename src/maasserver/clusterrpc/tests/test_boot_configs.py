@@ -0,0 +1,68 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the `boot_configs` module."""
+
+__all__ = []
+
+from unittest.mock import ANY
+
+from maasserver.clusterrpc.boot_configs import expire_boot_configs
+from maasserver.rpc.testing.fixtures import MockLiveRegionToClusterRPCFixture
+from maasserver.testing.eventloop import (
+    RegionEventLoopFixture,
+    RunningEventLoopFixture,
+)
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASTransactionServerTestCase
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.rpc.cluster import ExpireBootConfigs
+from twisted.internet.defer import (
+    fail,
+    succeed,
+)
+
+
+class TestExpireBootConfigs(MAASTransactionServerTestCase):
+    """Tests for `expire_boot_configs`."""
+
+    def setUp(self):
+        super(TestExpireBootConfigs, self).setUp()
+        # Limit the region's event loop to only the "rpc" service.
+        self.useFixture(RegionEventLoopFixture("rpc"))
+        # Now start the region's event loop.
+        self.useFixture(RunningEventLoopFixture())
+        # This fixture allows us to simulate mock clusters.
+        self.rpc = self.useFixture(MockLiveRegionToClusterRPCFixture())
+
+    def make_rack(self):
+        rack = factory.make_RackController()
+        protocol = self.rpc.makeCluster(rack, ExpireBootConfigs)
+        protocol.ExpireBootConfigs.return_value = succeed({})
+        return protocol
+
+    def test__expires_boot_configs_for_macs_on_all_racks(self):
+        protocols = [self.make_rack() for _ in range(3)]
+        macs = [factory.make_mac_address() for _ in range(2)]
+        expire_boot_configs(macs).wait(5)
+        for protocol in protocols:
+            self.assertThat(
+                protocol.ExpireBootConfigs,
+                MockCalledOnceWith(ANY, macs=macs))
+
+    def test__expires_all_boot_configs_on_all_racks(self):
+        protocols = [self.make_rack() for _ in range(3)]
+        expire_boot_configs().wait(5)
+        for protocol in protocols:
+            self.assertThat(
+                protocol.ExpireBootConfigs, MockCalledOnceWith(ANY))
+
+    def test__logs_failures(self):
+        protocol = self.make_rack()
+        protocol.ExpireBootConfigs.return_value = fail(ZeroDivisionError())
+        with TwistedLoggerFixture() as logger:
+            expire_boot_configs().wait(5)
+        self.assertIn(
+            "Failed to expire boot configurations on rack controller",
+            logger.output)
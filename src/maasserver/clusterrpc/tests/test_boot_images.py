@@ -30,6 +30,7 @@ from maasserver.enum import BOOT_RESOURCE_TYPE
 from maasserver.models.config import Config
 from maasserver.models.signals import bootsources
 from maasserver.rpc import getAllClients
+from maasserver.rpc.boot_images import ReportedBootImages
 from maasserver.rpc.testing.fixtures import (
     MockLiveRegionToClusterRPCFixture,
     RunningClusterRPCFixture,
@@ -188,6 +189,16 @@ class TestGetBootImages(MAASServerTestCase):
             call(ListBootImagesV2),
             call(ListBootImages)))
 
+    def test_uses_reported_boot_images(self):
+        rack_controller = factory.make_RackController()
+        images = [make_rpc_boot_image() for _ in range(3)]
+        reported = self.patch(
+            boot_images_module, "reported_boot_images", ReportedBootImages())
+        reported.report(rack_controller.system_id, sentinel.conn, images)
+        getClientFor = self.patch_autospec(boot_images_module, "getClientFor")
+        self.assertEqual(images, get_boot_images(rack_controller))
+        self.assertThat(getClientFor, MockNotCalled())
+
 
 class TestGetBootImagesTxn(MAASTransactionServerTestCase):
     """Transactional tests for `get_boot_images`."""
@@ -293,6 +304,28 @@ class TestGetAvailableBootImages(MAASTransactionServerTestCase):
 
         self.assertItemsEqual(images, self.get())
 
+    def test_uses_reported_boot_images(self):
+        factory.make_RackController()
+        factory.make_RackController()
+        self.useFixture(RunningClusterRPCFixture())
+
+        images = [make_rpc_boot_image() for _ in range(3)]
+        reported = self.patch(
+            boot_images_module, "reported_boot_images", ReportedBootImages())
+
+        clients = getAllClients()
+        for index, client in enumerate(clients):
+            callRemote = self.patch(client._conn, "callRemote")
+            if index == 0:
+                # The first client has reported, so it is not asked.
+                reported.report(client.ident, client._conn, images)
+                callRemote.side_effect = ZeroDivisionError()
+            else:
+                callRemote.return_value = succeed({'images': images})
+
+        self.assertItemsEqual(images, self.get())
+        self.assertThat(clients[0]._conn.callRemote, MockNotCalled())
+
     def test_fallback_to_ListBootImages_on_old_clusters(self):
         rack_1 = factory.make_RackController()
         rack_2 = factory.make_RackController()
@@ -10,9 +10,13 @@ Twisted concurrency primative, like `DeferredLock` or `DeferredSemaphore`.
 """
 
 __all__ = [
+    "database_queues",
+    "database_queues_for_rpc",
+    "database_reserved",
     "webapp",
 ]
 
+from provisioningserver.utils.twisted import ThreadPoolQueue
 from twisted.internet.defer import DeferredSemaphore
 
 #
@@ -48,3 +52,45 @@ from twisted.internet.defer import DeferredSemaphore
 # eliminate all RPC calls made while a database connection is being held.
 #
 webapp = DeferredSemaphore(4)
+
+#
+# Schedule database work by urgency.
+#
+# All database work in a region process shares one small thread-pool (see
+# `maasserver.utils.threads`), so bulk work like populating tags, processing
+# status messages from nodes, or finalising boot resources could otherwise
+# hold up work that a booting machine is waiting on, like `GetBootConfig`
+# or `UpdateLease`.
+#
+# Instead, work waits in one of these queues and, as database threads become
+# free, work in queues with a lower priority number goes first. A couple of
+# threads are reserved for the "boot" queue so that it never waits behind a
+# burst of other work. Queues for work that's not urgent are limited in how
+# many threads they can use, but their work is started anyway once it has
+# waited `max_wait` seconds so that it is not starved.
+#
+# Use `deferToDatabaseQueue` to choose a queue. Otherwise, work done on
+# behalf of an RPC command goes into the queue named in
+# `database_queues_for_rpc`, or "rpc", and other work into "default".
+#
+database_queues = (
+    ThreadPoolQueue("boot", priority=0, limit=None, max_wait=None),
+    ThreadPoolQueue("rpc", priority=1, limit=None, max_wait=None),
+    ThreadPoolQueue("default", priority=2, limit=None, max_wait=5.0),
+    ThreadPoolQueue("ui", priority=3, limit=4, max_wait=5.0),
+    ThreadPoolQueue("bulk", priority=4, limit=2, max_wait=30.0),
+)
+
+database_reserved = 2
+
+database_queues_for_rpc = {
+    "GetBootConfig": "boot",
+    "MarkNodeFailed": "boot",
+    "RequestNodeInfoByMACAddress": "boot",
+    "UpdateLease": "boot",
+    "ReportMDNSEntries": "bulk",
+    "ReportNeighbours": "bulk",
+    "SendEvent": "bulk",
+    "SendEventMACAddress": "bulk",
+    "UpdateInterfaces": "bulk",
+}
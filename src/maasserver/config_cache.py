@@ -0,0 +1,151 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""A cache of configuration values, for `Config.objects.get_config`.
+
+Configuration is read far more often than it is written: composing a single
+boot or preseed response can ask for a dozen or so values. When caching is
+enabled, every value is loaded with one query on the first lookup and kept
+in memory until configuration changes. A database trigger notifies the
+`sys_config` channel when that happens; see
+`maasserver.regiondservices.config_cache`, which listens for it and enables
+caching in region processes.
+
+Elsewhere -- in tests, management commands, and so on -- the cache reads
+through to the database on every lookup, so that a value is never stale.
+
+Values are also forgotten after `max_age` seconds, so that a change is not
+ignored for long should a notification be missed.
+
+Transactions run at REPEATABLE READ, so a lookup may load values from a
+snapshot taken before a change was committed, even after the notification
+has arrived. The notification carries the ID of the transaction that made
+the change, and values are only cached if they were loaded from a snapshot
+in which that transaction is visible; see `ConfigCache.changed`.
+"""
+
+__all__ = [
+    "config_cache",
+    "ConfigCache",
+]
+
+import os
+from threading import Lock
+import time
+
+
+class ConfigCache:
+    """A thread-safe cache of all configuration values.
+
+    Invalidating the cache bumps the generation, so values loaded before a
+    change are not cached.
+
+    :ivar read_through: When true, which is the default, nothing is cached.
+    :ivar txid: The ID of the latest transaction known to have changed
+        configuration, or `None`. Values must be loaded from a snapshot in
+        which it is visible to be cached.
+    :ivar hits: The number of lookups satisfied from the cache.
+    :ivar misses: The number of lookups that queried the database.
+    :ivar invalidations: The number of times the cache has been invalidated.
+    """
+
+    def __init__(self, max_age=60, clock=time.monotonic):
+        super(ConfigCache, self).__init__()
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = Lock()
+        self.read_through = True
+        self.clear()
+
+    def clear(self):
+        """Forget all values, and reset the statistics."""
+        with self.lock:
+            self.values = None
+            self.stamp = None
+            self.generation = 0
+            self.txid = None
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def enable(self):
+        """Start caching values."""
+        with self.lock:
+            self.read_through = False
+
+    def disable(self):
+        """Stop caching values, and forget those already cached."""
+        with self.lock:
+            self.read_through = True
+            self.generation += 1
+            self.values = None
+
+    def get(self):
+        """Return all cached configuration values.
+
+        :return: A ``(values, generation)`` tuple. `values` is a dict mapping
+            names to values, or `None` if nothing is cached. In the latter
+            case, load the values and pass them to `store` with `generation`.
+        """
+        with self.lock:
+            if self.values is not None:
+                if self.clock() - self.stamp <= self.max_age:
+                    self.hits += 1
+                    return self.values, self.generation
+                else:
+                    self.values = None
+            self.misses += 1
+            return None, self.generation
+
+    def store(self, values, generation):
+        """Cache `values`, a dict mapping all names to values.
+
+        Nothing is cached if reading through, or if the cache has been
+        invalidated since `generation` was obtained.
+        """
+        with self.lock:
+            if not self.read_through and generation == self.generation:
+                self.values = values
+                self.stamp = self.clock()
+
+    def invalidate(self, *args, **kwargs):
+        """Forget all values.
+
+        Accepts and ignores arguments so that it can be used as a signal or
+        notification handler.
+        """
+        with self.lock:
+            self.generation += 1
+            self.invalidations += 1
+            self.values = None
+
+    def changed(self, txid):
+        """Forget all values, because transaction `txid` changed them.
+
+        Values loaded from a snapshot in which `txid` is not visible must not
+        be stored from now on.
+        """
+        with self.lock:
+            self.generation += 1
+            self.invalidations += 1
+            self.values = None
+            if self.txid is None or txid > self.txid:
+                self.txid = txid
+
+    def asdict(self):
+        """Return statistics as a JSON-compatible dictionary."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "read_through": self.read_through,
+                "size": 0 if self.values is None else len(self.values),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+# The cache for this process.
+config_cache = ConfigCache()
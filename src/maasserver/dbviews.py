@@ -37,9 +37,11 @@ def _register_view(view_name, view_sql):
         cursor.execute(view_sql)
 
 
-# Note that the `Discovery` model object is backed by this view. Any
-# changes made to this view should be reflected there.
-maasserver_discovery = dedent("""\
+# Note that the `Discovery` model object is backed by the maasserver_discovery
+# table, which is populated from this view by the triggers in
+# `maasserver.triggers.discovery`. Any changes made to this view should be
+# reflected in both places (and in a migration for the table).
+maasserver_discovery_view = dedent("""\
     SELECT
         DISTINCT ON (neigh.mac_address, neigh.ip)
         neigh.id AS id, -- Django needs a primary key for the object.
@@ -97,6 +99,65 @@ maasserver_discovery = dedent("""\
         subnet_prefixlen DESC -- We want the best-match CIDR.
     """)
 
+# A summary of each node's hardware, for evaluating allocation constraints.
+# Note that the `NodeInventory` model object is backed by the
+# maasserver_nodeinventory table, which is populated from this view by the
+# triggers in `maasserver.triggers.inventory`. Any changes made to this view
+# should be reflected in both places (and in a migration for the table).
+#
+# The root disk is the block device on which '/' is mounted, directly or on
+# a partition. Other disks are counted only if they are unused, i.e. have
+# neither a filesystem nor a partition table: only those can match storage
+# constraints after the first.
+maasserver_nodeinventory_view = dedent("""\
+    SELECT
+        node.id AS node_id,
+        root.size AS root_disk_size,
+        COALESCE(root.tags, '{}') AS root_disk_tags,
+        disks.count::integer AS disk_count,
+        disks.max_size AS disk_max_size,
+        COALESCE(disks.tags, '{}') AS disk_tags,
+        COALESCE(vlans.ids, '{}') AS vlan_ids
+    FROM maasserver_node AS node
+    LEFT JOIN LATERAL (
+        SELECT blockdevice.size, blockdevice.tags
+        FROM maasserver_filesystem AS fs
+        LEFT JOIN maasserver_partition AS part
+            ON fs.partition_id = part.id
+        LEFT JOIN maasserver_partitiontable AS ptable
+            ON part.partition_table_id = ptable.id
+        JOIN maasserver_blockdevice AS blockdevice
+            ON blockdevice.id = COALESCE(
+                fs.block_device_id, ptable.block_device_id)
+        WHERE blockdevice.node_id = node.id
+            AND fs.mount_point = '/'
+            AND NOT fs.acquired
+        ORDER BY fs.id
+        LIMIT 1
+    ) AS root ON true
+    CROSS JOIN LATERAL (
+        SELECT
+            count(DISTINCT blockdevice.id) AS count,
+            max(blockdevice.size) AS max_size,
+            array_agg(DISTINCT tag) FILTER (WHERE tag IS NOT NULL) AS tags
+        FROM maasserver_blockdevice AS blockdevice
+        LEFT JOIN LATERAL unnest(blockdevice.tags) AS tag ON true
+        WHERE blockdevice.node_id = node.id
+            AND NOT EXISTS (
+                SELECT 1 FROM maasserver_filesystem AS fs
+                WHERE fs.block_device_id = blockdevice.id)
+            AND NOT EXISTS (
+                SELECT 1 FROM maasserver_partitiontable AS ptable
+                WHERE ptable.block_device_id = blockdevice.id)
+    ) AS disks
+    CROSS JOIN LATERAL (
+        SELECT array_agg(DISTINCT iface.vlan_id) AS ids
+        FROM maasserver_interface AS iface
+        WHERE iface.node_id = node.id
+            AND iface.vlan_id IS NOT NULL
+    ) AS vlans
+    """)
+
 # Pairs of IP addresses that can route between nodes. In MAAS all addresses in
 # a "space" are mutually routable, so this essentially means finding pairs of
 # IP addresses that are in subnets with the same space ID. Typically this view
@@ -317,7 +378,8 @@ maas_support__ssh_keys__by_user = dedent("""\
 
 # Dictionary of view_name: view_sql tuples which describe the database views.
 _ALL_VIEWS = {
-    "maasserver_discovery": maasserver_discovery,
+    "maasserver_discovery_view": maasserver_discovery_view,
+    "maasserver_nodeinventory_view": maasserver_nodeinventory_view,
     "maasserver_routable_pairs": maasserver_routable_pairs,
     "maas_support__node_overview": maas_support__node_overview,
     "maas_support__device_overview": maas_support__device_overview,
@@ -13,6 +13,7 @@ from datetime import (
 )
 import random
 
+from maasserver.duties import cleanup_dns_publications
 from maasserver.models.dnspublication import DNSPublication
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
@@ -72,4 +73,6 @@ class DNSPublicationGarbageService(Service):
 
     @transactional
     def _collectGarbage(self, cutoff):
-        return DNSPublication.objects.collect_garbage(cutoff)
+        # Only one region process needs to do this.
+        return cleanup_dns_publications.perform(
+            DNSPublication.objects.collect_garbage, cutoff)
@@ -0,0 +1,185 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Sharing periodic duties out between region controller processes.
+
+Some services do work on behalf of the whole region: cleaning up old nonces,
+checking on nodes that are commissioning, and so on. Running them in every
+region process, or even once per region controller, means duplicated work and
+processes racing or waiting on each other.
+
+A `Duty` is instead performed by one live `RegionControllerProcess`, chosen by
+rendezvous hashing of the duty's name and the process IDs. Every process reads
+the same table, so they agree on the owner without talking to each other, and
+when a process comes or goes only the duties it owned move elsewhere.
+
+Per-node duties can be split into shards, each assigned separately, so that
+the work is spread across all region processes.
+
+Every region process is a candidate owner, so the services that perform
+duties must run in every process, not only in the master; a duty owned by a
+worker would otherwise never be performed.
+
+Processes can briefly disagree on who is alive, for example before one has
+noticed a new peer, so claiming a duty also takes a transaction-level advisory
+lock. If that lock is held the duty is skipped this time around.
+"""
+
+__all__ = [
+    "cleanup_dns_publications",
+    "cleanup_nonces",
+    "cleanup_script_output",
+    "Duty",
+    "get_duty_owner",
+    "get_region_processes",
+    "monitor_node_status",
+    "send_stats",
+]
+
+from datetime import timedelta
+import hashlib
+import os
+
+from django.db.models import F
+from maasserver.models.regioncontrollerprocess import RegionControllerProcess
+from maasserver.models.timestampedmodel import now
+from maasserver.utils.dblocks import (
+    DatabaseLockNotHeld,
+    DatabaseXactLock,
+)
+from provisioningserver.utils.env import get_maas_id
+
+# Region processes update their `RegionControllerProcess` every 60 seconds,
+# and others remove it after 90 seconds without an update.
+PROCESS_TIMEOUT = timedelta(seconds=90)
+
+
+def get_region_processes():
+    """Return the IDs of this process and all live region processes.
+
+    Must be called within a transaction.
+
+    :return: A ``(process_id, process_ids)`` tuple. `process_id` is `None` if
+        this process has not yet registered itself.
+    """
+    processes = RegionControllerProcess.objects.filter(
+        updated__gt=now() - PROCESS_TIMEOUT)
+    processes = processes.values_list("id", "region__system_id", "pid")
+    maas_id, pid = get_maas_id(), os.getpid()
+    this_process, process_ids = None, []
+    for process_id, process_region, process_pid in processes:
+        if (process_region, process_pid) == (maas_id, pid):
+            this_process = process_id
+        process_ids.append(process_id)
+    return this_process, process_ids
+
+
+def get_duty_owner(key, process_ids):
+    """Return the process that should perform the duty named `key`.
+
+    This is the process with the highest hash of `key` and its ID, so adding
+    or removing a process only changes the owner of the duties it gains or
+    loses.
+
+    :return: A process ID, or `None` if `process_ids` is empty.
+    """
+    def weight(process_id):
+        data = ("%s:%d" % (key, process_id)).encode("ascii")
+        return hashlib.sha1(data).digest()
+
+    if len(process_ids) == 0:
+        return None
+    else:
+        return max(process_ids, key=weight)
+
+
+class Duty:
+    """A periodic duty performed by one region process at a time.
+
+    :ivar name: The name of the duty, used to choose its owner.
+    :ivar objid: The first of a range of advisory lock IDs, one per shard.
+        See `maasserver.locks`.
+    :ivar shards: The number of shards the duty is split into.
+    """
+
+    def __init__(self, name, objid, shards=1):
+        super(Duty, self).__init__()
+        self.name = name
+        self.objid = objid
+        self.shards = shards
+
+    def __repr__(self):
+        return "<%s %s shards=%d>" % (
+            self.__class__.__name__, self.name, self.shards)
+
+    def get_key(self, shard):
+        if self.shards == 1:
+            return self.name
+        else:
+            return "%s/%d" % (self.name, shard)
+
+    def get_lock(self, shard):
+        return DatabaseXactLock(self.objid + shard).TRY
+
+    def claim(self):
+        """Claim the shards of this duty that belong to this process.
+
+        Must be called within a transaction. Claimed shards are locked until
+        the transaction ends.
+
+        If no region processes are registered, e.g. while the region is
+        starting up, every process tries to claim every shard.
+
+        :return: A list of shard numbers, empty if there's nothing to do.
+        """
+        this_process, process_ids = get_region_processes()
+        claimed = []
+        for shard in range(self.shards):
+            owner = get_duty_owner(self.get_key(shard), process_ids)
+            if owner is not None and owner != this_process:
+                continue
+            try:
+                # The lock is released when the transaction ends, not when
+                # leaving this block.
+                with self.get_lock(shard):
+                    pass
+            except DatabaseLockNotHeld:
+                continue
+            else:
+                claimed.append(shard)
+        return claimed
+
+    def perform(self, func, *args, **kwargs):
+        """Call `func` if this process claims the whole of this duty.
+
+        Must be called within a transaction.
+
+        :return: The result of `func`, or `None` if it was not called.
+        """
+        if len(self.claim()) == self.shards:
+            return func(*args, **kwargs)
+        else:
+            return None
+
+    def filter(self, queryset, shards, field="id"):
+        """Limit `queryset` to the rows belonging to `shards`.
+
+        :param shards: A list of shard numbers from `claim`, or `None` for all
+            rows.
+        :param field: The integer field, typically a node ID, by which rows
+            are sharded.
+        """
+        if shards is None or len(shards) == self.shards:
+            return queryset
+        else:
+            return queryset.annotate(
+                duty_shard=F(field) % self.shards).filter(
+                    duty_shard__in=shards)
+
+
+# The duties. Lock IDs are reserved in `maasserver.locks`.
+cleanup_nonces = Duty("nonce-cleanup", 100)
+cleanup_dns_publications = Duty("dns-publication-cleanup", 101)
+send_stats = Duty("stats", 102)
+cleanup_script_output = Duty("script-output-cleanup", 103)
+monitor_node_status = Duty("status-monitor", 200, shards=16)
@@ -98,6 +98,11 @@ def make_NonceCleanupService():
     return nonces_cleanup.NonceCleanupService()
 
 
+def make_ScriptOutputCleanupService():
+    from metadataserver import script_output_cleanup
+    return script_output_cleanup.ScriptOutputCleanupService()
+
+
 def make_DNSPublicationGarbageService():
     from maasserver.dns import publication
     return publication.DNSPublicationGarbageService()
@@ -133,9 +138,9 @@ def make_RackControllerService(postgresListener, advertisingService):
     return RackControllerService(postgresListener, advertisingService)
 
 
-def make_StatusWorkerService(dbtasks):
+def make_StatusWorkerService(dbtasks, postgresListener):
     from metadataserver.api_twisted import StatusWorkerService
-    return StatusWorkerService(dbtasks)
+    return StatusWorkerService(dbtasks, postgresListener=postgresListener)
 
 
 def make_ServiceMonitorService(advertisingService):
@@ -164,6 +169,16 @@ def make_ReverseDNSService(postgresListener):
     return ReverseDNSService(postgresListener)
 
 
+def make_CurtinConfigService(postgresListener):
+    from maasserver.regiondservices.curtin_config import CurtinConfigService
+    return CurtinConfigService(postgresListener)
+
+
+def make_ConfigCacheService(postgresListener):
+    from maasserver.regiondservices.config_cache import ConfigCacheService
+    return ConfigCacheService(postgresListener)
+
+
 def make_NetworkTimeProtocolService():
     from maasserver.regiondservices import ntp
     return ntp.RegionNetworkTimeProtocolService(reactor)
@@ -249,22 +264,27 @@ class RegionEventLoop:
             "requires": [],
         },
         "nonce-cleanup": {
-            "only_on_master": True,
+            "only_on_master": False,
             "factory": make_NonceCleanupService,
             "requires": [],
         },
+        "script-output-cleanup": {
+            "only_on_master": False,
+            "factory": make_ScriptOutputCleanupService,
+            "requires": [],
+        },
         "dns-publication-cleanup": {
-            "only_on_master": True,
+            "only_on_master": False,
             "factory": make_DNSPublicationGarbageService,
             "requires": [],
         },
         "status-monitor": {
-            "only_on_master": True,
+            "only_on_master": False,
             "factory": make_StatusMonitorService,
             "requires": [],
         },
         "stats": {
-            "only_on_master": True,
+            "only_on_master": False,
             "factory": make_StatsService,
             "requires": [],
         },
@@ -296,7 +316,7 @@ class RegionEventLoop:
         "status-worker": {
             "only_on_master": False,
             "factory": make_StatusWorkerService,
-            "requires": ["database-tasks"],
+            "requires": ["database-tasks", "postgres-listener"],
         },
         "networks-monitor": {
             "only_on_master": False,
@@ -323,6 +343,16 @@ class RegionEventLoop:
             "factory": make_NetworkTimeProtocolService,
             "requires": [],
         },
+        "curtin-config": {
+            "only_on_master": False,
+            "factory": make_CurtinConfigService,
+            "requires": ["postgres-listener"],
+        },
+        "config-cache": {
+            "only_on_master": False,
+            "factory": make_ConfigCacheService,
+            "requires": ["postgres-listener"],
+        },
     }
 
     def __init__(self):
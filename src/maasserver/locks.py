@@ -8,15 +8,11 @@ __all__ = [
     "dns",
     "eventloop",
     "import_images",
-    "node_acquire",
     "security",
     "startup",
 ]
 
-from maasserver.utils.dblocks import (
-    DatabaseLock,
-    DatabaseXactLock,
-)
+from maasserver.utils.dblocks import DatabaseLock
 
 # Lock around starting-up a MAAS region and connection of rack controllers.
 # This can be a problem where a region controller and a rack controller try
@@ -38,8 +34,10 @@ import_images = DatabaseLock(4)
 # Lock to prevent concurrent changes to DNS configuration.
 dns = DatabaseLock(6)
 
-# Lock to prevent concurrent acquisition of nodes.
-node_acquire = DatabaseXactLock(7)
+# Lock used to be used to prevent concurrent acquisition of nodes. Machines
+# are now claimed by locking their rows; see `claim_machines_for_acquisition`.
+# DO NOT USE '7' AGAIN, it is reserved so it doesn't break upgrades.
+# node_acquire = DatabaseXactLock(7)
 
 # Lock to help with concurrent allocation of IP addresses.
 address_allocation = DatabaseLock(8)
@@ -51,3 +49,6 @@ address_allocation = DatabaseLock(8)
 
 # Lock to prevent concurrent network scanning.
 try_active_discovery = DatabaseLock(10).TRY
+
+# Locks from 100 to 299 are used by periodic duties shared out between region
+# processes; see `maasserver.duties`. Each shard of a duty has its own lock.
@@ -354,6 +354,26 @@ class Command(BaseCommand):
         from maasserver import dbviews
         dbviews.register_all_views()
 
+    @classmethod
+    def _perform_discovery_rebuild(cls, database):
+        """Rebuild the discovery table from its view.
+
+        :attention: `database` argument is not used!
+        """
+        from maasserver.models import Discovery
+        from maasserver.utils.orm import transactional
+        transactional(Discovery.objects.rebuild)()
+
+    @classmethod
+    def _perform_inventory_rebuild(cls, database):
+        """Rebuild the node inventory table from its view.
+
+        :attention: `database` argument is not used!
+        """
+        from maasserver.models import NodeInventory
+        from maasserver.utils.orm import transactional
+        transactional(NodeInventory.objects.rebuild)()
+
     def handle(self, *args, **options):
         database = options.get('database')
         always_south = options.get('always_south', False)
@@ -407,6 +427,11 @@ class Command(BaseCommand):
             # idempotent, so we run it at the end of every database upgrade.
             self._perform_trigger_installation(database)
             self._perform_view_installation(database)
+
+            # The triggers were not installed while migrating, so the
+            # discovery and node inventory tables may be out of date.
+            self._perform_discovery_rebuild(database)
+            self._perform_inventory_rebuild(database)
         else:
             # Piston has been renamed from piston to piston3.
             piston_tables = self._find_tables(database, "piston")
@@ -0,0 +1,86 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Django command: rebuild the discovery table from its view."""
+
+__all__ = ['Command']
+
+from contextlib import closing
+from textwrap import dedent
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from maasserver.models import Discovery
+from maasserver.utils.orm import transactional
+
+
+def _get_benchmark_querysets():
+    """Return (name, queryset) tuples of the queries to benchmark."""
+    return [
+        ("all", Discovery.objects.all().order_by("-last_seen")),
+        ("by_unknown_mac", Discovery.objects.by_unknown_mac()),
+        ("by_unknown_ip", Discovery.objects.by_unknown_ip()),
+        ("by_unknown_ip_and_mac", Discovery.objects.by_unknown_ip_and_mac()),
+    ]
+
+
+def _time_query(sql, params, iterations):
+    """Return the mean time, in seconds, to run `sql` and fetch all rows."""
+    with closing(connection.cursor()) as cursor:
+        start = time.monotonic()
+        for _ in range(iterations):
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        return (time.monotonic() - start) / iterations
+
+
+@transactional
+def benchmark(iterations):
+    """Compare the discovery queries against the table and the view.
+
+    :return: A list of (name, table_seconds, view_seconds) tuples.
+    """
+    results = []
+    for name, queryset in _get_benchmark_querysets():
+        sql, params = queryset.query.sql_with_params()
+        view_sql = sql.replace(
+            '"maasserver_discovery"', '"maasserver_discovery_view"')
+        results.append((
+            name,
+            _time_query(sql, params, iterations),
+            _time_query(view_sql, params, iterations),
+        ))
+    return results
+
+
+class Command(BaseCommand):
+    """Rebuilds the discovery table, and optionally benchmarks it."""
+
+    help = dedent(
+        "Rebuilds the table of discovered network devices from the "
+        "underlying neighbour and mDNS/rDNS observations. (This table is "
+        "normally kept up to date automatically.)")
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        parser.add_argument(
+            '--benchmark', action='store_true', default=False,
+            help="After rebuilding, compare the time taken to query the "
+                 "table with the time taken to query the view it is built "
+                 "from.")
+        parser.add_argument(
+            '--iterations', type=int, default=10,
+            help="Number of times to run each query when benchmarking.")
+
+    def handle(self, **options):
+        count = transactional(Discovery.objects.rebuild)()
+        self.stdout.write("Rebuilt discovery table: %d discoveries." % count)
+        if options.get('benchmark'):
+            self.stdout.write(
+                "%-24s %12s %12s %8s" % ("query", "table (ms)", "view (ms)",
+                                         "speedup"))
+            for name, table, view in benchmark(options['iterations']):
+                speedup = (view / table) if table > 0 else float('inf')
+                self.stdout.write("%-24s %12.2f %12.2f %7.1fx" % (
+                    name, table * 1000, view * 1000, speedup))
@@ -0,0 +1,47 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the `rebuild_discovery` management command."""
+
+__all__ = []
+
+from io import StringIO
+
+from django.core.management import call_command
+from maasserver.management.commands import rebuild_discovery
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import DocTestMatches
+from testtools.matchers import (
+    Equals,
+    HasLength,
+)
+
+
+class TestRebuildDiscoveryCommand(MAASServerTestCase):
+
+    def test__rebuilds_table(self):
+        factory.make_Discovery()
+        stdout = StringIO()
+        call_command("rebuild_discovery", stdout=stdout)
+        self.assertThat(stdout.getvalue(), Equals(
+            "Rebuilt discovery table: 1 discoveries.\n"))
+
+    def test__benchmarks_table_against_view(self):
+        factory.make_Discovery()
+        stdout = StringIO()
+        call_command(
+            "rebuild_discovery", benchmark=True, iterations=1, stdout=stdout)
+        self.assertThat(stdout.getvalue(), DocTestMatches(
+            "Rebuilt discovery table: 1 discoveries.\n"
+            "query ... table (ms) ... view (ms) ... speedup\n"
+            "all ...\n"
+            "by_unknown_mac ...\n"
+            "by_unknown_ip ...\n"
+            "by_unknown_ip_and_mac ...\n"))
+
+    def test__benchmark_returns_result_per_query(self):
+        results = rebuild_discovery.benchmark(1)
+        self.assertThat(
+            results,
+            HasLength(len(rebuild_discovery._get_benchmark_querysets())))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from django.db import migrations
+
+# The `Discovery` model was previously backed by a view of the same name.
+# It is now backed by a table maintained by triggers (see
+# maasserver.triggers.discovery), populated from the renamed
+# `maasserver_discovery_view` view. The view must be dropped first; any
+# existing installation will still have it.
+table_create = """\
+DROP VIEW IF EXISTS maasserver_discovery;
+CREATE TABLE maasserver_discovery (
+    id integer NOT NULL PRIMARY KEY,
+    discovery_id varchar(256),
+    neighbour_id integer NOT NULL,
+    ip inet,
+    mac_address macaddr,
+    vid integer,
+    first_seen timestamp with time zone NOT NULL,
+    last_seen timestamp with time zone NOT NULL,
+    mdns_id integer,
+    hostname varchar(256),
+    observer_id integer NOT NULL,
+    observer_system_id varchar(41) NOT NULL,
+    observer_hostname varchar(256),
+    observer_interface_id integer NOT NULL,
+    observer_interface_name varchar(255) NOT NULL,
+    fabric_id integer NOT NULL,
+    fabric_name varchar(256),
+    vlan_id integer NOT NULL,
+    is_external_dhcp boolean,
+    subnet_id integer,
+    subnet_cidr cidr,
+    subnet_prefixlen integer
+);
+CREATE INDEX maasserver_discovery_mac_address_ip_idx
+    ON maasserver_discovery (mac_address, ip);
+CREATE INDEX maasserver_discovery_ip_idx
+    ON maasserver_discovery (ip);
+CREATE INDEX maasserver_discovery_last_seen_idx
+    ON maasserver_discovery (last_seen);
+CREATE INDEX maasserver_discovery_subnet_id_idx
+    ON maasserver_discovery (subnet_id);
+CREATE INDEX maasserver_discovery_observer_id_idx
+    ON maasserver_discovery (observer_id);
+CREATE INDEX maasserver_discovery_vlan_id_idx
+    ON maasserver_discovery (vlan_id);
+CREATE INDEX maasserver_discovery_fabric_id_idx
+    ON maasserver_discovery (fabric_id);
+-- Used by the "unknown MAC" and "unknown IP" filters.
+CREATE INDEX maasserver_interface_mac_address_idx
+    ON maasserver_interface (mac_address);
+CREATE INDEX maasserver_neighbour_ip_idx
+    ON maasserver_neighbour (ip);
+"""
+
+table_drop = """\
+DROP INDEX IF EXISTS maasserver_neighbour_ip_idx;
+DROP INDEX IF EXISTS maasserver_interface_mac_address_idx;
+DROP TABLE IF EXISTS maasserver_discovery;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0130_node_locked_flag'),
+    ]
+
+    operations = [
+        migrations.RunSQL(table_create, table_drop),
+    ]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import django.contrib.postgres.fields
+from django.db import (
+    migrations,
+    models,
+)
+import django.db.models.deletion
+import maasserver.models.cleansave
+
+# The `NodeInventory` model is backed by a table maintained by triggers (see
+# maasserver.triggers.inventory), populated from the
+# `maasserver_nodeinventory_view` view. The table is filled by dbupgrade once
+# the view and triggers have been installed.
+table_create = """\
+CREATE TABLE maasserver_nodeinventory (
+    node_id integer NOT NULL PRIMARY KEY
+        REFERENCES maasserver_node (id) ON DELETE CASCADE,
+    root_disk_size bigint,
+    root_disk_tags text[] NOT NULL,
+    disk_count integer NOT NULL,
+    disk_max_size bigint,
+    disk_tags text[] NOT NULL,
+    vlan_ids integer[] NOT NULL
+);
+CREATE INDEX maasserver_nodeinventory_root_disk_size_idx
+    ON maasserver_nodeinventory (root_disk_size);
+CREATE INDEX maasserver_nodeinventory_root_disk_tags_idx
+    ON maasserver_nodeinventory USING gin (root_disk_tags);
+CREATE INDEX maasserver_nodeinventory_disk_max_size_idx
+    ON maasserver_nodeinventory (disk_max_size);
+CREATE INDEX maasserver_nodeinventory_disk_tags_idx
+    ON maasserver_nodeinventory USING gin (disk_tags);
+CREATE INDEX maasserver_nodeinventory_vlan_ids_idx
+    ON maasserver_nodeinventory USING gin (vlan_ids);
+"""
+
+table_drop = """\
+DROP TABLE IF EXISTS maasserver_nodeinventory;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0131_discovery_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeInventory',
+            fields=[
+                ('node', models.OneToOneField(editable=False, primary_key=True, related_name='inventory', serialize=False, on_delete=django.db.models.deletion.DO_NOTHING, to='maasserver.Node')),
+                ('root_disk_size', models.BigIntegerField(editable=False, null=True)),
+                ('root_disk_tags', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), editable=False, size=None)),
+                ('disk_count', models.IntegerField(editable=False)),
+                ('disk_max_size', models.BigIntegerField(editable=False, null=True)),
+                ('disk_tags', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), editable=False, size=None)),
+                ('vlan_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), editable=False, size=None)),
+            ],
+            options={
+                'managed': False,
+                'verbose_name': 'Node inventory',
+                'verbose_name_plural': 'Node inventories',
+            },
+            bases=(maasserver.models.cleansave.CleanSave, models.Model),
+        ),
+        migrations.RunSQL(table_create, table_drop),
+    ]
@@ -45,6 +45,7 @@ __all__ = [
     'MDNS',
     'Neighbour',
     'Node',
+    'NodeInventory',
     'NodeMetadata',
     'NodeGroupToRackController',
     'Notification',
@@ -150,6 +151,7 @@ from maasserver.models.node import (
     RackController,
     RegionController,
 )
+from maasserver.models.nodeinventory import NodeInventory
 from maasserver.models.nodemetadata import NodeMetadata
 from maasserver.models.notification import Notification
 from maasserver.models.ownerdata import OwnerData
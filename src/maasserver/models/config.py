@@ -15,13 +15,20 @@ import copy
 from datetime import timedelta
 from socket import gethostname
 
+from django.db import transaction
 from django.db.models import (
+    BooleanField,
     CharField,
     Manager,
     Model,
 )
-from django.db.models.signals import post_save
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
 from maasserver import DefaultMeta
+from maasserver.config_cache import config_cache
 from maasserver.fields import JSONObjectField
 from provisioningserver.drivers.osystem.ubuntu import UbuntuOS
 
@@ -130,20 +137,64 @@ class ConfigManager(Manager):
         Return None or the provided default if the config value does not
         exist.
 
+        Values are found in `config_cache` when caching is enabled for this
+        process, else they are read from the database. The cache is bypassed
+        in a transaction that has written configuration, until it commits.
+
         :param name: The name of the config item.
         :type name: unicode
         :param name: The optional default value to return if no such config
             item exists.
         :type name: object
         :return: A config value.
-        :raises: Config.MultipleObjectsReturned
         """
-        try:
-            return self.get(name=name).value
-        except Config.DoesNotExist:
+        if _written_in_this_transaction():
+            # The cache holds committed values, which this transaction has
+            # changed; neither use nor populate it until the change commits.
+            values = dict(self.filter(name=name).values_list("name", "value"))
+        else:
+            values, generation = config_cache.get()
+        if values is None:
+            if config_cache.read_through:
+                values = dict(
+                    self.filter(name=name).values_list("name", "value"))
+            else:
+                # Load every value; they're small, and most requests that
+                # need one need several.
+                values, current = self._load_all(config_cache.txid)
+                if current:
+                    config_cache.store(values, generation)
+        if name in values:
+            # Copy the value; callers are free to modify what they get.
+            return copy.deepcopy(values[name])
+        else:
             return copy.deepcopy(DEFAULT_CONFIG.get(name, default))
-        except Config.MultipleObjectsReturned as error:
-            raise Config.MultipleObjectsReturned("%s (%s)" (error, name))
+
+    def _load_all(self, txid):
+        """Load every configuration value.
+
+        :param txid: The ID of the latest transaction known to have changed
+            configuration, or `None`.
+        :return: A ``(values, current)`` tuple. `values` is a dict mapping
+            names to values. `current` is true if `txid` is visible in the
+            snapshot the values were loaded from, i.e. they include its
+            change, and so may be cached.
+        """
+        if txid is None:
+            return dict(self.values_list("name", "value")), True
+        else:
+            # Check in the same query, and thus the same snapshot, even when
+            # not in a transaction.
+            visible = RawSQL(
+                "txid_visible_in_snapshot(%s, txid_current_snapshot())",
+                [txid], output_field=BooleanField())
+            rows = list(self.annotate(visible=visible).values_list(
+                "name", "value", "visible"))
+            values = {name: value for name, value, _ in rows}
+            # With no rows there's no snapshot to check; don't cache.
+            current = len(rows) != 0 and all(
+                visible for _, _, visible in rows)
+            return values, current
 
     def set_config(self, name, value):
         """Set or overwrite a config value.
@@ -229,3 +280,33 @@ class Config(Model):
 
 # Connect config manager's _config_changed to Config's post-save signal.
 post_save.connect(Config.objects._config_changed, sender=Config)
+
+
+def _written_in_this_transaction():
+    """Has this thread's transaction written configuration, uncommitted?
+
+    `_config_written` arranges for the cache to be invalidated when such a
+    transaction commits. Django discards that arrangement if the transaction,
+    or the savepoint in which it was made, is rolled back, so it's pending
+    only for as long as the write is.
+    """
+    connection = transaction.get_connection()
+    return connection.in_atomic_block and any(
+        func == config_cache.invalidate
+        for _, func in connection.run_on_commit)
+
+
+def _config_written(sender, instance, **kwargs):
+    """Forget cached values when this process changes them.
+
+    They are forgotten again when the change commits, in case another thread
+    has cached the old values meanwhile. Other processes are told once the
+    change is committed; see `maasserver.config_cache`.
+    """
+    config_cache.invalidate()
+    if not _written_in_this_transaction():
+        transaction.on_commit(config_cache.invalidate)
+
+
+post_save.connect(_config_written, sender=Config)
+post_delete.connect(_config_written, sender=Config)
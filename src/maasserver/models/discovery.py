@@ -7,6 +7,9 @@ __all__ = [
     'Discovery',
 ]
 
+from contextlib import closing
+
+from django.db import connection
 from django.db.models import (
     CharField,
     DateTimeField,
@@ -139,19 +142,45 @@ class DiscoveryManager(Manager, DiscoveryQueriesMixin):
             "Cleared" if user is None else "User '%s' cleared" % (
                 user.username), what))
 
+    def rebuild(self):
+        """Rebuild the `maasserver_discovery` table from its view.
+
+        The table is normally kept up to date by triggers; this is only
+        needed after a database upgrade, or if it is suspected that the
+        table and the view have diverged.
+
+        :return: The number of discoveries in the rebuilt table.
+        """
+        # Circular imports.
+        from maasserver.triggers.discovery import DISCOVERY_COLUMNS
+        columns = ", ".join(DISCOVERY_COLUMNS)
+        with closing(connection.cursor()) as cursor:
+            # Prevent the triggers from writing to the table concurrently.
+            cursor.execute(
+                "LOCK TABLE maasserver_discovery IN EXCLUSIVE MODE")
+            cursor.execute("DELETE FROM maasserver_discovery")
+            cursor.execute(
+                "INSERT INTO maasserver_discovery (%s) "
+                "SELECT %s FROM maasserver_discovery_view" % (
+                    columns, columns))
+            return cursor.rowcount
+
 
 class Discovery(CleanSave, ViewModel):
     """A `Discovery` object represents the combined data for a network entity
     that MAAS believes has been discovered.
 
-    Note that this class is backed by the `maasserver_discovery` view. Any
-    updates to this model must be reflected in `maasserver/dbviews.py` under
-    the `maasserver_discovery` view.
+    Note that this class is backed by the `maasserver_discovery` table, which
+    is maintained by triggers (see `maasserver.triggers.discovery`) from the
+    `maasserver_discovery_view` view. Any updates to this model must be
+    reflected in `maasserver/dbviews.py` under the `maasserver_discovery_view`
+    view, and in a migration for the table.
     """
 
     class Meta(DefaultViewMeta):
         # When managed is False, Django will not create a migration for this
-        # model class. This is required for model classes based on views.
+        # model class. The table is created with raw SQL (see migration
+        # 0131_discovery_table) and written to only by triggers.
         verbose_name = "Discovery"
         verbose_name_plural = "Discoveries"
 
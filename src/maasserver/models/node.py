@@ -191,6 +191,7 @@ from provisioningserver.refresh.node_info_scripts import IPADDR_OUTPUT_NAME
 from provisioningserver.rpc.cluster import (
     AddChassis,
     DisableAndShutoffRackd,
+    GetRPCMetrics,
     IsImportBootImagesRunning,
     RefreshRackControllerInfo,
 )
@@ -565,6 +566,34 @@ class MachineManager(BaseNodeManager):
         available_machines = self.get_nodes(for_user, NODE_PERMISSION.VIEW)
         return available_machines.filter(status=NODE_STATUS.READY)
 
+    def claim_machines_for_acquisition(self, machines, count=1):
+        """Lock up to `count` of `machines` for acquisition.
+
+        Each machine's row is locked until the end of the transaction, and
+        machines already locked by another transaction are skipped, so that
+        concurrent allocations claim different machines rather than waiting
+        for one another.
+
+        :param machines: Candidate machines, in order of preference, e.g.
+            from `get_available_machines_for_acquisition`.
+        :type machines: `django.db.models.query.QuerySet`
+        :param count: The maximum number of machines to claim.
+        :return: A list of at most `count` machines, in order of preference.
+        """
+        candidates = [machine.id for machine in machines.only("id")]
+        if len(candidates) == 0:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM maasserver_node "
+                "WHERE id = ANY(%s) "
+                "ORDER BY array_position(%s, id) "
+                "LIMIT %s FOR UPDATE SKIP LOCKED",
+                [candidates, candidates, count])
+            claimed = [node_id for node_id, in cursor.fetchall()]
+        machines = self.in_bulk(claimed)
+        return [machines[node_id] for node_id in claimed]
+
 
 class DeviceManager(BaseNodeManager):
     """Devices are all the non-deployable nodes."""
@@ -2583,6 +2612,16 @@ class Node(CleanSave, TimestampedModel):
                     package_list,
                     "s" if len(missing_packages) > 1 else ""))
 
+    def lock_for_update(self):
+        """Lock this node's row until the end of the transaction.
+
+        This waits for any other transaction holding the lock, e.g. one
+        acquiring this node. Should that transaction change the node, this
+        one fails with a serialization failure, and is retried.
+        """
+        nodes = Node.objects.filter(id=self.id).select_for_update()
+        list(nodes.values_list("id", flat=True))
+
     def acquire(
             self, user, token=None, agent_name='', comment=None,
             bridge_all=False, bridge_stp=None, bridge_fd=None):
@@ -5276,6 +5315,19 @@ class RackController(Controller):
         response = call.wait(30)
         return response['running']
 
+    def get_rpc_metrics(self):
+        """Return the metrics recorded for RPC commands handled by the rack.
+
+        :raises NoConnectionsAvailable: When no connections to the rack
+            controller are available for use.
+        :raises crochet.TimeoutError: If a response has not been received
+            within 30 seconds.
+        """
+        client = getClientFor(self.system_id, timeout=1)
+        call = client(GetRPCMetrics)
+        response = call.wait(30)
+        return response['metrics']
+
 
 class RegionController(Controller):
     """A node which is running multiple regiond's."""
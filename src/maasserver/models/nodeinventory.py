@@ -0,0 +1,112 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Model definition for a `NodeInventory` (a summary of a node's hardware)."""
+
+__all__ = [
+    'NodeInventory',
+]
+
+from contextlib import closing
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection
+from django.db.models import (
+    BigIntegerField,
+    DO_NOTHING,
+    IntegerField,
+    Manager,
+    OneToOneField,
+    TextField,
+)
+from maasserver import DefaultViewMeta
+from maasserver.models.cleansave import CleanSave
+from maasserver.models.viewmodel import ViewModel
+
+
+# Columns of both the maasserver_nodeinventory table and view, in order.
+NODE_INVENTORY_COLUMNS = (
+    "node_id",
+    "root_disk_size",
+    "root_disk_tags",
+    "disk_count",
+    "disk_max_size",
+    "disk_tags",
+    "vlan_ids",
+)
+
+
+class NodeInventoryManager(Manager):
+    """A utility to manage the collection of `NodeInventory`s."""
+
+    def rebuild(self):
+        """Rebuild the `maasserver_nodeinventory` table from its view.
+
+        The table is normally kept up to date by triggers; this is only
+        needed after a database upgrade, or if it is suspected that the
+        table and the view have diverged.
+
+        :return: The number of nodes in the rebuilt table.
+        """
+        columns = ", ".join(NODE_INVENTORY_COLUMNS)
+        with closing(connection.cursor()) as cursor:
+            # Prevent the triggers from writing to the table concurrently.
+            cursor.execute(
+                "LOCK TABLE maasserver_nodeinventory IN EXCLUSIVE MODE")
+            cursor.execute("DELETE FROM maasserver_nodeinventory")
+            cursor.execute(
+                "INSERT INTO maasserver_nodeinventory (%s) "
+                "SELECT %s FROM maasserver_nodeinventory_view" % (
+                    columns, columns))
+            return cursor.rowcount
+
+
+class NodeInventory(CleanSave, ViewModel):
+    """A summary of a node's storage and networking.
+
+    It holds just enough to rule out, in SQL, nodes that cannot satisfy
+    allocation constraints, without fetching every block device and
+    interface. See `AcquireNodeForm`.
+
+    Note that this class is backed by the `maasserver_nodeinventory` table,
+    which is maintained by triggers (see `maasserver.triggers.inventory`)
+    from the `maasserver_nodeinventory_view` view. Any updates to this model
+    must be reflected in `maasserver/dbviews.py` under the
+    `maasserver_nodeinventory_view` view, and in a migration for the table.
+
+    :ivar root_disk_size: The size of the disk on which '/' is mounted.
+    :ivar root_disk_tags: The tags of the disk on which '/' is mounted.
+    :ivar disk_count: The number of unused disks, i.e. those without a
+        filesystem or partition table.
+    :ivar disk_max_size: The size of the largest unused disk.
+    :ivar disk_tags: All tags of the unused disks.
+    :ivar vlan_ids: The IDs of the VLANs the node's interfaces are on.
+    """
+
+    class Meta(DefaultViewMeta):
+        # When managed is False, Django will not create a migration for this
+        # model class. The table is created with raw SQL (see migration
+        # 0132_nodeinventory_table) and written to only by triggers.
+        verbose_name = "Node inventory"
+        verbose_name_plural = "Node inventories"
+
+    objects = NodeInventoryManager()
+
+    node = OneToOneField(
+        'Node', primary_key=True, editable=False, related_name='inventory',
+        on_delete=DO_NOTHING)
+
+    root_disk_size = BigIntegerField(editable=False, null=True)
+
+    root_disk_tags = ArrayField(TextField(), editable=False)
+
+    disk_count = IntegerField(editable=False)
+
+    disk_max_size = BigIntegerField(editable=False, null=True)
+
+    disk_tags = ArrayField(TextField(), editable=False)
+
+    vlan_ids = ArrayField(IntegerField(), editable=False)
+
+    def __str__(self):
+        return "<NodeInventory: %s>" % self.node_id
@@ -13,6 +13,7 @@ __all__ = [
     "script_output_nsmap",
 ]
 import base64
+import zlib
 
 from django.db import connection
 from metadataserver.enum import SCRIPT_STATUS
@@ -72,9 +73,11 @@ def get_probed_details(nodes):
         sql_query = """
             SELECT
               script_set.node_id, script_result.script_name,
-              script_result.stdout
+              script_output.data
             FROM
-              metadataserver_scriptresult AS script_result,
+              metadataserver_scriptresult AS script_result
+              LEFT OUTER JOIN metadataserver_scriptoutput AS script_output
+                ON script_output.id = script_result.stdout_blob_id,
               metadataserver_scriptset AS script_set,
               maasserver_node AS node
             WHERE
@@ -91,6 +94,11 @@ def get_probed_details(nodes):
         for node_id, script_name, stdout in cursor.fetchall():
             system_id = node_ids[node_id].system_id
             namespace = script_output_nsmap[script_name]
-            stdout_decoded = base64.b64decode(stdout)
+            if stdout is None:
+                # The script printed nothing.
+                stdout_decoded = b''
+            else:
+                # See `metadataserver.models.scriptoutput.ScriptOutput`.
+                stdout_decoded = zlib.decompress(base64.b64decode(stdout))
             ret[system_id][namespace] = stdout_decoded
     return ret
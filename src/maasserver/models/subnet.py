@@ -51,6 +51,7 @@ from maasserver.models.cleansave import CleanSave
 from maasserver.models.staticroute import StaticRoute
 from maasserver.models.timestampedmodel import TimestampedModel
 from maasserver.utils.orm import MAASQueriesMixin
+from maasserver.utils.prepared import PreparedStatement
 from netaddr import (
     AddrFormatError,
     IPAddress,
@@ -146,7 +147,7 @@ class SubnetQueriesMixin(MAASQueriesMixin):
         INNER JOIN maasserver_vlan AS vlan
             ON subnet.vlan_id = vlan.id
         WHERE
-            %s << subnet.cidr /* Specified IP is inside range */
+            $1 << subnet.cidr /* Specified IP is inside range */
         ORDER BY
             /* Pick subnet that is on a VLAN that is managed over a subnet
                that is not managed on a VLAN. */
@@ -163,9 +164,7 @@ class SubnetQueriesMixin(MAASQueriesMixin):
         ip = IPAddress(ip)
         if ip.is_ipv4_mapped():
             ip = ip.ipv4()
-        subnets = self.raw(
-            self.find_best_subnet_for_ip_query,
-            params=[str(ip)])
+        subnets = find_best_subnet_for_ip.raw(self, [str(ip)])
 
         for subnet in subnets:
             return subnet  # This is stable because the query is ordered.
@@ -283,6 +282,13 @@ class SubnetQueriesMixin(MAASQueriesMixin):
             return current_q
 
 
+# Prepared server-side; this is used for every lease update and many boot
+# requests. See `maasserver.utils.prepared`.
+find_best_subnet_for_ip = PreparedStatement(
+    "find_best_subnet_for_ip",
+    SubnetQueriesMixin.find_best_subnet_for_ip_query, ["inet"])
+
+
 class SubnetQuerySet(QuerySet, SubnetQueriesMixin):
     """Custom QuerySet which mixes in some additional queries specific to
     subnets. This needs to be a mixin because an identical method is needed on
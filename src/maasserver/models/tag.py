@@ -23,7 +23,7 @@ from maasserver import DefaultMeta
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.timestampedmodel import TimestampedModel
 from maasserver.utils.orm import post_commit_do
-from maasserver.utils.threads import deferToDatabase
+from maasserver.utils.threads import deferToDatabaseQueue
 from twisted.internet import reactor
 
 
@@ -106,7 +106,7 @@ class Tag(CleanSave, TimestampedModel):
             # Schedule repopulate to happen after commit. This thread does not
             # wait for it to complete.
             post_commit_do(
-                reactor.callLater, 0, deferToDatabase,
+                reactor.callLater, 0, deferToDatabaseQueue, "bulk",
                 populate_tags, self)
 
     def _populate_nodes_now(self):
@@ -7,8 +7,13 @@ __all__ = []
 
 from socket import gethostname
 
-from django.db import IntegrityError
+from django.db import (
+    connection,
+    IntegrityError,
+    transaction,
+)
 from fixtures import TestWithFixtures
+from maasserver.config_cache import config_cache
 from maasserver.models import (
     Config,
     signals,
@@ -17,6 +22,8 @@ import maasserver.models.config
 from maasserver.models.config import get_default_config
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.djangotestcase import count_queries
+from testtools import ExpectedException
 from testtools.matchers import Is
 
 
@@ -168,6 +175,110 @@ class ConfigTest(MAASServerTestCase):
         self.assertEqual([], recorder.calls)
 
 
+class ConfigCacheTest(MAASServerTestCase):
+    """Testing of `Config.objects.get_config` with `config_cache`."""
+
+    def setUp(self):
+        super(ConfigCacheTest, self).setUp()
+        config_cache.clear()
+        config_cache.enable()
+        self.addCleanup(config_cache.clear)
+        self.addCleanup(config_cache.disable)
+
+    def make_committed_config(self, **values):
+        # Saving a Config stops values being cached until the transaction
+        # commits, which it never does in a test. Creating them in bulk does
+        # not send signals, so these are treated as committed.
+        Config.objects.bulk_create(
+            Config(name=name, value=value) for name, value in values.items())
+
+    def test_get_config_loads_all_values_once(self):
+        self.make_committed_config(first=1, second=2)
+        count, values = count_queries(
+            lambda: [
+                Config.objects.get_config(name)
+                for name in ('first', 'second', 'third')
+            ])
+        self.assertEqual([1, 2, None], values)
+        self.assertEqual(1, count)
+        self.assertEqual((2, 1), (config_cache.hits, config_cache.misses))
+
+    def test_get_config_returns_copy_of_cached_value(self):
+        self.make_committed_config(name={'key': 'value'})
+        Config.objects.get_config('name')['key'] = 'changed'
+        self.assertEqual({'key': 'value'}, Config.objects.get_config('name'))
+        self.assertEqual(1, config_cache.hits)
+
+    def test_get_config_does_not_cache_values_written_in_transaction(self):
+        self.make_committed_config(name='before')
+        self.assertEqual('before', Config.objects.get_config('name'))
+        Config.objects.set_config('name', 'after')
+        self.assertEqual('after', Config.objects.get_config('name'))
+        self.assertIsNone(config_cache.values)
+
+    def test_get_config_does_not_use_cache_once_written_in_transaction(self):
+        Config.objects.set_config('name', 'after')
+        # Another thread caches the committed values meanwhile.
+        config_cache.store({'name': 'before'}, config_cache.generation)
+        self.assertEqual('after', Config.objects.get_config('name'))
+
+    def test_get_config_does_not_cache_rolled_back_values(self):
+        self.make_committed_config(name='before')
+        with ExpectedException(ZeroDivisionError):
+            with transaction.atomic():
+                Config.objects.set_config('name', 'phantom')
+                self.assertEqual('phantom', Config.objects.get_config('name'))
+                self.assertIsNone(config_cache.values)
+                0 / 0
+        self.assertEqual('before', Config.objects.get_config('name'))
+        self.assertEqual('before', config_cache.values['name'])
+
+    def test_set_config_invalidates_cache(self):
+        Config.objects.set_config('name', 'before')
+        self.assertEqual('before', Config.objects.get_config('name'))
+        Config.objects.set_config('name', 'after')
+        self.assertEqual('after', Config.objects.get_config('name'))
+
+    def test_delete_invalidates_cache(self):
+        Config.objects.set_config('name', 'value')
+        self.assertEqual('value', Config.objects.get_config('name'))
+        Config.objects.filter(name='name').delete()
+        self.assertIsNone(Config.objects.get_config('name'))
+
+    def get_snapshot_bounds(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT txid_snapshot_xmin(txid_current_snapshot()), "
+                "txid_snapshot_xmax(txid_current_snapshot())")
+            return cursor.fetchone()
+
+    def test_get_config_does_not_cache_values_older_than_change(self):
+        self.make_committed_config(name='before')
+        # A change is notified by a transaction that started after this one's
+        # snapshot was taken, so cannot be seen by it.
+        _, xmax = self.get_snapshot_bounds()
+        config_cache.changed(xmax)
+        self.assertEqual('before', Config.objects.get_config('name'))
+        self.assertIsNone(config_cache.values)
+
+    def test_get_config_caches_values_including_change(self):
+        self.make_committed_config(name='value')
+        # A change is notified by a transaction that finished before this
+        # one's snapshot was taken.
+        xmin, _ = self.get_snapshot_bounds()
+        config_cache.changed(xmin - 1)
+        self.assertEqual('value', Config.objects.get_config('name'))
+        self.assertEqual('value', config_cache.values['name'])
+
+    def test_get_config_reads_through_when_disabled(self):
+        config_cache.disable()
+        self.make_committed_config(name='value')
+        count, _ = count_queries(
+            lambda: [Config.objects.get_config('name') for _ in range(3)])
+        self.assertEqual(3, count)
+        self.assertEqual((0, 3), (config_cache.hits, config_cache.misses))
+
+
 class SettingConfigTest(MAASServerTestCase):
     """Testing of the :class:`Config` model and setting each option."""
 
@@ -11,6 +11,7 @@ import email
 import os
 import random
 import re
+import threading
 from unittest.mock import (
     ANY,
     call,
@@ -473,6 +474,96 @@ class TestMachineManager(MAASServerTestCase):
             [],
             list(Machine.objects.get_available_machines_for_acquisition(user)))
 
+    def test_claim_machines_returns_machines_in_order(self):
+        machines = [self.make_machine() for _ in range(3)]
+        candidates = Machine.objects.filter(
+            id__in=[machine.id for machine in machines]).order_by('-id')
+        self.assertEqual(
+            list(reversed(machines)),
+            Machine.objects.claim_machines_for_acquisition(candidates, 3))
+
+    def test_claim_machines_claims_at_most_count(self):
+        machines = [self.make_machine() for _ in range(3)]
+        candidates = Machine.objects.filter(
+            id__in=[machine.id for machine in machines]).order_by('id')
+        self.assertEqual(
+            machines[:2],
+            Machine.objects.claim_machines_for_acquisition(candidates, 2))
+
+    def test_claim_machines_returns_empty_list_if_no_candidates(self):
+        self.assertEqual(
+            [], Machine.objects.claim_machines_for_acquisition(
+                Machine.objects.none()))
+
+
+class TestMachineManagerConcurrency(MAASTransactionServerTestCase):
+
+    def test_claim_machines_skips_machines_claimed_elsewhere(self):
+        with transaction.atomic():
+            machines = [
+                factory.make_Node(status=NODE_STATUS.READY)
+                for _ in range(2)
+            ]
+        candidate_ids = [machine.id for machine in machines]
+
+        @transactional
+        def claim():
+            candidates = Machine.objects.filter(
+                id__in=candidate_ids).order_by('id')
+            return [
+                machine.id for machine in
+                Machine.objects.claim_machines_for_acquisition(candidates)
+            ]
+
+        claimed, release = threading.Event(), threading.Event()
+        claimed_in_thread = []
+
+        @transactional
+        def claim_and_hold():
+            claimed_in_thread.extend(claim())
+            claimed.set()
+            # Hold the lock until the other claim has been made.
+            release.wait(10)
+
+        thread = threading.Thread(target=claim_and_hold)
+        thread.start()
+        try:
+            self.assertTrue(claimed.wait(10))
+            claimed_here = claim()
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual([candidate_ids[0]], claimed_in_thread)
+        self.assertEqual([candidate_ids[1]], claimed_here)
+
+    def test_claim_machines_skips_machines_locked_for_update(self):
+        with transaction.atomic():
+            machine = factory.make_Node(status=NODE_STATUS.READY)
+
+        locked, release = threading.Event(), threading.Event()
+
+        @transactional
+        def lock_and_hold():
+            reload_object(machine).lock_for_update()
+            locked.set()
+            # Hold the lock until the claim has been made.
+            release.wait(10)
+
+        @transactional
+        def claim():
+            return Machine.objects.claim_machines_for_acquisition(
+                Machine.objects.filter(id=machine.id))
+
+        thread = threading.Thread(target=lock_and_hold)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual([], claim())
+        finally:
+            release.set()
+            thread.join()
+
 
 class TestControllerManager(MAASServerTestCase):
 
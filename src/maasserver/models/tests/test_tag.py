@@ -13,7 +13,7 @@ from maasserver.models import tag as tag_module
 from maasserver.models.tag import Tag
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
-from maasserver.utils.threads import deferToDatabase
+from maasserver.utils.threads import deferToDatabaseQueue
 from maastesting.matchers import (
     MockCalledOnceWith,
     MockNotCalled,
@@ -110,7 +110,7 @@ class TestTagPopulateNodesLater(MAASServerTestCase):
         tag._populate_nodes_later()
         self.assertThat(
             post_commit_do, MockCalledOnceWith(
-                reactor.callLater, 0, deferToDatabase,
+                reactor.callLater, 0, deferToDatabaseQueue, "bulk",
                 populate_tags.populate_tags, tag))
 
     def test__does_nothing_if_tag_is_not_defined(self):
@@ -135,7 +135,7 @@ class TestTagPopulateNodesLater(MAASServerTestCase):
         tag._populate_nodes_later()
         self.assertItemsEqual(nodes, tag.node_set.all())
         self.assertThat(post_commit_do, MockCalledOnceWith(
-            reactor.callLater, 0, deferToDatabase,
+            reactor.callLater, 0, deferToDatabaseQueue, "bulk",
             populate_tags.populate_tags, tag))
 
     def test__later_is_the_default(self):
@@ -25,7 +25,6 @@ from collections import OrderedDict
 
 from crochet import TimeoutError
 from django.core.exceptions import ValidationError
-from maasserver import locks
 from maasserver.clusterrpc.boot_images import RackControllersImporter
 from maasserver.enum import (
     NODE_PERMISSION,
@@ -310,8 +309,8 @@ class Acquire(NodeAction):
 
     def execute(self):
         """See `NodeAction.execute`."""
-        with locks.node_acquire:
-            self.node.acquire(self.user, token=None)
+        self.node.lock_for_update()
+        self.node.acquire(self.user, token=None)
 
 
 class Deploy(NodeAction):
@@ -326,8 +325,8 @@ class Deploy(NodeAction):
     def execute(self, osystem=None, distro_series=None, hwe_kernel=None):
         """See `NodeAction.execute`."""
         if self.node.owner is None:
-            with locks.node_acquire:
-                self.node.acquire(self.user, token=None)
+            self.node.lock_for_update()
+            self.node.acquire(self.user, token=None)
 
         if osystem and distro_series:
             try:
@@ -118,6 +118,7 @@ NETWORKING_CONSTRAINT_NAMES = {
 
 IGNORED_FIELDS = {
     'comment',
+    'count',
     'bridge_all',
     'bridge_stp',
     'bridge_fd',
@@ -303,6 +304,36 @@ def get_storage_constraints_from_string(storage):
     return head + tail
 
 
+def filter_nodes_by_storage_inventory(nodes, constraints):
+    """Return those of `nodes` whose inventory could satisfy `constraints`.
+
+    This is evaluated in SQL against each node's `NodeInventory`. It is
+    necessary, but not sufficient, for a node to match: a node's unused
+    disks may, between them, be large enough and have all the tags asked
+    for, without any one disk matching a constraint. Use `nodes_by_storage`
+    on the nodes returned to find those that do match.
+
+    :param constraints: Storage constraints, as returned by
+        `get_storage_constraints_from_string`.
+    """
+    if not constraints:
+        return nodes
+    (_, root_size, root_tags), others = constraints[0], constraints[1:]
+    nodes = nodes.filter(inventory__root_disk_size__gte=root_size)
+    if root_tags is not None:
+        nodes = nodes.filter(inventory__root_disk_tags__contains=root_tags)
+    if len(others) > 0:
+        nodes = nodes.filter(
+            inventory__disk_count__gte=len(others),
+            inventory__disk_max_size__gte=max(
+                size for _, size, _ in others))
+        tags = set(chain.from_iterable(
+            tags for _, _, tags in others if tags is not None))
+        if len(tags) > 0:
+            nodes = nodes.filter(inventory__disk_tags__contains=sorted(tags))
+    return nodes
+
+
 def nodes_by_storage(storage, node_ids=None):
     """Return list of dicts describing matching nodes and matched block devices
 
@@ -414,7 +445,7 @@ def nodes_by_storage(storage, node_ids=None):
     return nodes
 
 
-def nodes_by_interface(interfaces_label_map):
+def nodes_by_interface(interfaces_label_map, node_ids=None):
     """Determines the set of nodes that match the specified
     LabeledConstraintMap (which must be a map of interface constraints.)
 
@@ -429,8 +460,13 @@ def nodes_by_interface(interfaces_label_map):
     }
 
     :param interfaces_label_map: LabeledConstraintMap
+    :param node_ids: Optional IDs of the nodes to consider; the interfaces
+        of other nodes are ignored.
     :return: dict
     """
+    interfaces = Interface.objects.all()
+    if node_ids is not None:
+        interfaces = interfaces.filter(node_id__in=node_ids)
     node_ids = None
     label_map = {}
     for label in interfaces_label_map:
@@ -438,7 +474,7 @@ def nodes_by_interface(interfaces_label_map):
         if node_ids is None:
             # The first time through the filter, build the list
             # of candidate nodes.
-            node_ids, node_map = Interface.objects.get_matching_node_map(
+            node_ids, node_map = interfaces.get_matching_node_map(
                 constraints)
             label_map[label] = node_map
         else:
@@ -449,7 +485,7 @@ def nodes_by_interface(interfaces_label_map):
             # If a more efficient approach is desired, this could be changed
             # to filter the nodes starting from an 'id__in' filter using the
             # current 'node_ids' set.
-            new_node_ids, node_map = Interface.objects.get_matching_node_map(
+            new_node_ids, node_map = interfaces.get_matching_node_map(
                 constraints)
             label_map[label] = node_map
             node_ids &= new_node_ids
@@ -787,8 +823,9 @@ class AcquireNodeForm(RenamableFieldsForm):
         interfaces_label_map = self.cleaned_data.get(
             self.get_field_name('interfaces'))
         if interfaces_label_map is not None:
+            # Consider only the interfaces of nodes that are still candidates.
             node_ids, compatible_interfaces = nodes_by_interface(
-                interfaces_label_map)
+                interfaces_label_map, node_ids=filtered_nodes.values('id'))
             if node_ids is not None:
                 filtered_nodes = filtered_nodes.filter(id__in=node_ids)
 
@@ -799,23 +836,46 @@ class AcquireNodeForm(RenamableFieldsForm):
         storage = self.cleaned_data.get(
             self.get_field_name('storage'))
         if storage:
-            compatible_nodes = nodes_by_storage(storage)
+            # Rule out nodes without suitable disks in SQL first, so that
+            # only the block devices of the remaining nodes are matched.
+            filtered_nodes = filter_nodes_by_storage_inventory(
+                filtered_nodes, get_storage_constraints_from_string(storage))
+            compatible_nodes = nodes_by_storage(
+                storage, node_ids=filtered_nodes.values('id'))
             node_ids = list(compatible_nodes)
             if node_ids is not None:
                 filtered_nodes = filtered_nodes.filter(id__in=node_ids)
         return compatible_nodes, filtered_nodes
 
+    def filter_by_vlan_ids(self, filtered_nodes, vlan_ids, exclude=False):
+        """Filter nodes by whether any interface is on one of `vlan_ids`.
+
+        This is evaluated against each node's `NodeInventory`, so that the
+        filter does not have to join through every interface.
+        """
+        vlan_ids = list(vlan_ids)
+        if exclude:
+            return filtered_nodes.exclude(
+                inventory__vlan_ids__overlap=vlan_ids)
+        else:
+            return filtered_nodes.filter(
+                inventory__vlan_ids__overlap=vlan_ids)
+
     def filter_by_fabric_classes(self, filtered_nodes):
         fabric_classes = self.cleaned_data.get(self.get_field_name(
             'fabric_classes'))
         if fabric_classes is not None and len(fabric_classes) > 0:
-            filtered_nodes = filtered_nodes.filter(
-                interface__vlan__fabric__class_type__in=fabric_classes)
+            filtered_nodes = self.filter_by_vlan_ids(
+                filtered_nodes, VLAN.objects.filter(
+                    fabric__class_type__in=fabric_classes).values_list(
+                        'id', flat=True))
         not_fabric_classes = self.cleaned_data.get(self.get_field_name(
             'not_fabric_classes'))
         if not_fabric_classes is not None and len(not_fabric_classes) > 0:
-            filtered_nodes = filtered_nodes.exclude(
-                interface__vlan__fabric__class_type__in=not_fabric_classes)
+            filtered_nodes = self.filter_by_vlan_ids(
+                filtered_nodes, VLAN.objects.filter(
+                    fabric__class_type__in=not_fabric_classes).values_list(
+                        'id', flat=True), exclude=True)
         return filtered_nodes
 
     def filter_by_fabrics(self, filtered_nodes):
@@ -823,27 +883,30 @@ class AcquireNodeForm(RenamableFieldsForm):
         if fabrics is not None and len(fabrics) > 0:
             # XXX mpontillo 2015-10-30 need to also handle fabrics whose name
             # is null (fabric-<id>).
-            filtered_nodes = filtered_nodes.filter(
-                interface__vlan__fabric__name__in=fabrics)
+            filtered_nodes = self.filter_by_vlan_ids(
+                filtered_nodes, VLAN.objects.filter(
+                    fabric__name__in=fabrics).values_list('id', flat=True))
         not_fabrics = self.cleaned_data.get(self.get_field_name('not_fabrics'))
         if not_fabrics is not None and len(not_fabrics) > 0:
             # XXX mpontillo 2015-10-30 need to also handle fabrics whose name
             # is null (fabric-<id>).
-            filtered_nodes = filtered_nodes.exclude(
-                interface__vlan__fabric__name__in=not_fabrics)
+            filtered_nodes = self.filter_by_vlan_ids(
+                filtered_nodes, VLAN.objects.filter(
+                    fabric__name__in=not_fabrics).values_list(
+                        'id', flat=True), exclude=True)
         return filtered_nodes
 
     def filter_by_vlans(self, filtered_nodes):
         vlans = self.cleaned_data.get(self.get_field_name('vlans'))
         if vlans is not None and len(vlans) > 0:
             for vlan in set(vlans):
-                filtered_nodes = filtered_nodes.filter(
-                    interface__vlan=vlan)
+                filtered_nodes = self.filter_by_vlan_ids(
+                    filtered_nodes, [vlan.id])
         not_vlans = self.cleaned_data.get(self.get_field_name('not_vlans'))
         if not_vlans is not None and len(not_vlans) > 0:
-            for not_vlan in set(not_vlans):
-                filtered_nodes = filtered_nodes.exclude(
-                    interface__vlan=not_vlan)
+            filtered_nodes = self.filter_by_vlan_ids(
+                filtered_nodes, {not_vlan.id for not_vlan in not_vlans},
+                exclude=True)
         return filtered_nodes
 
     def filter_by_subnets(self, filtered_nodes):
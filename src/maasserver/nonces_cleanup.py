@@ -11,6 +11,7 @@ __all__ = [
 
 import time
 
+from maasserver.duties import cleanup_nonces
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from oauth.oauth import OAuthServer
@@ -99,6 +100,12 @@ class NonceCleanupService(TimerService, object):
     """
 
     def __init__(self, interval=(24 * 60 * 60)):
-        cleanup = synchronous(transactional(cleanup_old_nonces))
+
+        @synchronous
+        @transactional
+        def cleanup():
+            # Only one region process needs to do this.
+            return cleanup_nonces.perform(cleanup_old_nonces)
+
         super(NonceCleanupService, self).__init__(
             interval, deferToDatabase, cleanup)
@@ -13,6 +13,7 @@ __all__ = [
     'get_preseed',
     'get_preseed_context',
     'OS_WITH_IPv6_SUPPORT',
+    'render_curtin_userdata',
     ]
 
 from collections import namedtuple
@@ -55,6 +56,7 @@ from maasserver.models import (
 )
 from maasserver.models.filesystem import Filesystem
 from maasserver.node_status import COMMISSIONING_LIKE_STATUSES
+from maasserver.preseed_cache import curtin_userdata_cache
 from maasserver.preseed_network import compose_curtin_network_config
 from maasserver.preseed_storage import compose_curtin_storage_config
 from maasserver.server_address import get_maas_facing_server_host
@@ -74,6 +76,7 @@ from provisioningserver.logger import (
 )
 from provisioningserver.rpc.exceptions import NoConnectionsAvailable
 from provisioningserver.utils import typed
+from provisioningserver.utils.templates import TemplateCache
 from provisioningserver.utils.url import compose_URL
 import tempita
 import yaml
@@ -406,6 +409,20 @@ def get_curtin_merged_config(node):
 def get_curtin_userdata(node, default_region_ip=None):
     """Return the curtin user-data.
 
+    User-data rendered ahead of time is used if the node, and everything it
+    depends on, has not changed since; see `maasserver.preseed_cache`.
+
+    :param node: The node for which to generate the user-data.
+    :return: The rendered user-data string.
+    :rtype: unicode.
+    """
+    return curtin_userdata_cache.get(
+        node, default_region_ip, render_curtin_userdata)
+
+
+def render_curtin_userdata(node, default_region_ip=None):
+    """Render the curtin user-data, bypassing the cache.
+
     :param node: The node for which to generate the user-data.
     :return: The rendered user-data string.
     :rtype: unicode.
@@ -733,6 +750,30 @@ class PreseedTemplate(tempita.Template):
         escape=get_escape_singleton())
 
 
+# Preseed templates, parsed once and then reused until they change.
+preseed_templates = TemplateCache(PreseedTemplate)
+
+
+def load_cached_preseed_template(filenames, get_template):
+    """Load the first template found, parsing it only if it has changed.
+
+    :param filenames: An iterable of relative filenames.
+    :param get_template: See `TemplateCache.load`.
+    :return: A `PreseedTemplate`, or `None` if no template was found.
+    """
+    assert not isinstance(filenames, (bytes, str))
+    for location in settings.PRESEED_TEMPLATE_LOCATIONS:
+        for filename in filenames:
+            filepath = os.path.join(location, filename)
+            try:
+                return preseed_templates.load(
+                    filepath, encoding="utf-8", get_template=get_template)
+            except IOError:
+                pass  # Ignore.
+    else:
+        return None
+
+
 class TemplateNotFoundError(Exception):
     """The template has not been found."""
 
@@ -758,13 +799,12 @@ def load_preseed_template(node, prefix, osystem='', release=''):
         """
         filenames = list(get_preseed_filenames(
             node, name, osystem, release, default))
-        filepath, content = get_preseed_template(filenames)
-        if filepath is None:
-            raise TemplateNotFoundError(name)
         # This is where the closure happens: pass `get_template` when
-        # instanciating PreseedTemplate.
-        return PreseedTemplate(
-            content, name=filepath, get_template=get_template)
+        # loading the PreseedTemplate.
+        template = load_cached_preseed_template(filenames, get_template)
+        if template is None:
+            raise TemplateNotFoundError(name)
+        return template
 
     return get_template(prefix, None, default=True)
 
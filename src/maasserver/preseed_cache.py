@@ -0,0 +1,213 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""A cache of rendered curtin user-data.
+
+Composing curtin's user-data walks a node's interfaces, block devices,
+partitions and filesystems, and asks its rack controller about boot images.
+That is a lot of work to do while hundreds of nodes are deploying at once,
+all of them asking for their user-data at about the same time.
+
+Rendered user-data is therefore cached per node and per region address, and
+thrown away when the node or anything it depends on changes. The database
+triggers that keep the web UI up to date say when that happens; see
+`maasserver.regiondservices.curtin_config`, which listens for them and
+enables caching in region processes, and which also renders user-data ahead
+of time for nodes that are allocated or deploying.
+
+Elsewhere -- in tests, management commands, and so on -- nothing is cached
+and user-data is rendered afresh every time, so that it is never stale.
+
+Only user-data rendered ahead of time is cached. Transactions run at
+REPEATABLE READ, so user-data rendered for a request may come from a
+snapshot taken before a change was committed, even after the change has been
+notified. Rendering ahead of time happens in a transaction begun after the
+node's generation was noted, so any change its snapshot misses will have
+been notified since, and the render is not cached.
+"""
+
+__all__ = [
+    "curtin_userdata_cache",
+    "CurtinUserDataCache",
+]
+
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+class CurtinUserDataCache:
+    """A bounded, thread-safe cache of rendered curtin user-data.
+
+    Entries are keyed by the node's system ID and the region address that the
+    node was told to use. Invalidating a node bumps its generation, and
+    invalidating everything bumps the epoch, so a render that started before
+    a change is not cached.
+
+    :ivar read_through: When true, which is the default, nothing is cached.
+    :ivar hits: The number of lookups satisfied from the cache.
+    :ivar misses: The number of lookups that rendered user-data.
+    """
+
+    def __init__(self, size=2048, max_age=600, clock=time.monotonic):
+        super(CurtinUserDataCache, self).__init__()
+        self.size = size
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = Lock()
+        self.read_through = True
+        self.clear()
+
+    def clear(self):
+        """Forget everything, including the region addresses seen."""
+        with self.lock:
+            self.entries = OrderedDict()
+            self.region_ips = OrderedDict()
+            self.generations = {}
+            self.epoch = 0
+            self.hits = 0
+            self.misses = 0
+
+    def enable(self):
+        """Start caching user-data."""
+        with self.lock:
+            self.read_through = False
+
+    def disable(self):
+        """Stop caching user-data, and forget that already cached."""
+        with self.lock:
+            self.read_through = True
+            self.epoch += 1
+            self.entries.clear()
+
+    def _current(self, system_id):
+        return self.epoch, self.generations.get(system_id, 0)
+
+    def current(self, system_id):
+        """Return the current generation of the user-data for `system_id`.
+
+        Pass this to `warm`. It must be obtained before the transaction in
+        which user-data is rendered begins.
+        """
+        with self.lock:
+            return self._current(system_id)
+
+    def _lookup(self, key):
+        """Return the cached user-data for `key`, or `None`.
+
+        Must be called with the lock held.
+        """
+        try:
+            stamp, generation, userdata = self.entries.pop(key)
+        except KeyError:
+            return None
+        system_id, _ = key
+        if generation != self._current(system_id):
+            return None
+        if self.clock() - stamp > self.max_age:
+            return None
+        self.entries[key] = stamp, generation, userdata
+        return userdata
+
+    def _store(self, key, generation, userdata):
+        """Cache `userdata` for `key` if caching and it is not stale.
+
+        Must be called with the lock held.
+        """
+        system_id, region_ip = key
+        if not self.read_through and generation == self._current(system_id):
+            self.entries[key] = self.clock(), generation, userdata
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def get(self, node, default_region_ip, render):
+        """Return the user-data for `node`, calling `render` if needed.
+
+        User-data rendered here is not cached, because the caller's snapshot
+        may predate a change that has already been notified; see `warm`.
+        The region address is remembered, so that it is rendered for next
+        time the node is warmed.
+
+        :param render: A callable taking `node` and `default_region_ip` and
+            returning the rendered user-data.
+        """
+        key = node.system_id, default_region_ip
+        with self.lock:
+            self._remember_region_ip(node.system_id, default_region_ip)
+            userdata = self._lookup(key)
+            if userdata is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                return userdata
+        return render(node, default_region_ip)
+
+    def warm(self, node, render, generation):
+        """Render and cache user-data for `node` if not already cached.
+
+        User-data is rendered for each region address the node has been
+        seen to use. Returns the number of renders done.
+
+        :param generation: The generation of the node's user-data, from
+            `current`, obtained before the transaction in which `node` was
+            loaded began. Nothing is cached if it has changed since.
+        """
+        system_id = node.system_id
+        with self.lock:
+            if self.read_through:
+                return 0
+            region_ips = [
+                region_ip for region_ip in self.region_ips.get(system_id, ())
+                if self._lookup((system_id, region_ip)) is None
+            ]
+        for region_ip in region_ips:
+            userdata = render(node, region_ip)
+            with self.lock:
+                self._store((system_id, region_ip), generation, userdata)
+        return len(region_ips)
+
+    def _remember_region_ip(self, system_id, region_ip):
+        """Remember that `system_id` has been seen using `region_ip`.
+
+        Must be called with the lock held.
+        """
+        region_ips = self.region_ips.pop(system_id, ())
+        if region_ip not in region_ips:
+            region_ips += (region_ip,)
+        self.region_ips[system_id] = region_ips
+        while len(self.region_ips) > self.size:
+            self.region_ips.popitem(last=False)
+
+    def remember_region_ip(self, system_id, region_ip):
+        """Remember that `system_id` is expected to use `region_ip`."""
+        with self.lock:
+            self._remember_region_ip(system_id, region_ip)
+
+    def knows_region_ips(self, system_id):
+        """Return true if a region address has been seen for `system_id`."""
+        with self.lock:
+            return system_id in self.region_ips
+
+    def invalidate(self, system_id):
+        """Forget the user-data cached for `system_id`."""
+        with self.lock:
+            self.generations[system_id] = (
+                self.generations.get(system_id, 0) + 1)
+            for region_ip in self.region_ips.get(system_id, ()):
+                self.entries.pop((system_id, region_ip), None)
+
+    def invalidate_all(self):
+        """Forget all cached user-data.
+
+        Region addresses seen are remembered. Returns the system IDs of the
+        nodes that had user-data cached.
+        """
+        with self.lock:
+            system_ids = {system_id for system_id, _ in self.entries}
+            self.epoch += 1
+            self.entries.clear()
+            return system_ids
+
+
+# The cache for this process.
+curtin_userdata_cache = CurtinUserDataCache()
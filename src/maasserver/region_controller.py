@@ -17,12 +17,19 @@ Proxy:
     'sys_proxy'. Any time a message is recieved on that channel the maas-proxy
     is marked as requiring an update. Once marked for update the proxy
     configuration is updated and maas-proxy is told to reload.
+
+Boot configurations:
+    The regiond process listens for messages from Postgres on channel
+    'sys_boot_config'. Any time a message is recieved on that channel the rack
+    controllers are told to expire the boot configurations they have cached
+    for the MAC addresses in the message, or all of them if it is empty.
 """
 
 __all__ = [
     "RegionControllerService",
 ]
 
+from maasserver.clusterrpc.boot_configs import expire_boot_configs
 from maasserver.dns.config import dns_update_all_zones
 from maasserver.models.dnspublication import DNSPublication
 from maasserver.proxyconfig import proxy_update_config
@@ -85,6 +92,8 @@ class RegionControllerService(Service):
         super(RegionControllerService, self).startService()
         self.postgresListener.register("sys_dns", self.markDNSForUpdate)
         self.postgresListener.register("sys_proxy", self.markProxyForUpdate)
+        self.postgresListener.register(
+            "sys_boot_config", self.expireBootConfigs)
 
         # Update DNS and proxy on first start.
         self.markDNSForUpdate(None, None)
@@ -96,6 +105,8 @@ class RegionControllerService(Service):
         super(RegionControllerService, self).stopService()
         self.postgresListener.unregister("sys_dns", self.markDNSForUpdate)
         self.postgresListener.unregister("sys_proxy", self.markProxyForUpdate)
+        self.postgresListener.unregister(
+            "sys_boot_config", self.expireBootConfigs)
         if self.processingDefer is not None:
             self.processingDefer, d = None, self.processingDefer
             self.processing.stop()
@@ -111,6 +122,13 @@ class RegionControllerService(Service):
         self.needsProxyUpdate = True
         self.startProcessing()
 
+    def expireBootConfigs(self, channel, message):
+        """Called when the `sys_boot_config` message is received."""
+        if message:
+            expire_boot_configs(message.split(","))
+        else:
+            expire_boot_configs()
+
     def startProcessing(self):
         """Start the process looping call."""
         if not self.processing.running:
@@ -0,0 +1,46 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Service that keeps the cache of configuration values up to date."""
+
+__all__ = [
+    "ConfigCacheService",
+]
+
+from maasserver.config_cache import config_cache
+from maasserver.listener import PostgresListenerService
+from twisted.application.service import Service
+
+
+class ConfigCacheService(Service):
+    """Cache configuration values in this process while running.
+
+    Caching is enabled only while a listener is watching the `sys_config`
+    channel, so that values are forgotten when configuration changes.
+    """
+
+    def __init__(
+            self, postgresListener: PostgresListenerService=None,
+            cache=config_cache):
+        super().__init__()
+        self.listener = postgresListener
+        self.cache = cache
+
+    def startService(self):
+        super().startService()
+        if self.listener is not None:
+            self.listener.register("sys_config", self.configChanged)
+            self.cache.enable()
+
+    def stopService(self):
+        if self.listener is not None:
+            self.listener.unregister("sys_config", self.configChanged)
+            self.cache.disable()
+        return super().stopService()
+
+    def configChanged(self, channel, txid):
+        """Called when the `sys_config` message is received.
+
+        :param txid: The ID of the transaction that changed configuration.
+        """
+        self.cache.changed(int(txid))
@@ -0,0 +1,171 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Service that keeps the cache of curtin user-data up to date."""
+
+__all__ = [
+    "CurtinConfigService",
+]
+
+from maasserver.enum import NODE_STATUS
+from maasserver.listener import PostgresListenerService
+from maasserver.models import Node
+from maasserver.preseed import render_curtin_userdata
+from maasserver.preseed_cache import curtin_userdata_cache
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.utils.network import get_source_address
+from twisted.application.service import Service
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    Deferred,
+    maybeDeferred,
+)
+
+
+log = LegacyLogger()
+
+
+# Nodes in these states will soon ask for their curtin user-data.
+WARM_STATUSES = frozenset({
+    NODE_STATUS.ALLOCATED,
+    NODE_STATUS.DEPLOYING,
+})
+
+# Changes to rows in these channels are not tied to any one node, but can
+# change the user-data rendered for any of them.
+GLOBAL_CHANNELS = (
+    "config",
+    "domain",
+    "packagerepository",
+    "staticroute",
+    "subnet",
+    "vlan",
+)
+
+
+def guess_region_ip(node):
+    """Guess the region address that `node` will be told to use.
+
+    This is the address from which this region would reply to the rack
+    controller that the node last booted from. Most nodes reach the region
+    through that rack, or from the same network as it.
+    """
+    if node.boot_cluster_ip is None:
+        return None
+    else:
+        return get_source_address(node.boot_cluster_ip)
+
+
+class CurtinConfigService(Service):
+    """Keep the curtin user-data cached in this process up to date.
+
+    The database triggers that drive the web UI send a notification when a
+    machine, or any of its interfaces, block devices, partitions, and so on,
+    change. This drops the user-data cached for that machine and, if it has
+    been allocated or is deploying, renders it again in the background, so
+    that it's ready when curtin asks for it.
+
+    Notifications arriving close together are coalesced: a burst of changes
+    to a machine, or to many machines, results in one render for each.
+
+    Caching is enabled only while a listener is watching for these
+    notifications, so that user-data is forgotten when it would change.
+    """
+
+    def __init__(
+            self, postgresListener: PostgresListenerService=None,
+            clock=reactor, cache=curtin_userdata_cache, delay=1.0):
+        super().__init__()
+        self.listener = postgresListener
+        self.clock = clock
+        self.cache = cache
+        self.delay = delay
+        self.pending = set()
+        self.warming = None
+
+    def startService(self):
+        super().startService()
+        if self.listener is not None:
+            self.listener.register("machine", self.machineChanged)
+            for channel in GLOBAL_CHANNELS:
+                self.listener.register(channel, self.everythingChanged)
+            self.cache.enable()
+
+    def stopService(self):
+        if self.listener is not None:
+            self.listener.unregister("machine", self.machineChanged)
+            for channel in GLOBAL_CHANNELS:
+                self.listener.unregister(channel, self.everythingChanged)
+            self.cache.disable()
+        self.pending.clear()
+        d = maybeDeferred(super().stopService)
+        if isinstance(self.warming, Deferred):
+            # Wait for the renders in progress to finish.
+            warming = self.warming
+            d.addCallback(lambda _: warming)
+        elif self.warming is not None:
+            self.warming.cancel()
+            self.warming = None
+        return d
+
+    def machineChanged(self, action, system_id):
+        """Called when a machine or anything attached to it changes."""
+        self.cache.invalidate(system_id)
+        if action != "delete":
+            self.warmLater({system_id})
+
+    def everythingChanged(self, action, obj_id):
+        """Called when something that all machines depend on changes."""
+        self.warmLater(self.cache.invalidate_all())
+
+    def warmLater(self, system_ids):
+        """Render user-data for `system_ids` a short while from now."""
+        self.pending.update(system_ids)
+        if self.running and self.pending and self.warming is None:
+            self.warming = self.clock.callLater(self.delay, self.warm)
+
+    def warm(self):
+        """Render user-data for the pending machines."""
+        system_ids, self.pending = self.pending, set()
+        d = self.warming = deferToDatabase(self.warmMachines, system_ids)
+        d.addErrback(log.err, "Failed to render curtin user-data.")
+        d.addBoth(self._warmed)
+        return d
+
+    def _warmed(self, _):
+        self.warming = None
+        # Anything that changed while rendering is rendered again.
+        self.warmLater(())
+
+    def warmMachines(self, system_ids):
+        """Render and cache user-data for machines about to deploy.
+
+        Each machine is rendered in its own transaction, so that one that
+        cannot be rendered, e.g. because its rack controller is not connected,
+        does not stop the others.
+        """
+        for system_id in system_ids:
+            try:
+                self.warmMachine(system_id)
+            except Exception:
+                log.err(None, (
+                    "Failed to render curtin user-data for %s." % system_id))
+
+    def warmMachine(self, system_id):
+        # Note the generation before the transaction begins, so that a change
+        # its snapshot does not include is notified after, and the user-data
+        # rendered is not cached.
+        generation = self.cache.current(system_id)
+        self._warmMachine(system_id, generation)
+
+    @transactional
+    def _warmMachine(self, system_id, generation):
+        node = Node.objects.filter(
+            system_id=system_id, status__in=WARM_STATUSES).first()
+        if node is not None:
+            if not self.cache.knows_region_ips(system_id):
+                self.cache.remember_region_ip(
+                    system_id, guess_region_ip(node))
+            self.cache.warm(node, render_curtin_userdata, generation)
@@ -0,0 +1,45 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.regiondservices.config_cache`."""
+
+__all__ = []
+
+from maasserver.config_cache import ConfigCache
+from maasserver.regiondservices.config_cache import ConfigCacheService
+from maasserver.testing.listener import FakePostgresListenerService
+from maastesting.testcase import MAASTestCase
+
+
+class TestConfigCacheService(MAASTestCase):
+
+    def make_service(self, listener):
+        cache = ConfigCache()
+        return ConfigCacheService(listener, cache=cache), cache
+
+    def test__enables_cache_while_listening(self):
+        listener = FakePostgresListenerService()
+        service, cache = self.make_service(listener)
+        service.startService()
+        self.assertFalse(cache.read_through)
+        self.assertIn(
+            service.configChanged, listener.listeners["sys_config"])
+        service.stopService()
+        self.assertTrue(cache.read_through)
+        self.assertNotIn(
+            service.configChanged, listener.listeners.get("sys_config", []))
+
+    def test__does_not_enable_cache_without_listener(self):
+        service, cache = self.make_service(None)
+        service.startService()
+        self.assertTrue(cache.read_through)
+        service.stopService()
+
+    def test__config_changes_invalidate_cache(self):
+        service, cache = self.make_service(FakePostgresListenerService())
+        service.startService()
+        self.addCleanup(service.stopService)
+        cache.store({"a": 1}, cache.generation)
+        service.configChanged("sys_config", "1234")
+        self.assertIsNone(cache.get()[0])
+        self.assertEqual(1234, cache.txid)
@@ -0,0 +1,158 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the curtin user-data cache service."""
+
+__all__ = []
+
+from unittest.mock import (
+    call,
+    Mock,
+)
+
+from maasserver.enum import NODE_STATUS
+from maasserver.preseed_cache import CurtinUserDataCache
+from maasserver.regiondservices import curtin_config
+from maasserver.regiondservices.curtin_config import (
+    CurtinConfigService,
+    GLOBAL_CHANNELS,
+)
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCallsMatch,
+    MockNotCalled,
+)
+from twisted.internet.defer import succeed
+from twisted.internet.task import Clock
+
+
+class TestCurtinConfigService(MAASServerTestCase):
+
+    def make_service(self, listener=None):
+        if listener is None:
+            listener = Mock()
+        cache = CurtinUserDataCache()
+        service = CurtinConfigService(listener, Clock(), cache)
+        service.startService()
+        self.addCleanup(service.stopService)
+        return service
+
+    def test_registers_and_unregisters_listener(self):
+        listener = Mock()
+        service = self.make_service(listener)
+        self.assertThat(listener.register, MockCallsMatch(
+            call("machine", service.machineChanged), *(
+                call(channel, service.everythingChanged)
+                for channel in GLOBAL_CHANNELS)))
+        self.assertThat(listener.unregister, MockNotCalled())
+        service.stopService()
+        self.assertThat(listener.unregister, MockCallsMatch(
+            call("machine", service.machineChanged), *(
+                call(channel, service.everythingChanged)
+                for channel in GLOBAL_CHANNELS)))
+
+    def test_enables_and_disables_cache_with_listener(self):
+        service = self.make_service()
+        self.assertFalse(service.cache.read_through)
+        service.stopService()
+        self.assertTrue(service.cache.read_through)
+
+    def test_does_not_enable_cache_without_listener(self):
+        service = CurtinConfigService(None, Clock(), CurtinUserDataCache())
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertTrue(service.cache.read_through)
+
+    def test_machineChanged_invalidates_and_warms_later(self):
+        service = self.make_service()
+        system_id = factory.make_name("system_id")
+        invalidate = self.patch(service.cache, "invalidate")
+        warm = self.patch(service, "warm")
+        service.machineChanged("update", system_id)
+        service.machineChanged("update", system_id)
+        self.assertThat(invalidate, MockCallsMatch(
+            call(system_id), call(system_id)))
+        self.assertEqual({system_id}, service.pending)
+        self.assertThat(warm, MockNotCalled())
+        service.clock.advance(service.delay)
+        self.assertThat(warm, MockCalledOnceWith())
+
+    def test_machineChanged_does_not_warm_deleted_machine(self):
+        service = self.make_service()
+        service.machineChanged("delete", factory.make_name("system_id"))
+        self.assertEqual(set(), service.pending)
+        self.assertIsNone(service.warming)
+
+    def test_everythingChanged_warms_cached_machines(self):
+        service = self.make_service()
+        system_ids = {factory.make_name("system_id")}
+        self.patch(
+            service.cache, "invalidate_all").return_value = system_ids
+        service.everythingChanged("update", "1")
+        self.assertEqual(system_ids, service.pending)
+
+    def test_warm_renders_pending_machines(self):
+        service = self.make_service()
+        system_id = factory.make_name("system_id")
+        deferToDatabase = self.patch(curtin_config, "deferToDatabase")
+        deferToDatabase.return_value = succeed(None)
+        service.machineChanged("update", system_id)
+        service.clock.advance(service.delay)
+        self.assertThat(deferToDatabase, MockCalledOnceWith(
+            service.warmMachines, {system_id}))
+        self.assertEqual(set(), service.pending)
+        self.assertIsNone(service.warming)
+
+    def test_warmMachines_continues_after_failure(self):
+        service = self.make_service()
+        warmMachine = self.patch(service, "warmMachine")
+        warmMachine.side_effect = [Exception("boom"), None]
+        service.warmMachines(["a", "b"])
+        self.assertThat(warmMachine, MockCallsMatch(call("a"), call("b")))
+
+    def test_warmMachine_renders_allocated_machine(self):
+        service = self.make_service()
+        node = factory.make_Node(status=NODE_STATUS.ALLOCATED)
+        region_ip = factory.make_ip_address()
+        self.patch(
+            curtin_config, "guess_region_ip").return_value = region_ip
+        render = self.patch(curtin_config, "render_curtin_userdata")
+        render.return_value = factory.make_name("userdata")
+        service.warmMachine(node.system_id)
+        self.assertThat(render, MockCalledOnceWith(node, region_ip))
+        self.assertEqual(
+            render.return_value,
+            service.cache.get(node, region_ip, Mock()))
+
+    def test_warmMachine_notes_generation_before_transaction(self):
+        service = self.make_service()
+        system_id = factory.make_name("system_id")
+        _warmMachine = self.patch(service, "_warmMachine")
+        service.warmMachine(system_id)
+        self.assertThat(_warmMachine, MockCalledOnceWith(
+            system_id, service.cache.current(system_id)))
+
+    def test_warmMachine_does_not_cache_render_overtaken_by_change(self):
+        service = self.make_service()
+        node = factory.make_Node(status=NODE_STATUS.ALLOCATED)
+        self.patch(
+            curtin_config, "guess_region_ip").return_value = (
+                factory.make_ip_address())
+
+        def render(node, region_ip):
+            # The machine changes while its user-data is rendering.
+            service.cache.invalidate(node.system_id)
+            return factory.make_name("userdata")
+
+        self.patch(curtin_config, "render_curtin_userdata", render)
+        service.warmMachine(node.system_id)
+        self.assertEqual({}, dict(service.cache.entries))
+
+    def test_warmMachine_ignores_machine_not_deploying(self):
+        service = self.make_service()
+        node = factory.make_Node(status=NODE_STATUS.READY)
+        render = self.patch(curtin_config, "render_curtin_userdata")
+        service.warmMachine(node.system_id)
+        self.assertThat(render, MockNotCalled())
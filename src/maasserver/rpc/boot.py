@@ -22,13 +22,11 @@ from maasserver.models import (
     BootResource,
     Config,
     Event,
+    Node,
     RackController,
     VLAN,
 )
-from maasserver.models.interface import (
-    Interface,
-    PhysicalInterface,
-)
+from maasserver.models.interface import PhysicalInterface
 from maasserver.node_status import NODE_STATUS
 from maasserver.preseed import (
     compose_enlistment_preseed_url,
@@ -41,6 +39,7 @@ from maasserver.utils.orm import (
     transactional,
 )
 from maasserver.utils.osystems import validate_hwe_kernel
+from maasserver.utils.prepared import PreparedStatement
 from provisioningserver.events import EVENT_TYPES
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.utils.network import get_source_address
@@ -49,6 +48,18 @@ from provisioningserver.utils.twisted import synchronous
 
 DEFAULT_ARCH = 'i386'
 
+# Prepared server-side because it's used for every PXE request. See
+# `maasserver.utils.prepared`.
+find_node_by_physical_mac = PreparedStatement(
+    "find_node_by_physical_mac", """\
+    SELECT node.*
+    FROM maasserver_node AS node
+    INNER JOIN maasserver_interface AS interface
+        ON interface.node_id = node.id
+    WHERE interface.type = '%s' AND interface.mac_address = $1
+    LIMIT 2
+    """ % INTERFACE_TYPE.PHYSICAL, ["macaddr"])
+
 
 def get_node_from_mac_string(mac_string):
     """Get a Node object from a MAC address string.
@@ -57,10 +68,8 @@ def get_node_from_mac_string(mac_string):
     """
     if mac_string is None:
         return None
-    interface = get_one(
-        Interface.objects.filter(
-            type=INTERFACE_TYPE.PHYSICAL, mac_address=mac_string))
-    return interface.node if interface else None
+    return get_one(
+        find_node_by_physical_mac.raw(Node.objects, [mac_string]))
 
 
 def event_log_pxe_request(machine, purpose):
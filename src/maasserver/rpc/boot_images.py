@@ -0,0 +1,58 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""RPC helpers relating to boot images reported by rack controllers."""
+
+__all__ = [
+    "reported_boot_images",
+]
+
+import threading
+
+
+class ReportedBootImages:
+    """Boot images reported by rack controllers with `UpdateBootImages`.
+
+    A rack controller that watches its boot images reports them over each
+    connection to this region process when it connects, and again whenever
+    they change. A report stands until that connection is lost. Rack
+    controllers that do not report must be asked with `ListBootImagesV2`.
+
+    Reports are received in the reactor and read from database threads, so
+    access is locked.
+    """
+
+    def __init__(self):
+        super(ReportedBootImages, self).__init__()
+        self._lock = threading.Lock()
+        self._reports = {}
+
+    def report(self, ident, connection, images):
+        """Record `images` reported by rack `ident` over `connection`."""
+        with self._lock:
+            self._reports[ident] = connection, images
+
+    def forget(self, ident, connection):
+        """Forget the report made by rack `ident` over `connection`.
+
+        A more recent report made over another connection is kept.
+        """
+        with self._lock:
+            if ident in self._reports:
+                if self._reports[ident][0] is connection:
+                    del self._reports[ident]
+
+    def get(self, ident):
+        """Return the boot images reported by rack `ident`.
+
+        :return: A list of boot images, or `None` if there's no report.
+        """
+        with self._lock:
+            if ident in self._reports:
+                return self._reports[ident][1]
+            else:
+                return None
+
+
+# The reports received by this process.
+reported_boot_images = ReportedBootImages()
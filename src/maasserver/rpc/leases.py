@@ -22,6 +22,7 @@ from maasserver.models import (
     UnknownInterface,
 )
 from maasserver.utils.orm import transactional
+from maasserver.utils.prepared import PreparedStatement
 from netaddr import IPAddress
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils.network import coerce_to_valid_hostname
@@ -30,6 +31,15 @@ from provisioningserver.utils.twisted import synchronous
 
 log = LegacyLogger()
 
+# Prepared server-side because it's used for every lease update. See
+# `maasserver.utils.prepared`.
+find_interfaces_by_mac = PreparedStatement(
+    "find_interfaces_by_mac", """\
+    SELECT * FROM maasserver_interface
+    WHERE mac_address = $1
+    ORDER BY created, id
+    """, ["macaddr"])
+
 
 class LeaseUpdateError(Exception):
     """Raise when `update_lease` fails to update lease information."""
@@ -112,7 +122,7 @@ def update_lease(
         # Do nothing.
         return {}
 
-    interfaces = list(Interface.objects.filter(mac_address=mac))
+    interfaces = find_interfaces_by_mac.raw(Interface.objects, [mac])
     if len(interfaces) == 0 and action == "commit":
         # A MAC address that is unknown to MAAS was given an IP address. Create
         # an unknown interface for this lease.
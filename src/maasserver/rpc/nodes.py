@@ -15,7 +15,6 @@ from itertools import (
     chain,
     islice,
 )
-import json
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
@@ -105,37 +104,6 @@ def _gen_cluster_nodes_power_parameters(nodes):
             }
 
 
-def _gen_up_to_json_limit(things, limit):
-    """Yield until the combined JSON dump of those things would exceed `limit`.
-
-    :param things: Any iterable whose elements can dumped as JSON.
-    :return: A generator that yields items from `things` unmodified, and in
-        order, though maybe not all of them.
-    """
-    # Deduct the space required for brackets. json.dumps(), by default, does
-    # not add padding, so it's just the opening and closing brackets.
-    limit -= 2
-
-    for index, thing in enumerate(things):
-        # Adjust the limit according the the size of thing.
-        if index == 0:
-            # A sole element does not need a delimiter.n
-            limit -= len(json.dumps(thing))
-        else:
-            # There is a delimiter between this and the preceeding element.
-            # json.dumps(), by default, uses ", ", i.e. 2 characters.
-            limit -= len(json.dumps(thing)) + 2
-
-        # Check if we've reached the limit.
-        if limit == 0:
-            yield thing
-            break
-        elif limit > 0:
-            yield thing
-        else:
-            break
-
-
 @synchronous
 @transactional
 def list_cluster_nodes_power_parameters(system_id, limit=10):
@@ -145,20 +113,18 @@ def list_cluster_nodes_power_parameters(system_id, limit=10):
     For :py:class:`~provisioningserver.rpc.region.ListNodePowerParameters`.
 
     :param limit: Limit the number of nodes for which to return power
-        parameters. Pass `None` to remove this numerical limit; there is still
-        a limit on the quantity of power information that will be returned.
+        parameters. Pass `None` to remove this limit.
     """
     try:
         rack = RackController.objects.get(system_id=system_id)
     except RackController.DoesNotExist:
         raise NoSuchCluster.from_uuid(system_id)
 
-    # Generate all the the power queries that will fit into the response.
+    # Generate the power queries, but never more than `limit`. The response
+    # is chunked as needed, so there's no limit on its size.
     nodes = rack.get_bmc_accessible_nodes()
     details = _gen_cluster_nodes_power_parameters(nodes)
-    details = islice(details, limit)  # ... but never more than `limit`.
-    details = _gen_up_to_json_limit(details, 60 * (2 ** 10))  # 60kiB
-    details = list(details)
+    details = list(islice(details, limit))
 
     # Update the queried time on all of the nodes at once. So another
     # rack controller does not update them at the same time. This operation
@@ -43,6 +43,7 @@ from maasserver.models.service import Service
 from maasserver.models.timestampedmodel import now
 from maasserver.rpc import (
     boot,
+    boot_images,
     configuration,
     events,
     leases,
@@ -633,6 +634,17 @@ class RegionServer(Region):
             result['version'] = get_maas_version()
         return result
 
+    @region.UpdateBootImages.responder
+    def update_boot_images(self, images):
+        """update_boot_images(images)
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.region.UpdateBootImages`.
+        """
+        if self.ident is not None:
+            boot_images.reported_boot_images.report(self.ident, self, images)
+        return {}
+
     @inlineCallbacks
     def _register(
             self, system_id, hostname, interfaces, url, nodegroup_uuid=None,
@@ -733,6 +745,7 @@ class RegionServer(Region):
                 log.err,
                 "Failed to unregister the rack controller connection.")
         self.factory.service._removeConnectionFor(self.ident, self)
+        boot_images.reported_boot_images.forget(self.ident, self)
         log.msg("Rack controller '%s' disconnected." % self.ident)
         super(RegionServer, self).connectionLost(reason)
 
@@ -789,15 +802,17 @@ class RegionService(service.Service, object):
             waiters.add(d)
             return d
         else:
-            connection = random.choice(conns)
+            connection = common.choose_connection(conns)
             return defer.succeed(connection)
 
     def _getConnectionFromIdentifiers(self, identifiers, timeout):
         """Wait up to `timeout` seconds for at least one connection from
         `identifiers`.
 
-        Returns a `Deferred` which will fire with a list of random connections
-        to each client. Only one connection per client will be returned.
+        Returns a `Deferred` which will fire with a list of connections, the
+        least busy of two picked at random for each client; see
+        `common.choose_connection`. Only one connection per client will be
+        returned.
 
         The public interface to this method is `getClientFromIdentifiers`.
         """
@@ -805,7 +820,7 @@ class RegionService(service.Service, object):
         for ident in identifiers:
             conns = list(self.connections[ident])
             if len(conns) > 0:
-                matched_connections.append(random.choice(conns))
+                matched_connections.append(common.choose_connection(conns))
         if len(matched_connections) > 0:
             return defer.succeed(matched_connections)
         else:
@@ -957,9 +972,9 @@ class RegionService(service.Service, object):
     def getClientFor(self, system_id, timeout=30):
         """Return a :class:`common.Client` for the specified rack controller.
 
-        If more than one connection exists to that rack controller - implying
-        that there are multiple rack controllers for the particular
-        cluster, for HA - one of them will be returned at random.
+        If more than one connection exists to that rack controller - one for
+        each of its event-loops - the least busy of two picked at random is
+        returned; see `common.choose_connection`.
 
         :param system_id: The system_id - as a string - of the rack controller
             that a connection is wanted for.
@@ -984,7 +999,8 @@ class RegionService(service.Service, object):
         identifiers.
 
         If more than one connection exists to that given `identifiers`, then
-        one of them will be returned at random.
+        the least busy of two picked at random is returned; see
+        `common.choose_connection`.
 
         :param identifiers: List of system_id's of the rack controller
             that a connection is wanted for.
@@ -1002,15 +1018,19 @@ class RegionService(service.Service, object):
                 "available." % ','.join(identifiers))
 
         def cb_client(conns):
-            return common.Client(random.choice(conns))
+            return common.Client(common.choose_connection(conns))
 
         return d.addCallbacks(cb_client, cancelled)
 
     @asynchronous(timeout=FOREVER)
     def getAllClients(self):
-        """Return a list with one connection per rack controller."""
+        """Return a list with one connection per rack controller.
+
+        Each is the least busy of two of the rack controller's connections
+        picked at random; see `common.choose_connection`.
+        """
         return [
-            common.Client(random.choice(list(connections)))
+            common.Client(common.choose_connection(connections))
             for connections in self.connections.values()
             if len(connections) > 0
         ]
@@ -1028,7 +1048,7 @@ class RegionService(service.Service, object):
             # The connection object is a set of RegionServer objects.
             # Make sure a sane set was returned.
             assert len(connection) > 0, "Connection set empty."
-            return common.Client(random.choice(list(connection)))
+            return common.Client(common.choose_connection(connection))
 
 
 def ignoreCancellation(failure):
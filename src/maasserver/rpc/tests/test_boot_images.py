@@ -0,0 +1,47 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for :py:module:`~maasserver.rpc.boot_images`."""
+
+__all__ = []
+
+from unittest.mock import sentinel
+
+from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
+from maasserver.rpc.boot_images import ReportedBootImages
+from maasserver.testing.factory import factory
+from maastesting.testcase import MAASTestCase
+
+
+class TestReportedBootImages(MAASTestCase):
+
+    def test_get_returns_None_without_report(self):
+        reported = ReportedBootImages()
+        self.assertIsNone(reported.get(factory.make_name("system_id")))
+
+    def test_get_returns_most_recent_report(self):
+        reported = ReportedBootImages()
+        ident = factory.make_name("system_id")
+        images = [make_rpc_boot_image() for _ in range(3)]
+        reported.report(ident, sentinel.conn1, [make_rpc_boot_image()])
+        reported.report(ident, sentinel.conn2, images)
+        self.assertEqual(images, reported.get(ident))
+
+    def test_forget_forgets_report_made_over_connection(self):
+        reported = ReportedBootImages()
+        ident = factory.make_name("system_id")
+        reported.report(ident, sentinel.conn, [make_rpc_boot_image()])
+        reported.forget(ident, sentinel.conn)
+        self.assertIsNone(reported.get(ident))
+
+    def test_forget_keeps_report_made_over_other_connection(self):
+        reported = ReportedBootImages()
+        ident = factory.make_name("system_id")
+        images = [make_rpc_boot_image()]
+        reported.report(ident, sentinel.conn2, images)
+        reported.forget(ident, sentinel.conn1)
+        self.assertEqual(images, reported.get(ident))
+
+    def test_forget_copes_without_report(self):
+        reported = ReportedBootImages()
+        reported.forget(factory.make_name("system_id"), sentinel.conn)
@@ -60,10 +60,8 @@ from provisioningserver.rpc.exceptions import (
 from testtools import ExpectedException
 from testtools.matchers import (
     Equals,
-    GreaterThan,
     HasLength,
     Is,
-    LessThan,
     Not,
 )
 
@@ -469,7 +467,7 @@ class TestListClusterNodesPowerParameters(MAASServerTestCase):
             [node.system_id for node in nodes_in_order],
             system_ids)
 
-    def test__returns_at_most_60kiB_of_JSON(self):
+    def test__returns_more_than_64kiB_of_JSON(self):
         # Configure the rack controller subnet to be very large so it
         # can hold that many BMC connected to the interface for the rack
         # controller.
@@ -481,26 +479,24 @@ class TestListClusterNodesPowerParameters(MAASServerTestCase):
             ip=factory.pick_ip_in_Subnet(subnet), subnet=subnet,
             interface=rack_interface)
 
-        # Ensure that there are at least 64kiB of power parameters (when
+        # Ensure that there are more than 64kiB of power parameters (when
         # converted to JSON) in the database.
         example_parameters = {"key%d" % i: "value%d" % i for i in range(250)}
         remaining = 2 ** 16
+        nodes = []
         while remaining > 0:
             node = self.make_Node(
                 bmc_connected_to=rack, power_parameters=example_parameters)
             remaining -= len(json.dumps(node.get_effective_power_parameters()))
+            nodes.append(node)
 
-        nodes = list_cluster_nodes_power_parameters(
+        power_parameters = list_cluster_nodes_power_parameters(
             rack.system_id, limit=None)  # Remove numeric limit.
 
-        # The total size of the JSON is less than 60kiB, but only a bit.
-        nodes_json = map(json.dumps, nodes)
-        nodes_json_lengths = map(len, nodes_json)
-        nodes_json_length = sum(nodes_json_lengths)
-        expected_maximum = 60 * (2 ** 10)  # 60kiB
-        self.expectThat(nodes_json_length, LessThan(expected_maximum + 1))
-        expected_minimum = 50 * (2 ** 10)  # 50kiB
-        self.expectThat(nodes_json_length, GreaterThan(expected_minimum - 1))
+        # The response is chunked as needed, so all nodes are returned.
+        self.assertItemsEqual(
+            [node.system_id for node in nodes],
+            [params["system_id"] for params in power_parameters])
 
     def test__limited_to_10_nodes_at_a_time_by_default(self):
         # Configure the rack controller subnet to be large enough.
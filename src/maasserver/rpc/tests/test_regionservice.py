@@ -39,7 +39,12 @@ from maasserver.models import (
     timestampedmodel,
 )
 from maasserver.models.timestampedmodel import now
-from maasserver.rpc import regionservice
+from maasserver.clusterrpc.testing.boot_images import make_rpc_boot_image
+from maasserver.rpc import (
+    boot_images,
+    regionservice,
+)
+from maasserver.rpc.boot_images import ReportedBootImages
 from maasserver.rpc.regionservice import (
     getRegionID,
     ignoreCancellation,
@@ -88,7 +93,11 @@ from provisioningserver.rpc.exceptions import (
     NoConnectionsAvailable,
 )
 from provisioningserver.rpc.interfaces import IConnection
-from provisioningserver.rpc.region import RegisterRackController
+from provisioningserver.rpc.metrics import ConnectionLoad
+from provisioningserver.rpc.region import (
+    RegisterRackController,
+    UpdateBootImages,
+)
 from provisioningserver.rpc.testing import call_responder
 from provisioningserver.rpc.testing.doubles import DummyConnection
 from provisioningserver.utils import events
@@ -210,6 +219,37 @@ class TestRegionServer(MAASTransactionServerTestCase):
         # connectionLost() is called on the superclass.
         self.assertThat(connectionLost_up_call, MockCalledOnceWith(None))
 
+    def test_connectionLost_forgets_reported_boot_images(self):
+        reported = self.patch(
+            boot_images, "reported_boot_images", ReportedBootImages())
+        service = RegionService(sentinel.advertiser)
+        service.running = True  # Pretend it's running.
+        service.factory.protocol = HandshakingRegionServer
+        protocol = service.factory.buildProtocol(addr=None)  # addr is unused.
+        protocol.ident = factory.make_name("node")
+        self.patch(amp.AMP, "connectionLost")
+        service.connections[protocol.ident] = {protocol}
+        reported.report(protocol.ident, protocol, [make_rpc_boot_image()])
+
+        protocol.connectionLost(reason=None)
+        self.assertIsNone(reported.get(protocol.ident))
+
+    def test_update_boot_images_is_registered(self):
+        protocol = RegionServer()
+        responder = protocol.locateResponder(UpdateBootImages.commandName)
+        self.assertIsNotNone(responder)
+
+    def test_update_boot_images_records_report(self):
+        reported = self.patch(
+            boot_images, "reported_boot_images", ReportedBootImages())
+        protocol = RegionServer()
+        protocol.ident = factory.make_name("node")
+        images = [make_rpc_boot_image() for _ in range(3)]
+        response = extract_result(call_responder(
+            protocol, UpdateBootImages, {"images": images}))
+        self.assertEqual({}, response)
+        self.assertEqual(images, reported.get(protocol.ident))
+
     def test_connectionLost_uses_advertiser_to_unregister(self):
         advertising = MagicMock()
         advertiser = MagicMock()
@@ -890,23 +930,19 @@ class TestRegionService(MAASTestCase):
             exceptions.NoConnectionsAvailable)
 
     @wait_for_reactor
-    def test_getClientFor_returns_random_connection(self):
-        c1 = DummyConnection()
-        c2 = DummyConnection()
-        chosen = DummyConnection()
+    def test_getClientFor_returns_least_busy_connection(self):
+        busy = DummyConnection()
+        busy.load = ConnectionLoad()
+        busy.load.call_started()
+        idle = DummyConnection()
+        idle.load = ConnectionLoad()
 
         service = RegionService(sentinel.advertiser)
         uuid = factory.make_UUID()
-        conns_for_uuid = service.connections[uuid]
-        conns_for_uuid.update({c1, c2})
-
-        def check_choice(choices):
-            self.assertItemsEqual(choices, conns_for_uuid)
-            return chosen
-        self.patch(random, "choice", check_choice)
+        service.connections[uuid].update({busy, idle})
 
         def check(client):
-            self.assertThat(client, Equals(common.Client(chosen)))
+            self.assertThat(client, Equals(common.Client(idle)))
 
         return service.getClientFor(uuid).addCallback(check)
 
@@ -10,6 +10,7 @@ __all__ = [
 
 from datetime import timedelta
 
+from maasserver.duties import send_stats
 from maasserver.models import Config
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
@@ -87,7 +88,8 @@ class StatsService(TimerService, object):
     def maybe_make_stats_request(self):
         def determine_stats_request():
             if Config.objects.get_config('enable_analytics'):
-                make_maas_user_agent_request()
+                # Only one region process needs to do this.
+                send_stats.perform(make_maas_user_agent_request)
 
         d = deferToDatabase(transactional(determine_stats_request))
         d.addErrback(log.err, "Failure performing user agent request.")
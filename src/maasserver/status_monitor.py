@@ -13,6 +13,11 @@ from datetime import (
     timedelta,
 )
 
+from django.db.models import (
+    F,
+    Q,
+)
+from maasserver.duties import monitor_node_status
 from maasserver.enum import (
     NODE_STATUS,
     NODE_STATUS_CHOICES_DICT,
@@ -26,8 +31,8 @@ from maasserver.node_status import (
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from metadataserver.enum import SCRIPT_STATUS
+from metadataserver.models import ScriptResult
 from provisioningserver.logger import get_maas_logger
-from provisioningserver.refresh.node_info_scripts import NODE_INFO_SCRIPTS
 from provisioningserver.utils.twisted import synchronous
 from twisted.application.internet import TimerService
 
@@ -35,16 +40,20 @@ from twisted.application.internet import TimerService
 maaslog = get_maas_logger("node")
 
 
-def mark_nodes_failed_after_expiring():
+def mark_nodes_failed_after_expiring(shards=None):
     """Mark all nodes in that database as failed where the status did not
     transition in time. `status_expires` is checked on the node to see if the
     current time is newer than the expired time.
+
+    :param shards: Only check nodes in these shards of the status monitor
+        duty, or all nodes if `None`.
     """
     current_db_time = now()
     expired_nodes = Node.objects.filter(
         status__in=NODE_FAILURE_MONITORED_STATUS_TRANSITIONS.keys(),
         status_expires__isnull=False,
         status_expires__lte=current_db_time)
+    expired_nodes = monitor_node_status.filter(expired_nodes, shards)
     for node in expired_nodes:
         maaslog.info("%s: Operation '%s' timed out after %s minutes." % (
             node.hostname,
@@ -58,12 +67,18 @@ def mark_nodes_failed_after_expiring():
             ), script_result_status=SCRIPT_STATUS.ABORTED)
 
 
-def mark_nodes_failed_after_missing_script_timeout():
+def mark_nodes_failed_after_missing_script_timeout(shards=None):
     """Check on the status of commissioning or testing nodes.
 
     For any node currently commissioning or testing check that a region is
     still receiving its heartbeat and no running script has gone past its
     run limit. If the node fails either condition its put into a failed status.
+
+    Both checks are done in the database, so only nodes which have failed
+    either are loaded.
+
+    :param shards: Only check nodes in these shards of the status monitor
+        duty, or all nodes if `None`.
     """
     now = datetime.now()
     # maas-run-remote-scripts sends a heartbeat every two minutes. We allow
@@ -76,73 +91,75 @@ def mark_nodes_failed_after_missing_script_timeout():
     # while the node is booting. Once MAAS receives the signal that testing
     # has begun it resets status_expires and checks for the heartbeat instead.
     qs = Node.objects.filter(
-        status__in=[NODE_STATUS.COMMISSIONING, NODE_STATUS.TESTING],
-        status_expires=None).prefetch_related(
-            'current_commissioning_script_set', 'current_testing_script_set')
+        Q(status=NODE_STATUS.COMMISSIONING,
+          current_commissioning_script_set__last_ping__lt=heartbeat_expired) |
+        Q(status=NODE_STATUS.TESTING,
+          current_testing_script_set__last_ping__lt=heartbeat_expired),
+        status_expires=None)
+    qs = monitor_node_status.filter(qs, shards)
+    failed = set()
     for node in qs:
-        if node.status == NODE_STATUS.COMMISSIONING:
-            script_set = node.current_commissioning_script_set
-        elif node.status == NODE_STATUS.TESTING:
-            script_set = node.current_testing_script_set
-        if (script_set.last_ping is not None and
-                script_set.last_ping < heartbeat_expired):
+        maaslog.info(
+            '%s: Has not been heard from for the last 10 minutes' %
+            node.hostname)
+        node.mark_failed(
+            comment='Node has not been heard from for the last 10 minutes',
+            script_result_status=SCRIPT_STATUS.TIMEDOUT)
+        if not node.enable_ssh:
             maaslog.info(
-                '%s: Has not been heard from for the last 10 minutes' %
-                node.hostname)
-            node.mark_failed(
-                comment='Node has not been heard from for the last 10 minutes',
-                script_result_status=SCRIPT_STATUS.TIMEDOUT)
-            if not node.enable_ssh:
-                maaslog.info(
-                    '%s: Stopped because SSH is disabled' % node.hostname)
-                node.stop(comment='Node stopped because SSH is disabled')
+                '%s: Stopped because SSH is disabled' % node.hostname)
+            node.stop(comment='Node stopped because SSH is disabled')
+        failed.add(node.id)
+
+    # The node running the scripts checks if the script has run past its time
+    # limit. The node will try to kill the script and move on by signaling the
+    # region. If after 5 minutes past the timeout the region hasn't recieved
+    # the signal mark_failed and stop the node.
+    script_expired = now - timedelta(minutes=5)
+    script_qs = ScriptResult.objects.filter(
+        Q(script_set__node__status=NODE_STATUS.COMMISSIONING,
+          script_set__node__current_commissioning_script_set=F(
+              'script_set')) |
+        Q(script_set__node__status=NODE_STATUS.TESTING,
+          script_set__node__current_testing_script_set=F('script_set')),
+        script_set__node__status_expires=None,
+        status=SCRIPT_STATUS.RUNNING, expires_at__lt=script_expired)
+    script_qs = monitor_node_status.filter(
+        script_qs, shards, field='script_set__node_id')
+    script_qs = script_qs.select_related('script', 'script_set__node')
+    for script_result in script_qs.order_by('expires_at'):
+        node = script_result.script_set.node
+        if node.id in failed:
+            # Only the first script to expire is reported.
             continue
-
-        # Check for scripts which have gone past their timeout.
-        script_qs = script_set.scriptresult_set.filter(
-            status=SCRIPT_STATUS.RUNNING).prefetch_related('script')
-        for script_result in script_qs:
-            timeout = None
-            for param in script_result.parameters.values():
-                if param.get('type') == 'runtime':
-                    timeout = param.get('value')
-                    break
-            if (timeout is None and script_result.name in NODE_INFO_SCRIPTS and
-                    'timeout' in NODE_INFO_SCRIPTS[script_result.name]):
-                timeout = NODE_INFO_SCRIPTS[script_result.name]['timeout']
-            elif (timeout is None and script_result.script is not None and
-                    script_result.script.timeout.seconds > 0):
-                timeout = script_result.script.timeout
-            else:
-                continue
-            # The node running the scripts checks if the script has run past
-            # its time limit. The node will try to kill the script and move on
-            # by signaling the region. If after 5 minutes past the timeout the
-            # region hasn't recieved the signal mark_failed and stop the node.
-            script_expires = (
-                script_result.started + timeout + timedelta(minutes=5))
-            if script_expires < now:
-                script_result.status = SCRIPT_STATUS.TIMEDOUT
-                script_result.save(update_fields=['status'])
-                maaslog.info("%s: %s has run past it's timeout(%s)" % (
-                    node.hostname, script_result.name, str(timeout)))
-                node.mark_failed(
-                    comment="%s has run past it's timeout(%s)" % (
-                        script_result.name, str(timeout)),
-                    script_result_status=SCRIPT_STATUS.ABORTED)
-                if not node.enable_ssh:
-                    maaslog.info(
-                        '%s: Stopped because SSH is disabled' % node.hostname)
-                    node.stop(comment='Node stopped because SSH is disabled')
-                break
+        failed.add(node.id)
+        timeout = script_result.timeout
+        script_result.status = SCRIPT_STATUS.TIMEDOUT
+        script_result.save(update_fields=['status'])
+        maaslog.info("%s: %s has run past it's timeout(%s)" % (
+            node.hostname, script_result.name, str(timeout)))
+        node.mark_failed(
+            comment="%s has run past it's timeout(%s)" % (
+                script_result.name, str(timeout)),
+            script_result_status=SCRIPT_STATUS.ABORTED)
+        if not node.enable_ssh:
+            maaslog.info(
+                '%s: Stopped because SSH is disabled' % node.hostname)
+            node.stop(comment='Node stopped because SSH is disabled')
 
 
 @synchronous
 @transactional
 def check_status():
-    """Check the status_expires and script timeout on all nodes."""
-    mark_nodes_failed_after_expiring()
-    mark_nodes_failed_after_missing_script_timeout()
+    """Check the status_expires and script timeout on nodes.
+
+    Only nodes in the shards of the status monitor duty that belong to this
+    region process are checked.
+    """
+    shards = monitor_node_status.claim()
+    if len(shards) > 0:
+        mark_nodes_failed_after_expiring(shards)
+        mark_nodes_failed_after_missing_script_timeout(shards)
 
 
 class StatusMonitorService(TimerService, object):
@@ -1201,7 +1201,8 @@ class Factory(maastesting.factory.Factory):
                     hostname=hostname, ip=neighbour.ip, interface=interface)
         # By using filter here, we guarantee that an object is returned.
         # If we search by the Neighbour ID we think we just created, there
-        # might be no results, since the view might filter it.
+        # might be no results, since the view (from which the triggers
+        # populate the discovery table) might filter it.
         return get_one(Discovery.objects.filter(
             mac_address=neighbour.mac_address, ip=neighbour.ip))
 
@@ -104,6 +104,7 @@ from maastesting.twisted import (
     TwistedLoggerFixture,
 )
 from provisioningserver.auth import get_maas_user_gpghome
+from provisioningserver.import_images.download_pool import DownloadPool
 from provisioningserver.import_images.product_mapping import ProductMapping
 from provisioningserver.rpc.cluster import (
     ListBootImages,
@@ -1416,6 +1417,38 @@ class TestBootResourceTransactional(MAASTransactionServerTestCase):
                 with rfile.largefile.content.open('rb') as stream:
                     written_data = stream.read()
                 self.assertEqual(content, written_data)
+        self.assertEqual({}, store._content_to_finalize)
+
+    def test_perform_write_leaves_content_to_finalize_when_cancelled(self):
+        with transaction.atomic():
+            rfile, reader, content = make_boot_resource_file_with_stream()
+            store = BootResourceStore()
+            store.save_content_later(rfile, reader)
+        store._cancel_finalize = True
+        store.perform_write()
+        self.assertEqual({rfile.id: reader}, store._content_to_finalize)
+
+    def test_perform_write_writes_in_download_pool(self):
+        pool = self.patch(bootresources, "DownloadPool")
+        pool.side_effect = DownloadPool
+        store = BootResourceStore()
+        store.write_threads_per_host = 1
+        readers = {
+            factory.make_name("rid"): Mock(spec=['url'], url=url)
+            for url in ["http://example.com/%d" % i for i in range(6)]
+        }
+        store._content_to_finalize = dict(readers)
+        write_content_thread = self.patch(store, "write_content_thread")
+        store.perform_write()
+        self.assertThat(pool, MockCalledOnceWith(
+            store.write_threads, store.write_threads_per_host))
+        # Every write is done, not only those that fitted in the pool's
+        # threads for the host at first.
+        self.assertItemsEqual(
+            readers.items(),
+            [call_args for call_args, _ in (
+                write_content_thread.call_args_list)])
+        self.assertEqual({}, store._content_to_finalize)
 
     @asynchronous(timeout=1)
     def test_finalize_calls_notify_errback(self):
@@ -1792,25 +1825,28 @@ class TestImportImages(MAASTransactionServerTestCase):
 class TestImportResourcesInThread(MAASTestCase):
     """Tests for `_import_resources_in_thread`."""
 
-    def test__defers__import_resources_to_thread(self):
-        deferToDatabase = self.patch(bootresources, "deferToDatabase")
+    def test__defers__import_resources_to_bulk_queue(self):
+        deferToDatabaseQueue = self.patch(
+            bootresources, "deferToDatabaseQueue")
         bootresources._import_resources_in_thread()
         self.assertThat(
-            deferToDatabase, MockCalledOnceWith(
-                bootresources._import_resources, notify=None))
+            deferToDatabaseQueue, MockCalledOnceWith(
+                "bulk", bootresources._import_resources, notify=None))
 
     def tests__defaults_force_to_False(self):
-        deferToDatabase = self.patch(bootresources, "deferToDatabase")
+        deferToDatabaseQueue = self.patch(
+            bootresources, "deferToDatabaseQueue")
         bootresources._import_resources_in_thread()
         self.assertThat(
-            deferToDatabase, MockCalledOnceWith(
-                bootresources._import_resources, notify=None))
+            deferToDatabaseQueue, MockCalledOnceWith(
+                "bulk", bootresources._import_resources, notify=None))
 
     def test__logs_errors_and_does_not_errback(self):
         logger = self.useFixture(TwistedLoggerFixture())
         exception_type = factory.make_exception_type()
-        deferToDatabase = self.patch(bootresources, "deferToDatabase")
-        deferToDatabase.return_value = fail(exception_type())
+        deferToDatabaseQueue = self.patch(
+            bootresources, "deferToDatabaseQueue")
+        deferToDatabaseQueue.return_value = fail(exception_type())
         d = bootresources._import_resources_in_thread()
         self.assertIsNone(extract_result(d))
         self.assertDocTestMatches(
@@ -1826,8 +1862,9 @@ class TestImportResourcesInThread(MAASTestCase):
         exception = CalledProcessError(
             2, [factory.make_name("command")],
             factory.make_name("output"))
-        deferToDatabase = self.patch(bootresources, "deferToDatabase")
-        deferToDatabase.return_value = fail(exception)
+        deferToDatabaseQueue = self.patch(
+            bootresources, "deferToDatabaseQueue")
+        deferToDatabaseQueue.return_value = fail(exception)
         d = bootresources._import_resources_in_thread()
         self.assertIsNone(extract_result(d))
         self.assertDocTestMatches(
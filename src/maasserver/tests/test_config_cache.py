@@ -0,0 +1,105 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.config_cache`."""
+
+__all__ = []
+
+from maasserver.config_cache import ConfigCache
+from maastesting.testcase import MAASTestCase
+
+
+class TestConfigCache(MAASTestCase):
+
+    def make_cache(self, **kwargs):
+        cache = ConfigCache(**kwargs)
+        cache.enable()
+        return cache
+
+    def test__reads_through_by_default(self):
+        cache = ConfigCache()
+        values, generation = cache.get()
+        cache.store({"a": 1}, generation)
+        self.assertEqual((None, generation), cache.get())
+        self.assertEqual((0, 2), (cache.hits, cache.misses))
+
+    def test__get_misses_when_empty(self):
+        cache = self.make_cache()
+        self.assertEqual((None, 0), cache.get())
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test__get_hits_stored_values(self):
+        cache = self.make_cache()
+        values, generation = cache.get()
+        cache.store({"a": 1}, generation)
+        self.assertEqual(({"a": 1}, generation), cache.get())
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test__invalidate_forgets_values(self):
+        cache = self.make_cache()
+        cache.store({"a": 1}, cache.generation)
+        cache.invalidate()
+        self.assertIsNone(cache.get()[0])
+        self.assertEqual(1, cache.invalidations)
+
+    def test__invalidate_ignores_arguments(self):
+        cache = self.make_cache()
+        cache.store({"a": 1}, cache.generation)
+        cache.invalidate("sys_config", "a", sender=object)
+        self.assertIsNone(cache.get()[0])
+
+    def test__store_ignores_load_overtaken_by_invalidate(self):
+        cache = self.make_cache()
+        _, generation = cache.get()
+        # Configuration changes while it is being loaded.
+        cache.invalidate()
+        cache.store({"a": 1}, generation)
+        self.assertIsNone(cache.get()[0])
+
+    def test__changed_forgets_values_and_records_txid(self):
+        cache = self.make_cache()
+        cache.store({"a": 1}, cache.generation)
+        cache.changed(1234)
+        self.assertIsNone(cache.get()[0])
+        self.assertEqual((1234, 1), (cache.txid, cache.invalidations))
+
+    def test__changed_keeps_latest_txid(self):
+        cache = self.make_cache()
+        cache.changed(1234)
+        cache.changed(1000)
+        self.assertEqual(1234, cache.txid)
+        cache.clear()
+        self.assertIsNone(cache.txid)
+
+    def test__store_ignores_load_overtaken_by_changed(self):
+        cache = self.make_cache()
+        _, generation = cache.get()
+        cache.changed(1234)
+        cache.store({"a": 1}, generation)
+        self.assertIsNone(cache.get()[0])
+
+    def test__disable_forgets_values_and_reads_through(self):
+        cache = self.make_cache()
+        cache.store({"a": 1}, cache.generation)
+        cache.disable()
+        self.assertTrue(cache.read_through)
+        self.assertIsNone(cache.get()[0])
+
+    def test__forgets_values_when_too_old(self):
+        now = [100.0]
+        cache = self.make_cache(max_age=10, clock=lambda: now[0])
+        cache.store({"a": 1}, cache.generation)
+        now[0] += 11
+        self.assertIsNone(cache.get()[0])
+
+    def test__asdict_reports_hit_rate(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.asdict()["hit_rate"])
+        _, generation = cache.get()
+        cache.store({"a": 1, "b": 2}, generation)
+        cache.get(), cache.get(), cache.get()
+        stats = cache.asdict()
+        self.assertEqual(
+            (False, 2, 3, 1, 0.75),
+            (stats["read_through"], stats["size"], stats["hits"],
+             stats["misses"], stats["hit_rate"]))
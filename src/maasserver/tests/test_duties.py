@@ -0,0 +1,167 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.duties`."""
+
+__all__ = []
+
+import os
+from unittest.mock import Mock
+
+from maasserver import (
+    duties as duties_module,
+    eventloop,
+)
+from maasserver.duties import (
+    Duty,
+    get_duty_owner,
+    get_region_processes,
+)
+from maasserver.models import Node
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.dblocks import DatabaseLockNotHeld
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+
+
+class TestGetDutyOwner(MAASTestCase):
+
+    def test__returns_None_without_processes(self):
+        self.assertIsNone(get_duty_owner("duty", []))
+
+    def test__is_independent_of_order(self):
+        process_ids = list(range(1, 10))
+        owner = get_duty_owner("duty", process_ids)
+        self.assertIn(owner, process_ids)
+        self.assertEqual(
+            owner, get_duty_owner("duty", list(reversed(process_ids))))
+
+    def test__only_moves_duties_of_departed_process(self):
+        process_ids = list(range(1, 10))
+        keys = ["duty/%d" % shard for shard in range(64)]
+        before = {key: get_duty_owner(key, process_ids) for key in keys}
+        departed = process_ids.pop()
+        after = {key: get_duty_owner(key, process_ids) for key in keys}
+        for key in keys:
+            if before[key] != departed:
+                self.assertEqual(before[key], after[key])
+
+    def test__spreads_duties_between_processes(self):
+        process_ids = [1, 2, 3, 4]
+        owners = {
+            get_duty_owner("duty/%d" % shard, process_ids)
+            for shard in range(64)
+        }
+        self.assertItemsEqual(process_ids, owners)
+
+
+class TestGetRegionProcesses(MAASServerTestCase):
+
+    def test__returns_this_process_and_all_processes(self):
+        region = factory.make_RegionController()
+        self.patch(duties_module, "get_maas_id").return_value = (
+            region.system_id)
+        this_process = factory.make_RegionControllerProcess(
+            region=region, pid=os.getpid())
+        other_process = factory.make_RegionControllerProcess()
+        process_id, process_ids = get_region_processes()
+        self.assertEqual(this_process.id, process_id)
+        self.assertItemsEqual([this_process.id, other_process.id], process_ids)
+
+    def test__returns_None_when_this_process_is_not_registered(self):
+        self.patch(duties_module, "get_maas_id").return_value = None
+        process = factory.make_RegionControllerProcess()
+        self.assertEqual((None, [process.id]), get_region_processes())
+
+
+class TestDuty(MAASServerTestCase):
+
+    def test__claim_claims_everything_without_processes(self):
+        self.patch(duties_module, "get_region_processes").return_value = (
+            None, [])
+        duty = Duty(factory.make_name("duty"), 1000, shards=4)
+        self.assertEqual([0, 1, 2, 3], duty.claim())
+
+    def test__claim_claims_only_owned_shards(self):
+        process_ids = [1, 2, 3]
+        self.patch(duties_module, "get_region_processes").return_value = (
+            2, process_ids)
+        duty = Duty(factory.make_name("duty"), 1000, shards=16)
+        self.assertEqual([
+            shard for shard in range(16)
+            if get_duty_owner(duty.get_key(shard), process_ids) == 2
+        ], duty.claim())
+
+    def test__claim_skips_locked_shards(self):
+        self.patch(duties_module, "get_region_processes").return_value = (
+            None, [])
+        duty = Duty(factory.make_name("duty"), 1000, shards=2)
+        lock = Mock()
+        lock.__enter__ = Mock(side_effect=DatabaseLockNotHeld())
+        lock.__exit__ = Mock()
+        self.patch(duty, "get_lock").return_value = lock
+        self.assertEqual([], duty.claim())
+
+    def test__perform_calls_func_when_claimed(self):
+        duty = Duty(factory.make_name("duty"), 1000)
+        self.patch(duty, "claim").return_value = [0]
+        func = Mock()
+        self.assertEqual(func.return_value, duty.perform(func, 1, a=2))
+        self.assertThat(func, MockCalledOnceWith(1, a=2))
+
+    def test__perform_does_not_call_func_when_not_claimed(self):
+        duty = Duty(factory.make_name("duty"), 1000)
+        self.patch(duty, "claim").return_value = []
+        func = Mock()
+        self.assertIsNone(duty.perform(func))
+        self.assertThat(func, MockNotCalled())
+
+    def test__filter_limits_to_shards(self):
+        duty = Duty(factory.make_name("duty"), 1000, shards=2)
+        nodes = [factory.make_Node() for _ in range(4)]
+        self.assertItemsEqual(
+            [node for node in nodes if node.id % 2 == 1],
+            duty.filter(Node.objects.filter(
+                id__in=[node.id for node in nodes]), [1]))
+
+    def test__filter_does_nothing_for_all_shards(self):
+        duty = Duty(factory.make_name("duty"), 1000, shards=2)
+        queryset = Node.objects.all()
+        self.assertIs(queryset, duty.filter(queryset, [0, 1]))
+        self.assertIs(queryset, duty.filter(queryset, None))
+
+
+class TestDutiesInMasterAndWorker(MAASServerTestCase):
+    """Duties are performed even when owned by a worker process."""
+
+    # Duties, and the services that perform them.
+    duty_services = [
+        (duties_module.cleanup_nonces, "nonce-cleanup"),
+        (duties_module.cleanup_dns_publications, "dns-publication-cleanup"),
+        (duties_module.send_stats, "stats"),
+        (duties_module.cleanup_script_output, "script-output-cleanup"),
+    ]
+
+    def perform_in(self, process, is_master, duty, service, func):
+        """Perform `duty` in `process` if it runs `service`."""
+        only_on_master = eventloop.loop.factories[service]["only_on_master"]
+        if is_master or not only_on_master:
+            self.patch(duties_module.os, "getpid").return_value = process.pid
+            duty.perform(func)
+
+    def test__duty_owned_by_worker_is_performed(self):
+        region = factory.make_RegionController()
+        self.patch(duties_module, "get_maas_id").return_value = (
+            region.system_id)
+        master = factory.make_RegionControllerProcess(region=region)
+        worker = factory.make_RegionControllerProcess(region=region)
+        self.patch(duties_module, "get_duty_owner").return_value = worker.id
+        for duty, service in self.duty_services:
+            func = Mock()
+            self.perform_in(master, True, duty, service, func)
+            self.perform_in(worker, False, duty, service, func)
+            self.assertThat(func, MockCalledOnceWith())
@@ -28,7 +28,11 @@ from maasserver.eventloop import (
     DEFAULT_PORT,
     MAASServices,
 )
-from maasserver.regiondservices import service_monitor_service
+from maasserver.regiondservices import (
+    config_cache,
+    curtin_config,
+    service_monitor_service,
+)
 from maasserver.rpc import regionservice
 from maasserver.testing.eventloop import RegionEventLoopFixture
 from maasserver.testing.listener import FakePostgresListenerService
@@ -41,7 +45,10 @@ from maasserver.utils.orm import (
 from maastesting.factory import factory
 from maastesting.matchers import MockCallsMatch
 from maastesting.testcase import MAASTestCase
-from metadataserver import api_twisted
+from metadataserver import (
+    api_twisted,
+    script_output_cleanup,
+)
 from testtools.matchers import (
     Equals,
     IsInstance,
@@ -274,9 +281,21 @@ class TestFactories(MAASTestCase):
         self.assertIs(
             eventloop.make_NonceCleanupService,
             eventloop.loop.factories["nonce-cleanup"]["factory"])
-        self.assertTrue(
+        self.assertFalse(
             eventloop.loop.factories["nonce-cleanup"]["only_on_master"])
 
+    def test_make_ScriptOutputCleanupService(self):
+        service = eventloop.make_ScriptOutputCleanupService()
+        self.assertThat(service, IsInstance(
+            script_output_cleanup.ScriptOutputCleanupService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_ScriptOutputCleanupService,
+            eventloop.loop.factories["script-output-cleanup"]["factory"])
+        self.assertFalse(
+            eventloop.loop.factories["script-output-cleanup"][
+                "only_on_master"])
+
     def test_make_StatusMonitorService(self):
         service = eventloop.make_StatusMonitorService()
         self.assertThat(service, IsInstance(
@@ -285,7 +304,7 @@ class TestFactories(MAASTestCase):
         self.assertIs(
             eventloop.make_StatusMonitorService,
             eventloop.loop.factories["status-monitor"]["factory"])
-        self.assertTrue(
+        self.assertFalse(
             eventloop.loop.factories["status-monitor"]["only_on_master"])
 
     def test_make_StatsService(self):
@@ -296,7 +315,7 @@ class TestFactories(MAASTestCase):
         self.assertIs(
             eventloop.make_StatsService,
             eventloop.loop.factories["stats"]["factory"])
-        self.assertTrue(
+        self.assertFalse(
             eventloop.loop.factories["stats"]["only_on_master"])
 
     def test_make_ImportResourcesService(self):
@@ -350,6 +369,38 @@ class TestFactories(MAASTestCase):
         self.assertFalse(
             eventloop.loop.factories["rack-controller"]["only_on_master"])
 
+    def test_make_CurtinConfigService(self):
+        service = eventloop.make_CurtinConfigService(
+            FakePostgresListenerService())
+        self.assertThat(service, IsInstance(
+            curtin_config.CurtinConfigService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_CurtinConfigService,
+            eventloop.loop.factories["curtin-config"]["factory"])
+        # Has a dependency of postgres-listener.
+        self.assertEquals(
+            ["postgres-listener"],
+            eventloop.loop.factories["curtin-config"]["requires"])
+        self.assertFalse(
+            eventloop.loop.factories["curtin-config"]["only_on_master"])
+
+    def test_make_ConfigCacheService(self):
+        service = eventloop.make_ConfigCacheService(
+            FakePostgresListenerService())
+        self.assertThat(service, IsInstance(
+            config_cache.ConfigCacheService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_ConfigCacheService,
+            eventloop.loop.factories["config-cache"]["factory"])
+        # Has a dependency of postgres-listener.
+        self.assertEquals(
+            ["postgres-listener"],
+            eventloop.loop.factories["config-cache"]["requires"])
+        self.assertFalse(
+            eventloop.loop.factories["config-cache"]["only_on_master"])
+
     def test_make_ServiceMonitorService(self):
         service = eventloop.make_ServiceMonitorService(
             sentinel.rpc_advertise)
@@ -368,16 +419,17 @@ class TestFactories(MAASTestCase):
 
     def test_make_StatusWorkerService(self):
         service = eventloop.make_StatusWorkerService(
-            sentinel.dbtasks)
+            sentinel.dbtasks, sentinel.listener)
         self.assertThat(service, IsInstance(
             api_twisted.StatusWorkerService))
         # It is registered as a factory in RegionEventLoop.
         self.assertIs(
             eventloop.make_StatusWorkerService,
             eventloop.loop.factories["status-worker"]["factory"])
-        # Has a dependency of database-tasks.
+        self.assertIs(sentinel.listener, service.listener)
+        # Has a dependency of database-tasks and postgres-listener.
         self.assertEquals(
-            ["database-tasks"],
+            ["database-tasks", "postgres-listener"],
             eventloop.loop.factories["status-worker"]["requires"])
         self.assertFalse(
             eventloop.loop.factories["status-worker"]["only_on_master"])
@@ -9,7 +9,6 @@ import random
 from unittest.mock import ANY
 
 from django.db import transaction
-from maasserver import locks
 from maasserver.clusterrpc.boot_images import RackControllersImporter
 from maasserver.clusterrpc.utils import get_error_message_for_exception
 from maasserver.enum import (
@@ -468,16 +467,14 @@ class TestAcquireNodeAction(MAASServerTestCase):
         self.assertEqual(NODE_STATUS.ALLOCATED, node.status)
         self.assertEqual(user, node.owner)
 
-    def test_Acquire_uses_node_acquire_lock(self):
+    def test_Acquire_locks_node(self):
         node = factory.make_Node(
             interface=True, status=NODE_STATUS.READY,
             power_type='manual', with_boot_disk=True)
         user = factory.make_User()
-        node_acquire = self.patch(locks, 'node_acquire')
+        lock_for_update = self.patch(node, 'lock_for_update')
         Acquire(node, user).execute()
-        self.assertThat(node_acquire.__enter__, MockCalledOnceWith())
-        self.assertThat(
-            node_acquire.__exit__, MockCalledOnceWith(None, None, None))
+        self.assertThat(lock_for_update, MockCalledOnceWith())
 
 
 class TestDeployAction(MAASServerTestCase):
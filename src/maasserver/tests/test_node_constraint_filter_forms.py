@@ -23,10 +23,12 @@ from maasserver.models import (
 from maasserver.node_constraint_filter_forms import (
     AcquireNodeForm,
     detect_nonexistent_zone_names,
+    filter_nodes_by_storage_inventory,
     generate_architecture_wildcards,
     get_architecture_wildcards,
     get_storage_constraints_from_string,
     JUJU_ACQUIRE_FORM_FIELDS_MAPPING,
+    nodes_by_interface,
     nodes_by_storage,
     parse_legacy_tags,
     RenamableFieldsForm,
@@ -38,6 +40,7 @@ from maasserver.testing.factory import (
 )
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils import ignore_unused
+from provisioningserver.utils.constraints import LabeledConstraintMap
 from testtools.matchers import (
     Contains,
     ContainsAll,
@@ -171,6 +174,51 @@ class TestUtils(MAASServerTestCase):
     def test_nodes_by_storage_returns_None_when_storage_string_is_empty(self):
         self.assertEqual(None, nodes_by_storage(""))
 
+    def test_filter_nodes_by_storage_inventory_filters_on_root_disk(self):
+        node1 = factory.make_Node(with_boot_disk=False)
+        factory.make_PhysicalBlockDevice(
+            node=node1, size=8 * (1000 ** 3), tags=['ssd'],
+            formatted_root=True)
+        node2 = factory.make_Node(with_boot_disk=False)
+        factory.make_PhysicalBlockDevice(
+            node=node2, size=2 * (1000 ** 3), tags=['ssd'],
+            formatted_root=True)
+        node3 = factory.make_Node(with_boot_disk=False)
+        factory.make_PhysicalBlockDevice(
+            node=node3, size=8 * (1000 ** 3), tags=['rotary'],
+            formatted_root=True)
+        constraints = get_storage_constraints_from_string("4(ssd)")
+        self.assertItemsEqual(
+            [node1], filter_nodes_by_storage_inventory(
+                Machine.objects.all(), constraints))
+
+    def test_filter_nodes_by_storage_inventory_filters_on_unused_disks(self):
+        node1 = factory.make_Node(with_boot_disk=False)
+        factory.make_PhysicalBlockDevice(node=node1, formatted_root=True)
+        factory.make_PhysicalBlockDevice(
+            node=node1, size=8 * (1000 ** 3), tags=['rotary'])
+        node2 = factory.make_Node(with_boot_disk=False)
+        factory.make_PhysicalBlockDevice(node=node2, formatted_root=True)
+        unused = factory.make_PhysicalBlockDevice(
+            node=node2, size=8 * (1000 ** 3), tags=['rotary'])
+        # A partitioned disk is no longer unused.
+        factory.make_PartitionTable(block_device=unused)
+        constraints = get_storage_constraints_from_string("0,4(rotary)")
+        self.assertItemsEqual(
+            [node1], filter_nodes_by_storage_inventory(
+                Machine.objects.all(), constraints))
+
+    def test_nodes_by_interface_considers_only_node_ids(self):
+        fabric = factory.make_Fabric()
+        vlan = fabric.get_default_vlan()
+        node1 = factory.make_Node_with_Interface_on_Subnet(vlan=vlan)
+        node2 = factory.make_Node_with_Interface_on_Subnet(vlan=vlan)
+        node_ids, _ = nodes_by_interface(
+            LabeledConstraintMap('eth0:fabric=%s' % fabric.name),
+            node_ids=[node1.id])
+        self.assertItemsEqual([node1.id], node_ids)
+        ignore_unused(node2)
+
 
 class TestRenamableForm(RenamableFieldsForm):
     field1 = forms.CharField(label="A field which is forced to contain 'foo'.")
@@ -90,6 +90,8 @@ class TestRegionServiceMaker(MAASTestCase):
         self.assertIsInstance(service, MultiService)
         expected_services = [
             "active-discovery",
+            "config-cache",
+            "curtin-config",
             "database-tasks",
             "dns-publication-cleanup",
             "import-resources",
@@ -103,6 +105,7 @@ class TestRegionServiceMaker(MAASTestCase):
             "reverse-dns",
             "rpc",
             "rpc-advertise",
+            "script-output-cleanup",
             "service-monitor",
             "stats",
             "status-monitor",
@@ -65,11 +65,13 @@ from maasserver.preseed import (
     get_preseed_type_for,
     load_preseed_template,
     PreseedTemplate,
+    render_curtin_userdata,
     render_enlistment_preseed,
     render_preseed,
     split_subarch,
     TemplateNotFoundError,
 )
+from maasserver.preseed_cache import CurtinUserDataCache
 from maasserver.rpc.testing.mixins import PreseedRPCMixin
 from maasserver.testing.architecture import make_usable_architecture
 from maasserver.testing.config import RegionConfigurationFixture
@@ -92,6 +94,7 @@ from metadataserver.models import NodeKey
 from provisioningserver.drivers.osystem.ubuntu import UbuntuOS
 from provisioningserver.rpc.exceptions import NoConnectionsAvailable
 from provisioningserver.utils.enum import map_enum
+from provisioningserver.utils.templates import TemplateCache
 from testtools.matchers import (
     AllMatch,
     Contains,
@@ -363,6 +366,28 @@ class TestLoadPreseedTemplate(MAASServerTestCase):
         template = load_preseed_template(node, name)
         self.assertIsInstance(template, PreseedTemplate)
 
+    def test_load_preseed_template_parses_template_only_once(self):
+        cache = self.patch(
+            preseed_module, "preseed_templates",
+            TemplateCache(PreseedTemplate))
+        content = self.create_template(self.location, GENERIC_FILENAME)
+        node = factory.make_Node()
+        for _ in range(3):
+            template = load_preseed_template(node, factory.make_string())
+            self.assertEqual(content, template.substitute())
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+    def test_load_preseed_template_notices_changed_template(self):
+        self.patch(
+            preseed_module, "preseed_templates",
+            TemplateCache(PreseedTemplate))
+        self.create_template(self.location, GENERIC_FILENAME)
+        node = factory.make_Node()
+        load_preseed_template(node, factory.make_string())
+        self.create_template(self.location, GENERIC_FILENAME, "changed")
+        template = load_preseed_template(node, factory.make_string())
+        self.assertEqual("changed", template.substitute())
+
     def test_load_preseed_template_raises_if_no_template(self):
         node = factory.make_Node()
         unknown_template_name = factory.make_string()
@@ -876,6 +901,11 @@ class TestGetCurtinUserData(
         PreseedRPCMixin, BootImageHelperMixin, MAASServerTestCase):
     """Tests for `get_curtin_userdata`."""
 
+    def setUp(self):
+        super(TestGetCurtinUserData, self).setUp()
+        self.patch(
+            preseed_module, "curtin_userdata_cache", CurtinUserDataCache())
+
     def test_get_curtin_userdata_calls_compose_curtin_config_on_ubuntu(self):
         node = factory.make_Node_with_Interface_on_Subnet(
             primary_rack=self.rpc_rack_controller)
@@ -957,6 +987,38 @@ class TestGetCurtinUserData(
         self.assertIn("PREFIX='curtin'", user_data)
         self.assertThat(mock_supports_storage, MockCalledOnceWith())
 
+    def test_get_curtin_userdata_is_not_cached_by_default(self):
+        node = factory.make_Node()
+        region_ip = factory.make_ip_address()
+        render = self.patch(preseed_module, "render_curtin_userdata")
+        get_curtin_userdata(node, region_ip)
+        get_curtin_userdata(node, region_ip)
+        self.assertThat(render.call_count, Equals(2))
+
+    def test_get_curtin_userdata_returns_warmed_userdata(self):
+        cache = preseed_module.curtin_userdata_cache
+        cache.enable()
+        node = factory.make_Node()
+        region_ip = factory.make_ip_address()
+        render = self.patch(preseed_module, "render_curtin_userdata")
+        render.return_value = factory.make_name("userdata")
+        cache.remember_region_ip(node.system_id, region_ip)
+        cache.warm(node, render, cache.current(node.system_id))
+        self.assertEqual(
+            render.return_value, get_curtin_userdata(node, region_ip))
+        self.assertThat(render, MockCalledOnceWith(node, region_ip))
+
+    def test_get_curtin_userdata_is_warmed_per_region_ip(self):
+        cache = preseed_module.curtin_userdata_cache
+        cache.enable()
+        node = factory.make_Node()
+        render = self.patch(preseed_module, "render_curtin_userdata")
+        region_ip = factory.make_ip_address()
+        cache.remember_region_ip(node.system_id, region_ip)
+        cache.warm(node, render, cache.current(node.system_id))
+        get_curtin_userdata(node, factory.make_ip_address())
+        self.assertThat(render.call_count, Equals(2))
+
 
 class TestRenderCurtinUserdataWithThirdPartyDrivers(
         PreseedRPCMixin, BootImageHelperMixin, MAASServerTestCase):
@@ -1021,7 +1083,7 @@ class TestGetCurtinUserDataOS(
             primary_rack=self.rpc_rack_controller, osystem=self.os_name)
         arch, subarch = node.architecture.split('/')
         self.configure_get_boot_images_for_node(node, 'xinstall')
-        user_data = get_curtin_userdata(node)
+        user_data = render_curtin_userdata(node)
 
         # Just check that the user data looks good.
         self.assertIn("PREFIX='curtin'", user_data)
@@ -0,0 +1,160 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.preseed_cache`."""
+
+__all__ = []
+
+from unittest.mock import (
+    call,
+    Mock,
+)
+
+from maasserver.preseed_cache import CurtinUserDataCache
+from maastesting.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCallsMatch,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+
+
+class TestCurtinUserDataCache(MAASTestCase):
+
+    def make_cache(self, *args, **kwargs):
+        cache = CurtinUserDataCache(*args, **kwargs)
+        cache.enable()
+        return cache
+
+    def make_node(self):
+        return Mock(system_id=factory.make_name("system_id"))
+
+    def make_render(self):
+        return Mock(side_effect=lambda node, region_ip: (
+            factory.make_name("userdata")))
+
+    def warm(self, cache, node, region_ip, render):
+        cache.remember_region_ip(node.system_id, region_ip)
+        return cache.warm(node, render, cache.current(node.system_id))
+
+    def test__get_returns_warmed_userdata(self):
+        cache = self.make_cache()
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        render = self.make_render()
+        self.warm(cache, node, region_ip, render)
+        userdata = cache.get(node, region_ip, render)
+        self.assertThat(render, MockCalledOnceWith(node, region_ip))
+        self.assertEqual(userdata, cache.get(node, region_ip, render))
+        self.assertEqual((2, 0), (cache.hits, cache.misses))
+
+    def test__get_does_not_cache_what_it_renders(self):
+        # The caller's snapshot may predate a change already notified.
+        cache = self.make_cache()
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        render = self.make_render()
+        cache.get(node, region_ip, render)
+        cache.get(node, region_ip, render)
+        self.assertEqual(2, render.call_count)
+        self.assertEqual({}, dict(cache.entries))
+        self.assertEqual((0, 2), (cache.hits, cache.misses))
+
+    def test__get_remembers_region_ip_for_warming(self):
+        cache = self.make_cache()
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        render = self.make_render()
+        cache.get(node, region_ip, render)
+        self.assertTrue(cache.knows_region_ips(node.system_id))
+        generation = cache.current(node.system_id)
+        self.assertEqual(1, cache.warm(node, render, generation))
+        self.assertIn((node.system_id, region_ip), cache.entries)
+
+    def test__disable_forgets_and_stops_caching(self):
+        cache = self.make_cache()
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        render = self.make_render()
+        self.warm(cache, node, region_ip, render)
+        cache.disable()
+        self.assertEqual({}, dict(cache.entries))
+        self.assertEqual(0, self.warm(cache, node, region_ip, render))
+        self.assertEqual({}, dict(cache.entries))
+
+    def test__get_renders_again_after_invalidate(self):
+        cache = self.make_cache()
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        render = self.make_render()
+        self.warm(cache, node, region_ip, render)
+        userdata = cache.get(node, region_ip, render)
+        cache.invalidate(node.system_id)
+        self.assertNotEqual(userdata, cache.get(node, region_ip, render))
+        self.assertEqual(2, render.call_count)
+
+    def test__get_renders_again_after_invalidate_all(self):
+        cache = self.make_cache()
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        render = self.make_render()
+        self.warm(cache, node, region_ip, render)
+        self.assertEqual({node.system_id}, cache.invalidate_all())
+        cache.get(node, region_ip, render)
+        self.assertEqual(2, render.call_count)
+
+    def test__get_renders_again_when_too_old(self):
+        now = [100.0]
+        cache = self.make_cache(max_age=10, clock=lambda: now[0])
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        render = self.make_render()
+        self.warm(cache, node, region_ip, render)
+        now[0] += 11
+        cache.get(node, region_ip, render)
+        self.assertEqual(2, render.call_count)
+
+    def test__warm_does_not_cache_render_overtaken_by_change(self):
+        cache = self.make_cache()
+        node, region_ip = self.make_node(), factory.make_ip_address()
+        cache.remember_region_ip(node.system_id, region_ip)
+        generation = cache.current(node.system_id)
+        # The node changes after the generation is noted, but before or while
+        # its user-data is rendered.
+        cache.invalidate(node.system_id)
+        cache.warm(node, self.make_render(), generation)
+        self.assertEqual({}, dict(cache.entries))
+
+    def test__warm_renders_for_region_ips_seen(self):
+        cache = self.make_cache()
+        node, region_ips = self.make_node(), ["10.0.0.1", "10.0.0.2"]
+        for region_ip in region_ips:
+            cache.remember_region_ip(node.system_id, region_ip)
+        render = self.make_render()
+        generation = cache.current(node.system_id)
+        self.assertEqual(2, cache.warm(node, render, generation))
+        self.assertThat(render, MockCallsMatch(
+            call(node, region_ips[0]), call(node, region_ips[1])))
+        render.reset_mock()
+        cache.get(node, region_ips[0], render)
+        self.assertThat(render, MockNotCalled())
+        self.assertEqual(0, cache.warm(node, render, generation))
+
+    def test__warm_does_nothing_by_default(self):
+        cache = CurtinUserDataCache()
+        node = self.make_node()
+        render = self.make_render()
+        self.assertEqual(
+            0, self.warm(cache, node, factory.make_ip_address(), render))
+        self.assertThat(render, MockNotCalled())
+
+    def test__warm_does_nothing_for_unknown_node(self):
+        cache = self.make_cache()
+        node = self.make_node()
+        self.assertFalse(cache.knows_region_ips(node.system_id))
+        self.assertEqual(0, cache.warm(
+            node, self.make_render(), cache.current(node.system_id)))
+
+    def test__evicts_least_recently_used(self):
+        cache = self.make_cache(size=2)
+        nodes = [self.make_node() for _ in range(3)]
+        render = self.make_render()
+        for node in nodes:
+            self.warm(cache, node, None, render)
+        self.assertEqual(
+            [(node.system_id, None) for node in nodes[1:]],
+            list(cache.entries))
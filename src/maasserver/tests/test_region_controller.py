@@ -73,7 +73,8 @@ class TestRegionControllerService(MAASServerTestCase):
             listener.register,
             MockCallsMatch(
                 call("sys_dns", service.markDNSForUpdate),
-                call("sys_proxy", service.markProxyForUpdate)))
+                call("sys_proxy", service.markProxyForUpdate),
+                call("sys_boot_config", service.expireBootConfigs)))
 
     @wait_for_reactor
     @inlineCallbacks
@@ -104,7 +105,8 @@ class TestRegionControllerService(MAASServerTestCase):
             listener.unregister,
             MockCallsMatch(
                 call("sys_dns", service.markDNSForUpdate),
-                call("sys_proxy", service.markProxyForUpdate)))
+                call("sys_proxy", service.markProxyForUpdate),
+                call("sys_boot_config", service.expireBootConfigs)))
 
     @wait_for_reactor
     @inlineCallbacks
@@ -115,6 +117,21 @@ class TestRegionControllerService(MAASServerTestCase):
         yield service.stopService()
         self.assertIsNone(service.processingDefer)
 
+    def test_expireBootConfigs_expires_boot_configs_for_macs(self):
+        service = RegionControllerService(MagicMock())
+        expire_boot_configs = self.patch(
+            region_controller, "expire_boot_configs")
+        macs = [factory.make_mac_address() for _ in range(2)]
+        service.expireBootConfigs("sys_boot_config", ",".join(macs))
+        self.assertThat(expire_boot_configs, MockCalledOnceWith(macs))
+
+    def test_expireBootConfigs_expires_all_boot_configs(self):
+        service = RegionControllerService(MagicMock())
+        expire_boot_configs = self.patch(
+            region_controller, "expire_boot_configs")
+        service.expireBootConfigs("sys_boot_config", "")
+        self.assertThat(expire_boot_configs, MockCalledOnceWith())
+
     def test_markDNSForUpdate_sets_needsDNSUpdate_and_starts_process(self):
         listener = MagicMock()
         service = RegionControllerService(listener)
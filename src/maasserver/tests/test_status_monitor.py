@@ -317,10 +317,91 @@ class TestMarkNodesFailedAfterMissingScriptTimeout(MAASServerTestCase):
         counter = CountQueries()
         with counter:
             mark_nodes_failed_after_missing_script_timeout()
-        # Initial lookup and prefetch take three queries. This is done once to
-        # find the nodes which nodes are being tests and on each node which
-        # scripts are currently running.
-        self.assertEquals(3 + len(nodes) * 2, counter.num_queries)
+        # One query finds the nodes which have missed their heartbeat and one
+        # finds the scripts which have run past their timeout, no matter how
+        # many nodes are being tested.
+        self.assertEquals(2, counter.num_queries)
+        self.assertThat(Node.mark_failed, MockNotCalled())
+
+    def test_mark_nodes_failed_after_runtime_param_overrun(self):
+        node, script_set = self.make_node()
+        now = datetime.now()
+        script_set.last_ping = now
+        script_set.save()
+        script = factory.make_Script(timeout=timedelta(hours=2))
+        running_script_result = factory.make_ScriptResult(
+            script_set=script_set, status=SCRIPT_STATUS.RUNNING, script=script,
+            started=now - timedelta(minutes=10), parameters={'runtime': {
+                'type': 'runtime',
+                'value': 60,
+                }})
+
+        mark_nodes_failed_after_missing_script_timeout()
+        node = reload_object(node)
+
+        self.assertEquals(self.failed_status, node.status)
+        self.assertEquals(
+            "%s has run past it's timeout(%s)" % (
+                running_script_result.name, str(timedelta(seconds=60))),
+            node.error_description)
+        self.assertEquals(
+            SCRIPT_STATUS.TIMEDOUT,
+            reload_object(running_script_result).status)
+
+    def test_ignores_scripts_not_in_current_script_set(self):
+        node, script_set = self.make_node()
+        now = datetime.now()
+        script_set.last_ping = now
+        script_set.save()
+        old_script_set = factory.make_ScriptSet(node=node)
+        script = factory.make_Script(timeout=timedelta(seconds=60))
+        factory.make_ScriptResult(
+            script_set=old_script_set, status=SCRIPT_STATUS.RUNNING,
+            script=script, started=now - timedelta(minutes=10))
+
+        mark_nodes_failed_after_missing_script_timeout()
+
+        self.assertEquals(self.status, reload_object(node).status)
+
+
+class TestCheckStatus(MAASServerTestCase):
+
+    def test__checks_claimed_shards(self):
+        claim = self.patch(status_monitor.monitor_node_status, "claim")
+        claim.return_value = [1, 3]
+        expiring = self.patch(
+            status_monitor, "mark_nodes_failed_after_expiring")
+        script_timeout = self.patch(
+            status_monitor, "mark_nodes_failed_after_missing_script_timeout")
+        status_monitor.check_status()
+        self.assertThat(expiring, MockCalledOnceWith([1, 3]))
+        self.assertThat(script_timeout, MockCalledOnceWith([1, 3]))
+
+    def test__does_nothing_without_shards(self):
+        claim = self.patch(status_monitor.monitor_node_status, "claim")
+        claim.return_value = []
+        expiring = self.patch(
+            status_monitor, "mark_nodes_failed_after_expiring")
+        status_monitor.check_status()
+        self.assertThat(expiring, MockNotCalled())
+
+    def test__only_checks_nodes_in_shards(self):
+        self.useFixture(SignalsDisabled("power"))
+        expired_time = datetime.now() - timedelta(minutes=1)
+        nodes = [
+            factory.make_Node(
+                status=NODE_STATUS.DEPLOYING, status_expires=expired_time)
+            for _ in range(4)
+        ]
+        shards = [status_monitor.monitor_node_status.shards - 1]
+        mark_nodes_failed_after_expiring(shards)
+        for node in nodes:
+            in_shard = (
+                node.id % status_monitor.monitor_node_status.shards in shards)
+            self.assertEqual(
+                NODE_STATUS.FAILED_DEPLOYMENT if in_shard
+                else NODE_STATUS.DEPLOYING,
+                reload_object(node).status)
 
 
 class TestStatusMonitorService(MAASServerTestCase):
@@ -0,0 +1,352 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""
+Discovery Triggers
+
+The `maasserver_discovery` table is a materialised copy of the
+`maasserver_discovery_view` view. These triggers keep it up to date as the
+tables that the view joins (neighbours, mDNS, rDNS, interfaces, nodes,
+VLANs, fabrics, and subnets) change.
+
+Each row in the view is identified by its (MAC, IP) pair, so most changes
+are applied by recomputing the rows for the affected pairs from the view.
+"""
+
+__all__ = [
+    "DISCOVERY_COLUMNS",
+    "register_discovery_triggers",
+    ]
+
+from textwrap import dedent
+
+from maasserver.triggers import (
+    register_procedure,
+    register_trigger,
+)
+from maasserver.utils.orm import transactional
+
+# Columns of both the maasserver_discovery table and view, in order.
+DISCOVERY_COLUMNS = (
+    "id",
+    "discovery_id",
+    "neighbour_id",
+    "ip",
+    "mac_address",
+    "vid",
+    "first_seen",
+    "last_seen",
+    "mdns_id",
+    "hostname",
+    "observer_id",
+    "observer_system_id",
+    "observer_hostname",
+    "observer_interface_id",
+    "observer_interface_name",
+    "fabric_id",
+    "fabric_name",
+    "vlan_id",
+    "is_external_dhcp",
+    "subnet_id",
+    "subnet_cidr",
+    "subnet_prefixlen",
+)
+
+# Recomputes the discovery for the given (MAC, IP) pair from the view. The
+# predicates are on the view's DISTINCT ON columns, so Postgres pushes them
+# down into the view rather than computing all discoveries.
+DISCOVERY_REFRESH = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_refresh(mac macaddr, addr inet)
+    RETURNS void as $$
+    BEGIN
+      IF mac IS NULL OR addr IS NULL THEN
+        DELETE FROM maasserver_discovery
+          WHERE mac_address IS NOT DISTINCT FROM mac
+            AND ip IS NOT DISTINCT FROM addr;
+        INSERT INTO maasserver_discovery (%(columns)s)
+          SELECT %(columns)s FROM maasserver_discovery_view
+          WHERE mac_address IS NOT DISTINCT FROM mac
+            AND ip IS NOT DISTINCT FROM addr;
+      ELSE
+        DELETE FROM maasserver_discovery
+          WHERE mac_address = mac AND ip = addr;
+        INSERT INTO maasserver_discovery (%(columns)s)
+          SELECT %(columns)s FROM maasserver_discovery_view
+          WHERE mac_address = mac AND ip = addr;
+      END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+    """) % {"columns": ", ".join(DISCOVERY_COLUMNS)}
+
+# Recomputes the discoveries for all neighbours seen with the given IP.
+DISCOVERY_REFRESH_IP = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_refresh_ip(addr inet)
+    RETURNS void as $$
+    DECLARE
+      neigh RECORD;
+    BEGIN
+      FOR neigh IN (
+        SELECT DISTINCT mac_address, ip
+        FROM maasserver_neighbour
+        WHERE ip = addr)
+      LOOP
+        PERFORM sys_discovery_refresh(neigh.mac_address, neigh.ip);
+      END LOOP;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Recomputes the discoveries for all neighbours seen on the given interface.
+DISCOVERY_REFRESH_INTERFACE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_refresh_interface(
+      iface_id integer)
+    RETURNS void as $$
+    DECLARE
+      neigh RECORD;
+    BEGIN
+      FOR neigh IN (
+        SELECT DISTINCT mac_address, ip
+        FROM maasserver_neighbour
+        WHERE interface_id = iface_id)
+      LOOP
+        PERFORM sys_discovery_refresh(neigh.mac_address, neigh.ip);
+      END LOOP;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Recomputes the discoveries for all neighbours seen on the given VLAN.
+DISCOVERY_REFRESH_VLAN = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_refresh_vlan(
+      target_vlan_id integer)
+    RETURNS void as $$
+    DECLARE
+      neigh RECORD;
+    BEGIN
+      FOR neigh IN (
+        SELECT DISTINCT neighbour.mac_address, neighbour.ip
+        FROM maasserver_neighbour AS neighbour
+        JOIN maasserver_interface AS iface
+          ON neighbour.interface_id = iface.id
+        WHERE iface.vlan_id = target_vlan_id)
+      LOOP
+        PERFORM sys_discovery_refresh(neigh.mac_address, neigh.ip);
+      END LOOP;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_NEIGHBOUR_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_neighbour_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh(NEW.mac_address, NEW.ip);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_NEIGHBOUR_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_neighbour_update()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.mac_address IS DISTINCT FROM NEW.mac_address OR
+          OLD.ip IS DISTINCT FROM NEW.ip THEN
+        PERFORM sys_discovery_refresh(OLD.mac_address, OLD.ip);
+      END IF;
+      PERFORM sys_discovery_refresh(NEW.mac_address, NEW.ip);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_NEIGHBOUR_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_neighbour_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh(OLD.mac_address, OLD.ip);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+def render_sys_discovery_ip_procedure(proc_name, event):
+    """Render a database procedure with name `proc_name` that refreshes the
+    discoveries for the IP address of a changed mDNS or rDNS entry.
+
+    :param proc_name: Name of the procedure.
+    :param event: One of "insert", "update", or "delete".
+    """
+    if event == "insert":
+        body = "PERFORM sys_discovery_refresh_ip(NEW.ip);"
+    elif event == "update":
+        body = dedent("""\
+          IF OLD.ip IS DISTINCT FROM NEW.ip THEN
+            PERFORM sys_discovery_refresh_ip(OLD.ip);
+          END IF;
+          PERFORM sys_discovery_refresh_ip(NEW.ip);""")
+    else:
+        body = "PERFORM sys_discovery_refresh_ip(OLD.ip);"
+    return dedent("""\
+        CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+        BEGIN
+          %s
+          RETURN %s;
+        END;
+        $$ LANGUAGE plpgsql;
+        """) % (proc_name, body, 'OLD' if event == "delete" else 'NEW')
+
+
+DISCOVERY_INTERFACE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_interface_update()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.vlan_id IS DISTINCT FROM NEW.vlan_id OR
+          OLD.node_id IS DISTINCT FROM NEW.node_id THEN
+        PERFORM sys_discovery_refresh_interface(NEW.id);
+      ELSE
+        UPDATE maasserver_discovery
+          SET observer_interface_name = NEW.name
+          WHERE observer_interface_id = NEW.id;
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_NODE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_node_update()
+    RETURNS trigger as $$
+    BEGIN
+      UPDATE maasserver_discovery
+        SET observer_hostname = NEW.hostname,
+            observer_system_id = NEW.system_id
+        WHERE observer_id = NEW.id;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_FABRIC_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_fabric_update()
+    RETURNS trigger as $$
+    BEGIN
+      UPDATE maasserver_discovery
+        SET fabric_name = NEW.name
+        WHERE fabric_id = NEW.id;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_VLAN_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_vlan_update()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_vlan(NEW.id);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_SUBNET_INSERT = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_subnet_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_vlan(NEW.vlan_id);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_SUBNET_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_subnet_update()
+    RETURNS trigger as $$
+    BEGIN
+      IF OLD.vlan_id != NEW.vlan_id THEN
+        PERFORM sys_discovery_refresh_vlan(OLD.vlan_id);
+      END IF;
+      PERFORM sys_discovery_refresh_vlan(NEW.vlan_id);
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+DISCOVERY_SUBNET_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_discovery_subnet_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM sys_discovery_refresh_vlan(OLD.vlan_id);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+@transactional
+def register_discovery_triggers():
+    """Register all discovery triggers into the database."""
+    register_procedure(DISCOVERY_REFRESH)
+    register_procedure(DISCOVERY_REFRESH_IP)
+    register_procedure(DISCOVERY_REFRESH_INTERFACE)
+    register_procedure(DISCOVERY_REFRESH_VLAN)
+
+    # Neighbour
+    register_procedure(DISCOVERY_NEIGHBOUR_INSERT)
+    register_trigger(
+        "maasserver_neighbour", "sys_discovery_neighbour_insert", "insert")
+    register_procedure(DISCOVERY_NEIGHBOUR_UPDATE)
+    register_trigger(
+        "maasserver_neighbour", "sys_discovery_neighbour_update", "update")
+    register_procedure(DISCOVERY_NEIGHBOUR_DELETE)
+    register_trigger(
+        "maasserver_neighbour", "sys_discovery_neighbour_delete", "delete")
+
+    # mDNS and rDNS
+    for table in ("mdns", "rdns"):
+        for event in ("insert", "update", "delete"):
+            proc_name = "sys_discovery_%s_%s" % (table, event)
+            register_procedure(
+                render_sys_discovery_ip_procedure(proc_name, event))
+            register_trigger(
+                "maasserver_%s" % table, proc_name, event,
+                fields=(
+                    ["ip", "hostname", "updated"]
+                    if event == "update" else None))
+
+    # Interface
+    register_procedure(DISCOVERY_INTERFACE_UPDATE)
+    register_trigger(
+        "maasserver_interface", "sys_discovery_interface_update", "update",
+        fields=["name", "vlan_id", "node_id"])
+
+    # Node
+    register_procedure(DISCOVERY_NODE_UPDATE)
+    register_trigger(
+        "maasserver_node", "sys_discovery_node_update", "update",
+        fields=["hostname", "system_id"])
+
+    # Fabric
+    register_procedure(DISCOVERY_FABRIC_UPDATE)
+    register_trigger(
+        "maasserver_fabric", "sys_discovery_fabric_update", "update",
+        fields=["name"])
+
+    # VLAN
+    register_procedure(DISCOVERY_VLAN_UPDATE)
+    register_trigger(
+        "maasserver_vlan", "sys_discovery_vlan_update", "update",
+        fields=["external_dhcp", "fabric_id"])
+
+    # Subnet
+    register_procedure(DISCOVERY_SUBNET_INSERT)
+    register_trigger(
+        "maasserver_subnet", "sys_discovery_subnet_insert", "insert")
+    register_procedure(DISCOVERY_SUBNET_UPDATE)
+    register_trigger(
+        "maasserver_subnet", "sys_discovery_subnet_update", "update",
+        fields=["cidr", "vlan_id"])
+    register_procedure(DISCOVERY_SUBNET_DELETE)
+    register_trigger(
+        "maasserver_subnet", "sys_discovery_subnet_delete", "delete")
@@ -0,0 +1,161 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""
+Node Inventory Triggers
+
+The `maasserver_nodeinventory` table is a materialised copy of the
+`maasserver_nodeinventory_view` view. These triggers keep it up to date as
+the tables that the view summarises (block devices, filesystems, partition
+tables, and interfaces) change.
+
+Each row in the view summarises one node, so every change is applied by
+recomputing the row for the affected node from the view.
+"""
+
+__all__ = [
+    "register_inventory_triggers",
+    ]
+
+from textwrap import dedent
+
+from maasserver.models.nodeinventory import NODE_INVENTORY_COLUMNS
+from maasserver.triggers import (
+    register_procedure,
+    register_trigger,
+)
+from maasserver.utils.orm import transactional
+
+# Recomputes the inventory for the given node from the view. The predicate
+# is on the view's node ID, so Postgres pushes it down into the view rather
+# than summarising all nodes.
+INVENTORY_REFRESH = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_inventory_refresh(nid integer)
+    RETURNS void as $$
+    BEGIN
+      IF nid IS NOT NULL THEN
+        DELETE FROM maasserver_nodeinventory WHERE node_id = nid;
+        INSERT INTO maasserver_nodeinventory (%(columns)s)
+          SELECT %(columns)s FROM maasserver_nodeinventory_view
+          WHERE node_id = nid;
+      END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+    """) % {"columns": ", ".join(NODE_INVENTORY_COLUMNS)}
+
+# Recomputes the inventory for the node of the given block device.
+INVENTORY_REFRESH_BLOCKDEVICE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_inventory_refresh_blockdevice(
+      bd_id integer)
+    RETURNS void as $$
+    BEGIN
+      PERFORM sys_inventory_refresh(node_id)
+        FROM maasserver_blockdevice WHERE id = bd_id;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# Recomputes the inventory for the node of a filesystem, which is on either
+# a block device or a partition.
+INVENTORY_REFRESH_FILESYSTEM = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_inventory_refresh_filesystem(
+      bd_id integer, part_id integer)
+    RETURNS void as $$
+    BEGIN
+      IF bd_id IS NOT NULL THEN
+        PERFORM sys_inventory_refresh_blockdevice(bd_id);
+      END IF;
+      IF part_id IS NOT NULL THEN
+        PERFORM sys_inventory_refresh_blockdevice(ptable.block_device_id)
+          FROM maasserver_partition AS part
+          JOIN maasserver_partitiontable AS ptable
+            ON part.partition_table_id = ptable.id
+          WHERE part.id = part_id;
+      END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+def render_sys_inventory_procedure(proc_name, event, refresh, keys=()):
+    """Render a database procedure with name `proc_name` that refreshes the
+    inventory of the node of a changed row.
+
+    :param proc_name: Name of the procedure.
+    :param event: One of "insert", "update", or "delete".
+    :param refresh: The expression that refreshes the inventory, with a
+        ``%(row)s`` placeholder for the changed row, i.e. NEW or OLD.
+    :param keys: The columns that relate the row to its node. When updated,
+        the inventory of the node the row was related to is also refreshed.
+    """
+    if event == "insert":
+        body = "PERFORM %s;" % (refresh % {"row": "NEW"})
+    elif event == "update":
+        changed = " OR ".join(
+            "OLD.%s IS DISTINCT FROM NEW.%s" % (key, key) for key in keys)
+        body = "PERFORM %s;" % (refresh % {"row": "NEW"})
+        if len(keys) > 0:
+            body = dedent("""\
+              IF %s THEN
+                PERFORM %s;
+              END IF;
+              %s""") % (changed, refresh % {"row": "OLD"}, body)
+    else:
+        body = "PERFORM %s;" % (refresh % {"row": "OLD"})
+    return dedent("""\
+        CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+        BEGIN
+          %s
+          RETURN %s;
+        END;
+        $$ LANGUAGE plpgsql;
+        """) % (proc_name, body, 'OLD' if event == "delete" else 'NEW')
+
+
+# (table, refresh, keys, {event: fields}) for each table the view summarises.
+INVENTORY_SOURCES = (
+    ("node", "sys_inventory_refresh(%(row)s.id)", (), {
+        "insert": None,
+    }),
+    ("blockdevice", "sys_inventory_refresh(%(row)s.node_id)", ("node_id",), {
+        "insert": None,
+        "update": ["size", "tags", "node_id"],
+        "delete": None,
+    }),
+    ("filesystem", (
+        "sys_inventory_refresh_filesystem("
+        "%(row)s.block_device_id, %(row)s.partition_id)"),
+     ("block_device_id", "partition_id"), {
+        "insert": None,
+        "update": [
+            "mount_point", "acquired", "block_device_id", "partition_id"],
+        "delete": None,
+    }),
+    ("partitiontable", (
+        "sys_inventory_refresh_blockdevice(%(row)s.block_device_id)"), (), {
+        "insert": None,
+        "delete": None,
+    }),
+    ("interface", "sys_inventory_refresh(%(row)s.node_id)", ("node_id",), {
+        "insert": None,
+        "update": ["vlan_id", "node_id"],
+        "delete": None,
+    }),
+)
+
+
+@transactional
+def register_inventory_triggers():
+    """Register all node inventory triggers into the database."""
+    register_procedure(INVENTORY_REFRESH)
+    register_procedure(INVENTORY_REFRESH_BLOCKDEVICE)
+    register_procedure(INVENTORY_REFRESH_FILESYSTEM)
+
+    for table, refresh, keys, events in INVENTORY_SOURCES:
+        for event, fields in events.items():
+            proc_name = "sys_inventory_%s_%s" % (table, event)
+            register_procedure(
+                render_sys_inventory_procedure(
+                    proc_name, event, refresh, keys))
+            register_trigger(
+                "maasserver_%s" % table, proc_name, event, fields=fields)
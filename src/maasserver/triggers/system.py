@@ -1616,6 +1616,107 @@ PEER_PROXY_CONFIG_UPDATE = dedent("""\
     """)
 
 
+# Triggered when a node key is deleted, e.g. when its node is released or
+# deleted. Region processes forget the key; see `metadataserver.nodekey_cache`.
+NODEKEY_DELETE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_nodekey_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM pg_notify('sys_nodekey', OLD.key);
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+# Triggered when a node changes in a way that changes how it boots. Rack
+# controllers are told to expire the boot configurations they have cached
+# for the node's MAC addresses; see `RegionControllerService`.
+BOOT_CONFIG_NODE_UPDATE = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_boot_config_node_update()
+    RETURNS trigger as $$
+    DECLARE
+      macs text;
+    BEGIN
+      SELECT string_agg(mac_address::text, ',') INTO macs
+      FROM maasserver_interface
+      WHERE node_id = NEW.id
+        AND type = 'physical'
+        AND mac_address IS NOT NULL;
+      IF macs IS NOT NULL THEN
+        PERFORM pg_notify('sys_boot_config', macs);
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+# The node fields that affect the boot configuration of a node.
+BOOT_CONFIG_NODE_FIELDS = [
+    "status",
+    "netboot",
+    "osystem",
+    "distro_series",
+    "architecture",
+    "hwe_kernel",
+    "min_hwe_kernel",
+    "hostname",
+    "domain_id",
+]
+
+# The configuration items that affect the boot configuration of all nodes.
+BOOT_CONFIG_CONFIG_NAMES = [
+    "commissioning_distro_series",
+    "commissioning_osystem",
+    "default_min_hwe_kernel",
+    "enable_third_party_drivers",
+    "http_boot",
+    "kernel_opts",
+]
+
+
+def render_sys_boot_config_config_procedure(proc_name):
+    """Render a database procedure with name `proc_name` that notifies that
+    all boot configurations must be expired when a configuration item that
+    affects them has changed.
+
+    :param proc_name: Name of the procedure.
+    """
+    names = ", ".join("'%s'" % name for name in BOOT_CONFIG_CONFIG_NAMES)
+    return dedent("""\
+        CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+        BEGIN
+          IF NEW.name IN (%s) THEN
+            PERFORM pg_notify('sys_boot_config', '');
+          END IF;
+          RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """ % (proc_name, names))
+
+
+def render_sys_config_procedure(proc_name, on_delete=False):
+    """Render a database procedure with name `proc_name` that notifies that a
+    configuration item has changed. Region processes forget the configuration
+    they have cached; see `maasserver.config_cache`.
+
+    The payload is the ID of the transaction making the change, so that values
+    loaded from a snapshot that does not include it are not cached.
+
+    :param proc_name: Name of the procedure.
+    :param on_delete: True when procedure will be used as a delete trigger.
+    """
+    row = 'NEW' if not on_delete else 'OLD'
+    return dedent("""\
+        CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+        BEGIN
+          PERFORM pg_notify('sys_config', txid_current()::text);
+          RETURN %s;
+        END;
+        $$ LANGUAGE plpgsql;
+        """ % (proc_name, row))
+
+
 def render_sys_proxy_procedure(proc_name, on_delete=False):
     """Render a database procedure with name `proc_name` that notifies that a
     proxy update is needed.
@@ -1876,3 +1977,38 @@ def register_system_triggers():
     register_trigger(
         "maasserver_config", "sys_proxy_config_use_peer_proxy_update",
         "update")
+
+    # Config
+    register_procedure(
+        render_sys_config_procedure("sys_config_insert"))
+    register_trigger(
+        "maasserver_config", "sys_config_insert", "insert")
+    register_procedure(
+        render_sys_config_procedure("sys_config_update"))
+    register_trigger(
+        "maasserver_config", "sys_config_update", "update")
+    register_procedure(
+        render_sys_config_procedure("sys_config_delete", on_delete=True))
+    register_trigger(
+        "maasserver_config", "sys_config_delete", "delete")
+
+    # Node keys
+    register_procedure(NODEKEY_DELETE)
+    register_trigger(
+        "metadataserver_nodekey", "sys_nodekey_delete", "delete")
+
+    # Boot configurations
+    register_procedure(BOOT_CONFIG_NODE_UPDATE)
+    register_trigger(
+        "maasserver_node", "sys_boot_config_node_update", "update",
+        fields=BOOT_CONFIG_NODE_FIELDS)
+    register_procedure(
+        render_sys_boot_config_config_procedure(
+            "sys_boot_config_config_insert"))
+    register_trigger(
+        "maasserver_config", "sys_boot_config_config_insert", "insert")
+    register_procedure(
+        render_sys_boot_config_config_procedure(
+            "sys_boot_config_config_update"))
+    register_trigger(
+        "maasserver_config", "sys_boot_config_config_update", "update")
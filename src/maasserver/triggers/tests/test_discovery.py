@@ -0,0 +1,153 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.triggers.discovery`."""
+
+__all__ = []
+
+from contextlib import closing
+
+from django.db import connection
+from maasserver.models import Discovery
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.triggers.discovery import (
+    DISCOVERY_COLUMNS,
+    register_discovery_triggers,
+)
+from maasserver.utils.orm import (
+    psql_array,
+    reload_object,
+)
+from testtools.matchers import (
+    Equals,
+    HasLength,
+)
+
+
+def get_rows(relation):
+    columns = ", ".join(DISCOVERY_COLUMNS)
+    with closing(connection.cursor()) as cursor:
+        cursor.execute("SELECT %s FROM %s ORDER BY id" % (columns, relation))
+        return cursor.fetchall()
+
+
+class TestDiscoveryTriggers(MAASServerTestCase):
+
+    def test_register_discovery_triggers(self):
+        register_discovery_triggers()
+        triggers = [
+            "neighbour_sys_discovery_neighbour_insert",
+            "neighbour_sys_discovery_neighbour_update",
+            "neighbour_sys_discovery_neighbour_delete",
+            "mdns_sys_discovery_mdns_insert",
+            "mdns_sys_discovery_mdns_update",
+            "mdns_sys_discovery_mdns_delete",
+            "rdns_sys_discovery_rdns_insert",
+            "rdns_sys_discovery_rdns_update",
+            "rdns_sys_discovery_rdns_delete",
+            "interface_sys_discovery_interface_update",
+            "node_sys_discovery_node_update",
+            "fabric_sys_discovery_fabric_update",
+            "vlan_sys_discovery_vlan_update",
+            "subnet_sys_discovery_subnet_insert",
+            "subnet_sys_discovery_subnet_update",
+            "subnet_sys_discovery_subnet_delete",
+            ]
+        sql, args = psql_array(triggers, sql_type="text")
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(
+                "SELECT tgname::text FROM pg_trigger WHERE "
+                "tgname::text = ANY(%s)" % sql, args)
+            db_triggers = cursor.fetchall()
+        triggers_found = [trigger[0] for trigger in db_triggers]
+        self.assertItemsEqual(triggers, triggers_found)
+
+
+class TestDiscoveryTable(MAASServerTestCase):
+    """The discovery table is kept identical to the discovery view."""
+
+    def assertTableMatchesView(self):
+        self.assertThat(
+            get_rows("maasserver_discovery"),
+            Equals(get_rows("maasserver_discovery_view")))
+
+    def test__neighbour_insert_adds_discovery(self):
+        neighbour = factory.make_Neighbour()
+        self.assertThat(
+            Discovery.objects.filter(neighbour=neighbour), HasLength(1))
+        self.assertTableMatchesView()
+
+    def test__neighbour_update_updates_discovery(self):
+        neighbour = factory.make_Neighbour()
+        neighbour.ip = factory.make_ipv4_address()
+        neighbour.save()
+        discovery = Discovery.objects.get(neighbour=neighbour)
+        self.assertThat(discovery.ip, Equals(neighbour.ip))
+        self.assertTableMatchesView()
+
+    def test__neighbour_delete_removes_discovery(self):
+        neighbour = factory.make_Neighbour()
+        neighbour.delete()
+        self.assertThat(Discovery.objects.all(), HasLength(0))
+        self.assertTableMatchesView()
+
+    def test__mdns_sets_hostname(self):
+        discovery = factory.make_Discovery(hostname="")
+        hostname = factory.make_hostname()
+        factory.make_MDNS(
+            hostname=hostname, ip=discovery.ip,
+            interface=discovery.observer_interface)
+        self.assertThat(reload_object(discovery).hostname, Equals(hostname))
+        self.assertTableMatchesView()
+
+    def test__rdns_overrides_mdns_hostname(self):
+        discovery = factory.make_Discovery(hostname=factory.make_hostname())
+        rdns = factory.make_RDNS(ip=discovery.ip)
+        self.assertThat(
+            reload_object(discovery).hostname, Equals(rdns.hostname))
+        rdns.delete()
+        self.assertTableMatchesView()
+
+    def test__node_update_updates_observer_hostname(self):
+        discovery = factory.make_Discovery()
+        observer = discovery.observer
+        observer.hostname = factory.make_name("rack")
+        observer.save()
+        self.assertThat(
+            reload_object(discovery).observer_hostname,
+            Equals(observer.hostname))
+        self.assertTableMatchesView()
+
+    def test__fabric_update_updates_fabric_name(self):
+        discovery = factory.make_Discovery()
+        fabric = discovery.fabric
+        fabric.name = factory.make_name("fabric")
+        fabric.save()
+        self.assertThat(
+            reload_object(discovery).fabric_name, Equals(fabric.name))
+        self.assertTableMatchesView()
+
+    def test__subnet_changes_update_discovery_subnet(self):
+        discovery = factory.make_Discovery(ip="10.0.0.1")
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24", vlan=discovery.vlan)
+        self.assertThat(reload_object(discovery).subnet, Equals(subnet))
+        subnet.delete()
+        self.assertIsNone(reload_object(discovery).subnet)
+        self.assertTableMatchesView()
+
+    def test__vlan_update_updates_external_dhcp(self):
+        discovery = factory.make_Discovery()
+        vlan = discovery.vlan
+        vlan.external_dhcp = discovery.ip
+        vlan.save()
+        self.assertTrue(reload_object(discovery).is_external_dhcp)
+        self.assertTableMatchesView()
+
+    def test__rebuild_matches_view(self):
+        for _ in range(3):
+            factory.make_Discovery()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute("DELETE FROM maasserver_discovery")
+        self.assertThat(Discovery.objects.rebuild(), Equals(3))
+        self.assertTableMatchesView()
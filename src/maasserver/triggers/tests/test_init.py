@@ -13,6 +13,8 @@ from maasserver.triggers import (
     register_procedure,
     register_trigger,
 )
+from maasserver.triggers.discovery import register_discovery_triggers
+from maasserver.triggers.inventory import register_inventory_triggers
 from maasserver.triggers.system import register_system_triggers
 from maasserver.triggers.websocket import (
     register_websocket_triggers,
@@ -60,6 +62,11 @@ class TestTriggersUsed(MAASServerTestCase):
     """Tests relating to those triggers the MAAS application uses."""
 
     triggers_system = {
+        "config_sys_boot_config_config_insert",
+        "config_sys_boot_config_config_update",
+        "config_sys_config_delete",
+        "config_sys_config_insert",
+        "config_sys_config_update",
         "config_sys_dhcp_config_ntp_servers_delete",
         "config_sys_dhcp_config_ntp_servers_insert",
         "config_sys_dhcp_config_ntp_servers_update",
@@ -87,6 +94,8 @@ class TestTriggersUsed(MAASServerTestCase):
         "iprange_sys_dhcp_iprange_delete",
         "iprange_sys_dhcp_iprange_insert",
         "iprange_sys_dhcp_iprange_update",
+        "metadataserver_nodekey_sys_nodekey_delete",
+        "node_sys_boot_config_node_update",
         "node_sys_dhcp_node_update",
         "node_sys_dns_node_delete",
         "node_sys_dns_node_update",
@@ -107,6 +116,40 @@ class TestTriggersUsed(MAASServerTestCase):
         "vlan_sys_dhcp_vlan_update",
     }
 
+    triggers_discovery = {
+        "fabric_sys_discovery_fabric_update",
+        "interface_sys_discovery_interface_update",
+        "mdns_sys_discovery_mdns_delete",
+        "mdns_sys_discovery_mdns_insert",
+        "mdns_sys_discovery_mdns_update",
+        "neighbour_sys_discovery_neighbour_delete",
+        "neighbour_sys_discovery_neighbour_insert",
+        "neighbour_sys_discovery_neighbour_update",
+        "node_sys_discovery_node_update",
+        "rdns_sys_discovery_rdns_delete",
+        "rdns_sys_discovery_rdns_insert",
+        "rdns_sys_discovery_rdns_update",
+        "subnet_sys_discovery_subnet_delete",
+        "subnet_sys_discovery_subnet_insert",
+        "subnet_sys_discovery_subnet_update",
+        "vlan_sys_discovery_vlan_update",
+    }
+
+    triggers_inventory = {
+        "blockdevice_sys_inventory_blockdevice_delete",
+        "blockdevice_sys_inventory_blockdevice_insert",
+        "blockdevice_sys_inventory_blockdevice_update",
+        "filesystem_sys_inventory_filesystem_delete",
+        "filesystem_sys_inventory_filesystem_insert",
+        "filesystem_sys_inventory_filesystem_update",
+        "interface_sys_inventory_interface_delete",
+        "interface_sys_inventory_interface_insert",
+        "interface_sys_inventory_interface_update",
+        "node_sys_inventory_node_insert",
+        "partitiontable_sys_inventory_partitiontable_delete",
+        "partitiontable_sys_inventory_partitiontable_insert",
+    }
+
     triggers_websocket = {
         "auth_user_user_create_notify",
         "auth_user_user_delete_notify",
@@ -264,7 +307,9 @@ class TestTriggersUsed(MAASServerTestCase):
         "zone_zone_update_notify",
     }
 
-    triggers_all = triggers_system | triggers_websocket
+    triggers_all = (
+        triggers_system | triggers_websocket | triggers_discovery |
+        triggers_inventory)
 
     def find_triggers_in_database(self):
         with connection.cursor() as cursor:
@@ -296,3 +341,11 @@ class TestTriggersUsed(MAASServerTestCase):
     def test_register_websocket_triggers_does_not_introduce_more(self):
         register_websocket_triggers()
         self.check_triggers_in_database()
+
+    def test_register_discovery_triggers_does_not_introduce_more(self):
+        register_discovery_triggers()
+        self.check_triggers_in_database()
+
+    def test_register_inventory_triggers_does_not_introduce_more(self):
+        register_inventory_triggers()
+        self.check_triggers_in_database()
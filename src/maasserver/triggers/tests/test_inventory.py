@@ -0,0 +1,173 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.triggers.inventory`."""
+
+__all__ = []
+
+from contextlib import closing
+
+from django.db import connection
+from maasserver.enum import INTERFACE_TYPE
+from maasserver.models import NodeInventory
+from maasserver.models.nodeinventory import NODE_INVENTORY_COLUMNS
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.triggers.inventory import register_inventory_triggers
+from maasserver.utils.orm import psql_array
+from testtools.matchers import (
+    Equals,
+    HasLength,
+)
+
+
+def get_rows(relation):
+    columns = ", ".join(NODE_INVENTORY_COLUMNS)
+    with closing(connection.cursor()) as cursor:
+        cursor.execute(
+            "SELECT %s FROM %s ORDER BY node_id" % (columns, relation))
+        return cursor.fetchall()
+
+
+class TestInventoryTriggers(MAASServerTestCase):
+
+    def test_register_inventory_triggers(self):
+        register_inventory_triggers()
+        triggers = [
+            "node_sys_inventory_node_insert",
+            "blockdevice_sys_inventory_blockdevice_insert",
+            "blockdevice_sys_inventory_blockdevice_update",
+            "blockdevice_sys_inventory_blockdevice_delete",
+            "filesystem_sys_inventory_filesystem_insert",
+            "filesystem_sys_inventory_filesystem_update",
+            "filesystem_sys_inventory_filesystem_delete",
+            "partitiontable_sys_inventory_partitiontable_insert",
+            "partitiontable_sys_inventory_partitiontable_delete",
+            "interface_sys_inventory_interface_insert",
+            "interface_sys_inventory_interface_update",
+            "interface_sys_inventory_interface_delete",
+            ]
+        sql, args = psql_array(triggers, sql_type="text")
+        with closing(connection.cursor()) as cursor:
+            cursor.execute(
+                "SELECT tgname::text FROM pg_trigger WHERE "
+                "tgname::text = ANY(%s)" % sql, args)
+            db_triggers = cursor.fetchall()
+        triggers_found = [trigger[0] for trigger in db_triggers]
+        self.assertItemsEqual(triggers, triggers_found)
+
+
+class TestNodeInventoryTable(MAASServerTestCase):
+    """The node inventory table is kept identical to its view."""
+
+    def assertTableMatchesView(self):
+        self.assertThat(
+            get_rows("maasserver_nodeinventory"),
+            Equals(get_rows("maasserver_nodeinventory_view")))
+
+    def test__node_insert_adds_inventory(self):
+        node = factory.make_Node(with_boot_disk=False)
+        inventory = NodeInventory.objects.get(node=node)
+        self.assertThat(inventory.disk_count, Equals(0))
+        self.assertTableMatchesView()
+
+    def test__unused_disks_are_summarised(self):
+        node = factory.make_Node(with_boot_disk=False)
+        factory.make_PhysicalBlockDevice(
+            node=node, size=2 * 1024 ** 3, tags=["ssd"])
+        factory.make_PhysicalBlockDevice(
+            node=node, size=4 * 1024 ** 3, tags=["rotary", "ssd"])
+        inventory = NodeInventory.objects.get(node=node)
+        self.assertThat(
+            (inventory.disk_count, inventory.disk_max_size,
+             sorted(inventory.disk_tags)),
+            Equals((2, 4 * 1024 ** 3, ["rotary", "ssd"])))
+        self.assertTableMatchesView()
+
+    def test__root_disk_is_summarised(self):
+        node = factory.make_Node(with_boot_disk=False)
+        root = factory.make_PhysicalBlockDevice(
+            node=node, tags=["ssd"], formatted_root=True)
+        inventory = NodeInventory.objects.get(node=node)
+        self.assertThat(
+            (inventory.root_disk_size, inventory.root_disk_tags,
+             inventory.disk_count),
+            Equals((root.size, ["ssd"], 0)))
+        self.assertTableMatchesView()
+
+    def test__block_device_update_updates_inventory(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node, tags=[])
+        device.tags = ["fast"]
+        device.save()
+        self.assertThat(
+            NodeInventory.objects.get(node=node).disk_tags,
+            Equals(["fast"]))
+        self.assertTableMatchesView()
+
+    def test__block_device_delete_updates_inventory(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node)
+        device.delete()
+        self.assertThat(
+            NodeInventory.objects.get(node=node).disk_count, Equals(0))
+        self.assertTableMatchesView()
+
+    def test__partition_table_marks_disk_used(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node)
+        partition_table = factory.make_PartitionTable(block_device=device)
+        self.assertThat(
+            NodeInventory.objects.get(node=node).disk_count, Equals(0))
+        partition_table.delete()
+        self.assertThat(
+            NodeInventory.objects.get(node=node).disk_count, Equals(1))
+        self.assertTableMatchesView()
+
+    def test__filesystem_delete_unsets_root_disk(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node)
+        filesystem = factory.make_Filesystem(
+            block_device=device, mount_point='/')
+        self.assertThat(
+            NodeInventory.objects.get(node=node).root_disk_size,
+            Equals(device.size))
+        filesystem.delete()
+        self.assertIsNone(NodeInventory.objects.get(node=node).root_disk_size)
+        self.assertTableMatchesView()
+
+    def test__interface_changes_update_vlan_ids(self):
+        node = factory.make_Node(with_boot_disk=False)
+        vlan = factory.make_VLAN()
+        interface = factory.make_Interface(
+            INTERFACE_TYPE.PHYSICAL, node=node, vlan=vlan)
+        self.assertThat(
+            NodeInventory.objects.get(node=node).vlan_ids,
+            Equals([vlan.id]))
+        other_vlan = factory.make_VLAN()
+        interface.vlan = other_vlan
+        interface.save()
+        self.assertThat(
+            NodeInventory.objects.get(node=node).vlan_ids,
+            Equals([other_vlan.id]))
+        interface.delete()
+        self.assertThat(
+            NodeInventory.objects.get(node=node).vlan_ids, Equals([]))
+        self.assertTableMatchesView()
+
+    def test__node_delete_removes_inventory(self):
+        node = factory.make_Node()
+        node.delete()
+        self.assertThat(
+            NodeInventory.objects.filter(node_id=node.id), HasLength(0))
+        self.assertTableMatchesView()
+
+    def test__rebuild_matches_view(self):
+        for _ in range(3):
+            factory.make_Node()
+        with closing(connection.cursor()) as cursor:
+            cursor.execute("DELETE FROM maasserver_nodeinventory")
+        self.assertThat(
+            NodeInventory.objects.rebuild(),
+            Equals(len(get_rows("maasserver_nodeinventory_view"))))
+        self.assertTableMatchesView()
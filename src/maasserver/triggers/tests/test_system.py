@@ -61,6 +61,13 @@ class TestTriggers(MAASServerTestCase):
             "subnet_sys_proxy_subnet_insert",
             "subnet_sys_proxy_subnet_update",
             "subnet_sys_proxy_subnet_delete",
+            "config_sys_config_insert",
+            "config_sys_config_update",
+            "config_sys_config_delete",
+            "metadataserver_nodekey_sys_nodekey_delete",
+            "node_sys_boot_config_node_update",
+            "config_sys_boot_config_config_insert",
+            "config_sys_boot_config_config_update",
             ]
         sql, args = psql_array(triggers, sql_type="text")
         with closing(connection.cursor()) as cursor:
@@ -40,6 +40,7 @@ from maasserver.triggers.testing import (
 )
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
+from metadataserver.models import NodeKey
 from netaddr import IPAddress
 from provisioningserver.utils.twisted import DeferredValue
 from testtools import ExpectedException
@@ -4321,3 +4322,162 @@ class TestProxyListener(
             yield dv.get(timeout=2)
         finally:
             yield listener.stopService()
+
+
+class TestConfigListener(
+        MAASTransactionServerTestCase, TransactionalHelpersMixin):
+    """End-to-end test for the config triggers code."""
+
+    @transactional
+    def delete_config(self, name):
+        Config.objects.filter(name=name).delete()
+
+    @transactional
+    def in_transaction(self, func, *args):
+        """Call `func`, returning the ID of the transaction it ran in."""
+        func(*args)
+        with db_connection.cursor() as cursor:
+            cursor.execute("SELECT txid_current()")
+            [txid] = cursor.fetchone()
+        return str(txid)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_config_insert(self):
+        yield deferToDatabase(register_system_triggers)
+        name = factory.make_name("name")
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_config", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            txid = yield deferToDatabase(
+                self.in_transaction, self.create_config, name, "value")
+            yield dv.get(timeout=2)
+            self.assertEqual(("sys_config", txid), dv.value)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_config_update(self):
+        yield deferToDatabase(register_system_triggers)
+        name = factory.make_name("name")
+        yield deferToDatabase(self.create_config, name, "value")
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_config", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            txid = yield deferToDatabase(
+                self.in_transaction, self.set_config, name, "changed")
+            yield dv.get(timeout=2)
+            self.assertEqual(("sys_config", txid), dv.value)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_config_delete(self):
+        yield deferToDatabase(register_system_triggers)
+        name = factory.make_name("name")
+        yield deferToDatabase(self.create_config, name, "value")
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_config", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            txid = yield deferToDatabase(
+                self.in_transaction, self.delete_config, name)
+            yield dv.get(timeout=2)
+            self.assertEqual(("sys_config", txid), dv.value)
+        finally:
+            yield listener.stopService()
+
+
+class TestNodeKeyListener(
+        MAASTransactionServerTestCase, TransactionalHelpersMixin):
+    """End-to-end test for the node key triggers code."""
+
+    @transactional
+    def create_node_with_key(self):
+        node = factory.make_Node()
+        return node, NodeKey.objects.get_token_for_node(node).key
+
+    @transactional
+    def clear_key(self, node):
+        NodeKey.objects.clear_token_for_node(node)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_nodekey_delete(self):
+        yield deferToDatabase(register_system_triggers)
+        node, key = yield deferToDatabase(self.create_node_with_key)
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_nodekey", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.clear_key, node)
+            yield dv.get(timeout=2)
+            self.assertEqual(("sys_nodekey", key), dv.value)
+        finally:
+            yield listener.stopService()
+
+
+class TestBootConfigListener(
+        MAASTransactionServerTestCase, TransactionalHelpersMixin):
+    """End-to-end test for the boot configuration triggers code."""
+
+    @transactional
+    def get_macs(self, node):
+        return {
+            str(interface.mac_address)
+            for interface in node.interface_set.all()
+        }
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_hostname_update(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(self.create_node_with_interface)
+        macs = yield deferToDatabase(self.get_macs, node)
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_boot_config", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_node, node.system_id, {
+                    "hostname": factory.make_name("host"),
+                })
+            yield dv.get(timeout=2)
+            channel, message = dv.value
+            self.assertEqual("sys_boot_config", channel)
+            self.assertEqual(macs, set(message.split(",")))
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_config_update_kernel_opts(self):
+        yield deferToDatabase(register_system_triggers)
+        yield deferToDatabase(
+            self.create_config, "kernel_opts", factory.make_name("opts"))
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_boot_config", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.set_config, "kernel_opts", factory.make_name("opts"))
+            yield dv.get(timeout=2)
+            self.assertEqual(("sys_boot_config", ""), dv.value)
+        finally:
+            yield listener.stopService()
@@ -13,7 +13,7 @@ __all__ = [
     "DatabaseTasksService",
 ]
 
-from maasserver.utils.threads import deferToDatabase
+from maasserver.utils.threads import deferToDatabaseQueue
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils.twisted import (
     asynchronous,
@@ -50,6 +50,9 @@ class DatabaseTasksService(Service, object):
     Before this service has been started, and as soon as shutdown has
     commenced, database tasks will be rejected by `deferTask` and `addTask`.
 
+    These are background tasks, so they wait in the "bulk" database queue;
+    see `maasserver.concurrency.database_queues`.
+
     """
 
     sentinel = object()
@@ -79,7 +82,7 @@ class DatabaseTasksService(Service, object):
         done = Deferred(cancel)
 
         def task():
-            d = deferToDatabase(func, *args, **kwargs)
+            d = deferToDatabaseQueue("bulk", func, *args, **kwargs)
             d.chainDeferred(done)
             return d
 
@@ -0,0 +1,245 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Server-side prepared statements for hot queries.
+
+PostgreSQL parses and plans every query it is sent. For small queries that
+are run very often, like those on the boot and lease paths, that can be most
+of the work. Preparing them server-side means that's done once per database
+connection instead.
+
+Define a statement once, at module level::
+
+  find_thing = PreparedStatement(
+      "find_thing", "SELECT * FROM thing WHERE name = $1", ["text"])
+
+then call `find_thing.execute(params)` to get a cursor, or
+`find_thing.raw(Thing.objects, params)` to get model instances. The statement
+is prepared on the current connection the first time it's used there, and
+again after a reconnect.
+
+Execution statistics for all statements in this process are available from
+`get_prepared_statement_stats`.
+"""
+
+__all__ = [
+    "get_prepared_statement_stats",
+    "PreparedStatement",
+    "reset_prepared_statement_stats",
+]
+
+from contextlib import contextmanager
+import re
+from threading import Lock
+from time import monotonic
+from weakref import WeakKeyDictionary
+
+from django.db import connection
+from maasserver.utils.orm import (
+    get_psycopg2_exception,
+    request_transaction_retry,
+    retry_context,
+)
+from psycopg2.errorcodes import INVALID_SQL_STATEMENT_NAME
+
+# Names are used unquoted in SQL, so they're restricted to those that
+# PostgreSQL won't fold to lower-case.
+_valid_name = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+# All prepared statements defined in this process, keyed by name.
+_statements = {}
+
+# The names of the statements prepared on each DB-API connection. A new
+# connection, e.g. after a reconnect, starts afresh.
+_prepared = WeakKeyDictionary()
+
+# Guards `_statements`, `_prepared`, and the statistics of each statement.
+_lock = Lock()
+
+
+class PreparedStatementStats:
+    """Execution statistics for a `PreparedStatement`."""
+
+    def __init__(self):
+        super(PreparedStatementStats, self).__init__()
+        self.prepares = 0
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def asdict(self):
+        return {
+            "prepares": self.prepares,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_time": self.total_time,
+            "mean_time": (
+                self.total_time / self.calls if self.calls > 0 else None),
+            "max_time": self.max_time,
+        }
+
+
+class PreparedStatement:
+    """A named query that is prepared server-side on each connection.
+
+    :ivar name: The name of this statement, unique within this process.
+    :ivar sql: The query, using ``$1``, ``$2``, etc. for its parameters.
+    :ivar types: The PostgreSQL types of the parameters.
+    """
+
+    def __init__(self, name, sql, types=()):
+        super(PreparedStatement, self).__init__()
+        if _valid_name.match(name) is None:
+            raise ValueError("Invalid prepared statement name: %r" % name)
+        self.name = name
+        self.sql = sql
+        self.types = tuple(types)
+        self.stats = PreparedStatementStats()
+        with _lock:
+            if name in _statements:
+                raise ValueError(
+                    "Prepared statement %r is already defined." % name)
+            else:
+                _statements[name] = self
+
+    @property
+    def statement_name(self):
+        """The name of this statement in PostgreSQL."""
+        return "maas_" + self.name
+
+    @property
+    def prepare_sql(self):
+        if len(self.types) == 0:
+            return "PREPARE %s AS %s" % (self.statement_name, self.sql)
+        else:
+            return "PREPARE %s (%s) AS %s" % (
+                self.statement_name, ", ".join(self.types), self.sql)
+
+    @property
+    def execute_sql(self):
+        if len(self.types) == 0:
+            return "EXECUTE %s" % self.statement_name
+        else:
+            return "EXECUTE %s (%s)" % (
+                self.statement_name, ", ".join(["%s"] * len(self.types)))
+
+    def prepare(self):
+        """Prepare this statement on the current connection, if necessary."""
+        connection.ensure_connection()
+        dbapi_connection = connection.connection
+        with _lock:
+            prepared = _prepared.setdefault(dbapi_connection, set())
+            if self.name in prepared:
+                return
+        with connection.cursor() as cursor:
+            # The statement may have been prepared by something that doesn't
+            # use this module; PREPARE would then fail, breaking the
+            # transaction, so check first.
+            cursor.execute(
+                "SELECT 1 FROM pg_prepared_statements WHERE name = %s",
+                [self.statement_name])
+            if cursor.fetchone() is None:
+                cursor.execute(self.prepare_sql)
+                with _lock:
+                    self.stats.prepares += 1
+        with _lock:
+            prepared.add(self.name)
+
+    def forget(self):
+        """Forget that this statement was prepared on the current connection.
+
+        It will be prepared again before it's next executed.
+        """
+        dbapi_connection = connection.connection
+        if dbapi_connection is not None:
+            with _lock:
+                _prepared.get(dbapi_connection, set()).discard(self.name)
+
+    def execute(self, params=()):
+        """Execute this statement on the current connection.
+
+        If the statement has gone missing on the server, e.g. because it was
+        deallocated, the transaction is retried when the retry machinery is
+        active, and the statement is prepared again.
+
+        :return: A cursor from which the results can be fetched.
+        """
+        with self._executing(params):
+            cursor = connection.cursor()
+            try:
+                cursor.execute(self.execute_sql, params)
+            except:
+                cursor.close()
+                raise
+            else:
+                return cursor
+
+    def raw(self, manager, params=()):
+        """Execute this statement, returning model instances from `manager`.
+
+        The statement's result columns must match the model's table; extra
+        columns are added as attributes on each instance, as for
+        `Manager.raw`. See `execute` for how errors are handled.
+
+        :return: A list of model instances.
+        """
+        with self._executing(params):
+            return list(manager.raw(self.execute_sql, params))
+
+    @contextmanager
+    def _executing(self, params):
+        """Prepare this statement then time its execution in this context."""
+        if len(params) != len(self.types):
+            raise ValueError(
+                "Prepared statement %r expects %d parameters; %d given." % (
+                    self.name, len(self.types), len(params)))
+        self.prepare()
+        started = monotonic()
+        try:
+            yield
+        except Exception as error:
+            self._record(monotonic() - started, failed=True)
+            if _is_missing_prepared_statement(error):
+                self.forget()
+                if retry_context.active:
+                    request_transaction_retry()
+            raise
+        else:
+            self._record(monotonic() - started)
+
+    def _record(self, elapsed, failed=False):
+        with _lock:
+            stats = self.stats
+            stats.calls += 1
+            stats.total_time += elapsed
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+            if failed:
+                stats.errors += 1
+
+
+def _is_missing_prepared_statement(exception):
+    error = get_psycopg2_exception(exception)
+    return (
+        error is not None and
+        error.pgcode == INVALID_SQL_STATEMENT_NAME)
+
+
+def get_prepared_statement_stats():
+    """Return execution statistics for all prepared statements.
+
+    :return: A dict of statement names to dicts of statistics.
+    """
+    with _lock:
+        return {
+            name: statement.stats.asdict()
+            for name, statement in _statements.items()
+        }
+
+
+def reset_prepared_statement_stats():
+    """Reset the execution statistics for all prepared statements."""
+    with _lock:
+        for statement in _statements.values():
+            statement.stats = PreparedStatementStats()
@@ -0,0 +1,131 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.utils.prepared`."""
+
+__all__ = []
+
+from django.db import connection
+from maasserver.models import Node
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils import prepared
+from maasserver.utils.orm import (
+    retry_context,
+    RetryTransaction,
+    savepoint,
+)
+from maasserver.utils.prepared import (
+    get_prepared_statement_stats,
+    PreparedStatement,
+    reset_prepared_statement_stats,
+)
+from maastesting.testcase import MAASTestCase
+from testtools import ExpectedException
+from testtools.matchers import (
+    ContainsDict,
+    Equals,
+)
+
+
+def make_statement_name():
+    return factory.make_name("statement", sep="_").lower()
+
+
+def is_prepared(statement):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_prepared_statements WHERE name = %s",
+            [statement.statement_name])
+        return cursor.fetchone() is not None
+
+
+class TestPreparedStatementDefinition(MAASTestCase):
+
+    def setUp(self):
+        super(TestPreparedStatementDefinition, self).setUp()
+        self.patch(prepared, "_statements", {})
+
+    def test__rejects_invalid_name(self):
+        self.assertRaises(
+            ValueError, PreparedStatement, "Foo-Bar", "SELECT 1")
+
+    def test__rejects_duplicate_name(self):
+        name = make_statement_name()
+        PreparedStatement(name, "SELECT 1")
+        self.assertRaises(ValueError, PreparedStatement, name, "SELECT 1")
+
+    def test__sql_without_parameters(self):
+        statement = PreparedStatement("foo", "SELECT 1")
+        self.assertThat(
+            statement.prepare_sql, Equals("PREPARE maas_foo AS SELECT 1"))
+        self.assertThat(statement.execute_sql, Equals("EXECUTE maas_foo"))
+
+    def test__sql_with_parameters(self):
+        statement = PreparedStatement("foo", "SELECT $1, $2", ["int", "text"])
+        self.assertThat(statement.prepare_sql, Equals(
+            "PREPARE maas_foo (int, text) AS SELECT $1, $2"))
+        self.assertThat(
+            statement.execute_sql, Equals("EXECUTE maas_foo (%s, %s)"))
+
+    def test__execute_rejects_wrong_number_of_parameters(self):
+        statement = PreparedStatement("foo", "SELECT $1", ["int"])
+        self.assertRaises(ValueError, statement.execute, [1, 2])
+
+
+class TestPreparedStatement(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestPreparedStatement, self).setUp()
+        self.patch(prepared, "_statements", {})
+
+    def test__execute_prepares_once(self):
+        statement = PreparedStatement(
+            make_statement_name(), "SELECT $1 + 1", ["int"])
+        self.assertThat(statement.execute([1]).fetchall(), Equals([(2,)]))
+        self.assertThat(statement.execute([2]).fetchall(), Equals([(3,)]))
+        self.assertTrue(is_prepared(statement))
+        self.assertThat(statement.stats.prepares, Equals(1))
+        self.assertThat(statement.stats.calls, Equals(2))
+
+    def test__does_not_prepare_again_if_already_prepared(self):
+        statement = PreparedStatement(make_statement_name(), "SELECT 1")
+        statement.execute()
+        # Forget, as if this were a new connection, but the statement is
+        # still prepared on the server.
+        statement.forget()
+        statement.execute()
+        self.assertThat(statement.stats.prepares, Equals(1))
+
+    def test__prepares_again_when_missing_from_server(self):
+        statement = PreparedStatement(make_statement_name(), "SELECT 1")
+        statement.execute()
+        with connection.cursor() as cursor:
+            cursor.execute("DEALLOCATE %s" % statement.statement_name)
+        with retry_context, ExpectedException(RetryTransaction):
+            with savepoint():
+                statement.execute()
+        self.assertThat(statement.stats.errors, Equals(1))
+        self.assertThat(statement.execute().fetchall(), Equals([(1,)]))
+        self.assertThat(statement.stats.prepares, Equals(2))
+
+    def test__raw_returns_model_instances(self):
+        node = factory.make_Node()
+        statement = PreparedStatement(
+            make_statement_name(),
+            "SELECT * FROM maasserver_node WHERE system_id = $1", ["text"])
+        self.assertThat(
+            statement.raw(Node.objects, [node.system_id]), Equals([node]))
+
+    def test__stats_are_reported_and_reset(self):
+        statement = PreparedStatement(make_statement_name(), "SELECT 1")
+        statement.execute()
+        stats = get_prepared_statement_stats()
+        self.assertThat(stats[statement.name], ContainsDict({
+            "prepares": Equals(1), "calls": Equals(1), "errors": Equals(0),
+        }))
+        reset_prepared_statement_stats()
+        stats = get_prepared_statement_stats()
+        self.assertThat(stats[statement.name], ContainsDict({
+            "prepares": Equals(0), "calls": Equals(0),
+        }))
@@ -10,14 +10,22 @@ from unittest.mock import sentinel
 
 from crochet import wait_for
 from django.db import connection
+from maasserver import concurrency
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils import (
     orm,
     threads,
 )
+from maastesting.factory import factory
+from maastesting.matchers import MockCalledOnceWith
 from maastesting.testcase import MAASTestCase
+from provisioningserver.rpc.metrics import (
+    CURRENT_COMMAND,
+    RPCMetrics,
+)
 from provisioningserver.utils.twisted import (
     ThreadPool,
+    ThreadPoolScheduler,
     ThreadUnpool,
 )
 from testtools.matchers import (
@@ -30,6 +38,7 @@ from twisted.internet.defer import (
     DeferredSemaphore,
     inlineCallbacks,
 )
+from twisted.python import context
 
 
 wait_for_reactor = wait_for(30)  # 30 seconds.
@@ -68,6 +77,18 @@ class TestMakeFunctions(MAASTestCase):
         self.assertThat(pool.max, Equals(maxthreads))
         self.assertThat(pool.min, Equals(0))
 
+    def test__make_database_scheduler_schedules_pool(self):
+        pool = threads.make_database_pool()
+        scheduler = threads.make_database_scheduler(pool)
+        self.assertThat(scheduler, IsInstance(ThreadPoolScheduler))
+        self.assertThat(scheduler.pool, Is(pool))
+        self.assertThat(scheduler.capacity, Equals(pool.max))
+        self.assertThat(scheduler.reserved, Equals(
+            concurrency.database_reserved))
+        self.assertItemsEqual(
+            [queue.name for queue in concurrency.database_queues],
+            scheduler.queues)
+
     def test__make_database_unpool_creates_unpool(self):
         pool = threads.make_database_unpool()
         self.assertThat(pool, IsInstance(ThreadUnpool))
@@ -125,6 +146,71 @@ class TestDeferToDatabase(MAASServerTestCase):
         self.assertThat(result, Equals(
             (sentinel.called, sentinel.a, sentinel.b)))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__records_database_call_for_current_rpc_command(self):
+        metrics = RPCMetrics()
+        self.patch(threads, "rpc_metrics", metrics)
+        command = factory.make_name("command")
+        yield context.call(
+            {CURRENT_COMMAND: command}, threads.deferToDatabase,
+            lambda: None)
+        self.assertThat(
+            metrics.commands[command].database_wait.count, Equals(1))
+        self.assertThat(
+            metrics.commands[command].database_execution.count, Equals(1))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__records_nothing_outside_of_rpc_command(self):
+        metrics = RPCMetrics()
+        self.patch(threads, "rpc_metrics", metrics)
+        yield threads.deferToDatabase(lambda: None)
+        self.assertThat(metrics.commands, Equals({}))
+
+
+class TestGetDatabaseQueue(MAASTestCase):
+
+    def test__returns_None_by_default(self):
+        self.assertThat(threads.get_database_queue(), Is(None))
+
+    def test__returns_queue_from_context(self):
+        queue = factory.make_name("queue")
+        self.assertThat(context.call(
+            {threads.DATABASE_QUEUE: queue}, threads.get_database_queue),
+            Equals(queue))
+
+    def test__returns_queue_for_rpc_command(self):
+        self.assertThat(context.call(
+            {CURRENT_COMMAND: "GetBootConfig"}, threads.get_database_queue),
+            Equals("boot"))
+
+    def test__returns_rpc_queue_for_other_rpc_commands(self):
+        command = factory.make_name("command")
+        self.assertThat(context.call(
+            {CURRENT_COMMAND: command}, threads.get_database_queue),
+            Equals("rpc"))
+
+    def test__explicit_queue_wins_over_rpc_command(self):
+        self.assertThat(context.call(
+            {CURRENT_COMMAND: "GetBootConfig",
+             threads.DATABASE_QUEUE: "bulk"}, threads.get_database_queue),
+            Equals("bulk"))
+
+
+class TestDeferToDatabaseQueue(MAASTestCase):
+
+    def test__calls_deferToDatabase_in_queue_context(self):
+        queue = factory.make_name("queue")
+        deferToDatabase = self.patch(threads, "deferToDatabase")
+        deferToDatabase.side_effect = (
+            lambda func, *args, **kwargs: threads.get_database_queue())
+        result = threads.deferToDatabaseQueue(
+            queue, sentinel.func, sentinel.arg, kwarg=sentinel.kwarg)
+        self.assertThat(result, Equals(queue))
+        self.assertThat(deferToDatabase, MockCalledOnceWith(
+            sentinel.func, sentinel.arg, kwarg=sentinel.kwarg))
+
 
 class TestCallOutToDatabase(MAASServerTestCase):
 
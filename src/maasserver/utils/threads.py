@@ -12,22 +12,32 @@ pools to limit the number of connections each `regiond` process will consume.
 __all__ = [
     "callOutToDatabase",
     "deferToDatabase",
+    "deferToDatabaseQueue",
     "install_database_pool",
     "install_database_unpool",
     "install_default_pool",
     "make_database_pool",
+    "make_database_scheduler",
     "make_default_pool",
 ]
 
+from functools import wraps
+
+from maasserver import concurrency
 from maasserver.utils.orm import (
     ExclusivelyConnected,
     FullyConnected,
     TotallyDisconnected,
 )
+from provisioningserver.rpc.metrics import (
+    get_current_command,
+    rpc_metrics,
+)
 from provisioningserver.utils.twisted import (
     asynchronous,
     FOREVER,
     ThreadPool,
+    ThreadPoolScheduler,
     ThreadUnpool,
 )
 from twisted.internet import (
@@ -35,6 +45,7 @@ from twisted.internet import (
     threads,
 )
 from twisted.internet.defer import DeferredSemaphore
+from twisted.python import context
 
 
 max_threads_for_default_pool = 50
@@ -47,6 +58,10 @@ max_threads_for_default_pool = 50
 # PostgreSQL connection (default is 100 connections).
 max_threads_for_database_pool = 9
 
+# Key used to record the name of the database queue (see
+# `maasserver.concurrency.database_queues`) in the Twisted call context.
+DATABASE_QUEUE = "maas-database-queue"
+
 
 def make_default_pool(maxthreads=max_threads_for_default_pool):
     """Create a general thread-pool for non-database activity.
@@ -67,6 +82,17 @@ def make_database_pool(maxthreads=max_threads_for_database_pool):
     return ThreadPool(0, maxthreads, "database", FullyConnected)
 
 
+def make_database_scheduler(pool):
+    """Create a scheduler for database activity in `pool`.
+
+    This queues calls into `pool` by priority, according to the policy in
+    `maasserver.concurrency`. See `get_database_queue`.
+    """
+    return ThreadPoolScheduler(
+        pool, concurrency.database_queues, get_database_queue,
+        reserved=concurrency.database_reserved)
+
+
 def make_database_unpool(maxthreads=max_threads_for_database_pool):
     """Create a general non-thread-pool for database activity.
 
@@ -111,7 +137,8 @@ def install_database_pool(maxthreads=max_threads_for_database_pool):
     if getattr(reactor, "threadpoolForDatabase", None) is None:
         # Start with ZERO threads to avoid pulling in all of Django's
         # configuration straight away; it may not be ready yet.
-        reactor.threadpoolForDatabase = make_database_pool(maxthreads)
+        reactor.threadpoolForDatabase = make_database_scheduler(
+            make_database_pool(maxthreads))
         reactor.callInDatabase = reactor.threadpoolForDatabase.callInThread
         reactor.callWhenRunning(reactor.threadpoolForDatabase.start)
         reactor.addSystemEventTrigger(
@@ -142,13 +169,63 @@ def install_database_unpool(maxthreads=max_threads_for_database_pool):
             "been configured and installed.")
 
 
+def get_database_queue():
+    """Return the name of the database queue for the current call, or `None`.
+
+    This is the queue chosen with `deferToDatabaseQueue` or, when called on
+    behalf of an RPC command, the queue for that command.
+    """
+    queue = context.get(DATABASE_QUEUE)
+    if queue is None:
+        command = get_current_command()
+        if command is not None:
+            queue = concurrency.database_queues_for_rpc.get(command, "rpc")
+    return queue
+
+
 def deferToDatabase(func, *args, **kwargs):
-    """Call `func` in a thread where database activity is permitted."""
+    """Call `func` in a thread where database activity is permitted.
+
+    The call waits in the database queue returned by `get_database_queue`;
+    see `maasserver.concurrency.database_queues`.
+
+    When called on behalf of an RPC command, the time spent waiting for a
+    database thread and the time spent in `func` are recorded against that
+    command in `rpc_metrics`.
+    """
+    command = get_current_command()
+    if command is not None:
+        func = _timeDatabaseCall(command, func)
     return threads.deferToThreadPool(
         reactor, reactor.threadpoolForDatabase,
         func, *args, **kwargs)
 
 
+def deferToDatabaseQueue(queue, func, *args, **kwargs):
+    """Call `func` in a database thread, waiting in the named `queue`.
+
+    See `deferToDatabase` and `maasserver.concurrency.database_queues`.
+    """
+    return context.call(
+        {DATABASE_QUEUE: queue}, deferToDatabase, func, *args, **kwargs)
+
+
+def _timeDatabaseCall(command, func):
+    """Wrap `func` to record its queue wait and execution time."""
+    queued = rpc_metrics.clock()
+
+    @wraps(func)
+    def timed(*args, **kwargs):
+        started = rpc_metrics.clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            rpc_metrics.database_call(
+                command, started - queued, rpc_metrics.clock() - started)
+
+    return timed
+
+
 def callOutToDatabase(thing, func, *args, **kwargs):
     """Call out to the given `func` in a database thread, but return `thing`.
 
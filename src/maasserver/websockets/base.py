@@ -20,7 +20,7 @@ from django.utils.encoding import is_protected_type
 from maasserver import concurrency
 from maasserver.utils.forms import get_QueryDict
 from maasserver.utils.orm import transactional
-from maasserver.utils.threads import deferToDatabase
+from maasserver.utils.threads import deferToDatabaseQueue
 from provisioningserver.utils.twisted import (
     asynchronous,
     IAsynchronous,
@@ -331,7 +331,8 @@ class Handler(metaclass=HandlerMetaclass):
                     # This is going to block and hold a database connection so
                     # we limit its concurrency.
                     return concurrency.webapp.run(
-                        deferToDatabase, transactional(method), params)
+                        deferToDatabaseQueue, "ui", transactional(method),
+                        params)
         else:
             raise HandlerNoSuchMethodError(method_name)
 
@@ -38,9 +38,10 @@ class NodeResultHandler(TimestampedModelHandler):
         exclude = [
             "script_set",
             "script_name",
-            "output",
-            "stdout",
-            "stderr",
+            "output_blob",
+            "stdout_blob",
+            "stderr_blob",
+            "result_blob",
         ]
         list_fields = [
             "id",
@@ -180,7 +181,7 @@ class NodeResultHandler(TimestampedModelHandler):
                 "physical_blockdevice_id"])
         if "has_surfaced" in params:
             if params["has_surfaced"]:
-                queryset = queryset.exclude(result='')
+                queryset = queryset.exclude(result_blob=None)
         if "start" in params:
             queryset = queryset[params["start"]:]
         if "limit" in params:
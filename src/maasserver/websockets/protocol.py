@@ -27,7 +27,10 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from maasserver.eventloop import services
 from maasserver.utils.orm import transactional
-from maasserver.utils.threads import deferToDatabase
+from maasserver.utils.threads import (
+    deferToDatabase,
+    deferToDatabaseQueue,
+)
 from maasserver.websockets import handlers
 from maasserver.websockets.websockets import STATUSES
 from provisioningserver.logger import LegacyLogger
@@ -417,8 +420,8 @@ class WebSocketFactory(Factory):
     def onNotify(self, handler_class, channel, action, obj_id):
         for client in self.clients:
             handler = client.buildHandler(handler_class)
-            data = yield deferToDatabase(
-                self.processNotify, handler, channel, action, obj_id)
+            data = yield deferToDatabaseQueue(
+                "ui", self.processNotify, handler, channel, action, obj_id)
             if data is not None:
                 (name, client_action, data) = data
                 client.sendNotify(name, client_action, data)
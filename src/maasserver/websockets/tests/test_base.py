@@ -352,11 +352,12 @@ class TestHandler(MAASServerTestCase):
         # thread that originates from a specific threadpool.
         handler = self.make_nodes_handler()
         params = {"system_id": factory.make_name("system_id")}
-        self.patch(base, "deferToDatabase").return_value = sentinel.thing
+        self.patch(base, "deferToDatabaseQueue").return_value = sentinel.thing
         result = handler.execute("get", params).wait(30)
         self.assertThat(result, Is(sentinel.thing))
-        self.assertThat(base.deferToDatabase, MockCalledOnceWith(ANY, params))
-        [func, _] = base.deferToDatabase.call_args[0]
+        self.assertThat(
+            base.deferToDatabaseQueue, MockCalledOnceWith("ui", ANY, params))
+        [_, func, _] = base.deferToDatabaseQueue.call_args[0]
         self.assertThat(func.func, Equals(handler.get))
 
     def test_execute_calls_asynchronous_method_with_params(self):
@@ -17,18 +17,19 @@ __all__ = [
 import base64
 from datetime import datetime
 from functools import partial
+import hashlib
 import http.client
-from io import BytesIO
 from itertools import chain
 import json
 from operator import itemgetter
 import os
-import tarfile
-import time
 
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+)
 from django.shortcuts import get_object_or_404
 from formencode.validators import (
     Int,
@@ -61,7 +62,10 @@ from maasserver.models import (
     SSLKey,
 )
 from maasserver.models.event import Event
+from maasserver.models.eventtype import EventType
 from maasserver.models.tag import Tag
+from maasserver.models.timestampedmodel import now
+from maasserver.models.versionedtextfile import VersionedTextFile
 from maasserver.node_status import NODE_TESTING_RESET_READY_TRANSITIONS
 from maasserver.populate_tags import populate_tags_for_single_node
 from maasserver.preseed import (
@@ -94,6 +98,12 @@ from metadataserver.models import (
     Script,
     ScriptResult,
 )
+from metadataserver.script_archive import (
+    ARCHIVE_MTIME,
+    join_tar_members,
+    make_tar_member,
+    script_archive_cache,
+)
 from metadataserver.user_data import generate_user_data_for_poweroff
 from metadataserver.vendor_data import get_vendor_data
 from piston3.utils import rc
@@ -190,39 +200,79 @@ def make_list_response(items):
     return make_text_response('\n'.join(items))
 
 
+def etag_matches(header, etag):
+    """Does the If-None-Match `header` match `etag`?
+
+    Comparison is weak, and ignores the suffix that `GZipMiddleware` adds
+    to the ETags of compressed responses.
+    """
+    if header is None:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.endswith(';gzip"'):
+            candidate = candidate[:-6] + '"'
+        if candidate == etag:
+            return True
+    return False
+
+
+def make_cacheable_response(request, content, content_type):
+    """Create an `HttpResponse` of `content`, with an ETag.
+
+    If the client sent an If-None-Match header showing that it already has
+    `content`, the response is a 304 Not Modified instead.
+    """
+    etag = '"%s"' % hashlib.sha1(content).hexdigest()
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    return response
+
+
 def check_version(version):
     """Check that `version` is a supported metadata version."""
     if version not in ('latest', '2012-03-01'):
         raise UnknownMetadataVersion("Unknown metadata version: %s" % version)
 
 
-def add_event_to_node_event_log(
-        node, origin, action, description, result=None, created=None):
-    """Add an entry to the node's event log."""
+def get_node_event_type_name(node, result=None):
+    """Return the type of event to log for a status message from `node`."""
     if node.status == NODE_STATUS.COMMISSIONING:
         if result in ['SUCCESS', None]:
-            type_name = EVENT_TYPES.NODE_COMMISSIONING_EVENT
+            return EVENT_TYPES.NODE_COMMISSIONING_EVENT
         else:
-            type_name = EVENT_TYPES.NODE_COMMISSIONING_EVENT_FAILED
+            return EVENT_TYPES.NODE_COMMISSIONING_EVENT_FAILED
     elif node.status == NODE_STATUS.DEPLOYING:
         if result in ['SUCCESS', None]:
-            type_name = EVENT_TYPES.NODE_INSTALL_EVENT
+            return EVENT_TYPES.NODE_INSTALL_EVENT
         else:
-            type_name = EVENT_TYPES.NODE_INSTALL_EVENT_FAILED
+            return EVENT_TYPES.NODE_INSTALL_EVENT_FAILED
     elif node.status == NODE_STATUS.DEPLOYED and result in ['FAIL']:
-        type_name = EVENT_TYPES.NODE_POST_INSTALL_EVENT_FAILED
+        return EVENT_TYPES.NODE_POST_INSTALL_EVENT_FAILED
     elif node.status == NODE_STATUS.ENTERING_RESCUE_MODE:
         if result in ['SUCCESS', None]:
-            type_name = EVENT_TYPES.NODE_ENTERING_RESCUE_MODE_EVENT
+            return EVENT_TYPES.NODE_ENTERING_RESCUE_MODE_EVENT
         else:
-            type_name = EVENT_TYPES.NODE_ENTERING_RESCUE_MODE_EVENT_FAILED
+            return EVENT_TYPES.NODE_ENTERING_RESCUE_MODE_EVENT_FAILED
     elif node.node_type in [
             NODE_TYPE.RACK_CONTROLLER,
             NODE_TYPE.REGION_AND_RACK_CONTROLLER]:
-        type_name = EVENT_TYPES.REQUEST_CONTROLLER_REFRESH
+        return EVENT_TYPES.REQUEST_CONTROLLER_REFRESH
     else:
-        type_name = EVENT_TYPES.NODE_STATUS_EVENT
+        return EVENT_TYPES.NODE_STATUS_EVENT
 
+
+def add_event_to_node_event_log(
+        node, origin, action, description, result=None, created=None):
+    """Add an entry to the node's event log."""
+    type_name = get_node_event_type_name(node, result)
     event_details = EVENT_DETAILS[type_name]
     return Event.objects.register_event_and_event_type(
         node.system_id, type_name, type_level=event_details.level,
@@ -231,6 +281,30 @@ def add_event_to_node_event_log(
         event_description="'%s' %s" % (origin, description), created=created)
 
 
+def add_events_to_node_event_log(node, events):
+    """Add several entries to the node's event log, in a single query.
+
+    :param events: A list of ``(origin, action, description, result,
+        created)`` tuples, as for `add_event_to_node_event_log`.
+    """
+    event_types = {}
+    records = []
+    for origin, action, description, result, created in events:
+        type_name = get_node_event_type_name(node, result)
+        if type_name not in event_types:
+            event_details = EVENT_DETAILS[type_name]
+            event_types[type_name] = EventType.objects.register(
+                type_name, event_details.description, event_details.level)
+        if created is None:
+            created = now()
+        # bulk_create() does not call save(), so set both timestamps.
+        records.append(Event(
+            node=node, type=event_types[type_name], action=action,
+            description="'%s' %s" % (origin, description),
+            created=created, updated=created))
+    return Event.objects.bulk_create(records)
+
+
 def process_file(results, script_set, script_name, content, request):
     """Process a file sent to MAAS over the metadata service."""
 
@@ -860,16 +934,14 @@ class CurtinUserDataHandler(MetadataViewHandler):
             content_type='application/octet-stream')
 
 
-def add_file_to_tar(tar, path, content, mtime, permission=0o755):
-    """Add a script to a tar."""
-    assert isinstance(content, bytes), "Script content must be binary."
-    tarinfo = tarfile.TarInfo(name=path)
-    tarinfo.size = len(content)
-    tarinfo.mode = permission
-    # Modification time defaults to Epoch, which elicits annoying
-    # warnings when decompressing.
-    tarinfo.mtime = mtime
-    tar.addfile(tarinfo, BytesIO(content))
+def get_script_content(data):
+    """Return the content of a commissioning script, as bytes."""
+    try:
+        # Check if the script is a base64 encoded binary.
+        return base64.b64decode(data)
+    except:
+        # If it isn't encode the text as binary data.
+        return data.encode()
 
 
 class CommissioningScriptsHandler(MetadataViewHandler):
@@ -880,52 +952,61 @@ class CommissioningScriptsHandler(MetadataViewHandler):
 
     def _iter_builtin_scripts(self):
         for script in NODE_INFO_SCRIPTS.values():
-            yield script['name'], script['content']
+            yield (
+                script['name'], ("builtin", script['name']),
+                partial(itemgetter('content'), script))
 
     def _iter_user_scripts(self):
-        for script in Script.objects.filter(
-                script_type=SCRIPT_TYPE.COMMISSIONING):
-            try:
-                # Check if the script is a base64 encoded binary.
-                content = base64.b64decode(script.script.data)
-            except:
-                # If it isn't encode the text as binary data.
-                content = script.script.data.encode()
-            yield script.name, content
+        scripts = Script.objects.filter(
+            script_type=SCRIPT_TYPE.COMMISSIONING)
+        for name, script_id in scripts.values_list('name', 'script_id'):
+            # The content is only loaded when not already cached.
+            yield name, ("version", script_id), partial(
+                self._get_user_script_content, script_id)
+
+    def _get_user_script_content(self, script_id):
+        return get_script_content(
+            VersionedTextFile.objects.get(id=script_id).data)
 
     def _iter_scripts(self):
+        """Yield (name, source, get_content) tuples for all scripts."""
         return chain(
             self._iter_builtin_scripts(),
             self._iter_user_scripts(),
         )
 
     def _get_archive(self):
-        """Produce a tar archive of all commissionig scripts.
+        """Produce a tar archive of all commissioning scripts.
 
-        Each of the scripts will be in the `ARCHIVE_PREFIX` directory.
+        Each of the scripts will be in the `ARCHIVE_PREFIX` directory. The
+        archive is cached until a script is added, removed or changed.
         """
-        binary = BytesIO()
-        scripts = sorted(self._iter_scripts())
-        with tarfile.open(mode='w', fileobj=binary) as tarball:
-            add_script = partial(
-                add_file_to_tar, tarball, mtime=time.time())
-            for name, content in scripts:
-                add_script(os.path.join("commissioning.d", name), content)
-        return binary.getvalue()
+        scripts = sorted(self._iter_scripts(), key=itemgetter(0, 1))
+
+        def build():
+            return join_tar_members(
+                script_archive_cache.get_member(
+                    os.path.join("commissioning.d", name), source,
+                    get_content, ARCHIVE_MTIME)
+                for name, source, get_content in scripts)
+
+        key = tuple((name, source) for name, source, _ in scripts)
+        return script_archive_cache.get(("commissioning.d", key), build)
 
     def read(self, request, version, mac=None):
         check_version(version)
-        return HttpResponse(
-            self._get_archive(), content_type='application/tar')
+        return make_cacheable_response(
+            request, self._get_archive(), 'application/tar')
 
 
 class MAASScriptsHandler(OperationsHandler):
 
-    def _add_script_set_to_tar(self, script_set, tar, prefix, mtime):
+    def _add_script_set_to_archive(self, script_set, members, prefix):
         if script_set is None:
             return []
         meta_data = []
-        for script_result in script_set:
+        script_results = script_set.scriptresult_set.select_related('script')
+        for script_result in script_results:
             # Don't rerun Scripts which have already run.
             if script_result.status not in (
                     SCRIPT_STATUS.PENDING, SCRIPT_STATUS.RUNNING,
@@ -938,7 +1019,10 @@ class MAASScriptsHandler(OperationsHandler):
                 # data from the source.
                 if script_result.name in NODE_INFO_SCRIPTS:
                     script = NODE_INFO_SCRIPTS[script_result.name]
-                    add_file_to_tar(tar, path, script['content'], mtime)
+                    members.append(script_archive_cache.get_member(
+                        path, ("builtin", script_result.name),
+                        partial(itemgetter('content'), script),
+                        ARCHIVE_MTIME))
                     meta_data.append({
                         'name': script_result.name,
                         'path': path,
@@ -956,13 +1040,16 @@ class MAASScriptsHandler(OperationsHandler):
                     script_result.delete()
                     continue
             else:
-                content = script_result.script.script.data.encode()
-                add_file_to_tar(tar, path, content, mtime)
+                # The script's text is only loaded when not already cached.
+                members.append(script_archive_cache.get_member(
+                    path, ("version", script_result.script.script_id),
+                    partial(self._get_script_content, script_result.script),
+                    ARCHIVE_MTIME))
                 meta_data.append({
                     'name': script_result.name,
                     'path': path,
                     'script_result_id': script_result.id,
-                    'script_version_id': script_result.script.script.id,
+                    'script_version_id': script_result.script.script_id,
                     'timeout_seconds': script_result.script.timeout.seconds,
                     'parallel': script_result.script.parallel,
                     'hardware_type': script_result.script.hardware_type,
@@ -971,6 +1058,9 @@ class MAASScriptsHandler(OperationsHandler):
                 })
         return meta_data
 
+    def _get_script_content(self, script):
+        return script.script.data.encode()
+
     def read(self, request, version, mac=None):
         """Returns a tar containing user and status selected scripts.
 
@@ -980,35 +1070,37 @@ class MAASScriptsHandler(OperationsHandler):
         so auto-decompress is suggested. If the node returns a script status
         and calls this request again only the scripts which havn't been run
         will be returned.
+
+        The response has an ETag; if the node sends it back in an
+        If-None-Match header and the scripts haven't changed, the response
+        is a 304 Not Modified.
         """
         node = get_queried_node(request)
-        binary = BytesIO()
-        mtime = time.time()
+        members = []
         tar_meta_data = {}
-        # Responses are currently gzip compressed using
-        # django.middleware.gzip.GZipMiddleware.
-        with tarfile.open(mode='w', fileobj=binary) as tar:
-            # Commissioning scripts should only be run during commissioning.
-            if node.status == NODE_STATUS.COMMISSIONING:
-                meta_data = self._add_script_set_to_tar(
-                    node.current_commissioning_script_set, tar,
-                    'commissioning', mtime)
-                if meta_data != []:
-                    tar_meta_data['commissioning_scripts'] = sorted(
-                        meta_data, key=itemgetter('name', 'script_result_id'))
-
-            # Always send testing scripts.
-            meta_data = self._add_script_set_to_tar(
-                node.current_testing_script_set, tar, 'testing', mtime)
+        # Commissioning scripts should only be run during commissioning.
+        if node.status == NODE_STATUS.COMMISSIONING:
+            meta_data = self._add_script_set_to_archive(
+                node.current_commissioning_script_set, members,
+                'commissioning')
             if meta_data != []:
-                tar_meta_data['testing_scripts'] = sorted(
+                tar_meta_data['commissioning_scripts'] = sorted(
                     meta_data, key=itemgetter('name', 'script_result_id'))
 
-            add_file_to_tar(
-                tar, 'index.json', json.dumps({'1.0': tar_meta_data}).encode(),
-                mtime, 0o644)
-        return HttpResponse(
-            binary.getvalue(), content_type='application/x-tar')
+        # Always send testing scripts.
+        meta_data = self._add_script_set_to_archive(
+            node.current_testing_script_set, members, 'testing')
+        if meta_data != []:
+            tar_meta_data['testing_scripts'] = sorted(
+                meta_data, key=itemgetter('name', 'script_result_id'))
+
+        members.append(make_tar_member(
+            'index.json', json.dumps({'1.0': tar_meta_data}).encode(),
+            ARCHIVE_MTIME, 0o644))
+        # Responses are currently gzip compressed using
+        # django.middleware.gzip.GZipMiddleware.
+        return make_cacheable_response(
+            request, join_tar_members(members), 'application/x-tar')
 
 
 class EnlistMetaDataHandler(OperationsHandler):
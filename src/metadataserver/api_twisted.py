@@ -8,8 +8,12 @@ import bz2
 from collections import defaultdict
 from datetime import datetime
 import json
+import time
 
-from django.db import DatabaseError
+from django.db import (
+    DatabaseError,
+    DataError,
+)
 from maasserver.api.utils import extract_oauth_key_from_auth_header
 from maasserver.enum import (
     NODE_STATUS,
@@ -24,10 +28,15 @@ from maasserver.utils.orm import (
     transactional,
     TransactionManagementError,
 )
-from maasserver.utils.threads import deferToDatabase
+from maasserver.utils.prepared import PreparedStatement
+from maasserver.utils.threads import (
+    deferToDatabase,
+    deferToDatabaseQueue,
+)
 from metadataserver import logger
 from metadataserver.api import (
     add_event_to_node_event_log,
+    add_events_to_node_event_log,
     process_file,
 )
 from metadataserver.enum import SCRIPT_STATUS
@@ -35,10 +44,21 @@ from metadataserver.models import (
     NodeKey,
     ScriptSet,
 )
+from metadataserver.nodekey_cache import nodekey_cache
+from metadataserver.status_queue import (
+    get_status_spool_path,
+    status_queue_metrics,
+    StatusSpool,
+)
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils.twisted import deferred
 from twisted.application.internet import TimerService
 from twisted.internet import reactor
+from twisted.internet.defer import (
+    DeferredList,
+    inlineCallbacks,
+)
+from twisted.python.failure import Failure
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
 
@@ -181,27 +201,124 @@ class StatusHandlerResource(Resource):
         return NOT_DONE_YET
 
 
+# Prepared server-side because it's used to authorise every batch of status
+# messages. See `maasserver.utils.prepared`.
+find_nodes_by_key = PreparedStatement(
+    "find_nodes_by_key", """\
+    SELECT node.*, nodekey.key AS nodekey_key
+    FROM metadataserver_nodekey AS nodekey
+    INNER JOIN maasserver_node AS node
+        ON node.id = nodekey.node_id
+    WHERE nodekey.key = ANY($1)
+    """, ["text[]"])
+
+
 class StatusWorkerService(TimerService, object):
-    """Service to update nodes from recieved status messages."""
+    """Service to update nodes from recieved status messages.
+
+    Messages that must be processed immediately are, before the node gets a
+    response. The rest are queued, and written to the database in batches:
+    as soon as `batch_size` messages are waiting, or every `check_interval`
+    seconds otherwise. Queued messages are spooled to disk so that they
+    survive a restart; see `StatusSpool`.
+
+    The node for each key is found via `nodekey_cache`, which this service
+    keeps up to date when `postgresListener` is given.
+    """
 
-    check_interval = 60  # Every second.
+    check_interval = 0.5  # Every half a second.
 
-    def __init__(self, dbtasks, clock=reactor):
+    # Flush the queue as soon as this many messages are waiting.
+    batch_size = 500
+
+    def __init__(
+            self, dbtasks, clock=reactor, spool_path=None,
+            postgresListener=None):
         # Call self._tryUpdateNodes() every self.check_interval.
         super(StatusWorkerService, self).__init__(
             self.check_interval, self._tryUpdateNodes)
         self.dbtasks = dbtasks
+        self.listener = postgresListener
         self.clock = clock
+        self.spool = StatusSpool(
+            get_status_spool_path() if spool_path is None else spool_path)
         self.queue = defaultdict(list)
+        self.received = []
+        self.flushing = None
+
+    def startService(self):
+        try:
+            self.spool.open()
+        except OSError as error:
+            log.err(
+                None, "Status messages will not be spooled: %s" % error)
+        else:
+            self._recoverSpool()
+        if self.listener is not None:
+            self.listener.register("sys_nodekey", self._nodeKeyDeleted)
+        super(StatusWorkerService, self).startService()
+
+    @inlineCallbacks
+    def stopService(self):
+        if self.listener is not None:
+            self.listener.unregister("sys_nodekey", self._nodeKeyDeleted)
+        yield super(StatusWorkerService, self).stopService()
+        # Write out anything that's queued. If that fails the messages remain
+        # in the spool and are recovered when the region next starts.
+        if self.flushing is not None:
+            yield self.flushing
+        yield self._tryUpdateNodes()
+        self.spool.close()
+
+    def _nodeKeyDeleted(self, channel, key):
+        """Called when the `sys_nodekey` message is received."""
+        nodekey_cache.invalidate(key)
+
+    def _recoverSpool(self):
+        """Queue messages spooled by processes that have since stopped."""
+        for segment, entries in self.spool.recover():
+            for authorization, message in entries:
+                self._queueMessageLater(authorization, message)
+            # The messages are now in this process's spool.
+            segment.discard()
+            status_queue_metrics.messages_recovered(len(entries))
+
+    def _queueMessageLater(self, authorization, message):
+        self.spool.append(authorization, message)
+        message['timestamp'] = datetime.utcfromtimestamp(message['timestamp'])
+        self.queue[authorization].append(message)
+        self.received.append(status_queue_metrics.clock())
+        status_queue_metrics.messages_queued()
+        if len(self.received) >= self.batch_size and self.flushing is None:
+            self._tryUpdateNodes()
 
     def _tryUpdateNodes(self):
-        if len(self.queue) != 0:
+        if len(self.queue) != 0 and self.flushing is None:
             queue, self.queue = self.queue, defaultdict(list)
-            d = deferToDatabase(self._preProcessQueue, queue)
+            received, self.received = self.received, []
+            segment = self.spool.swap()
+            status_queue_metrics.batch_started(len(received))
+            d = deferToDatabaseQueue("bulk", self._preProcessQueue, queue)
             d.addCallback(self._processMessagesLater)
-            d.addErrback(log.err, "Failed to process node status messages.")
+            d.addBoth(self._updatedNodes, segment, received)
+            self.flushing = d
             return d
 
+    def _updatedNodes(self, result, segment, received):
+        self.flushing = None
+        if isinstance(result, Failure):
+            status_queue_metrics.batch_finished(received, failed=True)
+            log.err(result, "Failed to process node status messages.")
+            # Leave the messages in the spool to be recovered later.
+            if segment is not None:
+                segment.release()
+        else:
+            status_queue_metrics.batch_finished(received)
+            if segment is not None:
+                segment.discard()
+        if len(self.received) >= self.batch_size:
+            self._tryUpdateNodes()
+
     @transactional
     def _preProcessQueue(self, queue):
         """Check authorizations.
@@ -209,20 +326,34 @@ class StatusWorkerService(TimerService, object):
         Return a list of (node, messages) tuples, where each node is found
         from its authorisation.
         """
-        keys = NodeKey.objects.filter(
-            key__in=list(queue.keys())).select_related('node')
-        return [
-            (key.node, queue[key.key])
-            for key in keys
-        ]
+        node_ids, generation = nodekey_cache.get_many(queue.keys())
+        tasks = []
+        if len(node_ids) != 0:
+            nodes = Node.objects.in_bulk(set(node_ids.values()))
+            tasks.extend(
+                (nodes[node_id], queue[key])
+                for key, node_id in node_ids.items()
+                # The node may have been deleted, along with its key.
+                if node_id in nodes)
+        unknown = [key for key in queue if key not in node_ids]
+        if len(unknown) != 0:
+            found = {}
+            for node in find_nodes_by_key.raw(Node.objects, [unknown]):
+                found[node.nodekey_key] = node.id
+                tasks.append((node, queue[node.nodekey_key]))
+            nodekey_cache.store_many(found, generation)
+        return tasks
 
     def _processMessagesLater(self, tasks):
-        # Move all messages on the queue off onto the database tasks queue.
-        # We're not going to wait for them to be processed because we can't /
-        # don't apply back-pressure to those systems that are producing these
-        # messages anyway.
-        for node, messages in tasks:
-            self.dbtasks.addTask(self._processMessages, node, messages)
+        # Move all messages on the queue off onto the database tasks queue,
+        # and wait for them to be written before discarding them from the
+        # spool. Malformed messages are logged and dropped by
+        # `_processMessages`; any other failure fails the whole batch, which
+        # is then kept in the spool.
+        return DeferredList([
+            self.dbtasks.deferTask(self._processMessages, node, messages)
+            for node, messages in tasks
+        ], fireOnOneErrback=True, consumeErrors=True)
 
     def _processMessages(self, node, messages):
         # Push the messages into the database, recording them for this node.
@@ -234,29 +365,45 @@ class StatusWorkerService(TimerService, object):
                 "outside of a transaction.")
         else:
             # Here we're in a database thread, with a database connection.
-            # We only save the last_ping off the last message in the
-            # list of messages. This removes the number of database saves
-            # required.
-            for idx, message in enumerate(messages):
+            # Queued messages only ever need recording in the node's event
+            # log (see `queueMessage`) so they're inserted all at once. We
+            # only save the last_ping off the last message in the list.
+            #
+            # Malformed messages will never be recorded so they're logged and
+            # dropped. Any other failure, from the database say, propagates
+            # so that the batch is left in the spool and retried later.
+            try:
+                exists = self._processQueuedMessages(node, messages)
+            except (KeyError, TypeError, ValueError, DataError):
+                log.err(
+                    None,
+                    "Failed to process messages "
+                    "for node: %s" % node.hostname)
+                return
+            if exists:
+                # The messages have been recorded by now; retrying the batch
+                # would record them a second time, so only log this failure.
                 try:
-                    exists = self._processMessage(node, message)
-                    if not exists:
-                        # Node has been deleted no reason to continue saving
-                        # the events for this node.
-                        break
-                except:
+                    self._updateLastPing(node, messages[-1])
+                except Exception:
                     log.err(
                         None,
-                        "Failed to process message "
+                        "Failed to update last ping "
                         "for node: %s" % node.hostname)
-                if idx == len(messages) - 1:
-                    try:
-                        self._updateLastPing(node, message)
-                    except:
-                        log.err(
-                            None,
-                            "Failed to update last ping "
-                            "for node: %s" % node.hostname)
+
+    @transactional
+    def _processQueuedMessages(self, node, messages):
+        # Validate that the node still exists since this is a new transaction.
+        try:
+            node = Node.objects.get(id=node.id)
+        except Node.DoesNotExist:
+            return False
+        add_events_to_node_event_log(node, [
+            (message['origin'], message['name'], message['description'],
+             message.get('result', None), message['timestamp'])
+            for message in messages
+        ])
+        return True
 
     @transactional
     def _updateLastPing(self, node, message):
@@ -430,15 +577,11 @@ class StatusWorkerService(TimerService, object):
     @deferred
     def queueMessage(self, authorization, message):
         """Queue message for processing."""
-        # Ensure a timestamp exists in the message and convert it to a
-        # datetime object. This is used to update the `last_ping` and the
-        # time for the event message.
-        timestamp = message.get('timestamp', None)
-        if timestamp is not None:
-            message['timestamp'] = datetime.utcfromtimestamp(
-                message['timestamp'])
-        else:
-            message['timestamp'] = datetime.utcnow()
+        # Ensure a timestamp exists in the message. It's converted to a
+        # datetime object when processed, and is used to update the
+        # `last_ping` and the time for the event message.
+        if message.get('timestamp', None) is None:
+            message['timestamp'] = time.time()
 
         # Determine if this messsage needs to be processed immediately.
         is_starting_event = (
@@ -451,10 +594,12 @@ class StatusWorkerService(TimerService, object):
             message['event_type'] == 'finish')
         has_files = len(message.get('files', [])) > 0
         if is_starting_event or is_final_event or has_files:
+            message['timestamp'] = datetime.utcfromtimestamp(
+                message['timestamp'])
             d = deferToDatabase(
                 self._processMessageNow, authorization, message)
             d.addErrback(
                 log.err, "Failed to process status message instantly.")
             return d
         else:
-            self.queue[authorization].append(message)
+            self._queueMessageLater(authorization, message)
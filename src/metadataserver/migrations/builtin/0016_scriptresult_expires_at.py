@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.db import (
+    migrations,
+    models,
+)
+from provisioningserver.refresh.node_info_scripts import NODE_INFO_SCRIPTS
+
+# Copied from metadataserver.enum.
+SCRIPT_STATUS_RUNNING = 1
+
+
+def get_timeout(script_result):
+    for param in script_result.parameters.values():
+        if param.get('type') == 'runtime' and 'value' in param:
+            return timedelta(seconds=int(param['value']))
+    if script_result.script is not None:
+        name = script_result.script.name
+    else:
+        name = script_result.script_name
+    if 'timeout' in NODE_INFO_SCRIPTS.get(name, {}):
+        return NODE_INFO_SCRIPTS[name]['timeout']
+    elif (script_result.script is not None and
+            script_result.script.timeout != timedelta(0)):
+        return script_result.script.timeout
+    else:
+        return None
+
+
+def set_expires_at(apps, schema_editor):
+    ScriptResult = apps.get_model('metadataserver', 'ScriptResult')
+    # Scripts which are running when MAAS is upgraded need a deadline too,
+    # otherwise the status monitor will never time them out.
+    script_results = ScriptResult.objects.filter(
+        status=SCRIPT_STATUS_RUNNING, started__isnull=False)
+    for script_result in script_results.select_related('script'):
+        timeout = get_timeout(script_result)
+        if timeout is not None:
+            script_result.expires_at = script_result.started + timeout
+            script_result.save(update_fields=['expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metadataserver', '0015_migrate_storage_tests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scriptresult',
+            name='expires_at',
+            field=models.DateTimeField(editable=False, null=True, blank=True, db_index=True),
+        ),
+        migrations.RunPython(set_expires_at),
+    ]
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import zlib
+
+from django.db import (
+    migrations,
+    models,
+)
+import django.db.models.deletion
+import maasserver.models.cleansave
+import metadataserver.fields
+
+# Copied from metadataserver.models.scriptoutput.
+COMPRESSION_LEVEL = 9
+
+OUTPUT_NAMES = ('output', 'stdout', 'stderr', 'result')
+
+
+def move_output_to_script_output(apps, schema_editor):
+    ScriptOutput = apps.get_model('metadataserver', 'ScriptOutput')
+    ScriptResult = apps.get_model('metadataserver', 'ScriptResult')
+    # Each distinct output is stored once; remember what's been stored so
+    # far by its digest.
+    blob_ids = {}
+    script_results = ScriptResult.objects.only('id', *OUTPUT_NAMES)
+    for script_result in script_results.iterator():
+        for name in OUTPUT_NAMES:
+            data = getattr(script_result, name)
+            if data is None or len(data) == 0:
+                continue
+            digest = hashlib.sha256(data).hexdigest()
+            if digest not in blob_ids:
+                blob_ids[digest] = ScriptOutput.objects.create(
+                    digest=digest, size=len(data),
+                    data=metadataserver.fields.Bin(
+                        zlib.compress(data, COMPRESSION_LEVEL))).id
+            setattr(script_result, '%s_blob_id' % name, blob_ids[digest])
+        script_result.save(update_fields=[
+            '%s_blob' % name for name in OUTPUT_NAMES])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metadataserver', '0016_scriptresult_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScriptOutput',
+            fields=[
+                ('id', models.AutoField(primary_key=True, verbose_name='ID', auto_created=True, serialize=False)),
+                ('digest', models.CharField(max_length=64, unique=True, editable=False)),
+                ('size', models.BigIntegerField(editable=False)),
+                ('data', metadataserver.fields.BinaryField(editable=False)),
+            ],
+            bases=(maasserver.models.cleansave.CleanSave, models.Model, object),
+        ),
+        migrations.AddField(
+            model_name='scriptresult',
+            name='output_blob',
+            field=models.ForeignKey(to='metadataserver.ScriptOutput', blank=True, null=True, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+'),
+        ),
+        migrations.AddField(
+            model_name='scriptresult',
+            name='stdout_blob',
+            field=models.ForeignKey(to='metadataserver.ScriptOutput', blank=True, null=True, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+'),
+        ),
+        migrations.AddField(
+            model_name='scriptresult',
+            name='stderr_blob',
+            field=models.ForeignKey(to='metadataserver.ScriptOutput', blank=True, null=True, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+'),
+        ),
+        migrations.AddField(
+            model_name='scriptresult',
+            name='result_blob',
+            field=models.ForeignKey(to='metadataserver.ScriptOutput', blank=True, null=True, editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+'),
+        ),
+        migrations.RunPython(move_output_to_script_output),
+        migrations.RemoveField(
+            model_name='scriptresult',
+            name='output',
+        ),
+        migrations.RemoveField(
+            model_name='scriptresult',
+            name='stdout',
+        ),
+        migrations.RemoveField(
+            model_name='scriptresult',
+            name='stderr',
+        ),
+        migrations.RemoveField(
+            model_name='scriptresult',
+            name='result',
+        ),
+    ]
@@ -8,6 +8,7 @@ __all__ = [
     'NodeKey',
     'NodeUserData',
     'Script',
+    'ScriptOutput',
     'ScriptResult',
     'ScriptSet',
 ]
@@ -15,5 +16,6 @@ __all__ = [
 from metadataserver.models.nodekey import NodeKey
 from metadataserver.models.nodeuserdata import NodeUserData
 from metadataserver.models.script import Script
+from metadataserver.models.scriptoutput import ScriptOutput
 from metadataserver.models.scriptresult import ScriptResult
 from metadataserver.models.scriptset import ScriptSet
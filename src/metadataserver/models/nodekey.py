@@ -19,6 +19,7 @@ from maasserver.models.user import create_auth_token
 from maasserver.utils.orm import get_one
 from metadataserver import DefaultMeta
 from metadataserver.nodeinituser import get_node_init_user
+from metadataserver.nodekey_cache import nodekey_cache
 from piston3.models import (
     KEY_SIZE,
     Token,
@@ -44,6 +45,8 @@ class NodeKeyManager(Manager):
     2.  get_node_for_key(key) takes the token.key (which will be in the
         http Authorization header of a metadata request as "oauth_token")
         and looks up the associated Node.
+
+    The node ID for each key is cached in `nodekey_cache`.
     """
 
     def _create_token(self, node):
@@ -95,6 +98,8 @@ class NodeKeyManager(Manager):
             # sensible as eating live wasps. It means that deleting the token
             # will delete `nodekey` implicitly.
             nodekey.token.delete()
+            # Other processes are told by a trigger on the nodekey table.
+            nodekey_cache.invalidate(nodekey.key)
 
     def get_node_for_key(self, key):
         """Find the Node that `key` was created for.
@@ -108,7 +113,18 @@ class NodeKeyManager(Manager):
         :raise NodeKey.DoesNotExist: if `key` is not associated with any
             node.
         """
-        return self.get(key=key).node
+        node_id, generation = nodekey_cache.get(key)
+        if node_id is not None:
+            node_model = self.model._meta.get_field("node").related_model
+            try:
+                return node_model.objects.get(id=node_id)
+            except node_model.DoesNotExist:
+                # Deleting the node deleted its key too.
+                nodekey_cache.invalidate(key)
+                raise self.model.DoesNotExist()
+        node = self.select_related("node").get(key=key).node
+        nodekey_cache.store(key, node.id, generation)
+        return node
 
 
 class NodeKey(CleanSave, Model):
@@ -0,0 +1,146 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+""":class:`ScriptOutput` model.
+
+The output of a script, e.g. `lshw` or `lldp`, is often the same for many
+nodes, or for the same node each time it is commissioned. It is stored once,
+compressed, keyed by the SHA-256 of its content, and referenced from each
+`ScriptResult` that produced it. It is decompressed only when read.
+"""
+
+__all__ = [
+    'ScriptOutput',
+    ]
+
+import hashlib
+from textwrap import dedent
+import zlib
+
+from django.db import (
+    connection,
+    IntegrityError,
+    transaction,
+)
+from django.db.models import (
+    BigIntegerField,
+    CharField,
+    Manager,
+    Model,
+)
+from maasserver.models.cleansave import CleanSave
+from maasserver.utils.orm import make_serialization_failure
+from metadataserver import DefaultMeta
+from metadataserver.fields import (
+    Bin,
+    BinaryField,
+)
+
+# Output compresses well, and is read far less often than it's written, so
+# favour size over speed.
+COMPRESSION_LEVEL = 9
+
+
+def get_digest(data):
+    """Return the SHA-256 of `data`, as a hex string."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ScriptOutputManager(Manager):
+    """Manager for `ScriptOutput`."""
+
+    def get_or_create_for_data(self, data):
+        """Return the `ScriptOutput` holding `data`, creating it if needed.
+
+        An existing output is locked ``FOR KEY SHARE`` until the end of the
+        transaction so that `delete_unused` cannot delete it before the
+        `ScriptResult` referencing it has been committed.
+
+        :type data: bytes
+        """
+        digest = get_digest(data)
+        output = self._get_for_key_share(digest)
+        if output is not None:
+            return output
+        output = self.model(
+            digest=digest, size=len(data),
+            data=Bin(zlib.compress(data, COMPRESSION_LEVEL)))
+        try:
+            with transaction.atomic():
+                output.save()
+        except IntegrityError:
+            # Another transaction stored the same output first.
+            output = self._get_for_key_share(digest)
+            if output is None:
+                # It was committed after this transaction's snapshot was
+                # taken; raise so that @transactional will retry.
+                raise make_serialization_failure()
+            return output
+        else:
+            return output
+
+    def _get_for_key_share(self, digest):
+        """Return the output with `digest`, locked ``FOR KEY SHARE``.
+
+        This blocks `delete_unused` from deleting the row but does not block
+        other transactions from reusing it.
+        """
+        outputs = self.raw(
+            "SELECT * FROM metadataserver_scriptoutput "
+            "WHERE digest = %s FOR KEY SHARE", [digest])
+        for output in outputs:
+            return output
+        return None
+
+    def delete_unused(self):
+        """Delete output no longer referenced by any `ScriptResult`.
+
+        Output locked by `get_or_create_for_data` is about to be referenced
+        so it's skipped; it'll be deleted on a later run if it's still
+        unused by then.
+
+        :return: The number of outputs deleted.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(dedent("""\
+                DELETE FROM metadataserver_scriptoutput
+                WHERE id IN (
+                    SELECT output.id
+                    FROM metadataserver_scriptoutput AS output
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM metadataserver_scriptresult AS result
+                        WHERE result.output_blob_id = output.id
+                           OR result.stdout_blob_id = output.id
+                           OR result.stderr_blob_id = output.id
+                           OR result.result_blob_id = output.id)
+                    FOR UPDATE SKIP LOCKED)
+                """))
+            return cursor.rowcount
+
+
+class ScriptOutput(CleanSave, Model):
+    """The compressed output of a script.
+
+    :ivar digest: The SHA-256 of the uncompressed output.
+    :ivar size: The size of the uncompressed output, in bytes.
+    :ivar data: The output, compressed with zlib.
+    """
+
+    # Force model into the metadataserver namespace.
+    class Meta(DefaultMeta):
+        pass
+
+    objects = ScriptOutputManager()
+
+    digest = CharField(max_length=64, unique=True, editable=False)
+
+    size = BigIntegerField(editable=False)
+
+    data = BinaryField(editable=False)
+
+    def __str__(self):
+        return self.digest
+
+    def get_data(self):
+        """Return the uncompressed output."""
+        return Bin(zlib.decompress(self.data))
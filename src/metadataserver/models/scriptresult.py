@@ -17,6 +17,7 @@ from django.db.models import (
     DateTimeField,
     ForeignKey,
     IntegerField,
+    PROTECT,
     Q,
     SET_NULL,
 )
@@ -36,15 +37,40 @@ from metadataserver.enum import (
     SCRIPT_STATUS,
     SCRIPT_STATUS_CHOICES,
 )
-from metadataserver.fields import (
-    Bin,
-    BinaryField,
-)
+from metadataserver.fields import Bin
 from metadataserver.models.script import Script
+from metadataserver.models.scriptoutput import ScriptOutput
 from metadataserver.models.scriptset import ScriptSet
 from provisioningserver.events import EVENT_TYPES
 import yaml
 
+# The outputs of a script, each stored as a `ScriptOutput`.
+OUTPUT_NAMES = ('output', 'stdout', 'stderr', 'result')
+
+
+def output_property(name):
+    """Return a property for the `name` output of a `ScriptResult`.
+
+    The output is read from its `ScriptOutput`, and decompressed, the first
+    time it is used. Setting it stores it in a `ScriptOutput` when the
+    `ScriptResult` is next saved.
+    """
+    blob_name = "%s_blob" % name
+
+    def get_output(self):
+        outputs = self.__dict__.setdefault("_outputs", {})
+        if name not in outputs:
+            blob = getattr(self, blob_name)
+            outputs[name] = Bin(b'') if blob is None else blob.get_data()
+        return outputs[name]
+
+    def set_output(self, value):
+        self.__dict__.setdefault("_outputs", {})[name] = Bin(value)
+        self.__dict__.setdefault("_outputs_changed", set()).add(name)
+
+    return property(get_output, set_output, doc=(
+        "The %s of the script, as bytes." % name))
+
 
 class ScriptResult(CleanSave, TimestampedModel):
 
@@ -82,13 +108,32 @@ class ScriptResult(CleanSave, TimestampedModel):
     script_name = CharField(
         max_length=255, unique=False, editable=False, null=True)
 
-    output = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    # Outputs are shared between results with the same content. They're
+    # read and written through the `output`, `stdout`, `stderr`, and `result`
+    # properties; no output is stored as NULL.
+    output_blob = ForeignKey(
+        ScriptOutput, editable=False, blank=True, null=True,
+        on_delete=PROTECT, related_name='+')
+
+    stdout_blob = ForeignKey(
+        ScriptOutput, editable=False, blank=True, null=True,
+        on_delete=PROTECT, related_name='+')
 
-    stdout = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    stderr_blob = ForeignKey(
+        ScriptOutput, editable=False, blank=True, null=True,
+        on_delete=PROTECT, related_name='+')
 
-    stderr = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    result_blob = ForeignKey(
+        ScriptOutput, editable=False, blank=True, null=True,
+        on_delete=PROTECT, related_name='+')
 
-    result = BinaryField(max_length=1024 * 1024, blank=True, default=b'')
+    output = output_property('output')
+
+    stdout = output_property('stdout')
+
+    stderr = output_property('stderr')
+
+    result = output_property('result')
 
     # When the script started to run
     started = DateTimeField(editable=False, null=True, blank=True)
@@ -96,6 +141,12 @@ class ScriptResult(CleanSave, TimestampedModel):
     # When the script finished running
     ended = DateTimeField(editable=False, null=True, blank=True)
 
+    # When the script should have finished running by, if it has a timeout.
+    # Set when the script starts running so the status monitor can find
+    # scripts which have run past their timeout with a single query.
+    expires_at = DateTimeField(
+        editable=False, null=True, blank=True, db_index=True)
+
     @property
     def name(self):
         if self.script is not None:
@@ -131,6 +182,24 @@ class ScriptResult(CleanSave, TimestampedModel):
         else:
             return ''
 
+    @property
+    def timeout(self):
+        """The time this script is allowed to run for, or None if unlimited.
+
+        A runtime parameter takes precedence over the timeout of the builtin
+        commissioning script or `Script`.
+        """
+        for param in self.parameters.values():
+            if param.get('type') == 'runtime' and 'value' in param:
+                return timedelta(seconds=int(param['value']))
+        if 'timeout' in NODE_INFO_SCRIPTS.get(self.name, {}):
+            return NODE_INFO_SCRIPTS[self.name]['timeout']
+        elif (self.script is not None and
+                self.script.timeout != timedelta(0)):
+            return self.script.timeout
+        else:
+            return None
+
     @property
     def estimated_runtime(self):
         # If there is a runtime the script has completed, no need to calculate
@@ -354,6 +423,14 @@ class ScriptResult(CleanSave, TimestampedModel):
                 if 'update_fields' in kwargs:
                     kwargs['update_fields'].append('started')
 
+        if (self.expires_at is None and self.started is not None and
+                self.status == SCRIPT_STATUS.RUNNING):
+            timeout = self.timeout
+            if timeout is not None:
+                self.expires_at = self.started + timeout
+                if 'update_fields' in kwargs:
+                    kwargs['update_fields'].append('expires_at')
+
         if self.id is None and self.physical_blockdevice is None:
             for param in self.parameters.values():
                 if ('value' in param and isinstance(param['value'], dict) and
@@ -364,4 +441,20 @@ class ScriptResult(CleanSave, TimestampedModel):
                     param['value'][
                         'physical_blockdevice_id'] = physical_blockdevice.id
 
-        return super().save(*args, **kwargs)
+        changed = self.__dict__.get("_outputs_changed", set())
+        for name in OUTPUT_NAMES:
+            if name in changed:
+                data = self._outputs[name]
+                if len(data) == 0:
+                    blob = None
+                else:
+                    blob = ScriptOutput.objects.get_or_create_for_data(data)
+                setattr(self, "%s_blob" % name, blob)
+        if 'update_fields' in kwargs:
+            kwargs['update_fields'] = [
+                "%s_blob" % field if field in OUTPUT_NAMES else field
+                for field in kwargs['update_fields']
+            ]
+
+        super().save(*args, **kwargs)
+        changed.clear()
@@ -7,7 +7,11 @@ __all__ = []
 
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import reload_object
+from maastesting.djangotestcase import count_queries
 from metadataserver.models import NodeKey
+from metadataserver.models import nodekey as nodekey_module
+from metadataserver.nodekey_cache import NodeKeyCache
 from testtools.matchers import HasLength
 
 
@@ -61,3 +65,44 @@ class TestNodeKeyManager(MAASServerTestCase):
             key,
             NodeKey.objects.get_token_for_node(
                 NodeKey.objects.get_node_for_key(key)).key)
+
+
+class TestNodeKeyManagerCache(MAASServerTestCase):
+    """Test NodeKeyManager's use of `nodekey_cache`."""
+
+    def setUp(self):
+        super(TestNodeKeyManagerCache, self).setUp()
+        self.cache = self.patch(
+            nodekey_module, "nodekey_cache", NodeKeyCache())
+
+    def test_get_node_for_key_caches_node_id(self):
+        node = factory.make_Node()
+        key = NodeKey.objects.get_token_for_node(node).key
+        NodeKey.objects.get_node_for_key(key)
+        self.assertEqual(node.id, self.cache.get(key)[0])
+
+    def test_get_node_for_key_uses_cached_node_id(self):
+        node = factory.make_Node()
+        key = NodeKey.objects.get_token_for_node(node).key
+        NodeKey.objects.get_node_for_key(key)
+        queries, found = count_queries(
+            NodeKey.objects.get_node_for_key, key)
+        self.assertEqual((1, node), (queries, found))
+        self.assertEqual(1, self.cache.hits)
+
+    def test_get_node_for_key_raises_DoesNotExist_if_node_deleted(self):
+        node = factory.make_Node()
+        key = NodeKey.objects.get_token_for_node(node).key
+        NodeKey.objects.get_node_for_key(key)
+        node.delete()
+        self.assertRaises(
+            NodeKey.DoesNotExist, NodeKey.objects.get_node_for_key, key)
+        self.assertEqual(None, self.cache.get(key)[0])
+
+    def test_clear_token_for_node_invalidates_key(self):
+        node = factory.make_Node()
+        key = NodeKey.objects.get_token_for_node(node).key
+        NodeKey.objects.get_node_for_key(key)
+        NodeKey.objects.clear_token_for_node(reload_object(node))
+        self.assertRaises(
+            NodeKey.DoesNotExist, NodeKey.objects.get_node_for_key, key)
@@ -0,0 +1,116 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for :class:`ScriptOutput` model and manager."""
+
+__all__ = []
+
+import hashlib
+import threading
+
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import (
+    MAASServerTestCase,
+    MAASTransactionServerTestCase,
+)
+from maasserver.utils.orm import (
+    reload_object,
+    transactional,
+)
+from metadataserver.enum import SCRIPT_STATUS
+from metadataserver.models import ScriptOutput
+
+
+class TestScriptOutputManager(MAASServerTestCase):
+    """Test ScriptOutputManager."""
+
+    def test_get_or_create_for_data_stores_compressed_data(self):
+        data = b"output\n" * 1000
+        output = ScriptOutput.objects.get_or_create_for_data(data)
+        self.assertEqual(hashlib.sha256(data).hexdigest(), output.digest)
+        self.assertEqual(len(data), output.size)
+        self.assertLess(len(output.data), len(data))
+        self.assertEqual(
+            data, ScriptOutput.objects.get(id=output.id).get_data())
+
+    def test_get_or_create_for_data_returns_existing_output(self):
+        data = factory.make_bytes()
+        output = ScriptOutput.objects.get_or_create_for_data(data)
+        self.assertEqual(
+            output, ScriptOutput.objects.get_or_create_for_data(data))
+        self.assertEqual(1, ScriptOutput.objects.filter(
+            digest=output.digest).count())
+
+    def test_delete_unused_deletes_only_unreferenced_output(self):
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PASSED)
+        unused = ScriptOutput.objects.get_or_create_for_data(
+            factory.make_bytes())
+        self.assertEqual(1, ScriptOutput.objects.delete_unused())
+        self.assertFalse(ScriptOutput.objects.filter(id=unused.id).exists())
+        self.assertItemsEqual(
+            [
+                script_result.output_blob_id,
+                script_result.stdout_blob_id,
+                script_result.stderr_blob_id,
+                script_result.result_blob_id,
+            ],
+            ScriptOutput.objects.values_list("id", flat=True))
+
+    def test_delete_unused_deletes_output_of_deleted_results(self):
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PASSED)
+        script_result.delete()
+        self.assertEqual(4, ScriptOutput.objects.delete_unused())
+        self.assertFalse(ScriptOutput.objects.exists())
+
+
+class TestScriptOutputManagerConcurrency(MAASTransactionServerTestCase):
+    """Test ScriptOutputManager with concurrent transactions."""
+
+    def test_delete_unused_skips_output_being_reused(self):
+        data = factory.make_bytes()
+        output = transactional(
+            ScriptOutput.objects.get_or_create_for_data)(data)
+        script_result = transactional(factory.make_ScriptResult)(
+            status=SCRIPT_STATUS.PASSED)
+        reused = threading.Event()
+        deleted = threading.Event()
+        results = []
+
+        @transactional
+        def reuse_output():
+            # Reuse the unreferenced output, then reference it only once
+            # delete_unused has run in another transaction.
+            blob = ScriptOutput.objects.get_or_create_for_data(data)
+            reused.set()
+            deleted.wait(10)
+            script_result.stdout_blob = blob
+            script_result.save()
+
+        @transactional
+        def delete_unused():
+            reused.wait(10)
+            try:
+                results.append(ScriptOutput.objects.delete_unused())
+            finally:
+                deleted.set()
+
+        threads = [
+            threading.Thread(target=reuse_output),
+            threading.Thread(target=delete_unused),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # The reused output was skipped; only the result's old stdout, which
+        # was still referenced then, remains to be deleted.
+        self.assertEqual([0], results)
+        self.assertTrue(transactional(
+            ScriptOutput.objects.filter(id=output.id).exists)())
+        self.assertEqual(
+            1, transactional(ScriptOutput.objects.delete_unused)())
+        self.assertEqual(output.id, transactional(
+            lambda: reload_object(script_result).stdout_blob_id)())
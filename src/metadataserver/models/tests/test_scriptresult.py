@@ -22,6 +22,7 @@ from maasserver.utils.orm import reload_object
 from maastesting.matchers import (
     DocTestMatches,
     MockCalledOnceWith,
+    MockNotCalled,
 )
 from metadataserver.enum import (
     RESULT_TYPE,
@@ -30,6 +31,7 @@ from metadataserver.enum import (
 )
 from metadataserver.models import scriptresult as scriptresult_module
 from provisioningserver.events import EVENT_TYPES
+from provisioningserver.refresh.node_info_scripts import NODE_INFO_SCRIPTS
 import yaml
 
 
@@ -389,6 +391,89 @@ class TestScriptResult(MAASServerTestCase):
         self.assertIsNotNone(script_result.ended)
         self.assertEquals(script_result.started, script_result.ended)
 
+    def test_save_stores_expires_at_when_running(self):
+        script = factory.make_Script(timeout=timedelta(minutes=2))
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PENDING, script=script)
+        script_result.status = SCRIPT_STATUS.RUNNING
+        script_result.save(update_fields=['status'])
+        script_result = reload_object(script_result)
+        self.assertEquals(
+            script_result.started + timedelta(minutes=2),
+            script_result.expires_at)
+
+    def test_save_does_not_store_expires_at_without_timeout(self):
+        script = factory.make_Script(timeout=timedelta(0))
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.RUNNING, script=script)
+        self.assertIsNone(reload_object(script_result).expires_at)
+
+    def test_timeout_uses_runtime_parameter(self):
+        script = factory.make_Script(timeout=timedelta(minutes=2))
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PENDING, script=script, parameters={
+                'runtime': {'type': 'runtime', 'value': 60 * 60}})
+        self.assertEquals(timedelta(hours=1), script_result.timeout)
+
+    def test_timeout_uses_builtin_script_timeout(self):
+        script_name = random.choice([
+            name for name, script in NODE_INFO_SCRIPTS.items()
+            if 'timeout' in script])
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PENDING, script_name=script_name)
+        self.assertEquals(
+            NODE_INFO_SCRIPTS[script_name]['timeout'], script_result.timeout)
+
+    def test_timeout_uses_script_timeout(self):
+        script = factory.make_Script(timeout=timedelta(minutes=2))
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PENDING, script=script)
+        self.assertEquals(timedelta(minutes=2), script_result.timeout)
+
+    def test_save_stores_output_in_script_output(self):
+        stdout = factory.make_bytes()
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PASSED, stdout=stdout)
+        script_result = reload_object(script_result)
+        self.assertEquals(stdout, script_result.stdout_blob.get_data())
+        self.assertEquals(stdout, script_result.stdout)
+
+    def test_save_shares_script_output_between_results(self):
+        stdout = factory.make_bytes()
+        script_results = [
+            factory.make_ScriptResult(
+                status=SCRIPT_STATUS.PASSED, stdout=stdout)
+            for _ in range(2)
+        ]
+        self.assertEquals(
+            script_results[0].stdout_blob_id,
+            script_results[1].stdout_blob_id)
+
+    def test_save_stores_no_script_output_when_empty(self):
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PASSED, stdout=b'')
+        script_result = reload_object(script_result)
+        self.assertIsNone(script_result.stdout_blob)
+        self.assertEquals(b'', script_result.stdout)
+
+    def test_save_maps_output_names_in_update_fields(self):
+        script_result = factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PASSED)
+        stderr = factory.make_bytes()
+        script_result.stderr = stderr
+        script_result.save(update_fields=['stderr'])
+        self.assertEquals(stderr, reload_object(script_result).stderr)
+
+    def test_output_is_not_read_until_used(self):
+        script_result = reload_object(factory.make_ScriptResult(
+            status=SCRIPT_STATUS.PASSED))
+        get_data = self.patch(scriptresult_module.ScriptOutput, "get_data")
+        get_data.return_value = b"output"
+        self.assertThat(get_data, MockNotCalled())
+        self.assertEquals(b"output", script_result.output)
+        self.assertEquals(b"output", script_result.output)
+        self.assertThat(get_data, MockCalledOnceWith())
+
     def test_save_sets_physical_blockdevice_from_parameters(self):
         node = factory.make_Machine()
         script_set = factory.make_ScriptSet(node=node)
@@ -0,0 +1,137 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""A cache of node keys, mapping each to the ID of its node.
+
+Every request to the metadata service, and every batch of status messages,
+is authorised by looking up the node that its OAuth key belongs to. A key
+never moves from one node to another, so the mapping can be kept in memory;
+it only has to be forgotten when the key is deleted, e.g. when the node is
+released or deleted. A database trigger notifies the `sys_nodekey` channel
+when that happens; see `StatusWorkerService`, which listens for it.
+
+Entries are also forgotten after `max_age` seconds, so that a key is not
+honoured for long should a notification be missed.
+"""
+
+__all__ = [
+    "nodekey_cache",
+    "NodeKeyCache",
+]
+
+from collections import OrderedDict
+import os
+from threading import Lock
+import time
+
+
+class NodeKeyCache:
+    """A bounded, thread-safe cache mapping node keys to node IDs.
+
+    Invalidating a key bumps the generation, so a lookup that started before
+    a key was deleted is not cached.
+
+    :ivar hits: The number of keys found in the cache.
+    :ivar misses: The number of keys not found in the cache.
+    :ivar invalidations: The number of keys invalidated.
+    """
+
+    def __init__(self, size=8192, max_age=60, clock=time.monotonic):
+        super(NodeKeyCache, self).__init__()
+        self.size = size
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self):
+        """Forget everything, and reset the statistics."""
+        with self.lock:
+            self.entries = OrderedDict()
+            self.generation = 0
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def _lookup(self, key):
+        """Return the node ID cached for `key`, or `None`.
+
+        Must be called with the lock held.
+        """
+        try:
+            stamp, node_id = self.entries.pop(key)
+        except KeyError:
+            return None
+        if self.clock() - stamp > self.max_age:
+            return None
+        self.entries[key] = stamp, node_id
+        return node_id
+
+    def get_many(self, keys):
+        """Look up `keys` in the cache.
+
+        :return: A ``(found, generation)`` tuple. `found` maps each key that
+            was cached to its node ID. Pass `generation` to `store_many` when
+            caching the rest.
+        """
+        found = {}
+        with self.lock:
+            for key in keys:
+                node_id = self._lookup(key)
+                if node_id is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[key] = node_id
+            return found, self.generation
+
+    def get(self, key):
+        """Return the node ID cached for `key`, or `None`.
+
+        :return: A ``(node_id, generation)`` tuple.
+        """
+        found, generation = self.get_many((key,))
+        return found.get(key), generation
+
+    def store_many(self, node_ids, generation):
+        """Cache `node_ids`, a mapping of keys to node IDs.
+
+        Nothing is cached if a key has been invalidated since `generation`
+        was obtained.
+        """
+        with self.lock:
+            if generation == self.generation:
+                stamp = self.clock()
+                for key, node_id in node_ids.items():
+                    self.entries.pop(key, None)
+                    self.entries[key] = stamp, node_id
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+
+    def store(self, key, node_id, generation):
+        """Cache `node_id` for `key`; see `store_many`."""
+        self.store_many({key: node_id}, generation)
+
+    def invalidate(self, key):
+        """Forget `key`."""
+        with self.lock:
+            self.generation += 1
+            self.invalidations += 1
+            self.entries.pop(key, None)
+
+    def asdict(self):
+        """Return statistics as a JSON-compatible dictionary."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+# The cache for this process.
+nodekey_cache = NodeKeyCache()
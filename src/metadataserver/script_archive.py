@@ -0,0 +1,115 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Cached tar archives of scripts for the metadata API.
+
+Nodes download the scripts they're to run as tar archives. When many nodes
+commission at once they all want much the same scripts, so each script's
+tar member -- its header and padded content -- is built once and cached.
+An archive is then just its members concatenated.
+
+Members are keyed by their path in the archive and by where the content came
+from: a builtin script, or a `VersionedTextFile`. Versioned text files are
+immutable, so a script that's changed has a new key, and stale members age
+out of the cache.
+"""
+
+__all__ = [
+    "ARCHIVE_MTIME",
+    "join_tar_members",
+    "make_tar_member",
+    "script_archive_cache",
+    "ScriptArchiveCache",
+]
+
+from collections import OrderedDict
+import tarfile
+from threading import Lock
+
+
+NUL = b"\0"
+
+# The modification time of every member, 2017-01-01T00:00:00Z. Archives are
+# served with ETags so they must not vary from one request or region process
+# to the next. The epoch would elicit warnings when extracting.
+ARCHIVE_MTIME = 1483228800
+
+
+def make_tar_member(path, content, mtime, permission=0o755):
+    """Return the tar header and padded `content` for a file at `path`."""
+    assert isinstance(content, bytes), "Script content must be binary."
+    tarinfo = tarfile.TarInfo(name=path)
+    tarinfo.size = len(content)
+    tarinfo.mode = permission
+    # Modification time defaults to Epoch, which elicits annoying
+    # warnings when decompressing.
+    tarinfo.mtime = mtime
+    header = tarinfo.tobuf(tarfile.DEFAULT_FORMAT, "utf-8", "surrogateescape")
+    padding = NUL * (-len(content) % tarfile.BLOCKSIZE)
+    return header + content + padding
+
+
+def join_tar_members(members):
+    """Return a tar archive of `members`, from `make_tar_member`."""
+    # An archive ends with two empty blocks, and is padded to a whole record,
+    # just like `tarfile` does.
+    archive = b"".join(members) + NUL * (2 * tarfile.BLOCKSIZE)
+    return archive + NUL * (-len(archive) % tarfile.RECORDSIZE)
+
+
+class ScriptArchiveCache:
+    """A bounded, thread-safe, least-recently-used cache.
+
+    :ivar hits: The number of lookups satisfied from the cache.
+    :ivar misses: The number of lookups that built a new value.
+    """
+
+    def __init__(self, size=4096):
+        super(ScriptArchiveCache, self).__init__()
+        self.size = size
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, key, build):
+        """Return the value cached for `key`, calling `build` if needed.
+
+        `build` is called without holding the lock, so two threads can build
+        the same value at once; the values must therefore be equivalent.
+        """
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries[key] = value
+                return value
+        value = build()
+        with self.lock:
+            self.entries[key] = value
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return value
+
+    def get_member(self, path, source, get_content, mtime):
+        """Return a tar member for `path`, building it if needed.
+
+        :param source: A hashable that identifies the content, e.g. the ID of
+            a `VersionedTextFile`.
+        :param get_content: A callable that returns the content, as bytes.
+        :param mtime: The modification time to record when building.
+        """
+        return self.get(
+            ("member", path, source),
+            lambda: make_tar_member(path, get_content(), mtime))
+
+
+# The cache for this process.
+script_archive_cache = ScriptArchiveCache()
@@ -0,0 +1,37 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Delete script output no longer referenced by any script result."""
+
+__all__ = [
+    'ScriptOutputCleanupService',
+    ]
+
+from maasserver.duties import cleanup_script_output
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from metadataserver.models import ScriptOutput
+from provisioningserver.utils.twisted import synchronous
+from twisted.application.internet import TimerService
+
+
+class ScriptOutputCleanupService(TimerService, object):
+    """Service to periodically delete unused script output.
+
+    Script output is shared between script results, so it is not deleted
+    along with them. This will run immediately when it's started, then once
+    again every 6 hours, though the interval can be overridden by passing it
+    to the constructor.
+    """
+
+    def __init__(self, interval=(6 * 60 * 60)):
+
+        @synchronous
+        @transactional
+        def cleanup():
+            # Only one region process needs to do this.
+            return cleanup_script_output.perform(
+                ScriptOutput.objects.delete_unused)
+
+        super(ScriptOutputCleanupService, self).__init__(
+            interval, deferToDatabase, cleanup)
@@ -0,0 +1,256 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Durability and metrics for the queue of node status messages.
+
+Status messages that aren't processed immediately are queued by
+`StatusWorkerService` and written to the database in batches. So that they
+are not lost if the region restarts before a batch is written, each message
+is also appended to a `StatusSpool`. Its metrics are recorded in the
+process-wide `status_queue_metrics`.
+"""
+
+__all__ = [
+    "get_status_spool_path",
+    "status_queue_metrics",
+    "StatusQueueMetrics",
+    "StatusSpool",
+]
+
+import fcntl
+from glob import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.path import get_tentative_data_path
+from provisioningserver.rpc.metrics import (
+    Histogram,
+    TIME_BUCKETS,
+)
+
+
+log = LegacyLogger()
+
+# Bucket upper bounds for the number of messages in a batch.
+BATCH_BUCKETS = (1, 10, 50, 100, 250, 500, 1000)
+
+
+def get_status_spool_path():
+    """Return the directory in which status messages are spooled."""
+    return get_tentative_data_path("/var/lib/maas/status-spool")
+
+
+class StatusSpoolSegment:
+    """A file of spooled status messages, locked by this process."""
+
+    def __init__(self, path, fd):
+        super(StatusSpoolSegment, self).__init__()
+        self.path = path
+        self.fd = fd
+
+    def release(self):
+        """Unlock this segment, leaving it to be recovered later."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def discard(self):
+        """Delete this segment; its messages are safely in the database."""
+        if self.fd is not None:
+            os.unlink(self.path)
+            self.release()
+
+
+class StatusSpool:
+    """An append-only spool of queued status messages.
+
+    Messages are appended to the current segment, one JSON document per
+    line. When the queue is flushed the segment is swapped for a new one, and
+    the old one is discarded once its messages are in the database.
+
+    Each process holds an exclusive lock on the segments it's using. Any
+    segment that isn't locked was left behind by a process that has stopped,
+    and its messages are returned by `recover`. Delivery is therefore at
+    least once: a message can be processed twice if the region stops after a
+    batch is committed but before its segment is discarded.
+
+    Messages are written without ``fsync``, so they survive the region being
+    restarted, but not the machine crashing.
+    """
+
+    suffix = ".spool"
+
+    def __init__(self, path):
+        super(StatusSpool, self).__init__()
+        self.path = path
+        self.segment = None
+
+    @property
+    def opened(self):
+        return self.segment is not None
+
+    def open(self):
+        """Open the spool, creating its directory if needed."""
+        os.makedirs(self.path, exist_ok=True)
+        self.segment = self._newSegment()
+
+    def close(self):
+        """Close the spool.
+
+        The current segment is kept, if it's not empty, to be recovered when
+        the region next starts.
+        """
+        if self.segment is not None:
+            segment, self.segment = self.segment, None
+            if os.fstat(segment.fd).st_size == 0:
+                segment.discard()
+            else:
+                segment.release()
+
+    def append(self, authorization, message):
+        """Append `message` to the spool.
+
+        This does nothing if the spool is not open.
+        """
+        if self.segment is not None:
+            entry = json.dumps([authorization, message]) + "\n"
+            os.write(self.segment.fd, entry.encode("utf-8"))
+
+    def swap(self):
+        """Start a new segment, returning the old one.
+
+        The caller must `discard` or `release` the returned segment. Returns
+        `None` if the spool is not open.
+        """
+        if self.segment is None:
+            return None
+        else:
+            segment, self.segment = self.segment, self._newSegment()
+            return segment
+
+    def recover(self):
+        """Claim and read segments left behind by stopped processes.
+
+        :return: A list of ``(segment, entries)`` tuples, where `entries` is
+            a list of ``(authorization, message)`` tuples. The caller must
+            `discard` or `release` each segment.
+        """
+        recovered = []
+        for path in sorted(glob(os.path.join(self.path, "*" + self.suffix))):
+            if self.segment is not None and path == self.segment.path:
+                continue
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue  # Another process recovered it first.
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue  # In use by a running process.
+            if not os.path.exists(path):
+                os.close(fd)
+                continue  # Recovered and discarded while we waited.
+            segment = StatusSpoolSegment(path, fd)
+            recovered.append((segment, list(self._readSegment(fd, path))))
+        return recovered
+
+    def _newSegment(self):
+        fd, path = tempfile.mkstemp(suffix=self.suffix, dir=self.path)
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return StatusSpoolSegment(path, fd)
+
+    def _readSegment(self, fd, path):
+        with open(fd, "r", encoding="utf-8", closefd=False) as infile:
+            for line in infile:
+                try:
+                    authorization, message = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if the region stopped
+                    # while it was being written.
+                    log.msg("Ignoring corrupt entry in %s." % path)
+                else:
+                    yield authorization, message
+
+
+class StatusQueueMetrics:
+    """Metrics for the queue of status messages.
+
+    :ivar queued: The number of messages waiting to be processed.
+    :ivar processing: The number of messages being processed.
+    :ivar processed: The number of messages processed.
+    :ivar failed: The number of messages in batches that failed.
+    :ivar recovered: The number of messages recovered from the spool.
+    :ivar latency: Seconds from receiving each message to committing it.
+    :ivar batch_size: Messages per batch.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        super(StatusQueueMetrics, self).__init__()
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.queued = 0
+            self.processing = 0
+            self.processed = 0
+            self.failed = 0
+            self.recovered = 0
+            self.latency = Histogram(TIME_BUCKETS)
+            self.batch_size = Histogram(BATCH_BUCKETS)
+            self.started = time.time()
+
+    def messages_queued(self, count=1):
+        with self.lock:
+            self.queued += count
+
+    def messages_recovered(self, count):
+        with self.lock:
+            self.recovered += count
+
+    def batch_started(self, count):
+        with self.lock:
+            self.queued -= count
+            self.processing += count
+            self.batch_size.observe(count)
+
+    def batch_finished(self, received, failed=False):
+        """Record that a batch has been processed.
+
+        :param received: The times, from `clock`, at which each message in
+            the batch was received.
+        """
+        finished = self.clock()
+        with self.lock:
+            self.processing -= len(received)
+            if failed:
+                self.failed += len(received)
+            else:
+                self.processed += len(received)
+                for when in received:
+                    self.latency.observe(finished - when)
+
+    def asdict(self):
+        """Return all metrics as a JSON-compatible dictionary."""
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "since": self.started,
+                "queued": self.queued,
+                "processing": self.processing,
+                "processed": self.processed,
+                "failed": self.failed,
+                "recovered": self.recovered,
+                "latency": self.latency.asdict(),
+                "batch_size": self.batch_size.asdict(),
+            }
+
+
+# The metrics for this process.
+status_queue_metrics = StatusQueueMetrics()
@@ -73,7 +73,9 @@ from maastesting.utils import sample_binary_data
 from metadataserver import api
 from metadataserver.api import (
     add_event_to_node_event_log,
+    add_events_to_node_event_log,
     check_version,
+    etag_matches,
     get_node_for_mac,
     get_node_for_request,
     get_queried_node,
@@ -96,6 +98,10 @@ from metadataserver.models import (
     NodeUserData,
 )
 from metadataserver.nodeinituser import get_node_init_user
+from metadataserver.script_archive import (
+    ARCHIVE_MTIME,
+    ScriptArchiveCache,
+)
 from netaddr import IPNetwork
 from provisioningserver.events import (
     EVENT_DETAILS,
@@ -247,6 +253,43 @@ class TestHelpers(MAASServerTestCase):
         self.assertEqual(
             EVENT_TYPES.REQUEST_CONTROLLER_REFRESH, event.type.name)
 
+    def test_etag_matches(self):
+        etag = '"%s"' % factory.make_name("etag")
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches('"other", W/%s' % etag, etag))
+        self.assertTrue(etag_matches(etag[:-1] + ';gzip"', etag))
+        self.assertTrue(etag_matches('*', etag))
+
+    def test_add_events_to_node_event_log(self):
+        node = factory.make_Node(status=NODE_STATUS.COMMISSIONING)
+        events = [
+            (factory.make_name('origin'), factory.make_name('action'),
+             factory.make_name('description'), result, created)
+            for result, created in (
+                ('SUCCESS', datetime(2017, 1, 1)),
+                ('FAILURE', datetime(2017, 1, 2)),
+                (None, None),
+            )
+        ]
+        add_events_to_node_event_log(node, events)
+        saved = Event.objects.filter(node=node).order_by('id')
+        self.assertEqual(
+            [action for _, action, _, _, _ in events],
+            [event.action for event in saved])
+        self.assertEqual(
+            [EVENT_TYPES.NODE_COMMISSIONING_EVENT,
+             EVENT_TYPES.NODE_COMMISSIONING_EVENT_FAILED,
+             EVENT_TYPES.NODE_COMMISSIONING_EVENT],
+            [event.type.name for event in saved])
+        self.assertEqual(
+            [datetime(2017, 1, 1), datetime(2017, 1, 2)],
+            [event.created for event in saved[:2]])
+        self.assertIsNotNone(saved[2].created)
+        for event in saved:
+            self.assertEqual(event.created, event.updated)
+
     def test_process_file_creates_new_entry_for_output(self):
         results = {}
         script_result = factory.make_ScriptResult(status=SCRIPT_STATUS.RUNNING)
@@ -1113,16 +1156,18 @@ class TestInstallingAPI(MAASServerTestCase):
 
 class TestMAASScripts(MAASServerTestCase):
 
-    def extract_and_validate_file(
-            self, tar, path, start_time, end_time, content):
+    def setUp(self):
+        super(TestMAASScripts, self).setUp()
+        self.cache = self.patch(
+            api, "script_archive_cache", ScriptArchiveCache())
+
+    def extract_and_validate_file(self, tar, path, content):
         member = tar.getmember(path)
-        self.assertGreaterEqual(member.mtime, start_time)
-        self.assertLessEqual(member.mtime, end_time)
+        self.assertEqual(ARCHIVE_MTIME, member.mtime)
         self.assertEqual(0o755, member.mode)
         self.assertEqual(content, tar.extractfile(path).read())
 
     def test__returns_all_scripts_when_commissioning(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.COMMISSIONING, with_empty_script_sets=True)
 
@@ -1134,7 +1179,6 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # The + 1 is for the index.json file.
         self.assertEquals(
             node.current_commissioning_script_set.scriptresult_set.count() +
@@ -1167,16 +1211,14 @@ class TestMAASScripts(MAASServerTestCase):
                 md_item['hardware_type'] = script_result.script.hardware_type
                 md_item['parameters'] = script_result.parameters
                 md_item['packages'] = script_result.script.packages
-            self.extract_and_validate_file(
-                tar, path, start_time, end_time, content)
+            self.extract_and_validate_file(tar, path, content)
             commissioning_meta_data.append(md_item)
 
         testing_meta_data = []
         for script_result in node.current_testing_script_set:
             path = os.path.join('testing', script_result.name)
             self.extract_and_validate_file(
-                tar, path, start_time, end_time,
-                script_result.script.script.data.encode())
+                tar, path, script_result.script.script.data.encode())
             testing_meta_data.append({
                 'name': script_result.name,
                 'path': path,
@@ -1202,7 +1244,6 @@ class TestMAASScripts(MAASServerTestCase):
             }}, meta_data)
 
     def test__returns_testing_scripts_when_testing(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.TESTING, with_empty_script_sets=True)
 
@@ -1214,7 +1255,6 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # The + 1 is for the index.json file.
         self.assertEquals(
             node.current_testing_script_set.scriptresult_set.count() + 1,
@@ -1224,8 +1264,7 @@ class TestMAASScripts(MAASServerTestCase):
         for script_result in node.current_testing_script_set:
             path = os.path.join('testing', script_result.name)
             self.extract_and_validate_file(
-                tar, path, start_time, end_time,
-                script_result.script.script.data.encode())
+                tar, path, script_result.script.script.data.encode())
             testing_meta_data.append({
                 'name': script_result.name,
                 'path': path,
@@ -1273,7 +1312,6 @@ class TestMAASScripts(MAASServerTestCase):
         self.assertDictEqual({'1.0': {}}, meta_data)
 
     def test__only_returns_scripts_which_havnt_been_run(self):
-        start_time = floor(time.time())
         node = factory.make_Node(
             status=NODE_STATUS.COMMISSIONING, with_empty_script_sets=True)
 
@@ -1294,7 +1332,6 @@ class TestMAASScripts(MAASServerTestCase):
             % (response.status_code, response.content))
         self.assertEquals('application/x-tar', response['Content-Type'])
         tar = tarfile.open(mode='r', fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
         # We have two scripts which have been run but the tar always includes
         # an index.json file so subtract one.
         self.assertEquals(
@@ -1330,8 +1367,7 @@ class TestMAASScripts(MAASServerTestCase):
                 md_item['hardware_type'] = script_result.script.hardware_type
                 md_item['parameters'] = script_result.parameters
                 md_item['packages'] = script_result.script.packages
-            self.extract_and_validate_file(
-                tar, path, start_time, end_time, content)
+            self.extract_and_validate_file(tar, path, content)
             commissioning_meta_data.append(md_item)
 
         testing_meta_data = []
@@ -1351,8 +1387,7 @@ class TestMAASScripts(MAASServerTestCase):
                 'packages': script_result.script.packages,
             }
             content = script_result.script.script.data.encode()
-            self.extract_and_validate_file(
-                tar, path, start_time, end_time, content)
+            self.extract_and_validate_file(tar, path, content)
             testing_meta_data.append(md_item)
 
         meta_data = json.loads(
@@ -1367,15 +1402,79 @@ class TestMAASScripts(MAASServerTestCase):
                         'name', 'script_result_id')),
             }}, meta_data)
 
+    def test__returns_not_modified_when_etag_matches(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.COMMISSIONING, with_empty_script_sets=True)
+        client = make_node_client(node=node)
+        url = reverse('maas-scripts', args=['latest'])
+        response = client.get(url)
+        self.assertEqual(http.client.OK, response.status_code)
+        # The archive does not depend on when it was made.
+        later = time.time() + 60
+        self.patch(time, "time").return_value = later
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(http.client.NOT_MODIFIED, response.status_code)
+
+    def test__returns_new_content_once_scripts_have_run(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.TESTING, with_empty_script_sets=True)
+        client = make_node_client(node=node)
+        url = reverse('maas-scripts', args=['latest'])
+        etag = client.get(url)['ETag']
+        script_result = (
+            node.current_testing_script_set.scriptresult_set.first())
+        script_result.status = SCRIPT_STATUS.PASSED
+        script_result.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test__caches_script_members(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.TESTING, with_empty_script_sets=True)
+        client = make_node_client(node=node)
+        url = reverse('maas-scripts', args=['latest'])
+        client.get(url)
+        misses = self.cache.misses
+        self.assertEqual(0, self.cache.hits)
+        self.assertNotEqual(0, misses)
+        client.get(url)
+        self.assertEqual(
+            (misses, misses), (self.cache.hits, self.cache.misses))
+
 
 class TestCommissioningAPI(MAASServerTestCase):
 
     def setUp(self):
         super(TestCommissioningAPI, self).setUp()
         self.useFixture(SignalsDisabled("power"))
+        self.cache = self.patch(
+            api, "script_archive_cache", ScriptArchiveCache())
+
+    def test_commissioning_scripts_has_etag(self):
+        client = make_node_client()
+        url = reverse('commissioning-scripts', args=['latest'])
+        response = client.get(url)
+        self.assertEqual(http.client.OK, response.status_code)
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(http.client.NOT_MODIFIED, response.status_code)
+
+    def test_commissioning_scripts_cached_until_script_changes(self):
+        script = factory.make_Script(script_type=SCRIPT_TYPE.COMMISSIONING)
+        client = make_node_client()
+        url = reverse('commissioning-scripts', args=['latest'])
+        first = client.get(url)
+        self.assertEqual(first.content, client.get(url).content)
+        self.assertEqual(1, self.cache.hits)
+        script.script = script.script.update(factory.make_string())
+        script.save()
+        archive = tarfile.open(fileobj=BytesIO(client.get(url).content))
+        path = os.path.join('commissioning.d', script.name)
+        self.assertEqual(
+            script.script.data,
+            archive.extractfile(path).read().decode('utf-8'))
 
     def test_commissioning_scripts(self):
-        start_time = floor(time.time())
         # Create custom commissioing scripts
         binary_script = factory.make_Script(
             script_type=SCRIPT_TYPE.COMMISSIONING,
@@ -1402,14 +1501,12 @@ class TestCommissioningAPI(MAASServerTestCase):
                 'application/x-tgz',
             })
         archive = tarfile.open(fileobj=BytesIO(response.content))
-        end_time = ceil(time.time())
 
         # Validate all builtin scripts are included
         for script in NODE_INFO_SCRIPTS.values():
             path = os.path.join('commissioning.d', script['name'])
             member = archive.getmember(path)
-            self.assertGreaterEqual(member.mtime, start_time)
-            self.assertLessEqual(member.mtime, end_time)
+            self.assertEqual(ARCHIVE_MTIME, member.mtime)
             self.assertEqual(0o755, member.mode)
             self.assertEqual(
                 script['content'], archive.extractfile(path).read())
@@ -1417,16 +1514,14 @@ class TestCommissioningAPI(MAASServerTestCase):
         # Validate custom binary commissioning script
         path = os.path.join('commissioning.d', binary_script.name)
         member = archive.getmember(path)
-        self.assertGreaterEqual(member.mtime, start_time)
-        self.assertLessEqual(member.mtime, end_time)
+        self.assertEqual(ARCHIVE_MTIME, member.mtime)
         self.assertEqual(0o755, member.mode)
         self.assertEqual(sample_binary_data, archive.extractfile(path).read())
 
         # Validate custom text commissioning script
         path = os.path.join('commissioning.d', text_script.name)
         member = archive.getmember(path)
-        self.assertGreaterEqual(member.mtime, start_time)
-        self.assertLessEqual(member.mtime, end_time)
+        self.assertEqual(ARCHIVE_MTIME, member.mtime)
         self.assertEqual(0o755, member.mode)
         self.assertEqual(
             text_script.script.data,
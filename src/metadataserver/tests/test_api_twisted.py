@@ -11,12 +11,13 @@ from datetime import datetime
 from io import BytesIO
 import json
 from unittest.mock import (
-    call,
+    ANY,
     Mock,
     sentinel,
 )
 
 from crochet import wait_for
+from django.db import DatabaseError
 from maasserver.enum import NODE_STATUS
 from maasserver.models import (
     Event,
@@ -37,17 +38,25 @@ from maasserver.utils.orm import (
 from maasserver.utils.threads import deferToDatabase
 from maastesting.matchers import (
     MockCalledOnceWith,
-    MockCallsMatch,
     MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
-from metadataserver import api
+from maastesting.twisted import TwistedLoggerFixture
+from metadataserver import (
+    api,
+    api_twisted,
+)
 from metadataserver.api_twisted import (
     StatusHandlerResource,
     StatusWorkerService,
 )
 from metadataserver.enum import SCRIPT_STATUS
 from metadataserver.models import NodeKey
+from metadataserver.nodekey_cache import NodeKeyCache
+from metadataserver.status_queue import (
+    StatusQueueMetrics,
+    StatusSpool,
+)
 from testtools import ExpectedException
 from testtools.matchers import (
     Equals,
@@ -55,9 +64,12 @@ from testtools.matchers import (
     MatchesSetwise,
 )
 from twisted.internet.defer import (
+    Deferred,
     inlineCallbacks,
+    maybeDeferred,
     succeed,
 )
+from twisted.internet.task import Clock
 from twisted.web.server import NOT_DONE_YET
 from twisted.web.test.requesthelper import DummyRequest
 
@@ -187,7 +199,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
         worker = StatusWorkerService(sentinel.dbtasks, clock=sentinel.reactor)
         self.assertEqual(sentinel.dbtasks, worker.dbtasks)
         self.assertEqual(sentinel.reactor, worker.clock)
-        self.assertEqual(60, worker.step)
+        self.assertEqual(0.5, worker.step)
         self.assertEqual((worker._tryUpdateNodes, tuple(), {}), worker.call)
 
     def test__tryUpdateNodes_returns_None_when_empty_queue(self):
@@ -206,7 +218,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             for node, _ in nodes_with_tokens
         }
         dbtasks = Mock()
-        dbtasks.addTask = Mock()
+        dbtasks.deferTask.return_value = succeed(None)
         worker = StatusWorkerService(dbtasks)
         for node, token in nodes_with_tokens:
             for message in node_messages[node]:
@@ -214,7 +226,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
         yield worker._tryUpdateNodes()
         call_args = [
             (call_arg[0][1], call_arg[0][2])
-            for call_arg in dbtasks.addTask.call_args_list
+            for call_arg in dbtasks.deferTask.call_args_list
         ]
         self.assertThat(call_args, MatchesSetwise(*[
             MatchesListwise([Equals(node), Equals(messages)])
@@ -243,32 +255,35 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
     @inlineCallbacks
     def test__processMessages_doesnt_call_when_node_deleted(self):
         worker = StatusWorkerService(sentinel.dbtasks)
-        mock_processMessage = self.patch(worker, "_processMessage")
-        mock_processMessage.return_value = False
+        mock_processQueuedMessages = self.patch(
+            worker, "_processQueuedMessages")
+        mock_processQueuedMessages.return_value = False
         mock_updateLastPing = self.patch(worker, "_updateLastPing")
         yield deferToDatabase(
             worker._processMessages, sentinel.node,
             [sentinel.message1, sentinel.message2])
         self.assertThat(
-            mock_processMessage,
-            MockCalledOnceWith(sentinel.node, sentinel.message1))
+            mock_processQueuedMessages,
+            MockCalledOnceWith(
+                sentinel.node, [sentinel.message1, sentinel.message2]))
         self.assertThat(
             mock_updateLastPing, MockNotCalled())
 
     @wait_for_reactor
     @inlineCallbacks
-    def test__processMessages_calls_processMessage_and_updateLastPing(self):
+    def test__processMessages_calls_processQueuedMessages_and_updateLastPing(
+            self):
         worker = StatusWorkerService(sentinel.dbtasks)
-        mock_processMessage = self.patch(worker, "_processMessage")
+        mock_processQueuedMessages = self.patch(
+            worker, "_processQueuedMessages")
         mock_updateLastPing = self.patch(worker, "_updateLastPing")
         yield deferToDatabase(
             worker._processMessages, sentinel.node,
             [sentinel.message1, sentinel.message2])
         self.assertThat(
-            mock_processMessage,
-            MockCallsMatch(
-                call(sentinel.node, sentinel.message1),
-                call(sentinel.node, sentinel.message2)))
+            mock_processQueuedMessages,
+            MockCalledOnceWith(
+                sentinel.node, [sentinel.message1, sentinel.message2]))
         self.assertThat(
             mock_updateLastPing,
             MockCalledOnceWith(sentinel.node, sentinel.message2))
@@ -338,6 +353,146 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             mock_processMessage, MockNotCalled())
 
 
+class TestStatusWorkerServiceQueue(MAASTestCase):
+    """Tests for how `StatusWorkerService` batches and spools messages."""
+
+    def setUp(self):
+        super(TestStatusWorkerServiceQueue, self).setUp()
+        self.patch(api_twisted, "status_queue_metrics", StatusQueueMetrics())
+        self.spool_path = self.make_dir()
+        self.worker = StatusWorkerService(
+            sentinel.dbtasks, spool_path=self.spool_path)
+        self.worker.spool.open()
+        self.addCleanup(self.worker.spool.close)
+        self.processing = Deferred()
+        self.deferToDatabaseQueue = self.patch(
+            api_twisted, "deferToDatabaseQueue")
+        self.deferToDatabaseQueue.return_value = self.processing
+        self.patch(self.worker, "_processMessagesLater")
+
+    def make_message(self):
+        return {
+            'event_type': 'progress',
+            'origin': factory.make_name('origin'),
+            'name': factory.make_name('name'),
+            'description': factory.make_name('description'),
+            'timestamp': datetime.utcnow().timestamp(),
+        }
+
+    def read_spool(self):
+        spool = StatusSpool(self.spool_path)
+        recovered = spool.recover()
+        for segment, _ in recovered:
+            segment.release()
+        return [entry for _, entries in recovered for entry in entries]
+
+    def test__queues_and_spools_messages(self):
+        message = self.make_message()
+        timestamp = message['timestamp']
+        self.worker._queueMessageLater("token", message)
+        self.assertThat(self.worker.queue, Equals({"token": [message]}))
+        self.assertThat(
+            message['timestamp'],
+            Equals(datetime.utcfromtimestamp(timestamp)))
+        self.worker.spool.close()
+        self.assertThat(self.read_spool(), Equals([
+            ("token", dict(message, timestamp=timestamp))]))
+
+    def test__flushes_when_batch_size_reached(self):
+        self.patch(self.worker, "batch_size", 3)
+        for _ in range(2):
+            self.worker._queueMessageLater("token", self.make_message())
+        self.assertThat(self.deferToDatabaseQueue, MockNotCalled())
+        self.worker._queueMessageLater("token", self.make_message())
+        self.assertThat(
+            self.deferToDatabaseQueue,
+            MockCalledOnceWith("bulk", self.worker._preProcessQueue, ANY))
+        self.assertThat(self.worker.queue, Equals({}))
+
+    def test__flushes_one_batch_at_a_time(self):
+        self.worker._queueMessageLater("token", self.make_message())
+        self.worker._tryUpdateNodes()
+        self.worker._queueMessageLater("token", self.make_message())
+        self.assertIsNone(self.worker._tryUpdateNodes())
+        self.assertThat(self.deferToDatabaseQueue, MockCalledOnceWith(
+            "bulk", self.worker._preProcessQueue, ANY))
+
+    def test__discards_spooled_messages_once_processed(self):
+        self.worker._queueMessageLater("token", self.make_message())
+        self.worker._tryUpdateNodes()
+        self.processing.callback([])
+        self.assertIsNone(self.worker.flushing)
+        self.worker.spool.close()
+        self.assertThat(self.read_spool(), Equals([]))
+        self.assertThat(
+            api_twisted.status_queue_metrics.processed, Equals(1))
+        self.assertThat(
+            api_twisted.status_queue_metrics.latency.count, Equals(1))
+
+    def test__keeps_spooled_messages_when_processing_fails(self):
+        message = self.make_message()
+        timestamp = message['timestamp']
+        self.worker._queueMessageLater("token", message)
+        self.worker._tryUpdateNodes()
+        with TwistedLoggerFixture():
+            self.processing.errback(factory.make_exception())
+        self.assertIsNone(self.worker.flushing)
+        self.assertThat(self.read_spool(), Equals([
+            ("token", dict(message, timestamp=timestamp))]))
+        self.assertThat(api_twisted.status_queue_metrics.failed, Equals(1))
+
+    def process_messages_with_error(self, exception):
+        # Write the batch through `_processMessages`, which fails to record
+        # the messages with the given exception.
+        worker = self.worker
+        self.patch(worker, "_processMessagesLater").side_effect = (
+            lambda tasks: StatusWorkerService._processMessagesLater(
+                worker, tasks))
+        self.patch(worker, "dbtasks").deferTask.side_effect = maybeDeferred
+        self.patch(api_twisted, "in_transaction").return_value = False
+        self.patch(worker, "_processQueuedMessages").side_effect = exception
+        message = self.make_message()
+        timestamp = message['timestamp']
+        worker._queueMessageLater("token", message)
+        worker._tryUpdateNodes()
+        node = Mock(hostname=factory.make_name("node"))
+        with TwistedLoggerFixture() as logger:
+            self.processing.callback([(node, [message])])
+        self.assertIsNone(worker.flushing)
+        return logger, ("token", dict(message, timestamp=timestamp))
+
+    def test__keeps_spooled_messages_when_database_fails(self):
+        logger, entry = self.process_messages_with_error(
+            DatabaseError("connection lost"))
+        self.assertThat(self.read_spool(), Equals([entry]))
+        self.assertThat(api_twisted.status_queue_metrics.failed, Equals(1))
+        self.assertIn("Failed to process node status messages.", logger.output)
+
+    def test__discards_spooled_messages_that_are_malformed(self):
+        logger, _ = self.process_messages_with_error(KeyError("origin"))
+        self.worker.spool.close()
+        self.assertThat(self.read_spool(), Equals([]))
+        self.assertThat(
+            api_twisted.status_queue_metrics.processed, Equals(1))
+        self.assertIn("Failed to process messages for node", logger.output)
+
+    def test__recovers_messages_from_stopped_processes(self):
+        message = self.make_message()
+        old_spool = StatusSpool(self.spool_path)
+        old_spool.open()
+        old_spool.append("token", message)
+        old_spool.close()
+        self.worker._recoverSpool()
+        self.assertThat(self.worker.queue, Equals({"token": [
+            dict(message, timestamp=datetime.utcfromtimestamp(
+                message['timestamp']))]}))
+        self.assertThat(
+            api_twisted.status_queue_metrics.recovered, Equals(1))
+        # The messages are now spooled by this worker alone.
+        self.worker.spool.close()
+        self.assertThat(self.read_spool(), Equals([("token", message)]))
+
+
 def encode_as_base64(content):
     return base64.encodebytes(content).decode("ascii")
 
@@ -356,6 +511,58 @@ class TestStatusWorkerService(MAASServerTestCase):
         worker = StatusWorkerService(sentinel.dbtasks)
         worker._updateLastPing(node, payload)
 
+    def test_registers_and_unregisters_nodekey_listener(self):
+        listener = Mock()
+        worker = StatusWorkerService(
+            sentinel.dbtasks, clock=Clock(), spool_path=self.make_dir(),
+            postgresListener=listener)
+        worker.startService()
+        self.assertThat(listener.register, MockCalledOnceWith(
+            "sys_nodekey", worker._nodeKeyDeleted))
+        worker.stopService()
+        self.assertThat(listener.unregister, MockCalledOnceWith(
+            "sys_nodekey", worker._nodeKeyDeleted))
+
+    def test_nodeKeyDeleted_invalidates_key(self):
+        cache = self.patch(api_twisted, "nodekey_cache", NodeKeyCache())
+        key = factory.make_name("key")
+        cache.store(key, 1, cache.generation)
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker._nodeKeyDeleted("sys_nodekey", key)
+        self.assertEqual((None, 1), cache.get(key))
+
+    def test_preProcessQueue_caches_node_for_key(self):
+        cache = self.patch(api_twisted, "nodekey_cache", NodeKeyCache())
+        node = factory.make_Node()
+        key = NodeKey.objects.get_token_for_node(node).key
+        messages = [sentinel.message]
+        worker = StatusWorkerService(sentinel.dbtasks)
+        self.assertEqual(
+            [(node, messages)], worker._preProcessQueue({key: messages}))
+        self.assertEqual(node.id, cache.get(key)[0])
+
+    def test_preProcessQueue_finds_cached_node_without_key(self):
+        cache = self.patch(api_twisted, "nodekey_cache", NodeKeyCache())
+        node = factory.make_Node()
+        key = factory.make_name("key")
+        cache.store(key, node.id, cache.generation)
+        messages = [sentinel.message]
+        worker = StatusWorkerService(sentinel.dbtasks)
+        self.assertEqual(
+            [(node, messages)], worker._preProcessQueue({key: messages}))
+
+    def test_preProcessQueue_ignores_unknown_and_deleted_nodes(self):
+        cache = self.patch(api_twisted, "nodekey_cache", NodeKeyCache())
+        node = factory.make_Node()
+        key = factory.make_name("key")
+        cache.store(key, node.id, cache.generation)
+        node.delete()
+        worker = StatusWorkerService(sentinel.dbtasks)
+        self.assertEqual([], worker._preProcessQueue({
+            key: [sentinel.message],
+            factory.make_name("unknown"): [sentinel.message],
+        }))
+
     def test_process_message_returns_false_when_node_deleted(self):
         node1 = factory.make_Node(status=NODE_STATUS.DEPLOYING)
         node1.delete()
@@ -915,3 +1122,37 @@ class TestStatusWorkerService(MAASServerTestCase):
         script_result = script_set.find_script_result(
             script_name=CURTIN_INSTALL_LOG)
         self.assertEqual(SCRIPT_STATUS.RUNNING, script_result.status)
+
+    def test_processQueuedMessages_adds_events(self):
+        node = factory.make_Node(status=NODE_STATUS.DEPLOYING)
+        messages = [
+            {
+                'event_type': 'progress',
+                'origin': 'curtin',
+                'name': factory.make_name('name'),
+                'description': factory.make_name('description'),
+                'timestamp': datetime.utcnow(),
+            }
+            for _ in range(3)
+        ]
+        worker = StatusWorkerService(sentinel.dbtasks)
+        self.assertTrue(worker._processQueuedMessages(node, messages))
+        self.assertThat(
+            [(event.action, event.created)
+             for event in Event.objects.filter(node=node).order_by('id')],
+            Equals([
+                (message['name'], message['timestamp'])
+                for message in messages
+            ]))
+
+    def test_processQueuedMessages_returns_false_when_node_deleted(self):
+        node = factory.make_Node(status=NODE_STATUS.DEPLOYING)
+        node.delete()
+        worker = StatusWorkerService(sentinel.dbtasks)
+        self.assertFalse(worker._processQueuedMessages(node, [{
+            'event_type': 'progress',
+            'origin': 'curtin',
+            'name': 'test',
+            'description': 'testing',
+            'timestamp': datetime.utcnow(),
+        }]))
@@ -0,0 +1,73 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `metadataserver.nodekey_cache`."""
+
+__all__ = []
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+from metadataserver.nodekey_cache import NodeKeyCache
+
+
+class TestNodeKeyCache(MAASTestCase):
+
+    def test__get_misses_unknown_key(self):
+        cache = NodeKeyCache()
+        self.assertEqual((None, 0), cache.get(factory.make_name("key")))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test__get_hits_stored_key(self):
+        cache = NodeKeyCache()
+        key = factory.make_name("key")
+        node_id, generation = cache.get(key)
+        cache.store(key, 123, generation)
+        self.assertEqual((123, generation), cache.get(key))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test__get_many_returns_only_cached_keys(self):
+        cache = NodeKeyCache()
+        cache.store_many({"a": 1, "b": 2}, cache.generation)
+        found, _ = cache.get_many(["a", "b", "c"])
+        self.assertEqual({"a": 1, "b": 2}, found)
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+    def test__invalidate_forgets_key(self):
+        cache = NodeKeyCache()
+        cache.store("a", 1, cache.generation)
+        cache.invalidate("a")
+        self.assertIsNone(cache.get("a")[0])
+        self.assertEqual(1, cache.invalidations)
+
+    def test__store_ignores_lookup_overtaken_by_invalidate(self):
+        cache = NodeKeyCache()
+        _, generation = cache.get("a")
+        # The key is deleted while it is being looked up.
+        cache.invalidate("a")
+        cache.store("a", 1, generation)
+        self.assertIsNone(cache.get("a")[0])
+
+    def test__forgets_keys_when_too_old(self):
+        now = [100.0]
+        cache = NodeKeyCache(max_age=10, clock=lambda: now[0])
+        cache.store("a", 1, cache.generation)
+        now[0] += 11
+        self.assertIsNone(cache.get("a")[0])
+
+    def test__evicts_least_recently_used(self):
+        cache = NodeKeyCache(size=2)
+        cache.store_many({"a": 1, "b": 2}, cache.generation)
+        cache.get("a")
+        cache.store("c", 3, cache.generation)
+        self.assertEqual(["a", "c"], list(cache.entries))
+
+    def test__asdict_reports_hit_rate(self):
+        cache = NodeKeyCache()
+        self.assertIsNone(cache.asdict()["hit_rate"])
+        cache.store("a", 1, cache.generation)
+        cache.get_many(["a", "a", "a", "b"])
+        stats = cache.asdict()
+        self.assertEqual(
+            (1, 3, 1, 0.75),
+            (stats["size"], stats["hits"], stats["misses"],
+             stats["hit_rate"]))
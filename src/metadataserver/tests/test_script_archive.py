@@ -0,0 +1,77 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `metadataserver.script_archive`."""
+
+__all__ = []
+
+from io import BytesIO
+import tarfile
+from unittest.mock import Mock
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from metadataserver.script_archive import (
+    join_tar_members,
+    make_tar_member,
+    ScriptArchiveCache,
+)
+
+
+class TestTarMembers(MAASTestCase):
+
+    def test__joined_members_are_a_tar_archive(self):
+        files = [
+            (factory.make_name("path"), factory.make_bytes(size), mode)
+            for size, mode in ((0, 0o755), (512, 0o644), (1000, 0o700))
+        ]
+        data = join_tar_members(
+            make_tar_member(path, content, 1234, mode)
+            for path, content, mode in files)
+        self.assertEqual(0, len(data) % tarfile.RECORDSIZE)
+        with tarfile.open(mode="r", fileobj=BytesIO(data)) as tar:
+            for path, content, mode in files:
+                member = tar.getmember(path)
+                self.assertEqual(1234, member.mtime)
+                self.assertEqual(mode, member.mode)
+                self.assertEqual(content, tar.extractfile(path).read())
+
+    def test__empty_archive(self):
+        data = join_tar_members([])
+        with tarfile.open(mode="r", fileobj=BytesIO(data)) as tar:
+            self.assertEqual([], tar.getmembers())
+
+
+class TestScriptArchiveCache(MAASTestCase):
+
+    def test__get_builds_once(self):
+        cache = ScriptArchiveCache()
+        build = Mock(return_value=factory.make_bytes())
+        self.assertEqual(build.return_value, cache.get("key", build))
+        self.assertEqual(build.return_value, cache.get("key", build))
+        self.assertThat(build, MockCalledOnceWith())
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test__evicts_least_recently_used(self):
+        cache = ScriptArchiveCache(size=2)
+        cache.get("a", lambda: b"a")
+        cache.get("b", lambda: b"b")
+        cache.get("a", lambda: b"a")
+        cache.get("c", lambda: b"c")
+        self.assertEqual(["a", "c"], list(cache.entries))
+
+    def test__get_member_keys_by_path_and_source(self):
+        cache = ScriptArchiveCache()
+        get_content = Mock(return_value=factory.make_bytes())
+        member = cache.get_member("path", 1, get_content, 1234)
+        self.assertEqual(
+            make_tar_member("path", get_content.return_value, 1234), member)
+        get_content.reset_mock()
+        self.assertEqual(member, cache.get_member("path", 1, get_content, 0))
+        self.assertThat(get_content, MockNotCalled())
+        cache.get_member("path", 2, get_content, 0)
+        self.assertThat(get_content, MockCalledOnceWith())
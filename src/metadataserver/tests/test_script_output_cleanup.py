@@ -0,0 +1,45 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `metadataserver.script_output_cleanup`."""
+
+__all__ = []
+
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from metadataserver import script_output_cleanup
+from metadataserver.models import ScriptOutput
+from metadataserver.script_output_cleanup import ScriptOutputCleanupService
+from twisted.internet.defer import maybeDeferred
+from twisted.internet.task import Clock
+
+
+class TestScriptOutputCleanupService(MAASServerTestCase):
+
+    def test_deletes_unused_output_when_duty_is_claimed(self):
+        delete_unused = self.patch(ScriptOutput.objects, "delete_unused")
+        self.patch(
+            script_output_cleanup.cleanup_script_output,
+            "claim").return_value = [0]
+        self.patch(script_output_cleanup, "deferToDatabase", maybeDeferred)
+        service = ScriptOutputCleanupService()
+        service.clock = Clock()
+        self.assertEqual(6 * 60 * 60, service.step)
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertThat(delete_unused, MockCalledOnceWith())
+
+    def test_does_nothing_when_duty_is_not_claimed(self):
+        delete_unused = self.patch(ScriptOutput.objects, "delete_unused")
+        self.patch(
+            script_output_cleanup.cleanup_script_output,
+            "claim").return_value = []
+        self.patch(script_output_cleanup, "deferToDatabase", maybeDeferred)
+        service = ScriptOutputCleanupService()
+        service.clock = Clock()
+        service.startService()
+        self.addCleanup(service.stopService)
+        self.assertThat(delete_unused, MockNotCalled())
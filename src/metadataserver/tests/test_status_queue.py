@@ -0,0 +1,140 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `metadataserver.status_queue`."""
+
+__all__ = []
+
+import os
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+from metadataserver.status_queue import (
+    StatusQueueMetrics,
+    StatusSpool,
+)
+from testtools.matchers import (
+    ContainsDict,
+    Equals,
+    FileExists,
+    Not,
+)
+
+
+class TestStatusSpool(MAASTestCase):
+
+    def make_spool(self):
+        spool = StatusSpool(os.path.join(self.make_dir(), "spool"))
+        self.addCleanup(spool.close)
+        return spool
+
+    def make_entry(self):
+        return factory.make_name("token"), {
+            "name": factory.make_name("name"),
+            "timestamp": 1234.5,
+        }
+
+    def recover_all(self, spool):
+        """Recover from a second spool, as if in another process."""
+        other = StatusSpool(spool.path)
+        recovered = other.recover()
+        for segment, _ in recovered:
+            segment.release()
+        return [entry for _, entries in recovered for entry in entries]
+
+    def test__append_does_nothing_when_not_opened(self):
+        spool = self.make_spool()
+        spool.append(*self.make_entry())
+        self.assertFalse(spool.opened)
+
+    def test__open_creates_directory(self):
+        spool = self.make_spool()
+        spool.open()
+        self.assertTrue(os.path.isdir(spool.path))
+        self.assertTrue(spool.opened)
+
+    def test__close_keeps_unprocessed_messages(self):
+        spool = self.make_spool()
+        spool.open()
+        token, message = self.make_entry()
+        spool.append(token, message)
+        spool.close()
+        self.assertThat(self.recover_all(spool), Equals([(token, message)]))
+
+    def test__close_removes_empty_segment(self):
+        spool = self.make_spool()
+        spool.open()
+        path = spool.segment.path
+        spool.close()
+        self.assertThat(path, Not(FileExists()))
+
+    def test__recover_ignores_segments_in_use(self):
+        spool = self.make_spool()
+        spool.open()
+        spool.append(*self.make_entry())
+        self.assertThat(self.recover_all(spool), Equals([]))
+
+    def test__swap_starts_new_segment(self):
+        spool = self.make_spool()
+        spool.open()
+        first = self.make_entry()
+        spool.append(*first)
+        segment = spool.swap()
+        self.assertNotEqual(segment.path, spool.segment.path)
+        second = self.make_entry()
+        spool.append(*second)
+        # Both segments are still locked.
+        self.assertThat(self.recover_all(spool), Equals([]))
+        segment.release()
+        self.assertThat(self.recover_all(spool), Equals([first]))
+        spool.close()
+        self.assertCountEqual([first, second], self.recover_all(spool))
+
+    def test__discarded_segment_is_not_recovered(self):
+        spool = self.make_spool()
+        spool.open()
+        spool.append(*self.make_entry())
+        segment = spool.swap()
+        segment.discard()
+        spool.close()
+        self.assertThat(segment.path, Not(FileExists()))
+        self.assertThat(self.recover_all(spool), Equals([]))
+
+    def test__recover_skips_corrupt_entries(self):
+        spool = self.make_spool()
+        spool.open()
+        token, message = self.make_entry()
+        spool.append(token, message)
+        os.write(spool.segment.fd, b'["truncated", {')
+        spool.close()
+        self.assertThat(self.recover_all(spool), Equals([(token, message)]))
+
+
+class TestStatusQueueMetrics(MAASTestCase):
+
+    def test__records_batches(self):
+        clock = iter([10.0])
+        metrics = StatusQueueMetrics(clock=lambda: next(clock))
+        metrics.messages_queued(3)
+        metrics.batch_started(2)
+        self.assertThat(metrics.asdict(), ContainsDict({
+            "queued": Equals(1), "processing": Equals(2),
+        }))
+        metrics.batch_finished([8.0, 9.5])
+        self.assertThat(metrics.asdict(), ContainsDict({
+            "queued": Equals(1), "processing": Equals(0),
+            "processed": Equals(2), "failed": Equals(0),
+        }))
+        self.assertThat(metrics.latency.max, Equals(2.0))
+        self.assertThat(metrics.batch_size.count, Equals(1))
+
+    def test__records_failed_batches(self):
+        metrics = StatusQueueMetrics()
+        metrics.messages_queued(2)
+        metrics.batch_started(2)
+        metrics.batch_finished([0.0, 0.0], failed=True)
+        self.assertThat(metrics.asdict(), ContainsDict({
+            "processing": Equals(0), "processed": Equals(0),
+            "failed": Equals(2),
+        }))
+        self.assertThat(metrics.latency.count, Equals(0))
@@ -37,8 +37,8 @@ from provisioningserver.utils.fs import (
 )
 from provisioningserver.utils.network import find_mac_via_arp
 from provisioningserver.utils.registry import Registry
+from provisioningserver.utils.templates import TemplateCache
 from provisioningserver.utils.twisted import asynchronous
-import tempita
 from tftp.backend import IReader
 from twisted.internet.defer import (
     inlineCallbacks,
@@ -49,6 +49,9 @@ from zope.interface import implementer
 
 maaslog = get_maas_logger('bootloaders')
 
+# Boot method templates, parsed once and then reused until they change.
+boot_templates = TemplateCache()
+
 
 @asynchronous
 def get_archive_mirrors():
@@ -290,8 +293,9 @@ class BootMethod(metaclass=ABCMeta):
     def get_template(self, purpose, arch, subarch):
         """Gets the best avaliable template for the boot method.
 
-        Templates are loaded each time here so that they can be changed on
-        the fly without restarting the provisioning server.
+        Templates are checked for changes each time here so that they can be
+        changed on the fly without restarting the provisioning server. They
+        are only parsed again when they have changed.
 
         :param purpose: The boot purpose, e.g. "local".
         :param arch: Main machine architecture.
@@ -302,8 +306,7 @@ class BootMethod(metaclass=ABCMeta):
         for filename in gen_template_filenames(purpose, arch, subarch):
             template_name = os.path.join(pxe_templates_dir, filename)
             try:
-                return tempita.Template.from_filename(
-                    template_name, encoding="UTF-8")
+                return boot_templates.load(template_name, encoding="UTF-8")
             except IOError as error:
                 if error.errno != ENOENT:
                     raise
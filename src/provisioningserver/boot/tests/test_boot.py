@@ -38,7 +38,6 @@ from provisioningserver.utils.fs import (
     atomic_symlink,
     tempdir,
 )
-import tempita
 from twisted.internet.defer import (
     inlineCallbacks,
     succeed,
@@ -104,16 +103,16 @@ class TestBootMethod(MAASTestCase):
         # Set up the mocks that we've patched in.
         gen_filenames = self.patch(boot, "gen_template_filenames")
         gen_filenames.return_value = [filename]
-        from_filename = self.patch(tempita.Template, "from_filename")
-        from_filename.return_value = mock.sentinel.template
+        load = self.patch(boot.boot_templates, "load")
+        load.return_value = mock.sentinel.template
         # The template returned matches the return value above.
         template = method.get_template(purpose, arch, subarch)
         self.assertEqual(mock.sentinel.template, template)
         # gen_pxe_template_filenames is called to obtain filenames.
         gen_filenames.assert_called_once_with(purpose, arch, subarch)
-        # Tempita.from_filename is called with an absolute path derived from
-        # the filename returned from gen_pxe_template_filenames.
-        from_filename.assert_called_once_with(
+        # The template is loaded from an absolute path derived from the
+        # filename returned from gen_pxe_template_filenames.
+        load.assert_called_once_with(
             os.path.join(method.get_template_dir(), filename),
             encoding="UTF-8")
 
@@ -131,6 +130,18 @@ class TestBootMethod(MAASTestCase):
             generic_template,
             method.get_template(purpose, arch, subarch).name)
 
+    def test_get_template_reuses_template_until_changed(self):
+        templates_dir = self.make_dir()
+        method = FakeBootMethod()
+        method.get_template_dir = lambda: templates_dir
+        path = factory.make_file(templates_dir, 'config.template', b"one")
+        args = factory.make_names("purpose", "arch", "subarch")
+        template = method.get_template(*args)
+        self.assertIs(template, method.get_template(*args))
+        with open(path, "w") as fd:
+            fd.write("two, changed")
+        self.assertEqual("two, changed", method.get_template(*args).content)
+
     def test_get_template_not_found(self):
         mock_try_send_rack_event = self.patch(boot, 'try_send_rack_event')
         # It is a critical and unrecoverable error if the default template
@@ -147,9 +158,9 @@ class TestBootMethod(MAASTestCase):
         # The IOError arising from trying to load a template that doesn't
         # exist is suppressed, but other errors are not.
         method = FakeBootMethod()
-        from_filename = self.patch(tempita.Template, "from_filename")
-        from_filename.side_effect = IOError()
-        from_filename.side_effect.errno = errno.EACCES
+        load = self.patch(boot.boot_templates, "load")
+        load.side_effect = IOError()
+        load.side_effect.errno = errno.EACCES
         self.assertRaises(
             IOError, method.get_template,
             *factory.make_names("purpose", "arch", "subarch"))
@@ -7,17 +7,24 @@ __all__ = []
 
 import errno
 import os.path
+import shutil
 from unittest.mock import Mock
 
 from maastesting.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
 from maastesting.testcase import MAASTestCase
 from provisioningserver.boot import tftppath
 from provisioningserver.boot.tftppath import (
+    BootImageCatalogue,
     compose_image_path,
     drill_down,
     extend_path,
     extract_image_params,
     extract_metadata,
+    find_image_paths,
     is_visible_subdir,
     list_boot_images,
     list_subdirs,
@@ -184,6 +191,103 @@ class TestTFTPPath(MAASTestCase):
             self.make_image_dir(param, self.tftproot)
         self.assertItemsEqual([], list_boot_images(self.tftproot))
 
+    def make_image_path(self, params):
+        return [
+            params['osystem'], params['architecture'],
+            params['subarchitecture'], params['release'], params['label'],
+        ]
+
+    def test_find_image_paths_finds_all_images(self):
+        params = [make_boot_image_storage_params() for counter in range(3)]
+        for param in params:
+            self.make_image_dir(param, self.tftproot)
+        self.assertItemsEqual(
+            [self.make_image_path(param) for param in params],
+            find_image_paths(self.tftproot))
+
+    def test_find_image_paths_finds_images_under_prefix(self):
+        params = [make_boot_image_storage_params() for counter in range(2)]
+        for param in params:
+            self.make_image_dir(param, self.tftproot)
+        path = self.make_image_path(params[0])
+        self.assertEqual([path], find_image_paths(self.tftproot, path[:1]))
+        # Elements beyond the image's are ignored.
+        self.assertEqual(
+            [path], find_image_paths(self.tftproot, path + ['linux']))
+
+    def test_find_image_paths_finds_bootloaders(self):
+        path = ['bootloader', factory.make_name('type'), 'amd64']
+        os.makedirs(os.path.join(self.tftproot, *path))
+        self.assertEqual([path], find_image_paths(self.tftproot))
+
+    def test_find_image_paths_copes_with_missing_prefix(self):
+        self.assertEqual(
+            [], find_image_paths(self.tftproot, [factory.make_name('os')]))
+
+    def test_catalogue_rebuild_finds_boot_images(self):
+        purposes = ['install', 'commissioning', 'xinstall']
+        params = [make_boot_image_storage_params() for counter in range(3)]
+        for param in params:
+            self.make_image_dir(param, self.tftproot)
+            make_osystem(self, param['osystem'], purposes)
+        catalogue = BootImageCatalogue(self.tftproot)
+        catalogue.rebuild()
+        self.assertItemsEqual(
+            list_boot_images(self.tftproot), catalogue.list_boot_images())
+
+    def test_catalogue_rebuild_copes_with_missing_directory(self):
+        catalogue = BootImageCatalogue(factory.make_string())
+        catalogue.rebuild()
+        self.assertEqual([], catalogue.list_boot_images())
+
+    def test_catalogue_update_adds_and_removes_images(self):
+        purposes = ['install']
+        params = [make_boot_image_storage_params() for counter in range(2)]
+        make_osystem(self, params[0]['osystem'], purposes)
+        make_osystem(self, params[1]['osystem'], purposes)
+        self.make_image_dir(params[0], self.tftproot)
+        catalogue = BootImageCatalogue(self.tftproot)
+        catalogue.rebuild()
+        self.make_image_dir(params[1], self.tftproot)
+        catalogue.update([self.make_image_path(params[1]) + ['linux']])
+        self.assertItemsEqual(
+            [make_image(param, 'install') for param in params],
+            catalogue.list_boot_images())
+        shutil.rmtree(os.path.join(self.tftproot, params[0]['osystem']))
+        catalogue.update([[params[0]['osystem']]])
+        self.assertItemsEqual(
+            [make_image(params[1], 'install')],
+            catalogue.list_boot_images())
+
+    def test_catalogue_update_searches_only_changed_paths(self):
+        params = make_boot_image_storage_params()
+        self.make_image_dir(params, self.tftproot)
+        catalogue = BootImageCatalogue(self.tftproot)
+        catalogue.rebuild()
+        find_image_paths = self.patch(tftppath, 'find_image_paths')
+        find_image_paths.return_value = []
+        path = self.make_image_path(params)
+        catalogue.update([path + ['linux'], path + ['initrd.gz']])
+        self.assertThat(
+            find_image_paths, MockCalledOnceWith(self.tftproot, tuple(path)))
+
+    def test_catalogue_update_merges_changed_maas_meta_data(self):
+        params = make_boot_image_storage_params()
+        self.make_image_dir(params, self.tftproot)
+        make_osystem(self, params['osystem'], ['install'])
+        catalogue = BootImageCatalogue(self.tftproot)
+        catalogue.rebuild()
+        metadata = dict(subarches=factory.make_name("subarches"))
+        self.make_meta_file(params, metadata, self.tftproot)
+        find_image_paths = self.patch(tftppath, 'find_image_paths')
+        catalogue.update([['maas.meta']])
+        self.assertThat(find_image_paths, MockNotCalled())
+        self.assertEqual(
+            [make_image(
+                params, 'install',
+                dict(supported_subarches=metadata["subarches"]))],
+            catalogue.list_boot_images())
+
     def test_is_visible_subdir_ignores_regular_files(self):
         plain_file = self.make_file()
         self.assertFalse(
@@ -4,7 +4,9 @@
 """Construct TFTP paths for boot files."""
 
 __all__ = [
+    'BootImageCatalogue',
     'compose_image_path',
+    'find_image_paths',
     'list_boot_images',
     'list_subdirs',
     ]
@@ -93,6 +95,48 @@ def drill_down(directory, paths):
         extend_path(directory, path) for path in paths))
 
 
+def image_path_depth(path):
+    """Return the number of path elements that identify a boot image.
+
+    Bootloaders are identified by (bootloader, type, arch), and everything
+    else by (osystem, arch, subarch, release, label).
+
+    :param path: A non-empty list of path elements, relative to the TFTP
+        root, of a boot image or anything in or above it.
+    """
+    return 3 if path[0] == 'bootloader' else 5
+
+
+def find_image_paths(tftproot, prefix=()):
+    """Find the paths of the boot images under `prefix`.
+
+    :param tftproot: TFTP root directory.
+    :param prefix: A list of path elements relative to `tftproot`. Elements
+        beyond those that identify a boot image are ignored, so this can be
+        the path of a file within an image.
+    :return: A list of paths, as lists of path elements, each of which
+        identifies a boot image. This is empty if `prefix` does not exist.
+    :raise OSError: If `tftproot` does not exist, or if a directory is
+        removed while it is being searched.
+    """
+    prefix = list(prefix)
+    if len(prefix) == 0:
+        return list(chain.from_iterable(
+            find_image_paths(tftproot, [subdir])
+            for subdir in list_subdirs(tftproot)))
+    depth = image_path_depth(prefix)
+    prefix = prefix[:depth]
+    directory = tftproot
+    for element in prefix:
+        if not is_visible_subdir(directory, element):
+            return []
+        directory = os.path.join(directory, element)
+    paths = [prefix]
+    for _ in range(depth - len(prefix)):
+        paths = drill_down(tftproot, paths)
+    return paths
+
+
 def extract_metadata(metadata, params):
     """Examine the maas.meta file for any required metadata.
 
@@ -250,6 +294,74 @@ def list_boot_images(tftproot):
         extract_image_params(path, metadata) for path in paths))
 
 
+class BootImageCatalogue:
+    """The boot images under a TFTP root, maintained incrementally.
+
+    `rebuild` searches the whole tree, as `list_boot_images` does. After
+    that, `update` searches again beneath only the paths that have changed,
+    and a change to maas.meta updates the meta-data of every image without
+    searching at all.
+
+    :ivar paths: A dict mapping each image path, as a tuple of elements
+        relative to the TFTP root, to its list of boot image dicts.
+    """
+
+    def __init__(self, tftproot):
+        super(BootImageCatalogue, self).__init__()
+        self.tftproot = tftproot
+        self.metadata = ""
+        self.paths = {}
+
+    def list_boot_images(self):
+        """List the boot images, as `list_boot_images` does."""
+        return list(chain.from_iterable(
+            self.paths[path] for path in sorted(self.paths)))
+
+    def _find(self, prefix):
+        try:
+            paths = find_image_paths(self.tftproot, prefix)
+        except FileNotFoundError:
+            # Removed while searching; that will be seen as a change too.
+            paths = []
+        return {
+            tuple(path): extract_image_params(path, self.metadata)
+            for path in paths
+        }
+
+    def rebuild(self):
+        """Search the whole TFTP root for boot images."""
+        self.metadata = get_image_metadata(self.tftproot)
+        self.paths = self._find(())
+
+    def update(self, changed):
+        """Search again beneath the `changed` paths.
+
+        :param changed: An iterable of changed paths, each a sequence of
+            path elements relative to the TFTP root.
+        """
+        prefixes = set()
+        for path in changed:
+            path = tuple(path)
+            if len(path) == 0:
+                self.rebuild()
+                return
+            elif path == ('maas.meta',):
+                self.metadata = get_image_metadata(self.tftproot)
+                self.paths = {
+                    image_path: extract_image_params(image_path, self.metadata)
+                    for image_path in self.paths
+                }
+            else:
+                prefixes.add(path[:image_path_depth(path)])
+        for prefix in prefixes:
+            self.paths = {
+                image_path: images
+                for image_path, images in self.paths.items()
+                if image_path[:len(prefix)] != prefix
+            }
+            self.paths.update(self._find(prefix))
+
+
 def get_image_metadata(tftproot):
     meta_file_path = maas_meta_file_path(tftproot)
     try:
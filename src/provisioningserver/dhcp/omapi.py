@@ -0,0 +1,445 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""A client for the ISC DHCP server's OMAPI protocol.
+
+`Omshell` runs the ``omshell`` binary, and so connects and authenticates to
+the DHCP server, for every single operation. `OmapiClient` speaks OMAPI
+itself over a connection that's kept open between operations, and sends
+host-map changes in batches, so that updating hundreds of host maps takes a
+couple of round trips instead of hundreds of processes.
+"""
+
+__all__ = [
+    "HostMapFailure",
+    "OmapiClient",
+    "OmapiConnectionError",
+    "OmapiError",
+]
+
+from base64 import b64decode
+from collections import namedtuple
+import hashlib
+import hmac
+from itertools import count
+import random
+import socket
+import struct
+
+from netaddr import (
+    EUI,
+    IPAddress,
+)
+
+
+# OMAPI protocol version and header size, exchanged when connecting.
+OMAPI_PROTOCOL_VERSION = 100
+OMAPI_HEADER_SIZE = 24
+
+# Message opcodes.
+OMAPI_OP_OPEN = 1
+OMAPI_OP_REFRESH = 2
+OMAPI_OP_UPDATE = 3
+OMAPI_OP_NOTIFY = 4
+OMAPI_OP_STATUS = 5
+OMAPI_OP_DELETE = 6
+
+# The name and algorithm of the key in the DHCP server configuration; see
+# the dhcpd.conf and dhcpd6.conf templates.
+OMAPI_KEY_NAME = "omapi_key"
+OMAPI_KEY_ALGORITHM = "hmac-md5.SIG-ALG.REG.INT."
+OMAPI_SIGNATURE_SIZE = 16  # HMAC-MD5.
+
+# Hardware type for Ethernet, as used in host objects.
+HARDWARE_TYPE_ETHERNET = 1
+
+
+class OmapiError(Exception):
+    """An OMAPI operation failed."""
+
+
+class OmapiConnectionError(OmapiError):
+    """The DHCP server could not be reached, or the connection broke."""
+
+
+HostMapFailure = namedtuple(
+    "HostMapFailure", ("action", "mac", "ip", "message"))
+HostMapFailure.__doc__ = """\
+A host-map operation that failed.
+
+:ivar action: One of "remove", "create" or "modify".
+:ivar mac: The MAC address of the host.
+:ivar ip: The IP address of the host, or `None` when removing.
+:ivar message: The error reported by the DHCP server.
+"""
+
+
+def pack_int(value):
+    return struct.pack("!I", value)
+
+
+def unpack_int(value):
+    return struct.unpack("!I", value)[0]
+
+
+def pack_values(values):
+    """Pack a list of (name, value) tuples into an OMAPI name/value list."""
+    data = []
+    for name, value in values:
+        name = name.encode("ascii")
+        data.append(struct.pack("!H", len(name)))
+        data.append(name)
+        data.append(struct.pack("!I", len(value)))
+        data.append(value)
+    data.append(struct.pack("!H", 0))
+    return b"".join(data)
+
+
+def unpack_values(data, offset):
+    """Unpack an OMAPI name/value list from `data`, starting at `offset`.
+
+    :return: A tuple of a list of (name, value) tuples and the offset of the
+        first byte following the list.
+    """
+    values = []
+    while True:
+        [name_len] = struct.unpack_from("!H", data, offset)
+        offset += 2
+        if name_len == 0:
+            return values, offset
+        name = bytes(data[offset:offset + name_len]).decode("ascii")
+        offset += name_len
+        [value_len] = struct.unpack_from("!I", data, offset)
+        offset += 4
+        values.append((name, bytes(data[offset:offset + value_len])))
+        offset += value_len
+
+
+class OmapiMessage:
+    """A message in the OMAPI protocol.
+
+    :ivar message: A list of (name, value) tuples that describe what the
+        message is for, e.g. the type of object to open.
+    :ivar obj: A list of (name, value) tuples of the object's attributes.
+    """
+
+    def __init__(
+            self, opcode, handle=0, tid=0, rid=0, message=(), obj=(),
+            authid=0, signature=b""):
+        super(OmapiMessage, self).__init__()
+        self.opcode = opcode
+        self.handle = handle
+        self.tid = tid
+        self.rid = rid
+        self.message = list(message)
+        self.obj = list(obj)
+        self.authid = authid
+        self.signature = signature
+
+    def __repr__(self):
+        return "<%s opcode=%d handle=%d tid=%d rid=%d>" % (
+            self.__class__.__name__, self.opcode, self.handle, self.tid,
+            self.rid)
+
+    def get_message(self, name, default=None):
+        return dict(self.message).get(name, default)
+
+    @property
+    def status(self):
+        """The result code of a status message; 0 means success."""
+        result = self.get_message("result")
+        return 0 if result is None else unpack_int(result)
+
+    @property
+    def status_message(self):
+        """The error message of a status message."""
+        text = self.get_message("message", b"")
+        return text.rstrip(b"\0").decode("utf-8", "replace")
+
+    def signed_content(self, authlen):
+        """The bytes of this message that are covered by its signature."""
+        return b"".join((
+            pack_int(authlen), pack_int(self.opcode), pack_int(self.handle),
+            pack_int(self.tid), pack_int(self.rid),
+            pack_values(self.message), pack_values(self.obj),
+        ))
+
+    def encode(self, authid=0, key=None):
+        """Encode this message, signing it with `key` if given."""
+        if key is None:
+            authlen, signature = 0, b""
+        else:
+            authlen = OMAPI_SIGNATURE_SIZE
+            signature = sign(key, self.signed_content(authlen))
+        return pack_int(authid) + self.signed_content(authlen) + signature
+
+    @classmethod
+    def decode(cls, data):
+        """Decode a message from the start of `data`.
+
+        :return: A tuple of the message and the number of bytes consumed, or
+            `None` if `data` does not yet contain a complete message.
+        """
+        try:
+            authid, authlen, opcode, handle, tid, rid = (
+                struct.unpack_from("!6I", data, 0))
+            message, offset = unpack_values(data, OMAPI_HEADER_SIZE)
+            obj, offset = unpack_values(data, offset)
+        except struct.error:
+            return None
+        if len(data) < offset + authlen:
+            return None
+        signature = bytes(data[offset:offset + authlen])
+        return cls(
+            opcode, handle, tid, rid, message, obj, authid,
+            signature), offset + authlen
+
+
+def sign(key, content):
+    return hmac.new(key, content, hashlib.md5).digest()
+
+
+class OmapiClient:
+    """A client for a DHCP server's OMAPI.
+
+    The connection is made when first needed and kept open; call `close`
+    when done with it. Instances are not thread-safe.
+
+    :param address: The address of the DHCP server.
+    :param port: The OMAPI port of the DHCP server.
+    :param shared_key: The base64-encoded HMAC-MD5 key shared with the DHCP
+        server, as generated by `generate_omapi_key`.
+    """
+
+    # The DHCP server keeps a handle for each object opened over a
+    # connection until it's closed. Reconnect once this many have been
+    # opened so that they don't pile up.
+    max_handles = 4096
+
+    def __init__(self, address, port, shared_key, timeout=30.0):
+        super(OmapiClient, self).__init__()
+        self.address = address
+        self.port = port
+        self.shared_key = shared_key
+        self.key = b64decode(shared_key)
+        self.timeout = timeout
+        self.socket = None
+        self.authid = None
+        self.handles = 0
+        self.buffer = bytearray()
+        self.tids = count(random.randint(1, 2 ** 30))
+
+    @property
+    def connected(self):
+        return self.socket is not None
+
+    def connect(self):
+        """Connect and authenticate to the DHCP server."""
+        self.close()
+        try:
+            self.socket = socket.create_connection(
+                (self.address, self.port), self.timeout)
+            self.socket.sendall(
+                pack_int(OMAPI_PROTOCOL_VERSION) + pack_int(OMAPI_HEADER_SIZE))
+            version, header_size = struct.unpack("!II", self._recv(8))
+        except OSError as error:
+            self.close()
+            raise OmapiConnectionError(
+                "Could not connect to %s port %d: %s" % (
+                    self.address, self.port, error)) from error
+        if (version, header_size) != (
+                OMAPI_PROTOCOL_VERSION, OMAPI_HEADER_SIZE):
+            self.close()
+            raise OmapiError(
+                "Unsupported OMAPI protocol version %d (header size %d)." % (
+                    version, header_size))
+        [response] = self.transact([OmapiMessage(
+            OMAPI_OP_OPEN, message=[("type", b"authenticator")], obj=[
+                ("name", OMAPI_KEY_NAME.encode("ascii")),
+                ("algorithm", OMAPI_KEY_ALGORITHM.encode("ascii")),
+            ])])
+        if response.opcode != OMAPI_OP_UPDATE or response.handle == 0:
+            self.close()
+            raise OmapiError(
+                "Could not authenticate to %s port %d: %s" % (
+                    self.address, self.port, response.status_message))
+        self.authid = response.handle
+
+    def close(self):
+        """Close the connection to the DHCP server, if it's open."""
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            finally:
+                self.socket = None
+                self.authid = None
+                self.handles = 0
+                del self.buffer[:]
+
+    def transact(self, requests):
+        """Send all `requests` then wait for all their responses.
+
+        The DHCP server processes requests in the order they're sent.
+
+        :return: A list of responses, in the same order as `requests`.
+        """
+        if self.socket is None:
+            raise OmapiConnectionError("Not connected.")
+        key = None if self.authid is None else self.key
+        authid = 0 if self.authid is None else self.authid
+        for request in requests:
+            request.tid = next(self.tids)
+        data = b"".join(request.encode(authid, key) for request in requests)
+        try:
+            self.socket.sendall(data)
+            responses = {}
+            while len(responses) < len(requests):
+                response = self._read_message()
+                if key is not None and response.signature != sign(
+                        key, response.signed_content(len(response.signature))):
+                    raise OmapiError("Bad signature on OMAPI response.")
+                responses[response.rid] = response
+        except OSError as error:
+            self.close()
+            raise OmapiConnectionError(
+                "Connection to %s port %d failed: %s" % (
+                    self.address, self.port, error)) from error
+        except OmapiError:
+            self.close()
+            raise
+        self.handles += len(requests)
+        try:
+            return [responses[request.tid] for request in requests]
+        except KeyError:
+            self.close()
+            raise OmapiError("Missing response from DHCP server.")
+
+    def _recv(self, size):
+        while len(self.buffer) < size:
+            data = self.socket.recv(65536)
+            if len(data) == 0:
+                raise ConnectionResetError("Connection closed by server.")
+            self.buffer.extend(data)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def _read_message(self):
+        while True:
+            decoded = OmapiMessage.decode(self.buffer)
+            if decoded is None:
+                data = self.socket.recv(65536)
+                if len(data) == 0:
+                    raise ConnectionResetError("Connection closed by server.")
+                self.buffer.extend(data)
+            else:
+                message, size = decoded
+                del self.buffer[:size]
+                return message
+
+    def update_hosts(self, remove=(), create=(), modify=()):
+        """Remove, create and modify host maps, in that order.
+
+        Each host is a dict with "mac" and, except for `remove`, "ip" keys.
+        The host object in the DHCP server is named after the MAC address.
+
+        This takes two round trips to the DHCP server: one to open the host
+        objects to remove and modify, and another to remove, create and
+        modify them. A host that's already been removed or created counts
+        as a success.
+
+        :raise OmapiError: If the DHCP server cannot be reached, or the
+            connection fails. Some changes may have been made.
+        :return: A list of `HostMapFailure`, one for each failed operation.
+        """
+        if self.socket is None or self.handles >= self.max_handles:
+            self.connect()
+        failures = []
+
+        # Round trip #1: look up the host objects to remove and modify.
+        existing = [("remove", host) for host in remove]
+        existing.extend(("modify", host) for host in modify)
+        responses = self.transact([
+            OmapiMessage(
+                OMAPI_OP_OPEN, message=[("type", b"host")],
+                obj=[("name", host_name(host["mac"]))])
+            for _, host in existing
+        ])
+        removing, modifying = [], []
+        for (action, host), response in zip(existing, responses):
+            if response.opcode == OMAPI_OP_UPDATE and response.handle != 0:
+                if action == "remove":
+                    removing.append((host, response.handle))
+                else:
+                    modifying.append((host, response.handle))
+            elif action == "remove" and is_not_found(response):
+                pass  # Already removed.
+            else:
+                failures.append(HostMapFailure(
+                    action, host["mac"], host.get("ip"),
+                    describe_failure(response)))
+
+        # Round trip #2: remove, create then modify.
+        operations, requests = [], []
+        for host, handle in removing:
+            operations.append(("remove", host))
+            requests.append(OmapiMessage(OMAPI_OP_DELETE, handle=handle))
+        for host in create:
+            operations.append(("create", host))
+            requests.append(OmapiMessage(
+                OMAPI_OP_OPEN, message=[
+                    ("create", pack_int(1)), ("exclusive", pack_int(1)),
+                    ("type", b"host"),
+                ], obj=[("name", host_name(host["mac"]))] + host_values(host)))
+        for host, handle in modifying:
+            operations.append(("modify", host))
+            requests.append(OmapiMessage(
+                OMAPI_OP_UPDATE, handle=handle, obj=host_values(host)))
+        responses = self.transact(requests)
+        for (action, host), response in zip(operations, responses):
+            if response.opcode == OMAPI_OP_UPDATE:
+                pass  # Created or modified.
+            elif response.opcode == OMAPI_OP_STATUS and response.status == 0:
+                pass  # Removed or modified.
+            elif action == "create" and is_already_exists(response):
+                pass  # Already created.
+            else:
+                failures.append(HostMapFailure(
+                    action, host["mac"], host.get("ip"),
+                    describe_failure(response)))
+
+        return failures
+
+
+def host_name(mac):
+    """The name of the host object for `mac`; see `Omshell.create`."""
+    return mac.replace(":", "-").encode("ascii")
+
+
+def host_values(host):
+    """The attributes of a host object, as an OMAPI name/value list."""
+    return [
+        ("hardware-address", EUI(host["mac"]).packed),
+        ("hardware-type", pack_int(HARDWARE_TYPE_ETHERNET)),
+        ("ip-address", IPAddress(host["ip"]).packed),
+    ]
+
+
+def is_not_found(response):
+    return (
+        response.opcode == OMAPI_OP_STATUS and
+        "not found" in response.status_message)
+
+
+def is_already_exists(response):
+    return (
+        response.opcode == OMAPI_OP_STATUS and
+        "already exists" in response.status_message)
+
+
+def describe_failure(response):
+    if response.opcode == OMAPI_OP_STATUS:
+        return response.status_message or (
+            "error %d" % response.status)
+    else:
+        return "unexpected response: %r" % (response,)
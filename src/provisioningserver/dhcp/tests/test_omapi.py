@@ -0,0 +1,214 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.dhcp.omapi`."""
+
+__all__ = []
+
+from base64 import (
+    b64decode,
+    b64encode,
+)
+from itertools import count
+import socket
+
+from maastesting.factory import factory
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.testcase import MAASTestCase
+from netaddr import (
+    EUI,
+    IPAddress,
+)
+from provisioningserver.dhcp import omapi
+from provisioningserver.dhcp.omapi import (
+    HostMapFailure,
+    OMAPI_OP_DELETE,
+    OMAPI_OP_OPEN,
+    OMAPI_OP_STATUS,
+    OMAPI_OP_UPDATE,
+    OmapiClient,
+    OmapiConnectionError,
+    OmapiError,
+    OmapiMessage,
+    pack_int,
+)
+from testtools.matchers import (
+    Equals,
+    MatchesListwise,
+    MatchesStructure,
+)
+
+
+def make_key():
+    return b64encode(factory.make_bytes(64)).decode("ascii")
+
+
+def make_message():
+    return OmapiMessage(
+        OMAPI_OP_OPEN, handle=factory.pick_port(), tid=factory.pick_port(),
+        rid=factory.pick_port(), message=[("type", b"host")],
+        obj=[("name", factory.make_name("host").encode("ascii"))])
+
+
+def make_status(message):
+    return OmapiMessage(OMAPI_OP_STATUS, message=[
+        ("result", pack_int(1)), ("message", message.encode("ascii"))])
+
+
+def make_success():
+    return OmapiMessage(OMAPI_OP_STATUS)
+
+
+def make_opened(handle):
+    return OmapiMessage(OMAPI_OP_UPDATE, handle=handle)
+
+
+class TestOmapiMessage(MAASTestCase):
+
+    def test__encode_and_decode_round_trip(self):
+        message = make_message()
+        data = message.encode()
+        decoded, size = OmapiMessage.decode(data + b"trailing")
+        self.assertThat(size, Equals(len(data)))
+        self.assertThat(decoded, MatchesStructure.byEquality(
+            opcode=message.opcode, handle=message.handle, tid=message.tid,
+            rid=message.rid, message=message.message, obj=message.obj,
+            authid=0, signature=b""))
+
+    def test__decode_returns_None_for_partial_message(self):
+        data = make_message().encode()
+        for size in (0, 10, len(data) - 1):
+            self.assertIsNone(OmapiMessage.decode(data[:size]))
+
+    def test__encode_signs_message(self):
+        key = b64decode(make_key())
+        message = make_message()
+        decoded, _ = OmapiMessage.decode(message.encode(authid=7, key=key))
+        self.assertThat(decoded.authid, Equals(7))
+        self.assertThat(decoded.signature, Equals(omapi.sign(
+            key, decoded.signed_content(omapi.OMAPI_SIGNATURE_SIZE))))
+
+    def test__status(self):
+        status = make_status("not found")
+        self.assertThat(status.status, Equals(1))
+        self.assertThat(status.status_message, Equals("not found"))
+
+
+class TestOmapiClientTransact(MAASTestCase):
+
+    def make_client(self):
+        client = OmapiClient("127.0.0.1", 7911, make_key())
+        client.socket, server = socket.socketpair()
+        self.addCleanup(client.close)
+        self.addCleanup(server.close)
+        client.tids = count(1)
+        return client, server
+
+    def test__pipelines_requests_and_matches_responses(self):
+        client, server = self.make_client()
+        # Responses may arrive in any order; they're matched by tid.
+        server.sendall(
+            OmapiMessage(OMAPI_OP_UPDATE, handle=2, rid=2).encode() +
+            OmapiMessage(OMAPI_OP_UPDATE, handle=1, rid=1).encode())
+        responses = client.transact([make_message(), make_message()])
+        self.assertThat([r.handle for r in responses], Equals([1, 2]))
+        self.assertThat(client.handles, Equals(2))
+
+    def test__rejects_bad_signature(self):
+        client, server = self.make_client()
+        client.authid = 1
+        server.sendall(OmapiMessage(
+            OMAPI_OP_UPDATE, rid=1).encode(1, b"wrong key"))
+        self.assertRaises(OmapiError, client.transact, [make_message()])
+        self.assertFalse(client.connected)
+
+    def test__closes_when_connection_is_lost(self):
+        client, server = self.make_client()
+        server.close()
+        self.assertRaises(
+            OmapiConnectionError, client.transact, [make_message()])
+        self.assertFalse(client.connected)
+
+    def test__raises_when_not_connected(self):
+        client = OmapiClient("127.0.0.1", 7911, make_key())
+        self.assertRaises(
+            OmapiConnectionError, client.transact, [make_message()])
+
+
+class TestOmapiClientUpdateHosts(MAASTestCase):
+
+    def setUp(self):
+        super(TestOmapiClientUpdateHosts, self).setUp()
+        self.client = OmapiClient("127.0.0.1", 7911, make_key())
+        self.client.socket = object()  # Pretend to be connected.
+        self.connect = self.patch(self.client, "connect")
+        self.transact = self.patch(self.client, "transact")
+
+    def make_host(self):
+        return {
+            "mac": factory.make_mac_address(),
+            "ip": factory.make_ipv4_address(),
+        }
+
+    def test__opens_then_changes_hosts_in_two_round_trips(self):
+        remove, create, modify = (
+            self.make_host(), self.make_host(), self.make_host())
+        self.transact.side_effect = [
+            [make_opened(10), make_opened(11)],
+            [make_success(), make_opened(12), make_opened(11)],
+        ]
+        failures = self.client.update_hosts([remove], [create], [modify])
+        self.assertThat(failures, Equals([]))
+        [opens], [changes] = (
+            call[0] for call in self.transact.call_args_list)
+        self.assertThat(opens, MatchesListwise([
+            MatchesStructure.byEquality(
+                opcode=OMAPI_OP_OPEN,
+                obj=[("name", omapi.host_name(remove["mac"]))]),
+            MatchesStructure.byEquality(
+                opcode=OMAPI_OP_OPEN,
+                obj=[("name", omapi.host_name(modify["mac"]))]),
+        ]))
+        self.assertThat(changes, MatchesListwise([
+            MatchesStructure.byEquality(opcode=OMAPI_OP_DELETE, handle=10),
+            MatchesStructure.byEquality(opcode=OMAPI_OP_OPEN, obj=[
+                ("name", omapi.host_name(create["mac"])),
+                ("hardware-address", EUI(create["mac"]).packed),
+                ("hardware-type", pack_int(1)),
+                ("ip-address", IPAddress(create["ip"]).packed),
+            ]),
+            MatchesStructure.byEquality(opcode=OMAPI_OP_UPDATE, handle=11),
+        ]))
+
+    def test__ignores_already_removed_and_already_created(self):
+        remove, create = self.make_host(), self.make_host()
+        self.transact.side_effect = [
+            [make_status("not found")],
+            [make_status("already exists")],
+        ]
+        failures = self.client.update_hosts([remove], [create], [])
+        self.assertThat(failures, Equals([]))
+
+    def test__reports_failures(self):
+        create, modify = self.make_host(), self.make_host()
+        self.transact.side_effect = [
+            [make_status("not found")],
+            [make_status("no space")],
+        ]
+        failures = self.client.update_hosts([], [create], [modify])
+        self.assertThat(failures, Equals([
+            HostMapFailure("modify", modify["mac"], modify["ip"], "not found"),
+            HostMapFailure("create", create["mac"], create["ip"], "no space"),
+        ]))
+
+    def test__connects_when_not_connected(self):
+        self.client.socket = None
+        self.transact.return_value = []
+        self.client.update_hosts()
+        self.assertThat(self.connect, MockCalledOnceWith())
+
+    def test__reconnects_after_max_handles(self):
+        self.client.handles = self.client.max_handles
+        self.transact.return_value = []
+        self.client.update_hosts()
+        self.assertThat(self.connect, MockCalledOnceWith())
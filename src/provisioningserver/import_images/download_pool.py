@@ -0,0 +1,154 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Download boot resources several at a time.
+
+Simplestreams mirror writers are handed one item at a time, and downloading
+each before being handed the next leaves an import of several releases and
+architectures bound by latency rather than bandwidth. `DownloadPool` runs
+downloads in a bounded number of threads instead, while limiting how many
+run against any one host at once.
+
+Checksums are computed by the simplestreams content sources as the content
+is read, so each download is verified as it streams in; it's only the
+downloads themselves that need to be run side by side.
+"""
+
+__all__ = [
+    'DownloadPool',
+    'get_content_source_host',
+    ]
+
+from collections import (
+    defaultdict,
+    deque,
+)
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+import threading
+from urllib.parse import urlparse
+
+
+def get_content_source_host(content_source):
+    """Return the host from which `content_source` reads, if any.
+
+    Checksumming content sources wrap another content source, so these are
+    unwrapped first.
+
+    :return: The network location of the content source's URL, or the empty
+        string if it does not read from a URL.
+    """
+    while hasattr(content_source, 'cs'):
+        content_source = content_source.cs
+    url = getattr(content_source, 'url', None)
+    if isinstance(url, str):
+        return urlparse(url).netloc
+    else:
+        return ''
+
+
+class DownloadPool:
+    """Run downloads concurrently, a limited number per host.
+
+    Downloads are queued by host, and a download is only handed to a thread
+    once there's a slot free for its host, so threads are never held up
+    waiting for a busy host while downloads from other hosts are queued.
+
+    :ivar max_workers: The maximum number of downloads to run at once.
+    :ivar max_per_host: The maximum number of downloads to run at once from
+        any one host.
+    """
+
+    max_workers = 4
+    max_per_host = 2
+
+    def __init__(self, max_workers=None, max_per_host=None):
+        super(DownloadPool, self).__init__()
+        if max_workers is not None:
+            self.max_workers = max_workers
+        if max_per_host is not None:
+            self.max_per_host = max_per_host
+        self._executor = ThreadPoolExecutor(self.max_workers)
+        self._lock = threading.Lock()
+        self._queued = defaultdict(deque)
+        self._running = defaultdict(int)
+        self._futures = []
+        self._locks = defaultdict(threading.Lock)
+
+    def submit(self, host, func, *args, **kwargs):
+        """Call `func` with `args` and `kwargs` in a thread.
+
+        :param host: The host from which `func` downloads; see
+            `get_content_source_host`.
+        :return: A `concurrent.futures.Future` for the result of `func`.
+        """
+        future = Future()
+        with self._lock:
+            self._futures.append(future)
+            self._queued[host].append((future, func, args, kwargs))
+            self._dispatch(host)
+        return future
+
+    def lock(self, key):
+        """Return a lock for `key`.
+
+        Downloads that write to the same place must not run side by side; they
+        can hold the same lock to take turns.
+        """
+        with self._lock:
+            return self._locks[key]
+
+    def _dispatch(self, host):
+        """Start queued downloads from `host` while it has slots free.
+
+        The lock must be held.
+        """
+        queued = self._queued[host]
+        while len(queued) > 0 and self._running[host] < self.max_per_host:
+            self._running[host] += 1
+            self._executor.submit(self._run, host, *queued.popleft())
+
+    def _run(self, host, future, func, args, kwargs):
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        finally:
+            with self._lock:
+                self._running[host] -= 1
+                self._dispatch(host)
+
+    def cancel(self):
+        """Cancel all downloads that have not yet started."""
+        with self._lock:
+            queued = [
+                future for downloads in self._queued.values()
+                for future, _, _, _ in downloads
+            ]
+            self._queued.clear()
+            for future in self._futures:
+                future.cancel()
+            # Nothing will start the queued downloads now, so finish them off
+            # here; a cancelled future cannot be waited on until this is done.
+            for future in queued:
+                future.set_running_or_notify_cancel()
+
+    def shutdown(self):
+        """Wait for all downloads to finish, then stop the threads.
+
+        Downloads still queued are run first; call `cancel` beforehand to
+        stop those that have not yet started.
+        """
+        with self._lock:
+            futures = list(self._futures)
+        # Queued downloads are only handed to the executor as running ones
+        # finish, so the executor must not be shut down until all are done.
+        wait(futures)
+        self._executor.shutdown(wait=True)
@@ -8,11 +8,16 @@ __all__ = [
     ]
 
 from datetime import datetime
+from functools import partial
 from gzip import GzipFile
 import os.path
 import tarfile
 
 from provisioningserver.config import is_dev_environment
+from provisioningserver.import_images.download_pool import (
+    DownloadPool,
+    get_content_source_host,
+)
 from provisioningserver.import_images.helpers import (
     get_os_from_product,
     get_signing_policy,
@@ -245,12 +250,17 @@ class RepoWriter(BasicMirrorWriter):
         should be stored.
     :ivar product_mapping: A `ProductMapping` describing the desired boot
         resources.
+    :ivar pool: An optional `DownloadPool`. When given, items are downloaded
+        in its threads and only linked into the snapshot by `finish`.
+        Otherwise each item is downloaded and linked as it is inserted.
     """
 
-    def __init__(self, root_path, store, product_mapping):
+    def __init__(self, root_path, store, product_mapping, pool=None):
         self.root_path = root_path
         self.store = store
         self.product_mapping = product_mapping
+        self.pool = pool
+        self.pending = []
         super(RepoWriter, self).__init__(config={
             # Only download the latest version. Without this all versions
             # will be downloaded from simplestreams.
@@ -277,13 +287,16 @@ class RepoWriter(BasicMirrorWriter):
         ftype = item['ftype']
         filename = os.path.basename(item['path'])
         if ftype == 'archive.tar.xz':
-            links = extract_archive_tar(
+            insert = partial(
+                extract_archive_tar,
                 self.store, filename, tag, checksums, size, contentsource)
         elif ftype == 'root-image.gz':
-            links = insert_root_image(
+            insert = partial(
+                insert_root_image,
                 self.store, tag, checksums, size, contentsource)
         else:
-            links = insert_file(
+            insert = partial(
+                insert_file,
                 self.store, filename, tag, checksums, size, contentsource)
 
         osystem = get_os_from_product(item)
@@ -314,15 +327,43 @@ class RepoWriter(BasicMirrorWriter):
             subarch_parts = item['subarch'].split('-')
             subarch_parts[1] = 'rolling'
             subarches.add('-'.join(subarch_parts))
-        link_resources(
-            snapshot_path=self.root_path, links=links,
+        link = partial(
+            link_resources, snapshot_path=self.root_path,
             osystem=osystem, arch=item['arch'], release=item['release'],
             label=item['label'], subarches=subarches,
             bootloader_type=item.get('bootloader-type'))
 
+        if self.pool is None:
+            link(links=insert())
+        else:
+            future = self.pool.submit(
+                get_content_source_host(contentsource),
+                self._insert_exclusively, tag, insert)
+            self.pending.append((future, link))
+
+    def _insert_exclusively(self, tag, insert):
+        """Call `insert`, but not while another item with `tag` is inserted.
+
+        Items from different products can share content, and so a tag; these
+        are stored in the same place.
+        """
+        with self.pool.lock(tag):
+            return insert()
+
+    def finish(self):
+        """Wait for pending downloads, then link them into the snapshot.
+
+        Downloads are linked in the order in which they were inserted, as
+        they would have been had they been downloaded one by one; later links
+        may replace earlier ones.
+        """
+        pending, self.pending = self.pending, []
+        for future, link in pending:
+            link(links=future.result())
+
 
 def download_boot_resources(path, store, snapshot_path, product_mapping,
-                            keyring_file=None):
+                            keyring_file=None, pool=None):
     """Download boot resources for one simplestreams source.
 
     :param path: The Simplestreams URL for this source.
@@ -334,13 +375,18 @@ def download_boot_resources(path, store, snapshot_path, product_mapping,
         downloaded.
     :param keyring_file: Optional path to a keyring file for verifying
         signatures.
+    :param pool: Optional `DownloadPool` in which to download resources.
+        The returned writer's `finish` method must then be called to wait for
+        the downloads and link them into the snapshot.
+    :return: The `RepoWriter` used.
     """
     maaslog.info("Downloading boot resources from %s", path)
-    writer = RepoWriter(snapshot_path, store, product_mapping)
+    writer = RepoWriter(snapshot_path, store, product_mapping, pool=pool)
     (mirror, rpath) = path_from_mirror_url(path, None)
     policy = get_signing_policy(rpath, keyring_file)
     reader = UrlMirrorReader(mirror, policy=policy)
     writer.sync(reader, rpath)
+    return writer
 
 
 def compose_snapshot_path(storage_path):
@@ -371,6 +417,10 @@ def download_all_boot_resources(
     reflects the currently available boot resources in a proper directory
     hierarchy with subdirectories for architectures, releases, and so on.
 
+    Resources from all sources are downloaded concurrently in a shared
+    `DownloadPool`, and are linked into the snapshot once all of them have
+    been downloaded.
+
     :param sources: List of dicts describing the Simplestreams sources from
         which we should download.
     :param storage_path: Root storage directory,
@@ -391,9 +441,20 @@ def download_all_boot_resources(
     # XXX jtv 2014-04-11: FileStore now also takes an argument called
     # complete_callback, which can be used for progress reporting.
 
-    for source in sources:
-        download_boot_resources(
-            source['url'], store, snapshot_path, product_mapping,
-            keyring_file=source.get('keyring')),
+    pool = DownloadPool()
+    try:
+        writers = [
+            download_boot_resources(
+                source['url'], store, snapshot_path, product_mapping,
+                keyring_file=source.get('keyring'), pool=pool)
+            for source in sources
+        ]
+        for writer in writers:
+            writer.finish()
+    except BaseException:
+        pool.cancel()
+        raise
+    finally:
+        pool.shutdown()
 
     return snapshot_path
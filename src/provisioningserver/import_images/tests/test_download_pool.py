@@ -0,0 +1,130 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.import_images.download_pool`."""
+
+__all__ = []
+
+import threading
+from unittest.mock import (
+    Mock,
+    sentinel,
+)
+
+from maastesting.factory import factory
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.testcase import MAASTestCase
+from provisioningserver.import_images.download_pool import (
+    DownloadPool,
+    get_content_source_host,
+)
+
+
+class TestGetContentSourceHost(MAASTestCase):
+
+    def test_returns_host_of_url(self):
+        host = factory.make_hostname()
+        source = Mock(spec=['url'], url="http://%s:5248/path" % host)
+        self.assertEqual(host + ":5248", get_content_source_host(source))
+
+    def test_unwraps_checksumming_content_sources(self):
+        host = factory.make_hostname()
+        source = Mock(spec=['cs'])
+        source.cs = Mock(spec=['url'], url="http://%s/path" % host)
+        self.assertEqual(host, get_content_source_host(source))
+
+    def test_returns_empty_string_without_url(self):
+        self.assertEqual("", get_content_source_host(None))
+
+
+class TestDownloadPool(MAASTestCase):
+
+    def make_pool(self, *args):
+        pool = DownloadPool(*args)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def submit_blocked(self, pool, host):
+        """Submit a download to `pool` and wait for it to start.
+
+        :return: The download's future, and an event to set to finish it.
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def download():
+            started.set()
+            return release.wait(5)
+
+        self.addCleanup(release.set)
+        future = pool.submit(host, download)
+        self.assertTrue(started.wait(5))
+        return future, release
+
+    def test_returns_result(self):
+        pool = self.make_pool()
+        func = Mock(return_value=sentinel.result)
+        future = pool.submit("host", func, sentinel.arg, kwarg=sentinel.kw)
+        self.assertIs(sentinel.result, future.result(timeout=5))
+        func.assert_called_once_with(sentinel.arg, kwarg=sentinel.kw)
+
+    def test_returns_error(self):
+        pool = self.make_pool()
+        future = pool.submit("host", Mock(side_effect=ZeroDivisionError()))
+        self.assertRaises(ZeroDivisionError, future.result, timeout=5)
+
+    def test_limits_downloads_per_host(self):
+        pool = self.make_pool(4, 1)
+        first, release = self.submit_blocked(pool, "host")
+        second = pool.submit("host", Mock())
+        other = pool.submit("other", Mock())
+        # The other host is not held up by the busy host.
+        other.result(timeout=5)
+        self.assertFalse(second.running() or second.done())
+        release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+
+    def test_limits_downloads_overall(self):
+        pool = self.make_pool(1, 2)
+        first, release = self.submit_blocked(pool, "host")
+        other = pool.submit("other", Mock())
+        self.assertFalse(other.running() or other.done())
+        release.set()
+        first.result(timeout=5)
+        other.result(timeout=5)
+
+    def test_cancel_cancels_queued_downloads(self):
+        pool = self.make_pool(1, 1)
+        first, release = self.submit_blocked(pool, "host")
+        second = pool.submit("host", Mock())
+        pool.cancel()
+        release.set()
+        self.assertTrue(first.result(timeout=5))
+        self.assertTrue(second.cancelled())
+
+    def test_shutdown_waits_for_all_downloads(self):
+        pool = DownloadPool(4, 2)
+        first, release = self.submit_blocked(pool, "host")
+        funcs = [Mock() for _ in range(6)]
+        futures = [pool.submit("host", func) for func in funcs]
+        threading.Timer(0.1, release.set).start()
+        pool.shutdown()
+        self.assertTrue(first.done())
+        for func, future in zip(funcs, futures):
+            self.assertFalse(future.cancelled())
+            self.assertThat(func, MockCalledOnceWith())
+
+    def test_cancel_then_shutdown_waits_for_running_downloads(self):
+        pool = DownloadPool(1, 1)
+        first, release = self.submit_blocked(pool, "host")
+        second = pool.submit("host", Mock())
+        pool.cancel()
+        threading.Timer(0.1, release.set).start()
+        pool.shutdown()
+        self.assertTrue(first.done())
+        self.assertTrue(second.cancelled())
+
+    def test_lock_returns_same_lock_for_key(self):
+        pool = self.make_pool()
+        self.assertIs(pool.lock("key"), pool.lock("key"))
+        self.assertIsNot(pool.lock("key"), pool.lock("other"))
@@ -11,6 +11,7 @@ import os
 import random
 import tarfile
 from unittest import mock
+from unittest.mock import sentinel
 
 from maastesting.factory import factory
 from maastesting.matchers import (
@@ -72,7 +73,44 @@ class TestDownloadAllBootResources(MAASTestCase):
             fake,
             MockCalledWith(
                 source['url'], file_store, snapshot_path, product_mapping,
-                keyring_file=source['keyring']))
+                keyring_file=source['keyring'], pool=mock.ANY))
+
+    def test_shares_pool_between_sources_then_finishes(self):
+        storage_path = self.make_dir()
+        sources = [
+            {'url': factory.make_simple_http_url()}
+            for _ in range(2)
+        ]
+        fake = self.patch(download_resources, 'download_boot_resources')
+        download_resources.download_all_boot_resources(
+            sources=sources, storage_path=storage_path,
+            product_mapping=ProductMapping(), store=None)
+        pools = {kwargs['pool'] for _, kwargs in fake.call_args_list}
+        self.assertEqual(1, len(pools))
+        self.assertIsInstance(
+            pools.pop(), download_resources.DownloadPool)
+        self.assertThat(fake.return_value.finish, MockCalledWith())
+        self.assertEqual(2, fake.return_value.finish.call_count)
+
+    def test_cancels_pending_downloads_on_failure(self):
+        pool = self.patch(download_resources, 'DownloadPool').return_value
+        fake = self.patch(download_resources, 'download_boot_resources')
+        fake.return_value.finish.side_effect = ZeroDivisionError()
+        self.assertRaises(
+            ZeroDivisionError, download_resources.download_all_boot_resources,
+            sources=[{'url': factory.make_simple_http_url()}],
+            storage_path=self.make_dir(), product_mapping=ProductMapping())
+        self.assertThat(pool.cancel, MockCalledOnceWith())
+        self.assertThat(pool.shutdown, MockCalledOnceWith())
+
+    def test_waits_for_downloads_without_cancelling(self):
+        pool = self.patch(download_resources, 'DownloadPool').return_value
+        self.patch(download_resources, 'download_boot_resources')
+        download_resources.download_all_boot_resources(
+            sources=[{'url': factory.make_simple_http_url()}],
+            storage_path=self.make_dir(), product_mapping=ProductMapping())
+        self.assertThat(pool.cancel, MockNotCalled())
+        self.assertThat(pool.shutdown, MockCalledOnceWith())
 
 
 class TestDownloadBootResources(MAASTestCase):
@@ -86,9 +124,10 @@ class TestDownloadBootResources(MAASTestCase):
         file_store = FileStore(cache_path)
         source_url = DEFAULT_IMAGES_URL
 
-        download_resources.download_boot_resources(
+        writer = download_resources.download_boot_resources(
             source_url, file_store, snapshot_path, None, None)
         self.assertEqual(1, len(fake_sync.mock_calls))
+        self.assertIsInstance(writer, download_resources.RepoWriter)
 
 
 class TestComposeSnapshotPath(MAASTestCase):
@@ -391,6 +430,78 @@ class TestRepoWriter(MAASTestCase):
                 label=product['label'], subarches={'ga-16.04', 'generic'},
                 bootloader_type=None))
 
+    def test_downloads_in_pool_and_links_on_finish(self):
+        product_mapping = ProductMapping()
+        subarch = factory.make_name('subarch')
+        product = self.make_product(subarch=subarch)
+        product_mapping.add(product, subarch)
+        pool = download_resources.DownloadPool()
+        self.addCleanup(pool.shutdown)
+        repo_writer = download_resources.RepoWriter(
+            None, None, product_mapping, pool=pool)
+        self.patch(
+            download_resources, 'products_exdata').return_value = product
+        mock_insert_file = self.patch(download_resources, 'insert_file')
+        mock_insert_file.return_value = sentinel.links
+        mock_link_resources = self.patch(download_resources, 'link_resources')
+        repo_writer.insert_item(product, None, None, None, None)
+        self.assertThat(mock_link_resources, MockNotCalled())
+        repo_writer.finish()
+        self.assertThat(
+            mock_insert_file,
+            MockCalledOnceWith(
+                None, os.path.basename(product['path']), product['sha256'],
+                {'sha256': product['sha256']}, product['size'], None))
+        self.assertThat(
+            mock_link_resources,
+            MockCalledOnceWith(
+                snapshot_path=None, links=sentinel.links,
+                osystem=product['os'], arch=product['arch'],
+                release=product['release'], label=product['label'],
+                subarches={subarch}, bootloader_type=None))
+
+    def test_finish_links_in_order_of_insertion(self):
+        product_mapping = ProductMapping()
+        products = [
+            self.make_product(subarch=factory.make_name('subarch'))
+            for _ in range(3)
+        ]
+        for product in products:
+            product_mapping.add(product, product['subarch'])
+        pool = download_resources.DownloadPool()
+        self.addCleanup(pool.shutdown)
+        repo_writer = download_resources.RepoWriter(
+            None, None, product_mapping, pool=pool)
+        self.patch(
+            download_resources, 'products_exdata').side_effect = products
+        self.patch(download_resources, 'insert_file')
+        mock_link_resources = self.patch(download_resources, 'link_resources')
+        for product in products:
+            repo_writer.insert_item(product, None, None, None, None)
+        repo_writer.finish()
+        self.assertEqual(
+            [{product['subarch']} for product in products],
+            [call[2]['subarches'] for call in mock_link_resources.mock_calls])
+
+    def test_finish_raises_download_errors(self):
+        product_mapping = ProductMapping()
+        subarch = factory.make_name('subarch')
+        product = self.make_product(subarch=subarch)
+        product_mapping.add(product, subarch)
+        pool = download_resources.DownloadPool()
+        self.addCleanup(pool.shutdown)
+        repo_writer = download_resources.RepoWriter(
+            None, None, product_mapping, pool=pool)
+        self.patch(
+            download_resources, 'products_exdata').return_value = product
+        self.patch(
+            download_resources, 'insert_file').side_effect = (
+                ZeroDivisionError())
+        mock_link_resources = self.patch(download_resources, 'link_resources')
+        repo_writer.insert_item(product, None, None, None, None)
+        self.assertRaises(ZeroDivisionError, repo_writer.finish)
+        self.assertThat(mock_link_resources, MockNotCalled())
+
 
 class TestLinkResources(MAASTestCase):
     """Tests for `LinkResources`()."""
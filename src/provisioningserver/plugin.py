@@ -41,7 +41,7 @@ class ProvisioningServiceMaker:
         self.tapname = name
         self.description = description
 
-    def _makeImageService(self, resource_root):
+    def _makeImageService(self, resource_root, rpc_service):
         from provisioningserver.rackdservices.image import (
             BootImageEndpointService)
         from twisted.internet.endpoints import AdoptedStreamServerEndpoint
@@ -72,7 +72,8 @@ class ProvisioningServiceMaker:
         site_endpoint.socket = s  # Prevent garbage collection.
 
         image_service = BootImageEndpointService(
-            resource_root=resource_root, endpoint=site_endpoint)
+            resource_root=resource_root, endpoint=site_endpoint,
+            client_service=rpc_service)
         image_service.setName("image_service")
         return image_service
 
@@ -113,6 +114,14 @@ class ProvisioningServiceMaker:
         image_download_service.setName("image_download")
         return image_download_service
 
+    def _makeBootImageWatcherService(self, rpc_service, tftp_root):
+        from provisioningserver.rackdservices.boot_image_watcher import (
+            BootImageWatcherService)
+        boot_image_watcher = BootImageWatcherService(
+            rpc_service, tftp_root, reactor)
+        boot_image_watcher.setName("boot_image_watcher")
+        return boot_image_watcher
+
     def _makeLeaseSocketService(self, rpc_service):
         from provisioningserver.rackdservices.lease_socket_service import (
             LeaseSocketService)
@@ -173,9 +182,10 @@ class ProvisioningServiceMaker:
         yield self._makeNodePowerMonitorService()
         yield self._makeServiceMonitorService(rpc_service)
         yield self._makeImageDownloadService(rpc_service, tftp_root)
+        yield self._makeBootImageWatcherService(rpc_service, tftp_root)
         yield self._makeNetworkTimeProtocolService(rpc_service)
         # The following are network-accessible services.
-        yield self._makeImageService(tftp_root)
+        yield self._makeImageService(tftp_root, rpc_service)
         yield self._makeTFTPService(tftp_root, tftp_port, rpc_service)
 
     def _configureCrochet(self):
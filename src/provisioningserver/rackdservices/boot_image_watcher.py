@@ -0,0 +1,240 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Watch the TFTP root for boot images coming and going.
+
+`BootImageWatcherService` maintains this rack's boot images, as returned by
+`list_boot_images`, from filesystem events rather than by searching the
+whole TFTP root again. The TFTP root -- ``boot-resources/current`` -- is a
+symlink that the importer swaps once a new snapshot is complete, so two
+things are watched:
+
+- The directory containing the TFTP root. When the symlink is replaced the
+  whole snapshot it points to is searched, and then watched in turn.
+
+- The snapshot, recursively. A change within it searches again beneath
+  only the image that was changed, and a change to maas.meta updates the
+  meta-data of every image without searching at all.
+
+Events are gathered for `BootImageWatcherService.delay` seconds before
+being applied, so an import's flurry of events leads to one update. When
+the boot images change they are reported to every region controller this
+rack is connected to, so the region need not ask for them. If an update
+fails the whole TFTP root is searched again after
+`BootImageWatcherService.retry_delay` seconds, so that the region is not
+left with a stale report.
+"""
+
+__all__ = [
+    "BootImageWatcherService",
+]
+
+import os
+
+from provisioningserver.boot.tftppath import BootImageCatalogue
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.rpc import boot_images
+from twisted.application.service import Service
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    DeferredList,
+    DeferredLock,
+    inlineCallbacks,
+)
+from twisted.internet.inotify import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    INotify,
+    INotifyError,
+)
+from twisted.internet.threads import deferToThread
+from twisted.python.filepath import FilePath
+
+
+log = LegacyLogger()
+
+# Changes that might add, remove, or alter a boot image.
+WATCH_MASK = (
+    IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE)
+
+
+class BootImageNotifier(INotify):
+    """An `INotify` that keeps watching when a watched directory is removed.
+
+    `INotify` stops watching altogether when any directory it watches is
+    removed, but removing boot images is one of the changes to watch for.
+    """
+
+    def loseConnection(self, *args, **kwargs):
+        """Ignored; see `close`."""
+
+    def close(self):
+        """Stop watching."""
+        INotify.loseConnection(self)
+
+
+class BootImageWatcherService(Service, object):
+    """Maintain this rack's boot images as the TFTP root changes.
+
+    :ivar catalogue: The `BootImageCatalogue` of the TFTP root. This is
+        updated only in a thread, with `lock` held.
+    :ivar snapshot: The watched snapshot, i.e. the target of the TFTP root.
+    :ivar reported: The boot images last reported to the region.
+    """
+
+    delay = 1.0  # seconds.
+    retry_delay = 30.0  # seconds.
+
+    def __init__(self, client_service, tftp_root, clock=reactor):
+        """
+        :param client_service: A `ClusterClientService` instance.
+        :param tftp_root: The path to the TFTP root directory.
+        :param clock: An `IReactorTime` instance.
+        """
+        super(BootImageWatcherService, self).__init__()
+        self.client_service = client_service
+        self.tftp_root = FilePath(tftp_root)
+        self.clock = clock
+        self.catalogue = BootImageCatalogue(tftp_root)
+        self.lock = DeferredLock()
+        self.notifier = None
+        self.snapshot = None
+        self.reported = None
+        self.changed = set()
+        self.call = None
+
+    def startService(self):
+        super(BootImageWatcherService, self).startService()
+        try:
+            self.notifier = BootImageNotifier()
+            self.notifier.startReading()
+            self.notifier.watch(
+                self.tftp_root.parent(), mask=(IN_CREATE | IN_MOVED_TO),
+                callbacks=[self._rootChanged])
+        except (INotifyError, OSError):
+            # The region will ask for boot images instead.
+            log.err(None, "Cannot watch %s for boot images." % (
+                self.tftp_root.path,))
+            self._closeNotifier()
+        else:
+            boot_images.WATCHING_BOOT_IMAGES = True
+            self._schedule(())
+
+    def stopService(self):
+        boot_images.WATCHING_BOOT_IMAGES = False
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.call = None
+        self._closeNotifier()
+        super(BootImageWatcherService, self).stopService()
+        # Wait for any update in progress.
+        return self.lock.run(lambda: None)
+
+    def _closeNotifier(self):
+        if self.notifier is not None:
+            self.notifier.close()
+            self.notifier = None
+            self.snapshot = None
+
+    def _rootChanged(self, watch, path, mask):
+        if path.basename() == self.tftp_root.asBytesMode().basename():
+            self._schedule(())
+
+    def _snapshotChanged(self, watch, path, mask):
+        if self.snapshot is not None:
+            try:
+                segments = path.segmentsFrom(self.snapshot.asBytesMode())
+            except ValueError:
+                pass  # Not in the current snapshot.
+            else:
+                self._schedule(tuple(map(os.fsdecode, segments)))
+
+    def _schedule(self, path, delay=None):
+        """Update the images beneath `path` after `delay` seconds.
+
+        :param path: A tuple of path elements relative to the TFTP root. An
+            empty tuple means that everything is to be searched.
+        :param delay: The number of seconds to wait; `self.delay` by default.
+            If an update is already scheduled this is ignored.
+        """
+        self.changed.add(path)
+        if self.call is None:
+            self.call = self.clock.callLater(
+                self.delay if delay is None else delay, self._update)
+
+    def _update(self):
+        self.call = None
+        changed, self.changed = self.changed, set()
+        if () in changed:
+            self._watchSnapshot()
+        d = self.lock.run(deferToThread, self._updateCatalogue, changed)
+        d.addCallbacks(self._report, self._updateFailed)
+        d.addErrback(log.err, "Failed to report boot images.")
+        return d
+
+    def _updateFailed(self, failure):
+        """Search everything again later, once an update has failed.
+
+        The catalogue may have been left part way through the update, and
+        the region relies on the last report until it's told otherwise.
+        """
+        log.err(failure, "Failed to update boot images.")
+        if self.running:
+            self._schedule((), self.retry_delay)
+
+    def _updateCatalogue(self, changed):
+        self.catalogue.update(changed)
+        return self.catalogue.list_boot_images()
+
+    def _watchSnapshot(self):
+        """Watch the target of the TFTP root, if it has changed."""
+        snapshot = self.tftp_root.realpath()
+        if snapshot == self.snapshot:
+            return
+        elif self.snapshot is not None:
+            d = self.lock.run(self._ignore, self.snapshot)
+            d.addErrback(log.err, "Failed to stop watching %s." % (
+                self.snapshot.path,))
+        self.snapshot = snapshot
+        if snapshot.isdir():
+            try:
+                self.notifier.watch(
+                    snapshot, mask=WATCH_MASK, autoAdd=True,
+                    callbacks=[self._snapshotChanged], recursive=True)
+            except (INotifyError, OSError):
+                log.err(None, "Cannot watch %s for boot images." % (
+                    snapshot.path,))
+
+    @inlineCallbacks
+    def _ignore(self, snapshot):
+        """Stop watching `snapshot`, which may be being removed.
+
+        The snapshot is searched for its directories in a thread. Events
+        from it in the meantime are ignored by `_snapshotChanged`.
+        """
+        try:
+            directories = yield deferToThread(self._findDirectories, snapshot)
+        except OSError:
+            return  # Removed already; its watches went with it.
+        if self.notifier is None:
+            return  # Stopped watching altogether.
+        for path in directories:
+            try:
+                self.notifier.ignore(path)
+            except (KeyError, INotifyError):
+                pass  # Not watched, or removed already.
+
+    def _findDirectories(self, snapshot):
+        return [path for path in snapshot.walk() if path.isdir()]
+
+    def _report(self, images):
+        boot_images.update_boot_images(images)
+        if images != self.reported:
+            self.reported = images
+            return DeferredList([
+                boot_images.report_boot_images(client, images)
+                for client in self.client_service.getAllClients()
+            ])
@@ -0,0 +1,266 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""HTTP boot file serving for the rack controller.
+
+Machines that boot over HTTP -- UEFI HTTP boot, or iPXE chain-loaded from
+TFTP -- can fetch kernels, initrds, and squashfs images over TCP at line
+rate, rather than block by block over TFTP. `HTTPBootResource` serves the
+same tree as `TFTPService`:
+
+- Static files are served from the resource root with Twisted's `File`,
+  which supports byte ranges, and conditional requests. Connections are
+  persistent, courtesy of `Site`, so a machine fetches all its files over
+  one connection.
+
+- Boot configurations are generated on the fly by the same `TFTPBackend`
+  used by the TFTP service, and so share its boot configuration cache.
+
+Each file served is recorded in `http_boot_metrics`: requests, errors,
+bytes sent, and time taken, from which throughput is derived. Requests for
+files that do not exist are recorded together, as "unknown".
+"""
+
+__all__ = [
+    "http_boot_metrics",
+    "HTTPBootMetrics",
+    "HTTPBootMetricsResource",
+    "HTTPBootResource",
+]
+
+from collections import defaultdict
+from functools import partial
+import json
+import time
+
+from provisioningserver.boot import get_remote_mac
+from provisioningserver.rackdservices.tftp import (
+    log_request,
+    TFTPBackend,
+)
+from tftp.backend import FilesystemReader
+from tftp.errors import (
+    AccessViolation,
+    FileNotFound,
+)
+from twisted.python.context import call
+from twisted.web import http
+from twisted.web.resource import (
+    getChildForRequest,
+    Resource,
+)
+from twisted.web.server import NOT_DONE_YET
+from twisted.web.static import File
+
+# How much of a generated boot file is read at a time.
+READ_SIZE = 2 ** 16
+
+# The name under which requests for files that do not exist are recorded.
+UNKNOWN_FILE = "unknown"
+
+
+class FileMetrics:
+    """Metrics for a single file, or kind of generated file."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def asdict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "throughput": (
+                (self.bytes / self.seconds) if self.seconds > 0 else None),
+        }
+
+
+class HTTPBootMetrics:
+    """A registry of `FileMetrics` for files served over HTTP.
+
+    Static files are recorded by path. Generated files are recorded by the
+    name of the boot method that generated them, e.g. "pxe", so that there
+    is not an entry for every machine. Likewise, requests for files that do
+    not exist are all recorded as `UNKNOWN_FILE`.
+
+    Used only from the reactor thread, so it is not locked.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__()
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.files = defaultdict(FileMetrics)
+        self.started = time.time()
+
+    def request_started(self, name):
+        """Record that a request for `name` has been received.
+
+        :return: A token to pass to `request_finished`.
+        """
+        metrics = self.files[name]
+        metrics.requests += 1
+        metrics.in_flight += 1
+        return self.clock()
+
+    def request_finished(self, name, token, sent, failed=False):
+        """Record that a request for `name` has been responded to.
+
+        :param token: The token returned from `request_started`.
+        :param sent: The number of bytes of content sent.
+        :param failed: Whether the request failed.
+        """
+        metrics = self.files[name]
+        metrics.in_flight -= 1
+        metrics.bytes += sent
+        metrics.seconds += self.clock() - token
+        if failed:
+            metrics.errors += 1
+
+    def asdict(self):
+        """Return all metrics as a JSON-compatible dictionary."""
+        return {
+            "since": self.started,
+            "files": {
+                name: metrics.asdict()
+                for name, metrics in self.files.items()
+            },
+        }
+
+
+# The registry for this process.
+http_boot_metrics = HTTPBootMetrics()
+
+
+class StaticBootFile(File):
+    """A `File` that does not list directories."""
+
+    def directoryListing(self):
+        return self.forbidden
+
+
+class HTTPBootResource(Resource):
+    """Serve boot files, and generated boot configurations, over HTTP.
+
+    :ivar backend: The `TFTPBackend` used to generate boot configurations.
+    :ivar static: The `File` used to serve everything else.
+    """
+
+    isLeaf = True
+
+    def __init__(self, resource_root, client_service, metrics=None):
+        """
+        :param resource_root: The root directory for boot files.
+        :param client_service: The RPC client service for the rack controller.
+        :param metrics: An `HTTPBootMetrics`; `http_boot_metrics` by default.
+        """
+        super(HTTPBootResource, self).__init__()
+        self.backend = TFTPBackend(resource_root, client_service)
+        self.static = StaticBootFile(self.backend.base.path)
+        self.metrics = http_boot_metrics if metrics is None else metrics
+
+    def render_GET(self, request):
+        file_name = b"/".join(request.postpath)
+        # Set up the same call context as python-tx-tftp does for TFTP, so
+        # that the back-end can find the local and remote addresses.
+        local, remote = request.getHost(), request.client
+        context = {
+            "local": (local.host, local.port),
+            "remote": (remote.host, remote.port),
+        }
+        mac_address = call(context, get_remote_mac)
+        if mac_address is not None:
+            log_request(mac_address, file_name)
+        d = call(context, self.backend.get_boot_method, file_name)
+        d.addCallback(self._render, request, file_name, context)
+        d.addErrback(self._renderFailure, request)
+        return NOT_DONE_YET
+
+    def _render(self, result, request, file_name, context):
+        boot_method, _ = result
+        if boot_method is None:
+            resource = getChildForRequest(self.static, request)
+            if isinstance(resource, File) and resource.isfile():
+                name = file_name.decode("utf-8", "replace")
+            else:
+                # Anyone can request any path, so don't record each one.
+                name = UNKNOWN_FILE
+            self._startMetrics(request, name)
+            self._renderStatic(resource, request)
+        else:
+            self._startMetrics(request, boot_method.name)
+            d = call(
+                context, self.backend.handle_boot_method, file_name, result)
+            d.addErrback(self.backend.no_response_errback, file_name)
+            d.addErrback(self.backend.all_is_lost_errback)
+            d.addCallback(self._renderReader, request)
+            return d
+
+    def _startMetrics(self, request, name):
+        token = self.metrics.request_started(name)
+
+        def finished(result):
+            self.metrics.request_finished(
+                name, token, request.sentLength,
+                failed=(result is not None or request.code >= 400))
+
+        request.notifyFinish().addBoth(finished)
+
+    def _renderStatic(self, resource, request):
+        resource = getChildForRequest(resource, request)
+        body = resource.render(request)
+        if body is not NOT_DONE_YET:
+            request.write(body)
+            request.finish()
+
+    def _renderReader(self, reader, request):
+        if isinstance(reader, FilesystemReader):
+            # Serve files by path, so that byte ranges are supported.
+            reader.finish()
+            request.postpath = []
+            self._renderStatic(StaticBootFile(reader.file_path.path), request)
+        else:
+            try:
+                data = b"".join(iter(partial(reader.read, READ_SIZE), b""))
+            finally:
+                reader.finish()
+            request.setHeader(b"Content-Type", b"application/octet-stream")
+            request.setHeader(b"Content-Length", b"%d" % len(data))
+            request.write(data)
+            request.finish()
+
+    def _renderFailure(self, failure, request):
+        if failure.check(FileNotFound):
+            request.setResponseCode(http.NOT_FOUND)
+        elif failure.check(AccessViolation):
+            request.setResponseCode(http.FORBIDDEN)
+        else:
+            # The back-end has logged anything unexpected already.
+            request.setResponseCode(http.INTERNAL_SERVER_ERROR)
+        request.setHeader(b"Content-Type", b"text/plain; charset=utf-8")
+        request.write(failure.getErrorMessage().encode("utf-8"))
+        request.finish()
+
+
+class HTTPBootMetricsResource(Resource):
+    """Report `HTTPBootMetrics` as JSON."""
+
+    isLeaf = True
+
+    def __init__(self, metrics=None):
+        super(HTTPBootMetricsResource, self).__init__()
+        self.metrics = http_boot_metrics if metrics is None else metrics
+
+    def render_GET(self, request):
+        request.setHeader(b"Content-Type", b"application/json")
+        return json.dumps(self.metrics.asdict(), sort_keys=True).encode(
+            "utf-8")
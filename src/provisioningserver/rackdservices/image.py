@@ -7,6 +7,10 @@ __all__ = [
     "BootImageEndpointService",
     ]
 
+from provisioningserver.rackdservices.http import (
+    HTTPBootMetricsResource,
+    HTTPBootResource,
+)
 from provisioningserver.utils.twisted import reducedWebLogFormatter
 from twisted.application.internet import StreamServerEndpointService
 from twisted.web.resource import Resource
@@ -17,17 +21,28 @@ from twisted.web.static import File
 class BootImageEndpointService(StreamServerEndpointService):
     """Service for serving images to the TFTP server via HTTP
 
+    Boot files, including generated boot configurations, are also served to
+    machines that boot via HTTP under ``boot/``, and metrics for those are
+    reported under ``boot-metrics``.
+
     :ivar site: The twisted site resource
 
     """
 
-    def __init__(self, resource_root, endpoint):
+    def __init__(self, resource_root, endpoint, client_service=None):
         """
         :param resource_root: The root directory for the Image server.
         :param endpoint: The endpoint on which the server should listen.
+        :param client_service: The RPC client service for the rack controller,
+            used to generate boot configurations. If `None`, boot files are
+            not served.
 
         """
         resource = Resource()
         resource.putChild(b'images', File(resource_root))
+        if client_service is not None:
+            resource.putChild(
+                b'boot', HTTPBootResource(resource_root, client_service))
+            resource.putChild(b'boot-metrics', HTTPBootMetricsResource())
         self.site = Site(resource, logFormatter=reducedWebLogFormatter)
         super(BootImageEndpointService, self).__init__(endpoint, self.site)
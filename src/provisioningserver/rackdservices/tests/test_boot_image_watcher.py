@@ -0,0 +1,254 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the `boot_image_watcher` module."""
+
+__all__ = []
+
+import os
+from unittest.mock import (
+    Mock,
+    sentinel,
+)
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    MockAnyCall,
+    MockCalledOnceWith,
+)
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.rackdservices import (
+    boot_image_watcher as watcher_module,
+)
+from provisioningserver.rackdservices.boot_image_watcher import (
+    BootImageWatcherService,
+)
+from provisioningserver.rpc import boot_images
+from provisioningserver.rpc.region import UpdateBootImages
+from provisioningserver.testing.os import make_osystem
+from provisioningserver.utils.twisted import pause
+from twisted.internet.defer import (
+    inlineCallbacks,
+    maybeDeferred,
+    succeed,
+)
+from twisted.internet.task import Clock
+from twisted.python.filepath import FilePath
+
+
+class TestBootImageWatcherService(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestBootImageWatcherService, self).setUp()
+        self.patch(boot_images, "CACHED_BOOT_IMAGES", None)
+        self.patch(boot_images, "WATCHING_BOOT_IMAGES", False)
+        self.patch(watcher_module, "deferToThread", maybeDeferred)
+        self.boot_resources = os.path.realpath(self.make_dir())
+        self.tftp_root = os.path.join(self.boot_resources, "current")
+        self.osystem = factory.make_name("osystem")
+        make_osystem(self, self.osystem, ["install"])
+
+    def make_snapshot(self):
+        """Make a snapshot, and point the TFTP root at it."""
+        snapshot = os.path.join(
+            self.boot_resources, factory.make_name("snapshot"))
+        os.mkdir(snapshot)
+        link = factory.make_name(os.path.join(self.boot_resources, "link"))
+        os.symlink(snapshot, link)
+        os.rename(link, self.tftp_root)
+        return snapshot
+
+    def make_image_path(self):
+        return (
+            self.osystem, factory.make_name("arch"),
+            factory.make_name("subarch"), factory.make_name("release"),
+            factory.make_name("label"))
+
+    def make_image(self, snapshot):
+        path = self.make_image_path()
+        os.makedirs(os.path.join(snapshot, *path))
+        return path
+
+    def make_service(self):
+        client = Mock(return_value=succeed({}))
+        client_service = Mock()
+        client_service.getAllClients.return_value = [client]
+        service = BootImageWatcherService(
+            client_service, self.tftp_root, Clock())
+        self.addCleanup(service.stopService)
+        return service, client
+
+    def test_startService_watches_boot_images(self):
+        self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        self.assertTrue(boot_images.WATCHING_BOOT_IMAGES)
+        self.assertEqual({()}, service.changed)
+        self.assertTrue(service.call.active())
+
+    def test_startService_falls_back_when_it_cannot_watch(self):
+        self.tftp_root = os.path.join(self.make_dir(), "missing", "current")
+        service, client = self.make_service()
+        with TwistedLoggerFixture() as logger:
+            service.startService()
+        self.assertFalse(boot_images.WATCHING_BOOT_IMAGES)
+        self.assertIsNone(service.notifier)
+        self.assertIn("Cannot watch", logger.output)
+
+    def test_stopService_stops_watching(self):
+        self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        call = service.call
+        service.stopService()
+        self.assertFalse(boot_images.WATCHING_BOOT_IMAGES)
+        self.assertFalse(call.active())
+        self.assertIsNone(service.notifier)
+
+    def test_update_watches_and_reports_boot_images(self):
+        snapshot = self.make_snapshot()
+        self.make_image(snapshot)
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        self.assertEqual(FilePath(snapshot), service.snapshot)
+        images = service.catalogue.list_boot_images()
+        self.assertEqual(1, len(images))
+        self.assertEqual(images, boot_images.CACHED_BOOT_IMAGES)
+        self.assertThat(client, MockCalledOnceWith(
+            UpdateBootImages, images=images))
+
+    def test_update_does_not_report_unchanged_boot_images(self):
+        snapshot = self.make_snapshot()
+        self.make_image(snapshot)
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        service._schedule(())
+        service.clock.advance(service.delay)
+        self.assertThat(client, MockCalledOnceWith(
+            UpdateBootImages, images=boot_images.CACHED_BOOT_IMAGES))
+
+    def test_snapshot_changes_update_only_changed_images(self):
+        snapshot = self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        path = self.make_image(snapshot)
+        update = self.patch(service.catalogue, "update")
+        for name in ("linux", "initrd.gz"):
+            service._snapshotChanged(
+                sentinel.watch, FilePath(snapshot).preauthChild(
+                    os.path.join(*path + (name,))).asBytesMode(),
+                sentinel.mask)
+        service.clock.advance(service.delay)
+        self.assertThat(update, MockCalledOnceWith({
+            path + ("linux",), path + ("initrd.gz",)}))
+
+    def test_ignores_changes_outside_snapshot(self):
+        self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        service._snapshotChanged(
+            sentinel.watch, FilePath(self.make_dir()).asBytesMode(),
+            sentinel.mask)
+        self.assertEqual(set(), service.changed)
+
+    def test_replacing_tftp_root_rebuilds_from_new_snapshot(self):
+        self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        snapshot = self.make_snapshot()
+        self.make_image(snapshot)
+        service._rootChanged(
+            sentinel.watch, FilePath(self.tftp_root).asBytesMode(),
+            sentinel.mask)
+        service.clock.advance(service.delay)
+        self.assertEqual(FilePath(snapshot), service.snapshot)
+        self.assertEqual(1, len(boot_images.CACHED_BOOT_IMAGES))
+        self.assertThat(client, MockAnyCall(
+            UpdateBootImages, images=boot_images.CACHED_BOOT_IMAGES))
+
+    def test_replacing_tftp_root_ignores_old_snapshot_in_thread(self):
+        old_snapshot = self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        deferToThread = self.patch(watcher_module, "deferToThread")
+        deferToThread.side_effect = maybeDeferred
+        ignore = self.patch(service.notifier, "ignore")
+        self.make_snapshot()
+        service._rootChanged(
+            sentinel.watch, FilePath(self.tftp_root).asBytesMode(),
+            sentinel.mask)
+        service.clock.advance(service.delay)
+        self.assertThat(deferToThread, MockAnyCall(
+            service._findDirectories, FilePath(old_snapshot)))
+        self.assertThat(ignore, MockCalledOnceWith(FilePath(old_snapshot)))
+
+    def test_update_failure_searches_everything_again_later(self):
+        snapshot = self.make_snapshot()
+        self.make_image(snapshot)
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        self.patch(service.catalogue, "update").side_effect = (
+            factory.make_exception())
+        service._schedule(self.make_image(snapshot)[:1])
+        with TwistedLoggerFixture() as logger:
+            service.clock.advance(service.delay)
+        self.assertIn("Failed to update boot images.", logger.output)
+        self.assertEqual({()}, service.changed)
+        self.assertEqual(
+            service.clock.seconds() + service.retry_delay,
+            service.call.getTime())
+        del service.catalogue.update
+        service.clock.advance(service.retry_delay)
+        self.assertEqual(2, len(boot_images.CACHED_BOOT_IMAGES))
+        self.assertThat(client, MockAnyCall(
+            UpdateBootImages, images=boot_images.CACHED_BOOT_IMAGES))
+
+    def test_update_failure_after_stopping_does_not_search_again(self):
+        snapshot = self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        self.patch(service.catalogue, "update").side_effect = (
+            factory.make_exception())
+        service.stopService()
+        service.changed = {self.make_image(snapshot)[:1]}
+        with TwistedLoggerFixture():
+            service._update()
+        self.assertIsNone(service.call)
+        self.assertEqual(set(), service.changed)
+
+    def test_ignores_other_changes_beside_tftp_root(self):
+        self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        service._rootChanged(
+            sentinel.watch, FilePath(self.make_dir()).asBytesMode(),
+            sentinel.mask)
+        self.assertEqual(set(), service.changed)
+
+    @inlineCallbacks
+    def test_receives_filesystem_events(self):
+        snapshot = self.make_snapshot()
+        service, client = self.make_service()
+        service.startService()
+        service.clock.advance(service.delay)
+        path = self.make_image(snapshot)
+        for _ in range(40):
+            if len(service.changed) > 0:
+                break
+            yield pause(0.05)
+        self.assertIn(path[:1], service.changed)
@@ -0,0 +1,259 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the `http` module."""
+
+__all__ = []
+
+import json
+import os
+from unittest.mock import Mock
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.boot import BytesReader
+from provisioningserver.boot.pxe import PXEBootMethod
+from provisioningserver.rackdservices import http as http_module
+from provisioningserver.rackdservices.http import (
+    HTTPBootMetrics,
+    HTTPBootMetricsResource,
+    HTTPBootResource,
+    UNKNOWN_FILE,
+)
+from provisioningserver.rpc.exceptions import BootConfigNoResponse
+from testtools.matchers import Equals
+from twisted.internet.address import IPv4Address
+from twisted.internet.defer import (
+    fail,
+    inlineCallbacks,
+    returnValue,
+    succeed,
+)
+from twisted.web import http
+from twisted.web.server import NOT_DONE_YET
+from twisted.web.test.requesthelper import DummyRequest
+
+
+class BootRequest(DummyRequest):
+    """A `DummyRequest` that records what a `Request` would."""
+
+    def __init__(self, postpath):
+        super(BootRequest, self).__init__(postpath)
+        self.client = IPv4Address(
+            "TCP", factory.make_ipv4_address(), factory.pick_port())
+        self.sentLength = 0
+
+    @property
+    def code(self):
+        return http.OK if self.responseCode is None else self.responseCode
+
+    def write(self, data):
+        self.sentLength += len(data)
+        super(BootRequest, self).write(data)
+
+
+class TestHTTPBootMetrics(MAASTestCase):
+
+    def test_records_requests(self):
+        clock = Mock(side_effect=[10.0, 12.0, 20.0, 21.0])
+        metrics = HTTPBootMetrics(clock=clock)
+        token1 = metrics.request_started("file")
+        token2 = metrics.request_started("file")
+        self.assertEqual(2, metrics.files["file"].in_flight)
+        metrics.request_finished("file", token1, 1000)
+        metrics.request_finished("file", token2, 0, failed=True)
+        self.assertThat(metrics.asdict()["files"], Equals({
+            "file": {
+                "requests": 2,
+                "errors": 1,
+                "in_flight": 0,
+                "bytes": 1000,
+                "seconds": 19.0,
+                "throughput": 1000 / 19.0,
+            },
+        }))
+
+    def test_throughput_is_None_without_time(self):
+        metrics = HTTPBootMetrics(clock=Mock(return_value=1.0))
+        metrics.request_finished(
+            "file", metrics.request_started("file"), 0)
+        self.assertIsNone(metrics.asdict()["files"]["file"]["throughput"])
+
+
+class TestHTTPBootResource(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestHTTPBootResource, self).setUp()
+        self.patch(http_module, "get_remote_mac").return_value = None
+        self.patch(http_module, "log_request")
+
+    def make_resource(self, root=None):
+        if root is None:
+            root = self.make_dir()
+        resource = HTTPBootResource(root, Mock(), metrics=HTTPBootMetrics())
+        self.patch(resource.backend, "get_boot_method").return_value = (
+            succeed((None, None)))
+        return resource
+
+    @inlineCallbacks
+    def render(self, resource, path, headers=None):
+        request = BootRequest(path.split(b"/"))
+        for name, value in (headers or {}).items():
+            request.requestHeaders.setRawHeaders(name, [value])
+        finished = request.notifyFinish()
+        self.assertIs(NOT_DONE_YET, resource.render(request))
+        yield finished
+        returnValue(request)
+
+    @inlineCallbacks
+    def test_serves_static_file(self):
+        data = factory.make_bytes(1000)
+        root = self.make_dir()
+        factory.make_file(root, "file", data)
+        resource = self.make_resource(root)
+        request = yield self.render(resource, b"file")
+        self.assertEqual(data, b"".join(request.written))
+        metrics = resource.metrics.files["file"]
+        self.assertEqual((1, 0, 1000), (
+            metrics.requests, metrics.errors, metrics.bytes))
+
+    @inlineCallbacks
+    def test_serves_static_file_in_subdirectory(self):
+        data = factory.make_bytes()
+        root = self.make_dir()
+        os.mkdir(os.path.join(root, "dir"))
+        factory.make_file(os.path.join(root, "dir"), "file", data)
+        request = yield self.render(self.make_resource(root), b"dir/file")
+        self.assertEqual(data, b"".join(request.written))
+
+    @inlineCallbacks
+    def test_serves_byte_ranges(self):
+        data = factory.make_bytes(1000)
+        root = self.make_dir()
+        factory.make_file(root, "file", data)
+        request = yield self.render(
+            self.make_resource(root), b"file", {b"range": b"bytes=100-199"})
+        self.assertEqual(http.PARTIAL_CONTENT, request.responseCode)
+        self.assertEqual(data[100:200], b"".join(request.written))
+
+    @inlineCallbacks
+    def test_does_not_list_directories(self):
+        root = self.make_dir()
+        os.mkdir(os.path.join(root, "dir"))
+        request = yield self.render(self.make_resource(root), b"dir/")
+        self.assertEqual(http.FORBIDDEN, request.responseCode)
+
+    @inlineCallbacks
+    def test_missing_file_is_not_found(self):
+        resource = self.make_resource()
+        request = yield self.render(resource, b"missing")
+        self.assertEqual(http.NOT_FOUND, request.responseCode)
+        self.assertEqual(1, resource.metrics.files[UNKNOWN_FILE].errors)
+        self.assertNotIn("missing", resource.metrics.files)
+
+    @inlineCallbacks
+    def test_missing_files_share_metrics(self):
+        resource = self.make_resource()
+        for _ in range(3):
+            yield self.render(resource, factory.make_name("missing").encode(
+                "ascii"))
+        self.assertEqual([UNKNOWN_FILE], list(resource.metrics.files))
+        self.assertEqual(3, resource.metrics.files[UNKNOWN_FILE].requests)
+
+    @inlineCallbacks
+    def test_directory_is_recorded_as_unknown(self):
+        root = self.make_dir()
+        os.mkdir(os.path.join(root, "dir"))
+        resource = self.make_resource(root)
+        yield self.render(resource, b"dir/")
+        self.assertEqual([UNKNOWN_FILE], list(resource.metrics.files))
+
+    @inlineCallbacks
+    def test_logs_request(self):
+        mac_address = factory.make_mac_address()
+        http_module.get_remote_mac.return_value = mac_address
+        yield self.render(self.make_resource(), b"file")
+        self.assertThat(
+            http_module.log_request,
+            MockCalledOnceWith(mac_address, b"file"))
+
+    @inlineCallbacks
+    def test_does_not_log_request_without_mac(self):
+        yield self.render(self.make_resource(), b"file")
+        self.assertThat(http_module.log_request, MockNotCalled())
+
+    def patch_boot_method(self, resource, reader):
+        method = PXEBootMethod()
+        resource.backend.get_boot_method.return_value = succeed(
+            (method, {"mac": factory.make_mac_address("-")}))
+        self.patch(resource.backend, "get_boot_method_reader")
+        resource.backend.get_boot_method_reader.return_value = reader
+        return method
+
+    @inlineCallbacks
+    def test_serves_generated_config(self):
+        config = factory.make_name("config").encode("ascii")
+        resource = self.make_resource()
+        method = self.patch_boot_method(
+            resource, succeed(BytesReader(config)))
+        request = yield self.render(resource, b"pxelinux.cfg/default")
+        self.assertEqual(config, b"".join(request.written))
+        self.assertEqual(
+            [b"%d" % len(config)],
+            request.responseHeaders.getRawHeaders(b"content-length"))
+        # Generated configurations are recorded by boot method.
+        self.assertEqual(
+            len(config), resource.metrics.files[method.name].bytes)
+
+    @inlineCallbacks
+    def test_passes_addresses_to_backend(self):
+        resource = self.make_resource()
+        self.patch_boot_method(resource, succeed(BytesReader(b"")))
+        request = yield self.render(resource, b"pxelinux.cfg/default")
+        [[_, params], _] = resource.backend.get_boot_method_reader.call_args
+        self.assertEqual(
+            (request.getHost().host, request.client.host),
+            (params["local_ip"], params["remote_ip"]))
+
+    @inlineCallbacks
+    def test_config_without_response_is_not_found(self):
+        resource = self.make_resource()
+        self.patch_boot_method(resource, fail(BootConfigNoResponse()))
+        request = yield self.render(resource, b"pxelinux.cfg/default")
+        self.assertEqual(http.NOT_FOUND, request.responseCode)
+
+    @inlineCallbacks
+    def test_config_failure_is_server_error(self):
+        resource = self.make_resource()
+        self.patch_boot_method(resource, fail(ZeroDivisionError()))
+        with TwistedLoggerFixture() as logger:
+            request = yield self.render(resource, b"pxelinux.cfg/default")
+        self.assertEqual(http.INTERNAL_SERVER_ERROR, request.responseCode)
+        self.assertIn("TFTP back-end failed.", logger.output)
+        self.assertEqual(1, resource.metrics.files["pxe"].errors)
+
+
+class TestHTTPBootMetricsResource(MAASTestCase):
+
+    def test_renders_metrics_as_json(self):
+        metrics = HTTPBootMetrics()
+        metrics.request_finished("file", metrics.request_started("file"), 10)
+        resource = HTTPBootMetricsResource(metrics)
+        request = DummyRequest([])
+        body = resource.render(request)
+        self.assertEqual(
+            [b"application/json"],
+            request.responseHeaders.getRawHeaders(b"content-type"))
+        self.assertEqual(
+            json.loads(json.dumps(metrics.asdict())),
+            json.loads(body.decode("utf-8")))
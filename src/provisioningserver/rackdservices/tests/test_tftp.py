@@ -42,12 +42,19 @@ from provisioningserver.events import EVENT_TYPES
 from provisioningserver.rackdservices import tftp as tftp_module
 from provisioningserver.rackdservices.tftp import (
     get_boot_image,
+    get_reader_source,
     log_request,
+    make_reader,
     Port,
     TFTPBackend,
     TFTPService,
     UDPServer,
 )
+from provisioningserver.rackdservices.tftp_transfer import (
+    MappedFileReader,
+    WindowedTFTP,
+)
+from provisioningserver.rpc.boot_configs import BootConfigCache
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.rpc.region import GetBootConfig
 from provisioningserver.testing.boot_images import (
@@ -66,12 +73,14 @@ from testtools.matchers import (
     MatchesAll,
     MatchesStructure,
 )
-from tftp.backend import IReader
+from tftp.backend import (
+    FilesystemReader,
+    IReader,
+)
 from tftp.errors import (
     BackendError,
     FileNotFound,
 )
-from tftp.protocol import TFTP
 from twisted.application import internet
 from twisted.application.service import MultiService
 from twisted.internet import reactor
@@ -80,6 +89,8 @@ from twisted.internet.address import (
     IPv6Address,
 )
 from twisted.internet.defer import (
+    Deferred,
+    DeferredList,
     fail,
     inlineCallbacks,
     succeed,
@@ -87,6 +98,7 @@ from twisted.internet.defer import (
 from twisted.internet.protocol import Protocol
 from twisted.internet.task import Clock
 from twisted.python import context
+from twisted.python.filepath import FilePath
 from zope.interface.verify import verifyObject
 
 
@@ -217,6 +229,9 @@ class TestTFTPBackend(MAASTestCase):
         from provisioningserver import boot
         self.patch(boot, "find_mac_via_arp")
         self.patch(tftp_module, 'log_request')
+        # Don't cache boot configurations between requests, or tests; the
+        # cache is exercised explicitly below.
+        self.patch(tftp_module, "boot_config_cache", BootConfigCache(ttl=0))
 
     def test_init(self):
         temp_dir = self.make_dir()
@@ -234,12 +249,13 @@ class TestTFTPBackend(MAASTestCase):
 
     @inlineCallbacks
     def test_get_reader_regular_file(self):
-        # TFTPBackend.get_reader() returns a regular FilesystemReader for
+        # TFTPBackend.get_reader() returns a reader of the mapped file for
         # paths not matching re_config_file.
         self.patch(tftp_module, 'get_remote_mac')
         data = factory.make_string().encode("ascii")
         reader = yield self.get_reader(data)
         self.addCleanup(reader.finish)
+        self.assertIsInstance(reader, MappedFileReader)
         self.assertEqual(len(data), reader.size)
         self.assertEqual(data, reader.read(len(data)))
         self.assertEqual(b"", reader.read(1))
@@ -662,6 +678,79 @@ class TestTFTPBackend(MAASTestCase):
         self.assertThat(method.get_reader, MockCalledOnceWith(
             backend, kernel_params=fake_kernel_params, **params_with_ip))
 
+    @inlineCallbacks
+    def test_get_boot_method_reader_caches_rendered_config(self):
+        self.patch(tftp_module, "boot_config_cache", BootConfigCache())
+        backend = TFTPBackend(self.make_dir(), Mock())
+        fake_kernel_params = make_kernel_parameters()
+        get_kernel_params = self.patch(backend, "get_kernel_params")
+        get_kernel_params.return_value = succeed(fake_kernel_params)
+        method = PXEBootMethod()
+        fake_render_result = factory.make_name("render").encode("utf-8")
+        self.patch(method, "get_reader").return_value = (
+            BytesReader(fake_render_result))
+
+        params = {
+            "mac": factory.make_mac_address("-"),
+            "local_ip": factory.make_ipv4_address(),
+            "remote_ip": factory.make_ipv4_address(),
+        }
+        reader1 = yield backend.get_boot_method_reader(method, dict(params))
+        reader2 = yield backend.get_boot_method_reader(method, dict(params))
+
+        # Each request gets its own reader of the same configuration.
+        self.assertIsNot(reader1, reader2)
+        self.assertEqual(
+            [fake_render_result, fake_render_result],
+            [reader1.read(10000), reader2.read(10000)])
+        # The configuration was generated once.
+        self.assertThat(get_kernel_params, MockCalledOnceWith(params))
+        self.assertThat(method.get_reader, MockCalledOnceWith(
+            backend, kernel_params=fake_kernel_params, **params))
+
+    @inlineCallbacks
+    def test_get_boot_method_reader_coalesces_concurrent_requests(self):
+        self.patch(tftp_module, "boot_config_cache", BootConfigCache())
+        backend = TFTPBackend(self.make_dir(), Mock())
+        kernel_params = Deferred()
+        get_kernel_params = self.patch(backend, "get_kernel_params")
+        get_kernel_params.return_value = kernel_params
+        method = PXEBootMethod()
+        fake_render_result = factory.make_name("render").encode("utf-8")
+        self.patch(method, "get_reader").return_value = (
+            BytesReader(fake_render_result))
+
+        params = {
+            "arch": factory.make_name("arch"),
+            "local_ip": factory.make_ipv4_address(),
+            "remote_ip": factory.make_ipv4_address(),
+        }
+        d1 = backend.get_boot_method_reader(method, dict(params))
+        d2 = backend.get_boot_method_reader(method, dict(params))
+        kernel_params.callback(make_kernel_parameters())
+        readers = yield DeferredList([d1, d2], fireOnOneErrback=True)
+
+        self.assertEqual(
+            [fake_render_result, fake_render_result],
+            [reader.read(10000) for _, reader in readers])
+        self.assertThat(get_kernel_params, MockCalledOnceWith(params))
+
+    def test_get_reader_source_and_make_reader_for_bytes(self):
+        data = factory.make_bytes()
+        source = get_reader_source(BytesReader(data))
+        self.assertEqual(data, source)
+        self.assertEqual(data, make_reader(source).read(10000))
+
+    def test_get_reader_source_and_make_reader_for_file(self):
+        data = factory.make_bytes()
+        path = FilePath(self.make_file(contents=data))
+        source = get_reader_source(FilesystemReader(path))
+        self.assertEqual(path, source)
+        reader = make_reader(source)
+        self.addCleanup(reader.finish)
+        self.assertIsInstance(reader, FilesystemReader)
+        self.assertEqual(data, reader.read(10000))
+
     @inlineCallbacks
     def test_get_boot_method_reader_returns_rendered_params_for_local(self):
         # Fake configuration parameters, as discovered from the file path.
@@ -899,7 +988,7 @@ class TestTFTPService(MAASTestCase):
                 lambda backend: backend.client_service,
                 Equals(example_client_service)))
         expected_protocol = MatchesAll(
-            IsInstance(TFTP),
+            IsInstance(WindowedTFTP),
             AfterPreprocessing(
                 lambda protocol: protocol.backend,
                 expected_backend))
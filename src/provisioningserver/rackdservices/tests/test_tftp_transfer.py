@@ -0,0 +1,414 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the `tftp_transfer` module."""
+
+__all__ = []
+
+from collections import OrderedDict
+import os
+from unittest.mock import (
+    Mock,
+    sentinel,
+)
+
+from maastesting.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from provisioningserver.boot import BytesReader
+from provisioningserver.rackdservices import tftp_transfer
+from provisioningserver.rackdservices.tftp_transfer import (
+    MappedFileReader,
+    MappedFiles,
+    WindowedReadSession,
+    WindowedTFTP,
+)
+from testtools.matchers import (
+    Equals,
+    Is,
+)
+from tftp.backend import FilesystemReader
+from tftp.datagram import (
+    ACKDatagram,
+    DATADatagram,
+    ERR_FILE_NOT_FOUND,
+    ERRORDatagram,
+    OACKDatagram,
+    RRQDatagram,
+    split_opcode,
+    TFTPDatagramFactory,
+)
+from tftp.errors import FileNotFound
+from tftp.protocol import TFTP
+from twisted.internet.defer import (
+    fail,
+    inlineCallbacks,
+    succeed,
+)
+from twisted.internet.task import Clock
+from twisted.python.filepath import FilePath
+
+
+class FakeTransport:
+    """A connected datagram transport that records what is written."""
+
+    def __init__(self):
+        super(FakeTransport, self).__init__()
+        self.remote = None
+        self.written = []
+        self.listening = True
+
+    def connect(self, host, port):
+        self.remote = host, port
+
+    def write(self, data, addr=None):
+        self.written.append(TFTPDatagramFactory(*split_opcode(data)))
+
+    def stopListening(self):
+        self.listening = False
+
+    def pop(self):
+        """Return, and forget, the datagrams written."""
+        written, self.written = self.written, []
+        return written
+
+
+class TestMappedFiles(MAASTestCase):
+
+    def test_open_returns_reader(self):
+        data = factory.make_bytes(1000)
+        path = self.make_file(contents=data)
+        mapped_files = MappedFiles()
+        reader = mapped_files.open(path)
+        self.addCleanup(reader.finish)
+        self.assertIsInstance(reader, MappedFileReader)
+        self.assertEqual(len(data), reader.size)
+        self.assertEqual(data[:600], reader.read(600))
+        self.assertEqual(data[600:], reader.read(600))
+        self.assertEqual(b"", reader.read(600))
+
+    def test_open_shares_mapping_between_readers(self):
+        path = self.make_file(contents=factory.make_bytes())
+        mapped_files = MappedFiles()
+        reader1 = mapped_files.open(path)
+        reader2 = mapped_files.open(path)
+        self.assertIs(reader1.mapping, reader2.mapping)
+        self.assertEqual(1, len(mapped_files.mappings))
+        reader1.finish()
+        self.assertFalse(reader2.mapping.closed)
+        reader2.finish()
+        self.assertEqual({}, mapped_files.mappings)
+
+    def test_open_maps_replaced_file_anew(self):
+        path = self.make_file(contents=factory.make_bytes())
+        mapped_files = MappedFiles()
+        reader1 = mapped_files.open(path)
+        self.addCleanup(reader1.finish)
+        data = factory.make_bytes()
+        replacement = self.make_file(contents=data)
+        os.rename(replacement, path)
+        reader2 = mapped_files.open(path)
+        self.addCleanup(reader2.finish)
+        self.assertIsNot(reader1.mapping, reader2.mapping)
+        self.assertEqual(data, reader2.read(len(data)))
+
+    def test_finish_is_idempotent(self):
+        path = self.make_file(contents=factory.make_bytes())
+        mapped_files = MappedFiles()
+        reader = mapped_files.open(path)
+        reader.finish()
+        reader.finish()
+        self.assertEqual({}, mapped_files.mappings)
+        self.assertEqual(b"", reader.read(100))
+
+    def test_map_reader_maps_filesystem_reader(self):
+        data = factory.make_bytes()
+        path = FilePath(self.make_file(contents=data))
+        reader = MappedFiles().map_reader(FilesystemReader(path))
+        self.addCleanup(reader.finish)
+        self.assertIsInstance(reader, MappedFileReader)
+        self.assertEqual(data, reader.read(len(data)))
+
+    def test_map_reader_does_not_map_empty_file(self):
+        path = FilePath(self.make_file(contents=b""))
+        reader = FilesystemReader(path)
+        self.addCleanup(reader.finish)
+        self.assertThat(MappedFiles().map_reader(reader), Is(reader))
+
+    def test_map_reader_returns_other_readers(self):
+        reader = BytesReader(factory.make_bytes())
+        self.assertThat(MappedFiles().map_reader(reader), Is(reader))
+
+
+class TestWindowedReadSession(MAASTestCase):
+
+    def make_session(self, data, options=None):
+        if options is None:
+            options = OrderedDict()
+        clock = Clock()
+        remote = factory.make_ipv4_address(), factory.pick_port()
+        reader = BytesReader(data)
+        session = WindowedReadSession(remote, reader, options, clock=clock)
+        session.transport = FakeTransport()
+        return session, clock
+
+    def assertData(self, expected, datagrams):
+        """Assert `datagrams` are DATA for `expected` block numbers."""
+        self.assertEqual(
+            [DATADatagram.opcode] * len(expected),
+            [datagram.opcode for datagram in datagrams])
+        self.assertEqual(
+            expected, [datagram.blocknum for datagram in datagrams])
+
+    def test_negotiate_defaults(self):
+        session, _ = self.make_session(b"")
+        self.assertEqual(
+            (512, 1, OrderedDict()),
+            (session.blksize, session.windowsize, session.options))
+
+    def test_negotiate_accepts_options(self):
+        data = factory.make_bytes(100)
+        session, _ = self.make_session(data, OrderedDict((
+            (b"BLKSIZE", b"1468"), (b"windowsize", b"16"),
+            (b"timeout", b"2"), (b"tsize", b"0"))))
+        self.assertEqual((1468, 16), (session.blksize, session.windowsize))
+        self.assertEqual((2, 2, 2), session.timeouts)
+        # Options are acknowledged as the client sent them.
+        self.assertEqual(OrderedDict((
+            (b"BLKSIZE", b"1468"), (b"windowsize", b"16"),
+            (b"timeout", b"2"), (b"tsize", b"100"))), session.options)
+
+    def test_negotiate_ignores_bad_options(self):
+        session, _ = self.make_session(b"", OrderedDict((
+            (b"blksize", b"7"), (b"windowsize", b"0"),
+            (b"timeout", b"foo"), (b"bogus", b"1"))))
+        self.assertEqual((512, 1), (session.blksize, session.windowsize))
+        self.assertEqual(OrderedDict(), session.options)
+
+    def test_negotiate_limits_windowsize(self):
+        session, _ = self.make_session(b"", OrderedDict((
+            (b"windowsize", b"1000"),)))
+        self.assertEqual(64, session.windowsize)
+        self.assertEqual(
+            OrderedDict(((b"windowsize", b"64"),)), session.options)
+
+    def test_negotiate_limits_windowsize_by_bytes_in_flight(self):
+        session, _ = self.make_session(b"", OrderedDict((
+            (b"blksize", b"65464"), (b"windowsize", b"64"))))
+        self.assertEqual(4, session.windowsize)
+
+    def test_sends_window_without_options(self):
+        session, _ = self.make_session(factory.make_bytes(512 * 3))
+        session.startProtocol()
+        self.assertEqual(session.remote, session.transport.remote)
+        # The window size is 1.
+        self.assertData([1], session.transport.pop())
+        session.acknowledged(1)
+        self.assertData([2], session.transport.pop())
+
+    def test_sends_options_then_window(self):
+        data = factory.make_bytes(100 * 10)
+        session, _ = self.make_session(data, OrderedDict((
+            (b"blksize", b"100"), (b"windowsize", b"4"))))
+        session.startProtocol()
+        [oack] = session.transport.pop()
+        self.assertEqual(OACKDatagram.opcode, oack.opcode)
+        self.assertEqual(session.options, oack.options)
+        session.acknowledged(0)
+        datagrams = session.transport.pop()
+        self.assertData([1, 2, 3, 4], datagrams)
+        self.assertEqual(data[:400], b"".join(d.data for d in datagrams))
+
+    def test_transfers_whole_file(self):
+        data = factory.make_bytes(100 * 10)
+        session, _ = self.make_session(data, OrderedDict((
+            (b"blksize", b"100"), (b"windowsize", b"4"))))
+        session.startProtocol()
+        session.transport.pop()
+        session.acknowledged(0)
+        received = session.transport.pop()
+        session.acknowledged(4)
+        received += session.transport.pop()
+        session.acknowledged(8)
+        received += session.transport.pop()
+        # The file is a multiple of the block size, so the final block is
+        # empty, which ends the transfer in the middle of the window.
+        self.assertData(list(range(1, 12)), received)
+        self.assertEqual(data, b"".join(d.data for d in received))
+        self.assertFalse(session.deferred.called)
+        session.acknowledged(11)
+        self.assertTrue(session.deferred.called)
+        self.assertThat(session.deferred.result, Is(True))
+        self.assertFalse(session.transport.listening)
+        self.assertTrue(session.reader.buffer.closed)
+
+    def test_resumes_after_partial_acknowledgement(self):
+        session, _ = self.make_session(
+            factory.make_bytes(100 * 10), OrderedDict((
+                (b"blksize", b"100"), (b"windowsize", b"4"))))
+        session.startProtocol()
+        session.acknowledged(0)
+        session.transport.pop()
+        # Block 3 was lost, so the client acknowledges block 2.
+        session.acknowledged(2)
+        self.assertData([3, 4, 5, 6], session.transport.pop())
+
+    def test_resends_window_on_duplicate_acknowledgement(self):
+        session, _ = self.make_session(
+            factory.make_bytes(100 * 10), OrderedDict((
+                (b"blksize", b"100"), (b"windowsize", b"4"))))
+        session.startProtocol()
+        session.acknowledged(0)
+        session.transport.pop()
+        # Block 1 was lost, so the client acknowledges block 0 again.
+        session.acknowledged(0)
+        self.assertData([1, 2, 3, 4], session.transport.pop())
+
+    def test_ignores_duplicate_acknowledgement_in_lock_step(self):
+        session, _ = self.make_session(factory.make_bytes(512 * 3))
+        session.startProtocol()
+        session.acknowledged(1)
+        session.transport.pop()
+        session.acknowledged(1)
+        self.assertEqual([], session.transport.pop())
+
+    def test_ignores_acknowledgement_of_unsent_blocks(self):
+        session, _ = self.make_session(
+            factory.make_bytes(100 * 10), OrderedDict((
+                (b"blksize", b"100"), (b"windowsize", b"4"))))
+        session.startProtocol()
+        session.acknowledged(0)
+        session.transport.pop()
+        session.acknowledged(5)
+        self.assertEqual([], session.transport.pop())
+        self.assertEqual(0, session.acked)
+
+    def test_block_numbers_wrap_around(self):
+        session, _ = self.make_session(
+            factory.make_bytes(8 * 65540), OrderedDict((
+                (b"blksize", b"8"), (b"windowsize", b"4"))))
+        session.startProtocol()
+        session.acknowledged(0)
+        session.transport.pop()
+        for blocknum in range(4, 65536, 4):
+            session.transport.pop()
+            session.acknowledged(blocknum)
+        self.assertData([65533, 65534, 65535, 0], session.transport.pop())
+        session.acknowledged(0)
+        self.assertData([1, 2, 3, 4], session.transport.pop())
+        self.assertEqual(65536, session.acked)
+
+    def test_resends_window_on_timeout(self):
+        session, clock = self.make_session(
+            factory.make_bytes(100 * 10), OrderedDict((
+                (b"blksize", b"100"), (b"windowsize", b"2"))))
+        session.startProtocol()
+        session.acknowledged(0)
+        session.transport.pop()
+        clock.advance(1)
+        self.assertData([1, 2], session.transport.pop())
+        clock.advance(3)
+        self.assertData([1, 2], session.transport.pop())
+
+    def test_resends_options_on_timeout(self):
+        session, clock = self.make_session(
+            factory.make_bytes(100), OrderedDict((
+                (b"windowsize", b"2"),)))
+        session.startProtocol()
+        session.transport.pop()
+        clock.advance(1)
+        [oack] = session.transport.pop()
+        self.assertEqual(OACKDatagram.opcode, oack.opcode)
+
+    def test_gives_up_after_timeouts(self):
+        session, clock = self.make_session(factory.make_bytes(512 * 3))
+        session.startProtocol()
+        for timeout in (1, 3, 7):
+            clock.advance(timeout)
+        self.assertTrue(session.deferred.called)
+        self.assertThat(session.deferred.result, Is(False))
+        self.assertFalse(session.transport.listening)
+        self.assertEqual([], clock.getDelayedCalls())
+
+    def test_stops_on_error_from_client(self):
+        session, clock = self.make_session(factory.make_bytes(512 * 3))
+        session.startProtocol()
+        error = ERRORDatagram.from_code(ERR_FILE_NOT_FOUND)
+        session.datagramReceived(error.to_wire(), session.remote)
+        self.assertThat(session.deferred.result, Is(False))
+        self.assertEqual([], clock.getDelayedCalls())
+
+    def test_datagramReceived_handles_acknowledgements(self):
+        session, _ = self.make_session(factory.make_bytes(512 * 3))
+        session.startProtocol()
+        session.transport.pop()
+        ack = ACKDatagram(1)
+        session.datagramReceived(ack.to_wire(), session.remote)
+        self.assertData([2], session.transport.pop())
+
+    def test_datagramReceived_ignores_garbage(self):
+        session, _ = self.make_session(factory.make_bytes(512 * 3))
+        session.startProtocol()
+        session.transport.pop()
+        session.datagramReceived(b"\xff\xff", session.remote)
+        self.assertEqual([], session.transport.pop())
+
+
+class TestWindowedTFTP(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def make_request(self, options):
+        return RRQDatagram(factory.make_name("file").encode("ascii"),
+                           b"octet", options)
+
+    def test_is_TFTP(self):
+        self.assertIsInstance(WindowedTFTP(Mock()), TFTP)
+
+    def test_defers_to_TFTP_without_windowsize(self):
+        startSession = self.patch(TFTP, "_startSession")
+        startSession.return_value = sentinel.session
+        protocol = WindowedTFTP(Mock())
+        datagram = self.make_request(OrderedDict(((b"blksize", b"1468"),)))
+        addr = factory.make_ipv4_address(), factory.pick_port()
+        self.assertThat(
+            protocol._startSession(datagram, addr, b"octet"),
+            Is(sentinel.session))
+        self.assertThat(startSession, MockCalledOnceWith(
+            datagram, addr, b"octet"))
+
+    @inlineCallbacks
+    def test_starts_windowed_session(self):
+        listenUDP = self.patch(tftp_transfer.reactor, "listenUDP")
+        backend = Mock()
+        reader = BytesReader(factory.make_bytes())
+        backend.get_reader.return_value = succeed(reader)
+        protocol = WindowedTFTP(backend)
+        protocol.transport = Mock()
+        datagram = self.make_request(OrderedDict(((b"windowsize", b"8"),)))
+        addr = factory.make_ipv4_address(), factory.pick_port()
+        session = yield protocol._startSession(datagram, addr, b"octet")
+        self.assertIsInstance(session, WindowedReadSession)
+        self.assertThat(session.reader, Is(reader))
+        self.assertThat(session.windowsize, Equals(8))
+        self.assertThat(listenUDP, MockCalledOnceWith(0, session, ""))
+
+    @inlineCallbacks
+    def test_reports_errors_from_backend(self):
+        listenUDP = self.patch(tftp_transfer.reactor, "listenUDP")
+        backend = Mock()
+        backend.get_reader.return_value = fail(FileNotFound(b"file"))
+        protocol = WindowedTFTP(backend)
+        protocol.transport = Mock()
+        datagram = self.make_request(OrderedDict(((b"windowsize", b"8"),)))
+        addr = factory.make_ipv4_address(), factory.pick_port()
+        yield protocol._startSession(datagram, addr, b"octet")
+        self.assertThat(listenUDP, MockNotCalled())
+        self.assertThat(protocol.transport.write, MockCalledOnceWith(
+            ERRORDatagram.from_code(ERR_FILE_NOT_FOUND).to_wire(), addr))
@@ -17,6 +17,7 @@ from socket import (
 from netaddr import IPAddress
 from provisioningserver.boot import (
     BootMethodRegistry,
+    BytesReader,
     get_remote_mac,
 )
 from provisioningserver.drivers import ArchitectureRegistry
@@ -30,6 +31,11 @@ from provisioningserver.logger import (
     get_maas_logger,
     LegacyLogger,
 )
+from provisioningserver.rackdservices.tftp_transfer import (
+    mapped_files,
+    WindowedTFTP,
+)
+from provisioningserver.rpc.boot_configs import boot_config_cache
 from provisioningserver.rpc.boot_images import list_boot_images
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.rpc.region import (
@@ -46,12 +52,14 @@ from provisioningserver.utils.twisted import (
     deferred,
     RPCFetcher,
 )
-from tftp.backend import FilesystemSynchronousBackend
+from tftp.backend import (
+    FilesystemReader,
+    FilesystemSynchronousBackend,
+)
 from tftp.errors import (
     BackendError,
     FileNotFound,
 )
-from tftp.protocol import TFTP
 from twisted.application import internet
 from twisted.application.service import MultiService
 from twisted.internet import (
@@ -112,6 +120,33 @@ def get_boot_image(params):
     return None
 
 
+def get_reader_source(reader):
+    """Return something from which copies of `reader` can be made.
+
+    Boot methods return readers for configurations generated in memory, or
+    for files on disk. Readers cannot be shared between transfers, so the
+    configuration is kept as bytes, or the file as its `FilePath`; see
+    `make_reader`.
+    """
+    if isinstance(reader, BytesReader):
+        return reader.buffer.getvalue()
+    elif isinstance(reader, FilesystemReader):
+        reader.finish()
+        return reader.file_path
+    else:
+        return reader
+
+
+def make_reader(source):
+    """Return a new reader for a source from `get_reader_source`."""
+    if isinstance(source, bytes):
+        return BytesReader(source)
+    elif isinstance(source, FilePath):
+        return FilesystemReader(source)
+    else:
+        return source
+
+
 def log_request(mac_address, file_name, clock=reactor):
     """Log a TFTP request.
 
@@ -307,15 +342,28 @@ class TFTPBackend(FilesystemSynchronousBackend):
     def get_boot_method_reader(self, boot_method, params):
         """Return an `IReader` for a boot method.
 
+        What the boot method generates is cached briefly in
+        `boot_config_cache`, keyed on the boot method and `params` -- which
+        include the MAC address or architecture, and the local and remote IP
+        addresses -- so that the retries PXE firmware makes, and concurrent
+        identical requests, cost a single `GetBootConfig` call.
+
         :param boot_method: Boot method that is generating the config
         :param params: Parameters so far obtained, typically from the file
             path requested.
         """
-        def generate(kernel_params):
-            return boot_method.get_reader(
-                self, kernel_params=kernel_params, **params)
+        def generate():
+            d = self.get_kernel_params(params)
+            d.addCallback(
+                lambda kernel_params: boot_method.get_reader(
+                    self, kernel_params=kernel_params, **params))
+            d.addCallback(get_reader_source)
+            return d
 
-        return self.get_kernel_params(params).addCallback(generate)
+        key = boot_method.name, tuple(sorted(params.items()))
+        d = boot_config_cache.get(key, params.get("mac"), generate)
+        d.addCallback(make_reader)
+        return d
 
     @staticmethod
     def no_response_errback(failure, file_name):
@@ -328,7 +376,10 @@ class TFTPBackend(FilesystemSynchronousBackend):
     def handle_boot_method(self, file_name: TFTPPath, result):
         boot_method, params = result
         if boot_method is None:
-            return super(TFTPBackend, self).get_reader(file_name)
+            # Serve files from a memory mapping shared with other transfers
+            # of the same file.
+            reader = super(TFTPBackend, self).get_reader(file_name)
+            return mapped_files.map_reader(reader)
 
         # Map pxe namespace architecture names to MAAS's.
         arch = params.get("arch")
@@ -475,7 +526,7 @@ class TFTPService(MultiService, object):
         for address in addrs_desired - addrs_established:
             if not IPAddress(address).is_link_local():
                 tftp_service = UDPServer(
-                    self.port, TFTP(self.backend), interface=address)
+                    self.port, WindowedTFTP(self.backend), interface=address)
                 tftp_service.setName(address)
                 tftp_service.setServiceParent(self)
 
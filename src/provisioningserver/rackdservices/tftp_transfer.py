@@ -0,0 +1,473 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""High-throughput TFTP transfers.
+
+Kernels and initrds are tens of megabytes. Served in lock-step, one 512 byte
+block per round trip as RFC 1350 has it, they take a long time to transfer,
+and each block costs a trip through the reactor. This module provides:
+
+- `MappedFileReader`, which reads files via a memory mapping shared by all
+  concurrent transfers of the same file, so that many machines booting at
+  once don't each open and read their own copy.
+
+- `WindowedReadSession`, which sends a window of blocks for each
+  acknowledgement, as described in RFC 7440, and negotiates block sizes up
+  to the maximum allowed by RFC 2348.
+
+- `WindowedTFTP`, a `TFTP` protocol that uses `WindowedReadSession` for
+  clients that ask for a window size; other clients are served by
+  `python-tx-tftp` as before.
+"""
+
+__all__ = [
+    "mapped_files",
+    "MappedFileReader",
+    "WindowedReadSession",
+    "WindowedTFTP",
+]
+
+from collections import OrderedDict
+from functools import partial
+import mmap
+import os
+from socket import (
+    SO_SNDBUF,
+    SOL_SOCKET,
+)
+
+from netaddr import IPAddress
+from provisioningserver.logger import LegacyLogger
+from tftp.backend import (
+    FilesystemReader,
+    IReader,
+)
+from tftp.datagram import (
+    DATADatagram,
+    ERR_ACCESS_VIOLATION,
+    ERR_FILE_NOT_FOUND,
+    ERR_ILLEGAL_OP,
+    ERR_NOT_DEFINED,
+    ERRORDatagram,
+    OACKDatagram,
+    OP_ACK,
+    OP_ERROR,
+    OP_RRQ,
+    split_opcode,
+    TFTPDatagramFactory,
+)
+from tftp.errors import (
+    AccessViolation,
+    BackendError,
+    FileNotFound,
+    Unsupported,
+    WireProtocolError,
+)
+from tftp.protocol import TFTP
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    Deferred,
+    inlineCallbacks,
+    returnValue,
+)
+from twisted.internet.protocol import DatagramProtocol
+from twisted.python.context import call
+from zope.interface import implementer
+
+
+log = LegacyLogger()
+
+# Block sizes that may be negotiated, as defined by RFC 2348. The default
+# block size is that of RFC 1350.
+BLKSIZE_DEFAULT = 512
+BLKSIZE_MIN = 8
+BLKSIZE_MAX = 65464
+
+# Window sizes that may be negotiated, as defined by RFC 7440. A client may
+# ask for more than WINDOWSIZE_MAX, in which case it is offered less.
+WINDOWSIZE_MIN = 1
+WINDOWSIZE_MAX = 64
+
+# The most data that is sent without an acknowledgement. This bounds the
+# window size for large blocks, and sizes the socket's send buffer so that a
+# whole window can be written at once.
+WINDOW_BYTES_MAX = 2 ** 18
+
+# Timeouts that may be negotiated, as defined by RFC 2349.
+TIMEOUT_MIN = 1
+TIMEOUT_MAX = 255
+
+# Seconds to wait for each acknowledgement before sending the window again,
+# and then giving up, when the client has not negotiated a timeout.
+TIMEOUTS_DEFAULT = (1, 3, 7)
+
+# Block numbers are 16-bit and wrap around to zero.
+BLOCKNUM_MODULUS = 2 ** 16
+
+
+@implementer(IReader)
+class MappedFileReader:
+    """Read a file from a memory mapping shared with other readers.
+
+    Obtain these from `MappedFiles.open`.
+    """
+
+    def __init__(self, mapping, release):
+        """
+        :param mapping: An `mmap.mmap` of the file.
+        :param release: A callable to call, once, when finished.
+        """
+        super(MappedFileReader, self).__init__()
+        self.mapping = mapping
+        self.release = release
+        self.size = len(mapping)
+        self.position = 0
+
+    def read(self, size):
+        """See `IReader.read`."""
+        if self.mapping is None:
+            return b""
+        else:
+            data = self.mapping[self.position:self.position + size]
+            self.position += len(data)
+            return data
+
+    def finish(self):
+        """See `IReader.finish`."""
+        if self.mapping is not None:
+            self.mapping = None
+            self.release()
+
+
+class MappedFiles:
+    """Memory mappings of files being read, shared between readers.
+
+    A mapping is shared by all readers of the same version of a file, i.e.
+    one with the same device, inode, size, and modification time. A file
+    replaced while it's being read, e.g. by an image import, is mapped anew
+    for new readers; its old mapping is closed once its readers finish.
+
+    This is not thread-safe; use it from the reactor thread only.
+
+    :ivar mappings: A mapping of file keys to ``[mmap, readers]`` lists.
+    """
+
+    def __init__(self):
+        super(MappedFiles, self).__init__()
+        self.mappings = {}
+
+    def open(self, path):
+        """Return a `MappedFileReader` for the file at `path`.
+
+        :raise OSError: If the file cannot be opened or mapped.
+        :raise ValueError: If the file is empty; empty files cannot be mapped.
+        """
+        with open(path, "rb") as fd:
+            stat = os.fstat(fd.fileno())
+            key = stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+            if key in self.mappings:
+                entry = self.mappings[key]
+                entry[1] += 1
+            else:
+                mapping = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+                entry = self.mappings[key] = [mapping, 1]
+        return MappedFileReader(entry[0], partial(self._release, key))
+
+    def _release(self, key):
+        entry = self.mappings[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.mappings[key]
+            entry[0].close()
+
+    def map_reader(self, reader):
+        """Replace a `FilesystemReader` with a `MappedFileReader`.
+
+        Other readers, and files that cannot be mapped, are returned as-is.
+        """
+        if isinstance(reader, FilesystemReader):
+            try:
+                mapped = self.open(reader.file_path.path)
+            except (OSError, ValueError):
+                return reader
+            else:
+                reader.finish()
+                return mapped
+        else:
+            return reader
+
+
+# The memory mappings of files being served by this rack controller.
+mapped_files = MappedFiles()
+
+
+def get_option(options, name):
+    """Find the option `name` in `options`, regardless of case.
+
+    :return: A ``(name, value)`` tuple, where `name` is as the client sent
+        it, or `None` if the option was not sent.
+    """
+    for key, value in options.items():
+        if key.lower() == name:
+            return key, value
+    else:
+        return None
+
+
+def get_int_option(options, name, minimum, maximum):
+    """Find the integer option `name` in `options`.
+
+    :return: A ``(name, value)`` tuple, where `name` is as the client sent
+        it, or `None` if the option was not sent or is not an integer between
+        `minimum` and `maximum`.
+    """
+    option = get_option(options, name)
+    if option is not None:
+        key, value = option
+        try:
+            value = int(value)
+        except ValueError:
+            return None
+        else:
+            if minimum <= value <= maximum:
+                return key, value
+    return None
+
+
+class WindowedReadSession(DatagramProtocol):
+    """Send a file to a TFTP client, a window of blocks at a time.
+
+    This implements the sending side of RFC 1350 with the option extension
+    of RFC 2347, the "blksize" option of RFC 2348, the "timeout" and "tsize"
+    options of RFC 2349, and the "windowsize" option of RFC 7440.
+
+    The client acknowledges the last block of each window, or the last block
+    it received in order when a block goes missing; sending resumes from the
+    block after the one acknowledged. Blocks sent but not yet acknowledged
+    are kept in `window` so that they can be sent again.
+
+    :ivar acked: The number of the last block acknowledged, counted without
+        wrapping around.
+    :ivar final: The number of the final block, once it has been read.
+    :ivar deferred: A `Deferred` that fires with `True` once the whole file
+        has been acknowledged, or with `False` if the transfer was abandoned.
+    """
+
+    def __init__(self, remote, reader, options, clock=reactor):
+        """
+        :param remote: The client's address, a ``(host, port)`` tuple.
+        :param reader: An `IReader` of the file to send.
+        :param options: The options from the client's read request.
+        :param clock: An `IReactorTime`.
+        """
+        super(WindowedReadSession, self).__init__()
+        self.remote = remote
+        self.reader = reader
+        self.clock = clock
+        self.blksize = BLKSIZE_DEFAULT
+        self.windowsize = WINDOWSIZE_MIN
+        self.timeouts = TIMEOUTS_DEFAULT
+        self.options = self.negotiate(options)
+        self.sending = False
+        self.window = []
+        self.acked = 0
+        self.final = None
+        self.attempts = None
+        self.timer = None
+        self.deferred = Deferred()
+
+    def negotiate(self, options):
+        """Choose the options to use, and return those to acknowledge."""
+        accepted = OrderedDict()
+        blksize = get_int_option(
+            options, b"blksize", BLKSIZE_MIN, BLKSIZE_MAX)
+        if blksize is not None:
+            name, self.blksize = blksize
+            accepted[name] = self.blksize
+        windowsize = get_int_option(
+            options, b"windowsize", WINDOWSIZE_MIN, BLOCKNUM_MODULUS - 1)
+        if windowsize is not None:
+            name, windowsize = windowsize
+            self.windowsize = max(WINDOWSIZE_MIN, min(
+                windowsize, WINDOWSIZE_MAX, WINDOW_BYTES_MAX // self.blksize))
+            accepted[name] = self.windowsize
+        timeout = get_int_option(
+            options, b"timeout", TIMEOUT_MIN, TIMEOUT_MAX)
+        if timeout is not None:
+            name, timeout = timeout
+            self.timeouts = (timeout,) * len(TIMEOUTS_DEFAULT)
+            accepted[name] = timeout
+        tsize = get_option(options, b"tsize")
+        if tsize is not None and self.reader.size is not None:
+            name, _ = tsize
+            accepted[name] = self.reader.size
+        return OrderedDict(
+            (name, str(value).encode("ascii"))
+            for name, value in accepted.items())
+
+    def startProtocol(self):
+        """See `DatagramProtocol.startProtocol`."""
+        self.transport.connect(*self.remote[:2])
+        try:
+            self.transport.socket.setsockopt(
+                SOL_SOCKET, SO_SNDBUF, self.windowsize * self.blksize * 2)
+        except (AttributeError, OSError):
+            pass  # Best effort; the kernel's default is used instead.
+        if len(self.options) == 0:
+            self.sendWindow()
+        else:
+            self.send(OACKDatagram(self.options))
+            self.startTimer()
+
+    def datagramReceived(self, data, addr):
+        """See `DatagramProtocol.datagramReceived`."""
+        try:
+            datagram = TFTPDatagramFactory(*split_opcode(data))
+        except WireProtocolError:
+            return  # Ignore garbage.
+        if datagram.opcode == OP_ACK:
+            self.acknowledged(datagram.blocknum)
+        elif datagram.opcode == OP_ERROR:
+            log.msg(
+                "Transfer to {remote} aborted by client: {message}",
+                remote=self.remote, message=datagram.errmsg)
+            self.stop(False)
+
+    def acknowledged(self, blocknum):
+        """The client has acknowledged block `blocknum`.
+
+        :param blocknum: The block number, as sent on the wire.
+        """
+        if self.deferred.called:
+            return
+        elif not self.sending:
+            # Waiting for the client to acknowledge the options.
+            if blocknum == 0:
+                self.attempts = None
+                self.sendWindow()
+            return
+        # Blocks in the window are numbered from acked + 1.
+        count = (blocknum - self.acked) % BLOCKNUM_MODULUS
+        if count > len(self.window):
+            return  # Stale, or not yet sent; ignore it.
+        elif count == 0 and self.windowsize == WINDOWSIZE_MIN:
+            # A duplicate acknowledgement. In lock-step, responding to these
+            # leads to the Sorcerer's Apprentice Syndrome (RFC 1123, 4.2.3.1);
+            # the timer will send the block again if it has been lost.
+            return
+        else:
+            del self.window[:count]
+            self.acked += count
+            if self.final is not None and self.acked == self.final:
+                self.stop(True)
+            else:
+                self.attempts = None
+                self.sendWindow()
+
+    def sendWindow(self):
+        """Send the window, from the block after the last acknowledged.
+
+        Blocks already in the window are sent again, and the window is then
+        filled from the reader.
+        """
+        self.sending = True
+        while len(self.window) < self.windowsize and self.final is None:
+            data = self.reader.read(self.blksize)
+            self.window.append(data)
+            if len(data) < self.blksize:
+                self.final = self.acked + len(self.window)
+        for offset, data in enumerate(self.window, self.acked + 1):
+            try:
+                self.send(DATADatagram(offset % BLOCKNUM_MODULUS, data))
+            except OSError:
+                break  # Send buffer full; the rest are sent on timeout.
+        self.startTimer()
+
+    def send(self, datagram):
+        self.transport.write(datagram.to_wire())
+
+    def startTimer(self):
+        if self.timer is not None and self.timer.active():
+            self.timer.cancel()
+        if self.attempts is None:
+            self.attempts = iter(self.timeouts)
+        timeout = next(self.attempts, None)
+        if timeout is None:
+            self.timer = None
+            log.msg(
+                "Transfer to {remote} timed-out waiting for acknowledgement.",
+                remote=self.remote)
+            self.stop(False)
+        else:
+            self.timer = self.clock.callLater(timeout, self.timedOut)
+
+    def timedOut(self):
+        self.timer = None
+        if not self.sending:
+            # The option acknowledgement was lost, or the client's reply.
+            self.send(OACKDatagram(self.options))
+            self.startTimer()
+        else:
+            self.sendWindow()
+
+    def stop(self, complete):
+        """End the transfer.
+
+        :param complete: Whether the whole file was acknowledged.
+        """
+        if self.deferred.called:
+            return
+        if self.timer is not None and self.timer.active():
+            self.timer.cancel()
+        self.timer = None
+        self.window = []
+        self.reader.finish()
+        self.transport.stopListening()
+        self.deferred.callback(complete)
+
+
+class WindowedTFTP(TFTP):
+    """A `TFTP` protocol that sends windows of blocks to clients that can.
+
+    Read requests that ask for a window size, in octet mode, are handled by
+    `WindowedReadSession`. Everything else is left to `python-tx-tftp`.
+    """
+
+    def _startSession(self, datagram, addr, mode):
+        if datagram.opcode == OP_RRQ and mode == b"octet":
+            if get_option(datagram.options, b"windowsize") is not None:
+                return self._startWindowedSession(datagram, addr)
+        return super(WindowedTFTP, self)._startSession(datagram, addr, mode)
+
+    @inlineCallbacks
+    def _startWindowedSession(self, datagram, addr):
+        # Set up the same call context as python-tx-tftp, so that the back
+        # end can find the local and remote addresses.
+        context = {}
+        if self.transport is not None:
+            local = self.transport.getHost()
+            context["local"] = local.host, local.port
+            context["remote"] = addr
+        try:
+            reader = yield call(
+                context, self.backend.get_reader, datagram.filename)
+        except Unsupported as e:
+            self.transport.write(ERRORDatagram.from_code(
+                ERR_ILLEGAL_OP,
+                "{}".format(e).encode("ascii", "replace")).to_wire(), addr)
+        except AccessViolation:
+            self.transport.write(
+                ERRORDatagram.from_code(ERR_ACCESS_VIOLATION).to_wire(), addr)
+        except FileNotFound:
+            self.transport.write(
+                ERRORDatagram.from_code(ERR_FILE_NOT_FOUND).to_wire(), addr)
+        except BackendError as e:
+            self.transport.write(ERRORDatagram.from_code(
+                ERR_NOT_DEFINED,
+                "{}".format(e).encode("ascii", "replace")).to_wire(), addr)
+        else:
+            iface = "::" if IPAddress(addr[0]).version == 6 else ""
+            session = WindowedReadSession(
+                addr, reader, datagram.options, clock=self._clock)
+            reactor.listenUDP(0, session, iface)
+            returnValue(session)
@@ -6,6 +6,8 @@
 __all__ = [
     "Bytes",
     "Choice",
+    "Chunked",
+    "ChunkedArgument",
     "IPAddress",
     "IPNetwork",
     "ParsedURL",
@@ -102,13 +104,76 @@ class ParsedURL(amp.Argument):
         return urllib.parse.urlparse(inString.decode("ascii"))
 
 
-class StructureAsJSON(amp.Argument):
-    """Encode a structure on the wire as JSON, compressed with zlib.
+def _chunkKey(name, index):
+    """Return the key in a box for chunk `index` of argument `name`.
+
+    The first chunk is stored under `name` itself, so a value that fits into
+    a single chunk is sent exactly as an unchunked argument would send it.
+    The others are stored under ``name.2``, ``name.3``, and so on.
+    """
+    if index == 0:
+        return name
+    else:
+        return name + b".%d" % (index + 1)
+
 
-    The compressed size of the structure should not exceed
+class ChunkedArgument(amp.Argument):
+    """An argument whose value can be larger than AMP allows.
+
+    AMP limits each value in a box to
     :py:data:`~twisted.protocols.amp.MAX_VALUE_LENGTH`, or ``0xffff`` bytes.
-    This is pretty hard to be sure of ahead of time, so only use this for
-    small structures that won't go near the limit.
+    An encoded value longer than that is split into chunks stored under
+    several keys of the same box, and joined together again before it is
+    decoded; see `_chunkKey`.
+    """
+
+    chunk_size = amp.MAX_VALUE_LENGTH
+
+    def toBox(self, name, strings, objects, proto):
+        box = amp.AmpBox()
+        super(ChunkedArgument, self).toBox(name, box, objects, proto)
+        value = box.get(name)
+        if value is not None:
+            for index, start in enumerate(range(
+                    0, max(len(value), 1), self.chunk_size)):
+                strings[_chunkKey(name, index)] = (
+                    value[start:start + self.chunk_size])
+
+    def fromBox(self, name, strings, objects, proto):
+        chunks = []
+        key = _chunkKey(name, 0)
+        while key in strings:
+            chunks.append(strings.pop(key))
+            key = _chunkKey(name, len(chunks))
+        box = amp.AmpBox()
+        if len(chunks) != 0:
+            box[name] = b"".join(chunks)
+        super(ChunkedArgument, self).fromBox(name, box, objects, proto)
+
+
+class Chunked(ChunkedArgument):
+    """Send the value of another argument in chunks if it's too large.
+
+    For example, ``Chunked(AmpList(...))`` can send a list of any length.
+    Compressed arguments like `StructureAsJSON` and `CompressedAmpList` are
+    already chunked.
+    """
+
+    def __init__(self, argument):
+        super(Chunked, self).__init__(optional=argument.optional)
+        self.argument = argument
+
+    def toStringProto(self, inObject, proto):
+        return self.argument.toStringProto(inObject, proto)
+
+    def fromStringProto(self, inString, proto):
+        return self.argument.fromStringProto(inString, proto)
+
+
+class StructureAsJSON(ChunkedArgument):
+    """Encode a structure on the wire as JSON, compressed with zlib.
+
+    The structure can be of any size; see `ChunkedArgument`.
     """
 
     def toString(self, inObject):
@@ -150,12 +215,12 @@ class AmpList(amp.AmpList):
         super(AmpList, self).__init__(subargs, optional)
 
 
-class CompressedAmpList(AmpList):
+class CompressedAmpList(ChunkedArgument, AmpList):
     """An :py:class:`amp.AmpList` that's compressed on the wire.
 
     The serialised form is transparently compressed and decompressed with
     zlib. This can be useful when there's a lot of repetition in the list
-    being transmitted.
+    being transmitted. The list can be of any size; see `ChunkedArgument`.
     """
 
     def toStringProto(self, inObject, proto):
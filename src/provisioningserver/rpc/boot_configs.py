@@ -0,0 +1,138 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""RPC relating to generated boot configurations."""
+
+__all__ = [
+    "boot_config_cache",
+    "BootConfigCache",
+    "expire_boot_configs",
+    ]
+
+from provisioningserver.utils.twisted import (
+    callOut,
+    DeferredValue,
+)
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    maybeDeferred,
+    succeed,
+)
+
+# How long, in seconds, a generated boot configuration is served from the
+# cache. This is long enough to absorb the retries that PXE firmware makes
+# after a timeout, yet short enough that a configuration that was not
+# explicitly expired (e.g. after a lost notification) is soon regenerated.
+BOOT_CONFIG_TTL = 30
+
+
+def normalise_mac(mac):
+    """Return `mac` in lower-case and colon-separated, or `None`."""
+    if mac is None:
+        return None
+    else:
+        return mac.replace("-", ":").lower()
+
+
+class BootConfigCache:
+    """A short-lived cache of generated boot configurations.
+
+    Each configuration is identified by a key, e.g. the boot method and all
+    the parameters derived from the request, and optionally by the MAC
+    address of the machine it was generated for, so that it can be expired
+    when the region reports that the machine has changed.
+
+    Concurrent requests for the same key are coalesced: only the first
+    calls `generate`, and the rest wait for its result.
+
+    :ivar configs: A mapping of keys to ``(expires, mac, config)`` tuples.
+    :ivar pending: A mapping of keys to ``(mac, dvalue)`` tuples for
+        configurations currently being generated.
+    """
+
+    def __init__(self, ttl=BOOT_CONFIG_TTL, clock=reactor):
+        super(BootConfigCache, self).__init__()
+        self.ttl = ttl
+        self.clock = clock
+        self.configs = {}
+        self.pending = {}
+        # Bumped each time configurations are expired. A configuration that
+        # was being generated at the time is returned, but not stored.
+        self.generation = 0
+
+    def get(self, key, mac, generate):
+        """Return the configuration for `key`, generating it if needed.
+
+        :param key: A hashable key identifying the configuration.
+        :param mac: The MAC address of the machine the configuration is for,
+            or `None` if it is not for a specific machine.
+        :param generate: A callable that returns the configuration, or a
+            `Deferred` that fires with it. Its result must be safe to share
+            between callers. `None` is returned to callers, but not stored.
+        :return: A `Deferred` that fires with the configuration.
+        """
+        entry = self.configs.get(key)
+        if entry is not None:
+            expires, _, config = entry
+            if expires > self.clock.seconds():
+                return succeed(config)
+            else:
+                del self.configs[key]
+        mac = normalise_mac(mac)
+        if key in self.pending:
+            _, dvalue = self.pending[key]
+        else:
+            dvalue = DeferredValue()
+            self.pending[key] = mac, dvalue
+            d = maybeDeferred(generate)
+            d.addCallback(self._store, key, mac, self.generation)
+            d.addBoth(callOut, self._cleanup, key, dvalue)
+            dvalue.capture(d)
+        return dvalue.get()
+
+    def _store(self, config, key, mac, generation):
+        if config is not None and generation == self.generation:
+            expires = self.clock.seconds() + self.ttl
+            self.configs[key] = (expires, mac, config)
+        return config
+
+    def _cleanup(self, key, dvalue):
+        # The pending entry may have been dropped, or replaced, by an expiry.
+        if key in self.pending and self.pending[key][1] is dvalue:
+            del self.pending[key]
+
+    def expire(self, macs=None):
+        """Expire configurations.
+
+        :param macs: Expire only those configurations generated for these MAC
+            addresses. If `None`, expire all configurations.
+        """
+        self.generation += 1
+        if macs is None:
+            self.configs.clear()
+            self.pending.clear()
+        else:
+            macs = {normalise_mac(mac) for mac in macs}
+            self.configs = {
+                key: entry for key, entry in self.configs.items()
+                if entry[1] not in macs
+            }
+            # Configurations being generated for these MACs may already be
+            # stale, so later requests must not wait for them.
+            self.pending = {
+                key: entry for key, entry in self.pending.items()
+                if entry[0] not in macs
+            }
+
+
+# The cache of boot configurations generated by this rack controller.
+boot_config_cache = BootConfigCache()
+
+
+def expire_boot_configs(macs=None):
+    """Expire the cached boot configurations for the given MAC addresses.
+
+    :param macs: The MAC addresses of machines that have changed, or `None`
+        to expire all boot configurations.
+    """
+    boot_config_cache.expire(macs)
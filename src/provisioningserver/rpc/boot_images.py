@@ -7,6 +7,8 @@ __all__ = [
     "import_boot_images",
     "list_boot_images",
     "is_import_boot_images_running",
+    "report_boot_images",
+    "update_boot_images",
     ]
 
 from urllib.parse import urlparse
@@ -18,7 +20,11 @@ from provisioningserver.config import ClusterConfiguration
 from provisioningserver.import_images import boot_resources
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc import getRegionClient
-from provisioningserver.rpc.region import UpdateLastImageSync
+from provisioningserver.rpc.boot_configs import expire_boot_configs
+from provisioningserver.rpc.region import (
+    UpdateBootImages,
+    UpdateLastImageSync,
+)
 from provisioningserver.utils.env import (
     environment_variables,
     get_maas_id,
@@ -27,8 +33,10 @@ from provisioningserver.utils.twisted import synchronous
 from twisted.internet.defer import (
     fail,
     inlineCallbacks,
+    succeed,
 )
 from twisted.internet.threads import deferToThread
+from twisted.protocols.amp import UnhandledCommand
 
 
 log = LegacyLogger()
@@ -36,6 +44,10 @@ log = LegacyLogger()
 
 CACHED_BOOT_IMAGES = None
 
+# Set while the boot images are being watched for changes, and so can be
+# reported to the region as they change; see `BootImageWatcherService`.
+WATCHING_BOOT_IMAGES = False
+
 
 def list_boot_images():
     """List the boot images that exist on the cluster.
@@ -62,6 +74,40 @@ def reload_boot_images():
     CACHED_BOOT_IMAGES = tftppath.list_boot_images(tftp_root)
 
 
+def update_boot_images(images):
+    """Replace the cached boot images with `images`.
+
+    This is for use by a watcher that maintains the boot images itself.
+    """
+    global CACHED_BOOT_IMAGES
+    CACHED_BOOT_IMAGES = images
+
+
+def report_boot_images(client, images=None):
+    """Report this rack's boot images to the region.
+
+    This does nothing unless the boot images are being watched, because the
+    region relies on each report until the rack reports again or the
+    connection is lost; otherwise it asks with `ListBootImagesV2` instead.
+
+    :param client: A client connected to the region.
+    :param images: The boot images; by default, from `list_boot_images`.
+    :return: A `Deferred` that fires when the region has been told. Failures
+        are logged and suppressed, and regions that do not understand
+        `UpdateBootImages` are ignored.
+    """
+    if not WATCHING_BOOT_IMAGES:
+        return succeed(None)
+    if images is None:
+        images = list_boot_images()
+    d = client(UpdateBootImages, images=images)
+    d.addErrback(lambda failure: failure.trap(UnhandledCommand))
+    d.addErrback(
+        log.err, "Failed to report boot images to the region (via %s)." % (
+            client.ident,))
+    return d
+
+
 def get_hosts_from_sources(sources):
     """Return set of hosts that are contained in the given sources."""
     hosts = set()
@@ -143,6 +189,8 @@ def _import_boot_images(sources, http_proxy=None, https_proxy=None):
     """
     proxies = dict(http_proxy=http_proxy, https_proxy=https_proxy)
     imported = yield deferToThread(_run_import, sources, **proxies)
+    # Boot configurations name the images they boot, which may have changed.
+    expire_boot_configs()
     if imported:
         yield touch_last_image_sync_timestamp().addErrback(
             log.err, "Failure touching last image sync timestamp.")
@@ -16,7 +16,9 @@ __all__ = [
     "ConfigureDHCPv6_V2",
     "DescribePowerTypes",
     "DescribeNOSTypes",
+    "ExpireBootConfigs",
     "GetPreseedData",
+    "GetRPCMetrics",
     "Identify",
     "ListBootImages",
     "ListOperatingSystems",
@@ -574,6 +576,18 @@ class EvaluateTag(amp.Command):
     errors = []
 
 
+class GetRPCMetrics(amp.Command):
+    """Get the metrics recorded for RPC commands handled by this rack.
+
+    :since: 2.3
+    """
+    arguments = []
+    response = [
+        (b"metrics", StructureAsJSON()),
+    ]
+    errors = {}
+
+
 class IsImportBootImagesRunning(amp.Command):
     """Check if the import boot images task is running on the cluster.
 
@@ -586,6 +600,20 @@ class IsImportBootImagesRunning(amp.Command):
     errors = {}
 
 
+class ExpireBootConfigs(amp.Command):
+    """Expire the boot configurations the rack controller has cached.
+
+    :since: 2.3
+    """
+    arguments = [
+        # The MAC addresses of the machines that have changed. If omitted,
+        # all boot configurations are expired.
+        (b"macs", amp.ListOf(amp.Unicode(), optional=True)),
+    ]
+    response = []
+    errors = {}
+
+
 class RefreshRackControllerInfo(amp.Command):
     """Refresh the rack controller's hardware and network details.
 
@@ -12,7 +12,6 @@ import json
 from operator import itemgetter
 import os
 from os import urandom
-import random
 import re
 from socket import (
     AF_INET,
@@ -58,13 +57,16 @@ from provisioningserver.rpc import (
     pods,
     region,
 )
+from provisioningserver.rpc.boot_configs import expire_boot_configs
 from provisioningserver.rpc.boot_images import (
     import_boot_images,
     is_import_boot_images_running,
     list_boot_images,
+    report_boot_images,
 )
 from provisioningserver.rpc.common import RPCProtocol
 from provisioningserver.rpc.interfaces import IConnectionToRegion
+from provisioningserver.rpc.metrics import rpc_metrics
 from provisioningserver.rpc.osystems import (
     gen_operating_systems,
     get_os_release_title,
@@ -306,6 +308,25 @@ class Cluster(RPCProtocol):
         """
         return {"running": is_import_boot_images_running()}
 
+    @cluster.ExpireBootConfigs.responder
+    def expire_boot_configs(self, macs=None):
+        """expire_boot_configs()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.cluster.ExpireBootConfigs`.
+        """
+        expire_boot_configs(macs)
+        return {}
+
+    @cluster.GetRPCMetrics.responder
+    def get_rpc_metrics(self):
+        """get_rpc_metrics()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.cluster.GetRPCMetrics`.
+        """
+        return {"metrics": rpc_metrics.asdict()}
+
     @cluster.DescribePowerTypes.responder
     def describe_power_types(self):
         """describe_power_types()
@@ -846,6 +867,9 @@ class ClusterClient(Cluster):
                     del self.service.try_connections[self.eventloop]
                 self.service.connections[self.eventloop] = self
                 self.ready.set(self.eventloop)
+                # The region relies on reports of boot images, when they're
+                # made, so it needs a report over every new connection.
+                report_boot_images(common.Client(self))
             else:
                 self.transport.loseConnection()
                 self.ready.fail(
@@ -1024,7 +1048,8 @@ class ClusterClientService(TimerService, object):
     def getClient(self):
         """Returns a :class:`common.Client` connected to a region.
 
-        The client is chosen at random.
+        The connection is the least busy of two picked at random; see
+        `common.choose_connection`.
 
         :raises: :py:class:`~.exceptions.NoConnectionsAvailable` when
             there are no open connections to a region controller.
@@ -1033,7 +1058,7 @@ class ClusterClientService(TimerService, object):
         if len(conns) == 0:
             raise exceptions.NoConnectionsAvailable()
         else:
-            return common.Client(random.choice(conns))
+            return common.Client(common.choose_connection(conns))
 
     @deferred
     def getClientNow(self):
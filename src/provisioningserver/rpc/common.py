@@ -5,12 +5,14 @@
 
 __all__ = [
     "Authenticate",
+    "choose_connection",
     "Client",
     "Identify",
     "RPCProtocol",
 ]
 
 from os import getpid
+import random
 from socket import gethostname
 
 from provisioningserver.logger import LegacyLogger
@@ -18,9 +20,15 @@ from provisioningserver.rpc.interfaces import (
     IConnection,
     IConnectionToRegion,
 )
+from provisioningserver.rpc.metrics import (
+    ConnectionLoad,
+    CURRENT_COMMAND,
+    rpc_metrics,
+)
 from provisioningserver.utils.twisted import asynchronous
 from twisted.internet.defer import Deferred
 from twisted.protocols import amp
+from twisted.python import context
 from twisted.python.failure import Failure
 
 
@@ -171,6 +179,34 @@ class Client:
         return hash(self._conn)
 
 
+def get_connection_load(connection):
+    """Return a sort key for the load on `connection`; lower is less busy.
+
+    Connections that do not track their load are assumed to be idle.
+    """
+    load = getattr(connection, "load", None)
+    if load is None:
+        return 0, 0
+    else:
+        return load.in_flight, load.latency or 0
+
+
+def choose_connection(connections):
+    """Choose a connection to make a call on.
+
+    Two of `connections` are picked at random and the one with fewer calls
+    in flight -- or, if they're equally busy, the one that has lately been
+    quicker to respond -- is chosen. This "power of two choices" spreads
+    calls between peers according to how busy they are, without sending
+    every call to whichever looked least busy a moment ago.
+
+    :param connections: A non-empty collection of connections.
+    """
+    connections = list(connections)
+    candidates = random.sample(connections, min(2, len(connections)))
+    return min(candidates, key=get_connection_load)
+
+
 def make_command_ref(box):
     """Make a textual description of an AMP command box.
 
@@ -211,21 +247,51 @@ class RPCProtocol(amp.AMP, object):
         been called, i.e. this protocol is now connected.
     :ivar onConnectionLost: A `Deferred` that fires when `connectionLost` has
         been called, i.e. this protocol is no longer connected.
+    :ivar load: A `ConnectionLoad` recording the calls made on this protocol
+        from this end.
     """
 
     def __init__(self):
         super(RPCProtocol, self).__init__()
         self.onConnectionMade = Deferred()
         self.onConnectionLost = Deferred()
+        self.load = ConnectionLoad()
 
     def connectionMade(self):
         super(RPCProtocol, self).connectionMade()
+        rpc_metrics.connection_made(self, self.load)
         self.onConnectionMade.callback(None)
 
     def connectionLost(self, reason):
         super(RPCProtocol, self).connectionLost(reason)
+        rpc_metrics.connection_lost(self)
         self.onConnectionLost.callback(None)
 
+    def callRemote(self, commandType, *args, **kwargs):
+        """Call up, recording the call in `load`."""
+        token = self.load.call_started()
+        try:
+            d = super(RPCProtocol, self).callRemote(
+                commandType, *args, **kwargs)
+        except:
+            self.load.call_finished(token, failed=True)
+            raise
+
+        def record_response(response):
+            self.load.call_finished(token)
+            return response
+
+        def record_failure(failure):
+            self.load.call_finished(token, failed=True)
+            return failure
+
+        if d is None:
+            # The command does not require an answer.
+            self.load.call_finished(token)
+            return d
+        else:
+            return d.addCallbacks(record_response, record_failure)
+
     def dispatchCommand(self, box):
         """Call up, but coerce errors into non-fatal failures.
 
@@ -237,8 +303,24 @@ class RPCProtocol(amp.AMP, object):
         Here we capture all errors before `_commandReceived` sees them and
         wrap them with :class:`amp.RemoteAmpError`. This prevents the
         disconnecting behaviour.
+
+        Each command is also recorded in `rpc_metrics`.
         """
-        d = super(RPCProtocol, self).dispatchCommand(box)
+        command = box[amp.COMMAND].decode("ascii", "replace")
+        token = rpc_metrics.command_started(command, box)
+        d = context.call(
+            {CURRENT_COMMAND: command},
+            super(RPCProtocol, self).dispatchCommand, box)
+
+        def record_response(response):
+            rpc_metrics.command_finished(command, token, response)
+            return response
+
+        def record_failure(failure):
+            rpc_metrics.command_finished(command, token, failed=True)
+            return failure
+
+        d.addCallbacks(record_response, record_failure)
 
         def coerce_error(failure):
             if failure.check(amp.RemoteAmpError):
@@ -23,7 +23,12 @@ from provisioningserver.dhcp import (
     DHCPv6Server,
 )
 from provisioningserver.dhcp.config import get_config
-from provisioningserver.dhcp.omshell import Omshell
+from provisioningserver.dhcp.omapi import (
+    HostMapFailure,
+    OmapiClient,
+    OmapiConnectionError,
+    OmapiError,
+)
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.rpc.exceptions import (
     CannotConfigureDHCP,
@@ -181,62 +186,80 @@ def _delete_config(server):
         sudo_delete_file(server.config_filename)
 
 
-def _remove_host_map(omshell, mac):
-    """Remove host by `mac`."""
-    try:
-        omshell.remove(mac)
-    except ExternalProcessError as e:
-        if 'not connected.' in e.output_as_unicode:
-            msg = "The DHCP server could not be reached."
-        else:
-            msg = str(e)
-        err = "Could not remove host map for %s: %s" % (mac, msg)
-        maaslog.error(err)
-        raise CannotRemoveHostMap(err)
+# OMAPI clients, keyed by DHCP service name. Each stays connected between
+# updates to the host maps.
+_omapi_clients = {}
 
 
-def _create_host_map(omshell, mac, ip_address):
-    """Create host with `mac` -> `ip_address`."""
-    try:
-        omshell.create(ip_address, mac)
-    except ExternalProcessError as e:
-        if 'not connected.' in e.output_as_unicode:
-            msg = "The DHCP server could not be reached."
-        else:
-            msg = str(e)
-        err = "Could not create host map for %s -> %s: %s" % (
-            mac, ip_address, msg)
-        maaslog.error(err)
-        raise CannotCreateHostMap(err)
+def _get_omapi_client(server):
+    """Return an `OmapiClient` for `server`, reusing one if possible."""
+    client = _omapi_clients.get(server.dhcp_service)
+    if client is None or client.shared_key != server.omapi_key:
+        if client is not None:
+            client.close()
+        client = OmapiClient(
+            "127.0.0.1", 7912 if server.ipv6 else 7911, server.omapi_key)
+        _omapi_clients[server.dhcp_service] = client
+    return client
 
 
-def _modify_host_map(omshell, mac, ip_address):
-    """Modify host with `mac` -> `ip_address`."""
-    try:
-        omshell.modify(ip_address, mac)
-    except ExternalProcessError as e:
-        if 'not connected.' in e.output_as_unicode:
-            msg = "The DHCP server could not be reached."
-        else:
-            msg = str(e)
-        err = "Could not modify host map for %s -> %s: %s" % (
-            mac, ip_address, msg)
-        maaslog.error(err)
-        raise CannotModifyHostMap(err)
+def _describe_host_map_failure(failure):
+    if failure.action == "remove":
+        return "Could not remove host map for %s: %s" % (
+            failure.mac, failure.message)
+    else:
+        return "Could not %s host map for %s -> %s: %s" % (
+            failure.action, failure.mac, failure.ip, failure.message)
+
+
+_host_map_exceptions = {
+    "remove": CannotRemoveHostMap,
+    "create": CannotCreateHostMap,
+    "modify": CannotModifyHostMap,
+}
 
 
 @synchronous
 def _update_hosts(server, remove, add, modify):
-    """Update the hosts using the OMAPI."""
-    omshell = Omshell(
-        server_address='127.0.0.1', shared_key=server.omapi_key,
-        ipv6=server.ipv6)
-    for host in remove:
-        _remove_host_map(omshell, host["mac"])
-    for host in add:
-        _create_host_map(omshell, host["mac"], host["ip"])
-    for host in modify:
-        _modify_host_map(omshell, host["mac"], host["ip"])
+    """Update the hosts using the OMAPI.
+
+    All changes are sent together, over a connection to the DHCP server that
+    is kept open for subsequent updates.
+
+    :raise CannotRemoveHostMap: If removing a host map failed. Likewise
+        `CannotCreateHostMap` and `CannotModifyHostMap` for creating and
+        modifying host maps. The error is for the first failure; every
+        failure is logged.
+    """
+    client = _get_omapi_client(server)
+    try:
+        try:
+            failures = client.update_hosts(remove, add, modify)
+        except OmapiConnectionError:
+            # The DHCP server may have been restarted since the last update,
+            # so try again with a new connection. Repeating changes that
+            # were already made is harmless.
+            failures = client.update_hosts(remove, add, modify)
+    except OmapiError as error:
+        client.close()
+        if isinstance(error, OmapiConnectionError):
+            message = "The DHCP server could not be reached."
+        else:
+            message = str(error)
+        failures = [
+            HostMapFailure(action, host["mac"], host.get("ip"), message)
+            for action, hosts in (
+                ("remove", remove), ("create", add), ("modify", modify))
+            for host in hosts
+        ]
+    for failure in failures:
+        maaslog.error(_describe_host_map_failure(failure))
+    if len(failures) != 0:
+        first = failures[0]
+        error = _describe_host_map_failure(first)
+        if len(failures) > 1:
+            error += " (and %d more host map failures)" % (len(failures) - 1)
+        raise _host_map_exceptions[first.action](error)
 
 
 @asynchronous
@@ -0,0 +1,309 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Metrics for RPC responders.
+
+Every command dispatched by an `RPCProtocol` (i.e. on both the region and the
+rack) is recorded in the process-wide `rpc_metrics` registry: call and error
+counts, how many calls are in flight, latency, and request/response sizes.
+
+Region responders that hand work to the database thread-pool also record
+how long that work waited in the pool's queue and how long it ran for; see
+`maasserver.utils.threads.deferToDatabase`.
+
+Each open connection also records the load of the calls made *on* it from
+this end -- how many are in flight, and how quickly they have recently been
+answered -- so that calls can be sent to the least busy peer; see
+`provisioningserver.rpc.common.choose_connection`.
+"""
+
+__all__ = [
+    "ConnectionLoad",
+    "get_current_command",
+    "Histogram",
+    "rpc_metrics",
+    "RPCMetrics",
+]
+
+from bisect import bisect_left
+from collections import defaultdict
+import json
+import os
+import threading
+import time
+
+from twisted.python import context
+
+# Bucket upper bounds for timings, in seconds.
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Bucket upper bounds for payload sizes, in bytes. AMP limits each value
+# to 64 KiB, but a box can contain several values.
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144,
+)
+
+# Key used to record the name of the command being dispatched in the
+# Twisted call context.
+CURRENT_COMMAND = "maas-rpc-current-command"
+
+
+def get_current_command():
+    """Return the name of the RPC command being dispatched, or `None`.
+
+    This is only known while the responder is being called synchronously by
+    `RPCProtocol.dispatchCommand`; work done later (e.g. in a callback) is not
+    attributed to the command.
+    """
+    return context.get(CURRENT_COMMAND)
+
+
+class Histogram:
+    """A histogram with fixed bucket boundaries.
+
+    Observations greater than the last boundary are counted in an overflow
+    bucket.
+    """
+
+    def __init__(self, bounds):
+        super().__init__()
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket containing `fraction`.
+
+        :param fraction: A number between 0 and 1, e.g. 0.99.
+        :return: A bucket boundary, `max` for the overflow bucket, or `None`
+            if nothing has been observed.
+        """
+        if self.count == 0:
+            return None
+        threshold = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= threshold:
+                return bound
+        return self.max
+
+    def asdict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "mean": (self.total / self.count) if self.count > 0 else None,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "buckets": [
+                [bound, count] for bound, count in zip(
+                    self.bounds + ("inf",), self.counts)
+            ],
+        }
+
+
+class CommandMetrics:
+    """Metrics for a single RPC command."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.latency = Histogram(TIME_BUCKETS)
+        self.database_wait = Histogram(TIME_BUCKETS)
+        self.database_execution = Histogram(TIME_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+    def asdict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "latency": self.latency.asdict(),
+            "database_wait": self.database_wait.asdict(),
+            "database_execution": self.database_execution.asdict(),
+            "request_size": self.request_size.asdict(),
+            "response_size": self.response_size.asdict(),
+        }
+
+
+class ConnectionLoad:
+    """The load of the calls made on a single connection.
+
+    Used only from the reactor thread, so it is not locked.
+
+    :ivar in_flight: The number of calls awaiting a response.
+    :ivar calls: The number of calls made.
+    :ivar errors: The number of calls that failed.
+    :ivar latency: An exponentially weighted moving average of the time taken
+        to respond to calls, in seconds, or `None` if none have completed.
+    """
+
+    # How much each response counts towards `latency`.
+    weight = 0.2
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__()
+        self.clock = clock
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.latency = None
+
+    def call_started(self):
+        """Record that a call has been made.
+
+        :return: A token to pass to `call_finished`.
+        """
+        self.calls += 1
+        self.in_flight += 1
+        return self.clock()
+
+    def call_finished(self, token, failed=False):
+        """Record that a call has been responded to.
+
+        :param token: The token returned from `call_started`.
+        :param failed: Whether the call failed.
+        """
+        elapsed = self.clock() - token
+        self.in_flight -= 1
+        if failed:
+            self.errors += 1
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += self.weight * (elapsed - self.latency)
+
+    def asdict(self):
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency": self.latency,
+        }
+
+
+def get_box_size(box):
+    """Return the approximate encoded size of an AMP box, in bytes."""
+    # Each key and value is preceded by a 2-byte length, and the box is
+    # terminated by an empty key.
+    return 2 + sum(4 + len(key) + len(value) for key, value in box.items())
+
+
+class RPCMetrics:
+    """A registry of `CommandMetrics` for this process.
+
+    Recording is thread-safe because database timings are recorded from
+    database threads.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__()
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.connections = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.commands = defaultdict(CommandMetrics)
+            self.started = time.time()
+
+    def command_started(self, name, box):
+        """Record that the command `name` has been received.
+
+        :param box: The received `amp.AmpBox`.
+        :return: A token to pass to `command_finished`.
+        """
+        size = get_box_size(box)
+        with self.lock:
+            metrics = self.commands[name]
+            metrics.calls += 1
+            metrics.in_flight += 1
+            metrics.request_size.observe(size)
+        return self.clock()
+
+    def command_finished(self, name, token, response=None, failed=False):
+        """Record that the command `name` has been responded to.
+
+        :param token: The token returned from `command_started`.
+        :param response: The response `amp.AmpBox`, if any.
+        :param failed: Whether the command failed.
+        """
+        elapsed = self.clock() - token
+        with self.lock:
+            metrics = self.commands[name]
+            metrics.in_flight -= 1
+            metrics.latency.observe(elapsed)
+            if failed:
+                metrics.errors += 1
+            if isinstance(response, dict):
+                metrics.response_size.observe(get_box_size(response))
+
+    def database_call(self, name, wait, execution):
+        """Record a call into the database thread-pool made by `name`.
+
+        :param wait: Seconds spent waiting in the thread-pool's queue.
+        :param execution: Seconds spent running in the database thread.
+        """
+        with self.lock:
+            metrics = self.commands[name]
+            metrics.database_wait.observe(wait)
+            metrics.database_execution.observe(execution)
+
+    def connection_made(self, connection, load):
+        """Record that `connection` is open, and that `load` is its load.
+
+        :param connection: An `RPCProtocol`. Its `ident`, if it has one, is
+            used to describe it.
+        :param load: The connection's `ConnectionLoad`.
+        """
+        with self.lock:
+            self.connections[connection] = load
+
+    def connection_lost(self, connection):
+        """Record that `connection` has been closed."""
+        with self.lock:
+            self.connections.pop(connection, None)
+
+    def asdict(self):
+        """Return all metrics as a JSON-compatible dictionary."""
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "since": self.started,
+                "commands": {
+                    name: metrics.asdict()
+                    for name, metrics in self.commands.items()
+                },
+                "connections": [
+                    dict(load.asdict(), ident=str(
+                        getattr(connection, "ident", None)))
+                    for connection, load in self.connections.items()
+                ],
+            }
+
+    def dump(self, path):
+        """Write all metrics as JSON to `path`, for offline analysis."""
+        with open(path, "w", encoding="utf-8") as fd:
+            json.dump(self.asdict(), fd, indent=2, sort_keys=True)
+
+
+# The registry for this process.
+rpc_metrics = RPCMetrics()
@@ -30,6 +30,7 @@ __all__ = [
     "RequestNodeInfoByMACAddress",
     "SendEvent",
     "SendEventMACAddress",
+    "UpdateBootImages",
     "UpdateInterfaces",
     "UpdateLastImageSync",
     "UpdateNodePowerState",
@@ -38,6 +39,8 @@ __all__ = [
 from provisioningserver.rpc.arguments import (
     AmpList,
     Bytes,
+    Chunked,
+    CompressedAmpList,
     ParsedURL,
     StructureAsJSON,
 )
@@ -97,11 +100,36 @@ class ReportBootImages(amp.Command):
     arguments = [
         # The cluster UUID.
         (b"uuid", amp.Unicode()),
-        (b"images", AmpList(
+        (b"images", Chunked(AmpList(
             [(b"architecture", amp.Unicode()),
              (b"subarchitecture", amp.Unicode()),
              (b"release", amp.Unicode()),
-             (b"purpose", amp.Unicode())])),
+             (b"purpose", amp.Unicode())]))),
+    ]
+    response = []
+    errors = []
+
+
+class UpdateBootImages(amp.Command):
+    """Report the boot images available on the invoking rack controller.
+
+    The rack controller reports its boot images when it connects and again
+    whenever they change, so the region can use the most recent report in
+    place of calling `ListBootImagesV2`.
+
+    :since: 2.3
+    """
+
+    arguments = [
+        (b"images", CompressedAmpList(
+            [(b"osystem", amp.Unicode()),
+             (b"architecture", amp.Unicode()),
+             (b"subarchitecture", amp.Unicode()),
+             (b"release", amp.Unicode()),
+             (b"label", amp.Unicode()),
+             (b"purpose", amp.Unicode()),
+             (b"xinstall_type", amp.Unicode()),
+             (b"xinstall_path", amp.Unicode())])),
     ]
     response = []
     errors = []
@@ -161,14 +189,14 @@ class GetBootSources(amp.Command):
         (b"uuid", amp.Unicode()),
     ]
     response = [
-        (b"sources", AmpList(
+        (b"sources", Chunked(AmpList(
             [(b"url", amp.Unicode()),
              (b"keyring_data", Bytes()),
              (b"selections", AmpList(
                  [(b"release", amp.Unicode()),
                   (b"arches", amp.ListOf(amp.Unicode())),
                   (b"subarches", amp.ListOf(amp.Unicode())),
-                  (b"labels", amp.ListOf(amp.Unicode()))]))])),
+                  (b"labels", amp.ListOf(amp.Unicode()))]))]))),
     ]
     errors = []
 
@@ -186,7 +214,7 @@ class GetBootSourcesV2(amp.Command):
         (b"uuid", amp.Unicode()),
     ]
     response = [
-        (b"sources", AmpList(
+        (b"sources", Chunked(AmpList(
             [(b"url", amp.Unicode()),
              (b"keyring_data", Bytes()),
              (b"selections", AmpList(
@@ -194,7 +222,7 @@ class GetBootSourcesV2(amp.Command):
                   (b"release", amp.Unicode()),
                   (b"arches", amp.ListOf(amp.Unicode())),
                   (b"subarches", amp.ListOf(amp.Unicode())),
-                  (b"labels", amp.ListOf(amp.Unicode()))]))])),
+                  (b"labels", amp.ListOf(amp.Unicode()))]))]))),
     ]
     errors = []
 
@@ -265,14 +293,14 @@ class ListNodePowerParameters(amp.Command):
         (b"uuid", amp.Unicode()),
     ]
     response = [
-        (b"nodes", AmpList(
+        (b"nodes", Chunked(AmpList(
             [(b"system_id", amp.Unicode()),
              (b"hostname", amp.Unicode()),
              (b"power_state", amp.Unicode()),
              (b"power_type", amp.Unicode()),
              # We can't define a tighter schema here because this is a highly
              # variable bag of arguments from a variety of sources.
-             (b"context", StructureAsJSON())])),
+             (b"context", StructureAsJSON())]))),
     ]
     errors = {
         NoSuchCluster: b"NoSuchCluster",
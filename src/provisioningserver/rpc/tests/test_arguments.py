@@ -127,6 +127,78 @@ class TestAmpList(MAASTestCase):
         self.assertEqual(example, decoded)
 
 
+class ChunkedCommand(amp.Command):
+    arguments = [
+        (b"structure", arguments.StructureAsJSON()),
+        (b"things", arguments.CompressedAmpList([(b"thing", amp.Unicode())])),
+        (b"names", arguments.Chunked(
+            arguments.AmpList([(b"name", amp.Unicode())]))),
+        (b"optional", arguments.StructureAsJSON(optional=True)),
+    ]
+
+
+class TestChunkedArgument(MAASTestCase):
+
+    def make_objects(self, size):
+        # Random strings don't compress, so these objects are at least
+        # `size` bytes on the wire.
+        data = factory.make_bytes(size // 2).hex()
+        pieces = [
+            data[start:start + 1000]
+            for start in range(0, len(data), 1000)
+        ]
+        return {
+            "structure": {"data": data},
+            "things": [{"thing": piece} for piece in pieces],
+            "names": [{"name": piece} for piece in pieces],
+            "optional": None,
+        }
+
+    def to_box(self, objects):
+        return amp._objectsToStrings(
+            objects, ChunkedCommand.arguments, amp.AmpBox(), None)
+
+    def from_box(self, box):
+        return amp._stringsToObjects(box, ChunkedCommand.arguments, None)
+
+    def test_round_trips_small_values_unchunked(self):
+        objects = self.make_objects(100)
+        box = self.to_box(objects)
+        self.assertItemsEqual([b"structure", b"things", b"names"], box)
+        self.assertEqual(objects, self.from_box(box))
+
+    def test_round_trips_large_values_in_chunks(self):
+        objects = self.make_objects(3 * amp.MAX_VALUE_LENGTH)
+        box = self.to_box(objects)
+        self.assertIn(b"structure.2", box)
+        self.assertIn(b"things.2", box)
+        self.assertIn(b"names.2", box)
+        for value in box.values():
+            self.assertThat(len(value), LessThan(amp.MAX_VALUE_LENGTH + 1))
+        # The box can be sent; amp.TooLong is not raised.
+        box.serialize()
+        self.assertEqual(objects, self.from_box(box))
+
+    def test_chunked_values_are_same_as_unchunked(self):
+        objects = self.make_objects(3 * amp.MAX_VALUE_LENGTH)
+        box = self.to_box(dict(objects))
+        argument = arguments.StructureAsJSON()
+        chunks = []
+        key, index = b"structure", 1
+        while key in box:
+            chunks.append(box[key])
+            index += 1
+            key = b"structure.%d" % index
+        self.assertEqual(
+            objects["structure"],
+            argument.fromStringProto(b"".join(chunks), proto=None))
+
+    def test_missing_value_is_an_error(self):
+        box = self.to_box(self.make_objects(100))
+        del box[b"structure"]
+        self.assertRaises(KeyError, self.from_box, box)
+
+
 class TestCompressedAmpList(MAASTestCase):
 
     def test_round_trip(self):
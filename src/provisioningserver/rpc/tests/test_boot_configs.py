@@ -0,0 +1,157 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for :py:module:`~provisioningserver.rpc.boot_configs`."""
+
+__all__ = []
+
+from unittest.mock import Mock
+
+from maastesting.factory import factory
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from provisioningserver.rpc import boot_configs
+from provisioningserver.rpc.boot_configs import (
+    BootConfigCache,
+    expire_boot_configs,
+)
+from testtools import ExpectedException
+from twisted.internet.defer import (
+    Deferred,
+    fail,
+    inlineCallbacks,
+    succeed,
+)
+from twisted.internet.task import Clock
+
+
+class TestBootConfigCache(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def make_cache(self, ttl=10):
+        clock = Clock()
+        return BootConfigCache(ttl=ttl, clock=clock), clock
+
+    def make_generate(self, config=None):
+        if config is None:
+            config = factory.make_bytes()
+        return Mock(side_effect=lambda: succeed(config)), config
+
+    @inlineCallbacks
+    def test_get_generates_config(self):
+        cache, _ = self.make_cache()
+        generate, config = self.make_generate()
+        result = yield cache.get("key", None, generate)
+        self.assertEqual(config, result)
+        self.assertThat(generate, MockCalledOnceWith())
+
+    @inlineCallbacks
+    def test_get_returns_cached_config(self):
+        cache, _ = self.make_cache()
+        generate, config = self.make_generate()
+        yield cache.get("key", None, generate)
+        result = yield cache.get("key", None, generate)
+        self.assertEqual(config, result)
+        self.assertThat(generate, MockCalledOnceWith())
+
+    @inlineCallbacks
+    def test_get_generates_config_for_each_key(self):
+        cache, _ = self.make_cache()
+        generate, _ = self.make_generate()
+        yield cache.get("key1", None, generate)
+        yield cache.get("key2", None, generate)
+        self.assertEqual(2, generate.call_count)
+
+    @inlineCallbacks
+    def test_get_regenerates_config_after_ttl(self):
+        cache, clock = self.make_cache(ttl=10)
+        generate, _ = self.make_generate()
+        yield cache.get("key", None, generate)
+        clock.advance(10)
+        yield cache.get("key", None, generate)
+        self.assertEqual(2, generate.call_count)
+
+    @inlineCallbacks
+    def test_get_coalesces_concurrent_requests(self):
+        cache, _ = self.make_cache()
+        d = Deferred()
+        generate = Mock(return_value=d)
+        d1 = cache.get("key", None, generate)
+        d2 = cache.get("key", None, generate)
+        config = factory.make_bytes()
+        d.callback(config)
+        self.assertEqual([config, config], [(yield d1), (yield d2)])
+        self.assertThat(generate, MockCalledOnceWith())
+        self.assertEqual({}, cache.pending)
+
+    @inlineCallbacks
+    def test_get_does_not_cache_failures(self):
+        cache, _ = self.make_cache()
+        generate = Mock(side_effect=lambda: fail(ZeroDivisionError()))
+        with ExpectedException(ZeroDivisionError):
+            yield cache.get("key", None, generate)
+        with ExpectedException(ZeroDivisionError):
+            yield cache.get("key", None, generate)
+        self.assertEqual(2, generate.call_count)
+        self.assertEqual({}, cache.pending)
+
+    @inlineCallbacks
+    def test_get_does_not_cache_None(self):
+        cache, _ = self.make_cache()
+        generate = Mock(return_value=None)
+        result = yield cache.get("key", None, generate)
+        self.assertIsNone(result)
+        self.assertEqual({}, cache.configs)
+
+    @inlineCallbacks
+    def test_expire_expires_configs_for_macs(self):
+        cache, _ = self.make_cache()
+        mac = factory.make_mac_address()
+        other_mac = factory.make_mac_address()
+        generate, _ = self.make_generate()
+        # The MAC address is compared regardless of its format.
+        yield cache.get("key1", mac.replace(":", "-").upper(), generate)
+        yield cache.get("key2", other_mac, generate)
+        yield cache.get("key3", None, generate)
+        cache.expire([mac])
+        self.assertItemsEqual(["key2", "key3"], cache.configs)
+
+    @inlineCallbacks
+    def test_expire_expires_all_configs(self):
+        cache, _ = self.make_cache()
+        generate, _ = self.make_generate()
+        yield cache.get("key1", factory.make_mac_address(), generate)
+        yield cache.get("key2", None, generate)
+        cache.expire()
+        self.assertEqual({}, cache.configs)
+
+    @inlineCallbacks
+    def test_expire_stops_coalescing_and_caching_pending_configs(self):
+        cache, _ = self.make_cache()
+        mac = factory.make_mac_address()
+        d = Deferred()
+        d1 = cache.get("key", mac, Mock(return_value=d))
+        cache.expire([mac])
+        # A request after the expiry generates the configuration afresh.
+        generate, config = self.make_generate()
+        result = yield cache.get("key", mac, generate)
+        self.assertEqual(config, result)
+        # The stale configuration is returned to those waiting for it, but
+        # it is not cached.
+        stale = factory.make_bytes()
+        d.callback(stale)
+        self.assertEqual(stale, (yield d1))
+        self.assertEqual(config, cache.configs["key"][2])
+
+
+class TestExpireBootConfigs(MAASTestCase):
+
+    def test_expires_module_cache(self):
+        cache = self.patch(boot_configs, "boot_config_cache")
+        macs = [factory.make_mac_address()]
+        expire_boot_configs(macs)
+        self.assertThat(cache.expire, MockCalledOnceWith(macs))
@@ -9,6 +9,7 @@ import os
 from random import randint
 from unittest.mock import (
     ANY,
+    Mock,
     sentinel,
 )
 
@@ -21,6 +22,7 @@ from maastesting.testcase import (
     MAASTestCase,
     MAASTwistedRunTest,
 )
+from maastesting.twisted import TwistedLoggerFixture
 from provisioningserver import concurrency
 from provisioningserver.boot import tftppath
 from provisioningserver.import_images import boot_resources
@@ -36,8 +38,13 @@ from provisioningserver.rpc.boot_images import (
     is_import_boot_images_running,
     list_boot_images,
     reload_boot_images,
+    report_boot_images,
+    update_boot_images,
+)
+from provisioningserver.rpc.region import (
+    UpdateBootImages,
+    UpdateLastImageSync,
 )
-from provisioningserver.rpc.region import UpdateLastImageSync
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
 from provisioningserver.testing.config import (
     BootSourcesFixture,
@@ -50,10 +57,12 @@ from testtools.matchers import (
 )
 from twisted.internet import defer
 from twisted.internet.defer import (
+    fail,
     inlineCallbacks,
     succeed,
 )
 from twisted.internet.task import Clock
+from twisted.protocols.amp import UnhandledCommand
 
 
 def make_sources():
@@ -116,6 +125,58 @@ class TestReloadBootImages(MAASTestCase):
             boot_images.CACHED_BOOT_IMAGES, fake_boot_images)
 
 
+class TestUpdateBootImages(MAASTestCase):
+
+    def test__sets_CACHED_BOOT_IMAGES(self):
+        self.patch(
+            boot_images, 'CACHED_BOOT_IMAGES', factory.make_name('old_cache'))
+        fake_boot_images = [factory.make_name('image') for _ in range(3)]
+        update_boot_images(fake_boot_images)
+        self.assertEqual(
+            boot_images.CACHED_BOOT_IMAGES, fake_boot_images)
+
+
+class TestReportBootImages(MAASTestCase):
+
+    def setUp(self):
+        super(TestReportBootImages, self).setUp()
+        self.patch(boot_images, 'WATCHING_BOOT_IMAGES', True)
+
+    def test__reports_boot_images(self):
+        fake_boot_images = [factory.make_name('image') for _ in range(3)]
+        self.patch(boot_images, 'CACHED_BOOT_IMAGES', fake_boot_images)
+        client = Mock(return_value=succeed({}))
+        report_boot_images(client)
+        self.assertThat(client, MockCalledOnceWith(
+            UpdateBootImages, images=fake_boot_images))
+
+    def test__reports_given_boot_images(self):
+        fake_boot_images = [factory.make_name('image') for _ in range(3)]
+        client = Mock(return_value=succeed({}))
+        report_boot_images(client, fake_boot_images)
+        self.assertThat(client, MockCalledOnceWith(
+            UpdateBootImages, images=fake_boot_images))
+
+    def test__does_not_report_when_not_watching(self):
+        self.patch(boot_images, 'WATCHING_BOOT_IMAGES', False)
+        client = Mock(return_value=succeed({}))
+        report_boot_images(client, [])
+        self.assertThat(client, MockNotCalled())
+
+    def test__ignores_regions_without_UpdateBootImages(self):
+        client = Mock(return_value=fail(UnhandledCommand()))
+        with TwistedLoggerFixture() as logger:
+            report_boot_images(client, [])
+        self.assertEqual("", logger.output)
+
+    def test__logs_failures(self):
+        client = Mock(return_value=fail(ZeroDivisionError()))
+        with TwistedLoggerFixture() as logger:
+            report_boot_images(client, [])
+        self.assertIn(
+            "Failed to report boot images to the region", logger.output)
+
+
 class TestGetHostsFromSources(MAASTestCase):
 
     def test__returns_set_of_hosts_from_sources(self):
@@ -96,6 +96,10 @@ from provisioningserver.rpc.clusterservice import (
     spawnProcessAndNullifyStdout,
 )
 from provisioningserver.rpc.interfaces import IConnection
+from provisioningserver.rpc.metrics import (
+    ConnectionLoad,
+    RPCMetrics,
+)
 from provisioningserver.rpc.osystems import gen_operating_systems
 from provisioningserver.rpc.testing import (
     are_valid_tls_parameters,
@@ -398,6 +402,57 @@ class TestClusterProtocol_IsImportBootImagesRunning(MAASTestCase):
         self.assertEqual({"running": True}, response)
 
 
+class TestClusterProtocol_ExpireBootConfigs(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test_expire_boot_configs_is_registered(self):
+        protocol = Cluster()
+        responder = protocol.locateResponder(
+            cluster.ExpireBootConfigs.commandName)
+        self.assertIsNotNone(responder)
+
+    @inlineCallbacks
+    def test_expire_boot_configs_expires_macs(self):
+        expire_boot_configs = self.patch(
+            clusterservice, "expire_boot_configs")
+        macs = [factory.make_mac_address() for _ in range(2)]
+        response = yield call_responder(
+            Cluster(), cluster.ExpireBootConfigs, {"macs": macs})
+        self.assertEqual({}, response)
+        self.assertThat(expire_boot_configs, MockCalledOnceWith(macs))
+
+    @inlineCallbacks
+    def test_expire_boot_configs_expires_all(self):
+        expire_boot_configs = self.patch(
+            clusterservice, "expire_boot_configs")
+        response = yield call_responder(
+            Cluster(), cluster.ExpireBootConfigs, {})
+        self.assertEqual({}, response)
+        self.assertThat(expire_boot_configs, MockCalledOnceWith(None))
+
+
+class TestClusterProtocol_GetRPCMetrics(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test_get_rpc_metrics_is_registered(self):
+        protocol = Cluster()
+        responder = protocol.locateResponder(
+            cluster.GetRPCMetrics.commandName)
+        self.assertIsNotNone(responder)
+
+    @inlineCallbacks
+    def test_get_rpc_metrics_returns_metrics(self):
+        metrics = RPCMetrics()
+        metrics.database_call("Foo", 0.5, 0.25)
+        self.patch(clusterservice, "rpc_metrics", metrics)
+        response = yield call_responder(
+            Cluster(), cluster.GetRPCMetrics, {})
+        self.assertEqual(
+            json.loads(json.dumps(metrics.asdict())), response["metrics"])
+
+
 class TestClusterProtocol_DescribePowerTypes(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
@@ -890,6 +945,19 @@ class TestClusterClientService(MAASTestCase):
                 for conn in service.connections.values()
             })
 
+    def test_getClient_returns_least_busy_connection(self):
+        busy = DummyConnection()
+        busy.load = ConnectionLoad()
+        busy.load.call_started()
+        idle = DummyConnection()
+        idle.load = ConnectionLoad()
+        service = ClusterClientService(Clock())
+        service.connections = {
+            sentinel.eventloop01: busy,
+            sentinel.eventloop02: idle,
+        }
+        self.assertEqual(common.Client(idle), service.getClient())
+
     def test_getClient_when_there_are_no_connections(self):
         service = ClusterClientService(Clock())
         service.connections = {}
@@ -1127,6 +1195,16 @@ class TestClusterClient(MAASTestCase):
             client.service.connections,
             {client.eventloop: client})
 
+    def test_connecting_reports_boot_images(self):
+        client = self.make_running_client()
+        self.patch_authenticate_for_success(client)
+        self.patch_register_for_success(client)
+        report_boot_images = self.patch(clusterservice, "report_boot_images")
+        client.connectionMade()
+        self.assertThat(report_boot_images, MockCalledOnceWith(ANY))
+        [reported_to], _ = report_boot_images.call_args
+        self.assertIs(client, reported_to._conn)
+
     def test_disconnects_when_there_is_an_existing_connection(self):
         client = self.make_running_client()
 
@@ -22,6 +22,11 @@ from maastesting.twisted import (
     TwistedLoggerFixture,
 )
 from provisioningserver.rpc import common
+from provisioningserver.rpc.metrics import (
+    ConnectionLoad,
+    get_current_command,
+    RPCMetrics,
+)
 from provisioningserver.rpc.testing.doubles import (
     DummyConnection,
     FakeConnection,
@@ -34,7 +39,10 @@ from testtools.matchers import (
     IsInstance,
     Not,
 )
-from twisted.internet.defer import Deferred
+from twisted.internet.defer import (
+    Deferred,
+    succeed,
+)
 from twisted.internet.protocol import connectionDone
 from twisted.protocols import amp
 from twisted.test.proto_helpers import StringTransport
@@ -240,6 +248,134 @@ class TestRPCProtocol_UnhandledErrorsWhenHandlingCommands(MAASTestCase):
         self.assertThat(observed_boxes_sent, Equals(expected_boxes_sent))
 
 
+class TestRPCProtocol_Metrics(MAASTestCase):
+
+    def setUp(self):
+        super(TestRPCProtocol_Metrics, self).setUp()
+        self.metrics = RPCMetrics()
+        self.patch(common, "rpc_metrics", self.metrics)
+
+    def test_dispatched_commands_are_recorded(self):
+        protocol = common.RPCProtocol()
+        protocol.makeConnection(StringTransport())
+        dispatchCommand = self.patch(amp.AMP, "dispatchCommand")
+        dispatchCommand.return_value = succeed(amp.AmpBox(_answer=b"1"))
+        cmd = factory.make_name("command")
+        box = amp.AmpBox(_ask=b"1", _command=cmd.encode("ascii"))
+        protocol.ampBoxReceived(box)
+        metrics = self.metrics.commands[cmd]
+        self.expectThat(metrics.calls, Equals(1))
+        self.expectThat(metrics.errors, Equals(0))
+        self.expectThat(metrics.in_flight, Equals(0))
+        self.expectThat(metrics.latency.count, Equals(1))
+        self.expectThat(metrics.response_size.count, Equals(1))
+
+    def test_failed_commands_are_recorded(self):
+        protocol = common.RPCProtocol()
+        protocol.makeConnection(StringTransport())
+        dispatchCommand = self.patch(amp.AMP, "dispatchCommand")
+        dispatchCommand.side_effect = always_fail_with(ZeroDivisionError())
+        cmd = factory.make_name("command")
+        box = amp.AmpBox(_ask=b"1", _command=cmd.encode("ascii"))
+        with TwistedLoggerFixture():
+            protocol.ampBoxReceived(box)
+        metrics = self.metrics.commands[cmd]
+        self.expectThat(metrics.calls, Equals(1))
+        self.expectThat(metrics.errors, Equals(1))
+        self.expectThat(metrics.in_flight, Equals(0))
+
+    def test_command_is_current_while_dispatching(self):
+        protocol = common.RPCProtocol()
+        protocol.makeConnection(StringTransport())
+        observed = []
+        dispatchCommand = self.patch(amp.AMP, "dispatchCommand")
+        dispatchCommand.side_effect = lambda box: (
+            observed.append(get_current_command()) or
+            succeed(amp.AmpBox(_answer=b"1")))
+        cmd = factory.make_name("command")
+        protocol.ampBoxReceived(
+            amp.AmpBox(_ask=b"1", _command=cmd.encode("ascii")))
+        self.assertThat(observed, Equals([cmd]))
+        self.assertThat(get_current_command(), Is(None))
+
+
+class TestRPCProtocol_Load(MAASTestCase):
+
+    def setUp(self):
+        super(TestRPCProtocol_Load, self).setUp()
+        self.metrics = RPCMetrics()
+        self.patch(common, "rpc_metrics", self.metrics)
+
+    def test_connection_is_registered_while_connected(self):
+        protocol = common.RPCProtocol()
+        protocol.makeConnection(StringTransport())
+        self.assertThat(
+            self.metrics.connections, Equals({protocol: protocol.load}))
+        protocol.connectionLost(connectionDone)
+        self.assertThat(self.metrics.connections, Equals({}))
+
+    def test_calls_are_recorded(self):
+        protocol = common.RPCProtocol()
+        protocol.makeConnection(StringTransport())
+        d = protocol.callRemote(common.Identify)
+        self.expectThat(protocol.load.in_flight, Equals(1))
+        protocol.ampBoxReceived(amp.AmpBox(_answer=b"1", ident=b"ident"))
+        self.expectThat(extract_result(d), Equals({"ident": "ident"}))
+        self.expectThat(protocol.load.in_flight, Equals(0))
+        self.expectThat(protocol.load.calls, Equals(1))
+        self.expectThat(protocol.load.errors, Equals(0))
+        self.expectThat(protocol.load.latency, Not(Is(None)))
+
+    def test_failed_calls_are_recorded(self):
+        protocol = common.RPCProtocol()
+        protocol.makeConnection(StringTransport())
+        d = protocol.callRemote(common.Identify)
+        protocol.ampBoxReceived(amp.AmpBox(
+            _error=b"1", _error_code=amp.UNKNOWN_ERROR_CODE,
+            _error_description=b"Boom"))
+        self.assertRaises(amp.UnknownRemoteError, extract_result, d)
+        self.expectThat(protocol.load.in_flight, Equals(0))
+        self.expectThat(protocol.load.errors, Equals(1))
+
+
+class TestChooseConnection(MAASTestCase):
+
+    def make_connection(self, in_flight=0, latency=None):
+        connection = DummyConnection()
+        connection.load = ConnectionLoad()
+        connection.load.in_flight = in_flight
+        connection.load.latency = latency
+        return connection
+
+    def test_chooses_only_connection(self):
+        connection = self.make_connection(in_flight=10)
+        self.assertThat(
+            common.choose_connection({connection}), Is(connection))
+
+    def test_chooses_connection_with_fewer_calls_in_flight(self):
+        busy = self.make_connection(in_flight=2, latency=0.1)
+        idle = self.make_connection(in_flight=1, latency=1.0)
+        self.assertThat(common.choose_connection([busy, idle]), Is(idle))
+
+    def test_chooses_quicker_connection_when_equally_busy(self):
+        slow = self.make_connection(in_flight=1, latency=1.0)
+        quick = self.make_connection(in_flight=1, latency=0.1)
+        self.assertThat(common.choose_connection([slow, quick]), Is(quick))
+
+    def test_chooses_between_two_random_connections(self):
+        connections = [self.make_connection() for _ in range(5)]
+        sample = self.patch(random, "sample")
+        sample.return_value = connections[3:]
+        self.assertThat(
+            common.choose_connection(connections), Is(connections[3]))
+        self.assertThat(sample, MockCalledOnceWith(connections, 2))
+
+    def test_assumes_connections_without_load_are_idle(self):
+        busy = self.make_connection(in_flight=1)
+        other = DummyConnection()
+        self.assertThat(common.choose_connection([busy, other]), Is(other))
+
+
 class TestMakeCommandRef(MAASTestCase):
     """Tests for `common.make_command_ref`."""
 
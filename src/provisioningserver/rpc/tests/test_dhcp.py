@@ -25,6 +25,10 @@ from maastesting.testcase import (
     MAASTestCase,
     MAASTwistedRunTest,
 )
+from provisioningserver.dhcp.omapi import (
+    HostMapFailure,
+    OmapiConnectionError,
+)
 from provisioningserver.dhcp.testing.config import (
     DHCPConfigNameResolutionDisabled,
     fix_shared_networks_failover,
@@ -47,7 +51,10 @@ from provisioningserver.utils.service_monitor import (
 )
 from provisioningserver.utils.shell import ExternalProcessError
 from testtools import ExpectedException
-from testtools.matchers import MatchesStructure
+from testtools.matchers import (
+    Equals,
+    MatchesStructure,
+)
 from twisted.internet.defer import inlineCallbacks
 
 
@@ -299,154 +306,124 @@ class TestDHCPState(MAASTestCase):
                     global_dhcp_snippets, key=itemgetter("name"))))
 
 
-class TestRemoveHostMap(MAASTestCase):
+class TestUpdateHosts(MAASTestCase):
 
-    def test_calls_omshell_remove(self):
-        omshell = Mock()
-        mac = factory.make_mac_address()
-        dhcp._remove_host_map(omshell, mac)
-        self.assertThat(omshell.remove, MockCalledOnceWith(mac))
-
-    def test_raises_error_when_omshell_crashes(self):
-        error_message = factory.make_name("error").encode("ascii")
-        omshell = Mock()
-        omshell.remove.side_effect = ExternalProcessError(
-            returncode=2, cmd=("omshell",), output=error_message)
-        mac = factory.make_mac_address()
-        with FakeLogger("maas.dhcp") as logger:
-            error = self.assertRaises(
-                exceptions.CannotRemoveHostMap, dhcp._remove_host_map,
-                omshell, mac)
-        # The CannotRemoveHostMap exception includes a message describing the
-        # problematic mapping.
-        self.assertDocTestMatches(
-            "Could not remove host map for %s: ..." % (mac),
-            str(error))
-        # A message is also written to the maas.dhcp logger that describes the
-        # problematic mapping.
-        self.assertDocTestMatches(
-            "Could not remove host map for %s: ..." % (mac),
-            logger.output)
+    def setUp(self):
+        super(TestUpdateHosts, self).setUp()
+        self.patch(dhcp, "_omapi_clients", {})
+        self.OmapiClient = self.patch(dhcp, "OmapiClient")
+        self.client = self.OmapiClient.return_value
+        self.client.update_hosts.return_value = []
 
-    def test_raises_error_when_omshell_not_connected(self):
-        error = ExternalProcessError(
-            returncode=2, cmd=("omshell",), output="")
-        self.patch(ExternalProcessError, 'output_as_unicode', 'not connected.')
-        omshell = Mock()
-        omshell.remove.side_effect = error
-        mac = factory.make_mac_address()
-        with FakeLogger("maas.dhcp") as logger:
-            error = self.assertRaises(
-                exceptions.CannotRemoveHostMap, dhcp._remove_host_map,
-                omshell, mac)
-        # The CannotCreateHostMap exception includes a message describing the
-        # problematic mapping.
-        self.assertDocTestMatches(
-            "Could not remove host map for %s: "
-            "The DHCP server could not be reached." % (mac),
-            str(error))
-        # A message is also written to the maas.dhcp logger that describes the
-        # problematic mapping.
-        self.assertDocTestMatches(
-            "Could not remove host map for %s: "
-            "The DHCP server could not be reached." % (mac),
-            logger.output)
+    def make_server(self):
+        server = Mock()
+        server.ipv6 = factory.pick_bool()
+        server.omapi_key = factory.make_name("key")
+        self.client.shared_key = server.omapi_key
+        return server
 
+    def test__creates_client_with_correct_arguments(self):
+        server = self.make_server()
+        dhcp._update_hosts(server, [], [], [])
+        self.assertThat(self.OmapiClient, MockCalledOnceWith(
+            "127.0.0.1", 7912 if server.ipv6 else 7911, server.omapi_key))
 
-class TestCreateHostMap(MAASTestCase):
+    def test__reuses_client(self):
+        server = self.make_server()
+        dhcp._update_hosts(server, [], [], [])
+        dhcp._update_hosts(server, [], [], [])
+        self.assertThat(self.OmapiClient, MockCalledOnceWith(
+            ANY, ANY, server.omapi_key))
+        self.assertThat(self.client.close, MockNotCalled())
 
-    def test_calls_omshell_create(self):
-        omshell = Mock()
-        mac = factory.make_mac_address()
-        ip = factory.make_ip_address()
-        dhcp._create_host_map(omshell, mac, ip)
-        self.assertThat(omshell.create, MockCalledOnceWith(ip, mac))
-
-    def test_raises_error_when_omshell_crashes(self):
-        error_message = factory.make_name("error").encode("ascii")
-        omshell = Mock()
-        omshell.create.side_effect = ExternalProcessError(
-            returncode=2, cmd=("omshell",), output=error_message)
+    def test__replaces_client_when_key_changes(self):
+        server = self.make_server()
+        dhcp._update_hosts(server, [], [], [])
+        server.omapi_key = factory.make_name("key")
+        dhcp._update_hosts(server, [], [], [])
+        self.assertThat(self.OmapiClient, MockCallsMatch(
+            call(ANY, ANY, self.client.shared_key),
+            call(ANY, ANY, server.omapi_key)))
+        self.assertThat(self.client.close, MockCalledOnceWith())
+
+    def test__performs_operations(self):
+        server = self.make_server()
+        remove_host = make_host()
+        add_host = make_host()
+        modify_host = make_host()
+        dhcp._update_hosts(server, [remove_host], [add_host], [modify_host])
+        self.assertThat(self.client.update_hosts, MockCalledOnceWith(
+            [remove_host], [add_host], [modify_host]))
+
+    def test__retries_once_when_connection_fails(self):
+        server = self.make_server()
+        self.client.update_hosts.side_effect = [
+            OmapiConnectionError("broken"), []]
+        host = make_host()
+        dhcp._update_hosts(server, [], [host], [])
+        self.assertThat(self.client.update_hosts, MockCallsMatch(
+            call([], [host], []), call([], [host], [])))
+
+    def test__raises_error_for_failed_remove(self):
+        server = self.make_server()
         mac = factory.make_mac_address()
-        ip = factory.make_ip_address()
+        self.client.update_hosts.return_value = [
+            HostMapFailure("remove", mac, None, "error")]
         with FakeLogger("maas.dhcp") as logger:
             error = self.assertRaises(
-                exceptions.CannotCreateHostMap, dhcp._create_host_map,
-                omshell, mac, ip)
-        # The CannotCreateHostMap exception includes a message describing the
-        # problematic mapping.
+                exceptions.CannotRemoveHostMap, dhcp._update_hosts,
+                server, [{"mac": mac}], [], [])
+        message = "Could not remove host map for %s: error" % mac
+        self.assertThat(str(error), Equals(message))
+        self.assertThat(logger.output.strip(), Equals(message))
+
+    def test__raises_error_for_failed_create(self):
+        server = self.make_server()
+        host = make_host()
+        self.client.update_hosts.return_value = [
+            HostMapFailure("create", host["mac"], host["ip"], "error")]
+        with FakeLogger("maas.dhcp") as logger:
+            error = self.assertRaises(
+                exceptions.CannotCreateHostMap, dhcp._update_hosts,
+                server, [], [host], [])
+        message = "Could not create host map for %s -> %s: error" % (
+            host["mac"], host["ip"])
+        self.assertThat(str(error), Equals(message))
+        self.assertThat(logger.output.strip(), Equals(message))
+
+    def test__raises_error_for_first_of_several_failures(self):
+        server = self.make_server()
+        hosts = [make_host() for _ in range(3)]
+        self.client.update_hosts.return_value = [
+            HostMapFailure("modify", host["mac"], host["ip"], "error")
+            for host in hosts]
+        with FakeLogger("maas.dhcp") as logger:
+            error = self.assertRaises(
+                exceptions.CannotModifyHostMap, dhcp._update_hosts,
+                server, [], [], hosts)
         self.assertDocTestMatches(
-            "Could not create host map for %s -> %s: ..." % (mac, ip),
+            "Could not modify host map for %s -> %s: error "
+            "(and 2 more host map failures)" % (
+                hosts[0]["mac"], hosts[0]["ip"]),
             str(error))
-        # A message is also written to the maas.dhcp logger that describes the
-        # problematic mapping.
-        self.assertDocTestMatches(
-            "Could not create host map for %s -> %s: ..." % (mac, ip),
-            logger.output)
+        for host in hosts:
+            self.assertIn(host["mac"], logger.output)
 
-    def test_raises_error_when_omshell_not_connected(self):
-        error = ExternalProcessError(
-            returncode=2, cmd=("omshell",), output="")
-        self.patch(ExternalProcessError, 'output_as_unicode', 'not connected.')
-        omshell = Mock()
-        omshell.create.side_effect = error
-        mac = factory.make_mac_address()
-        ip = factory.make_ip_address()
+    def test__raises_error_when_server_not_reachable(self):
+        server = self.make_server()
+        self.client.update_hosts.side_effect = OmapiConnectionError("down")
+        host = make_host()
         with FakeLogger("maas.dhcp") as logger:
             error = self.assertRaises(
-                exceptions.CannotCreateHostMap, dhcp._create_host_map,
-                omshell, mac, ip)
-        # The CannotCreateHostMap exception includes a message describing the
-        # problematic mapping.
-        self.assertDocTestMatches(
+                exceptions.CannotCreateHostMap, dhcp._update_hosts,
+                server, [], [host], [])
+        message = (
             "Could not create host map for %s -> %s: "
-            "The DHCP server could not be reached." % (mac, ip),
-            str(error))
-        # A message is also written to the maas.dhcp logger that describes the
-        # problematic mapping.
-        self.assertDocTestMatches(
-            "Could not create host map for %s -> %s: "
-            "The DHCP server could not be reached." % (mac, ip),
-            logger.output)
-
-
-class TestUpdateHost(MAASTestCase):
-
-    def test__creates_omshell_with_correct_arguments(self):
-        omshell = self.patch(dhcp, "Omshell")
-        server = Mock()
-        server.ipv6 = factory.pick_bool()
-        dhcp._update_hosts(server, [], [], [])
-        self.assertThat(omshell, MockCallsMatch(
-            call(
-                ipv6=server.ipv6, server_address="127.0.0.1",
-                shared_key=server.omapi_key),
-        ))
-
-    def test__performs_operations(self):
-        omshell = Mock()
-        self.patch(dhcp, "Omshell").return_value = omshell
-        remove_host = make_host()
-        add_host = make_host()
-        modify_host = make_host()
-        server = Mock()
-        server.ipv6 = factory.pick_bool()
-        dhcp._update_hosts(server, [remove_host], [add_host], [modify_host])
-        self.assertThat(
-            omshell.remove,
-            MockCallsMatch(
-                call(remove_host["mac"]),
-            ))
-        self.assertThat(
-            omshell.create,
-            MockCallsMatch(
-                call(add_host["ip"], add_host["mac"]),
-            ))
-        self.assertThat(
-            omshell.modify,
-            MockCallsMatch(
-                call(modify_host["ip"], modify_host["mac"]),
-            ))
+            "The DHCP server could not be reached." % (
+                host["mac"], host["ip"]))
+        self.assertThat(str(error), Equals(message))
+        self.assertThat(logger.output.strip(), Equals(message))
+        self.assertThat(self.client.close, MockCalledOnceWith())
 
 
 class TestConfigureDHCP(MAASTestCase):
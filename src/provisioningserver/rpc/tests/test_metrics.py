@@ -0,0 +1,167 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.rpc.metrics`."""
+
+__all__ = []
+
+import json
+import os
+from unittest.mock import Mock
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+from provisioningserver.rpc.metrics import (
+    ConnectionLoad,
+    CURRENT_COMMAND,
+    get_box_size,
+    get_current_command,
+    Histogram,
+    RPCMetrics,
+)
+from testtools.matchers import (
+    Equals,
+    Is,
+)
+from twisted.protocols import amp
+from twisted.python import context
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHistogram(MAASTestCase):
+
+    def test__observations_are_counted_in_buckets(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        self.assertThat(histogram.counts, Equals([2, 1, 1]))
+        self.assertThat(histogram.count, Equals(4))
+        self.assertThat(histogram.total, Equals(56.5))
+        self.assertThat(histogram.max, Equals(50))
+
+    def test__percentile(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 0.5, 5, 50):
+            histogram.observe(value)
+        self.assertThat(histogram.percentile(0.5), Equals(1))
+        self.assertThat(histogram.percentile(0.75), Equals(10))
+        self.assertThat(histogram.percentile(1.0), Equals(50))
+
+    def test__percentile_of_empty_histogram_is_None(self):
+        self.assertThat(Histogram((1, 10)).percentile(0.5), Is(None))
+
+
+class TestConnectionLoad(MAASTestCase):
+
+    def test__records_calls_in_flight(self):
+        load = ConnectionLoad(clock=FakeClock())
+        token = load.call_started()
+        self.assertThat(load.in_flight, Equals(1))
+        load.call_finished(token)
+        self.assertThat(load.in_flight, Equals(0))
+        self.assertThat(load.calls, Equals(1))
+        self.assertThat(load.errors, Equals(0))
+
+    def test__records_errors(self):
+        load = ConnectionLoad(clock=FakeClock())
+        load.call_finished(load.call_started(), failed=True)
+        self.assertThat(load.errors, Equals(1))
+
+    def test__latency_is_moving_average(self):
+        clock = FakeClock()
+        load = ConnectionLoad(clock=clock)
+        self.assertThat(load.latency, Is(None))
+        token = load.call_started()
+        clock.now += 1.0
+        load.call_finished(token)
+        self.assertThat(load.latency, Equals(1.0))
+        token = load.call_started()
+        clock.now += 2.0
+        load.call_finished(token)
+        self.assertThat(load.latency, Equals(1.0 + load.weight))
+
+
+class TestRPCMetrics(MAASTestCase):
+
+    def test__records_call_latency_and_sizes(self):
+        clock = FakeClock()
+        metrics = RPCMetrics(clock=clock)
+        request = amp.AmpBox(_command=b"Foo", _ask=b"1", bar=b"baz")
+        response = amp.AmpBox(_answer=b"1", result=b"x" * 1000)
+        token = metrics.command_started("Foo", request)
+        self.assertThat(metrics.commands["Foo"].in_flight, Equals(1))
+        clock.now += 0.02
+        metrics.command_finished("Foo", token, response)
+        foo = metrics.commands["Foo"]
+        self.assertThat(foo.calls, Equals(1))
+        self.assertThat(foo.errors, Equals(0))
+        self.assertThat(foo.in_flight, Equals(0))
+        self.assertThat(foo.latency.total, Equals(0.02))
+        self.assertThat(
+            foo.request_size.total, Equals(get_box_size(request)))
+        self.assertThat(
+            foo.response_size.total, Equals(get_box_size(response)))
+
+    def test__records_errors(self):
+        metrics = RPCMetrics(clock=FakeClock())
+        token = metrics.command_started("Foo", amp.AmpBox())
+        metrics.command_finished("Foo", token, failed=True)
+        self.assertThat(metrics.commands["Foo"].errors, Equals(1))
+        self.assertThat(metrics.commands["Foo"].response_size.count, Equals(0))
+
+    def test__records_database_calls(self):
+        metrics = RPCMetrics(clock=FakeClock())
+        metrics.database_call("Foo", 0.5, 0.25)
+        self.assertThat(
+            metrics.commands["Foo"].database_wait.total, Equals(0.5))
+        self.assertThat(
+            metrics.commands["Foo"].database_execution.total, Equals(0.25))
+
+    def test__asdict_and_dump(self):
+        metrics = RPCMetrics(clock=FakeClock())
+        metrics.database_call("Foo", 0.5, 0.25)
+        observed = metrics.asdict()
+        self.assertThat(observed["pid"], Equals(os.getpid()))
+        self.assertThat(observed["commands"]["Foo"]["calls"], Equals(0))
+        path = os.path.join(self.make_dir(), "metrics.json")
+        metrics.dump(path)
+        with open(path, "r", encoding="utf-8") as fd:
+            self.assertThat(json.load(fd), Equals(json.loads(
+                json.dumps(observed))))
+
+    def test__asdict_includes_connection_loads(self):
+        metrics = RPCMetrics(clock=FakeClock())
+        connection = Mock(ident=factory.make_name("ident"))
+        load = ConnectionLoad(clock=FakeClock())
+        load.call_started()
+        metrics.connection_made(connection, load)
+        self.assertThat(metrics.asdict()["connections"], Equals([
+            dict(load.asdict(), ident=connection.ident)]))
+        metrics.connection_lost(connection)
+        self.assertThat(metrics.asdict()["connections"], Equals([]))
+
+    def test__reset(self):
+        metrics = RPCMetrics(clock=FakeClock())
+        metrics.database_call("Foo", 0.5, 0.25)
+        metrics.reset()
+        self.assertThat(metrics.asdict()["commands"], Equals({}))
+
+
+class TestGetCurrentCommand(MAASTestCase):
+
+    def test__returns_None_outside_of_command(self):
+        self.assertThat(get_current_command(), Is(None))
+
+    def test__returns_command_from_context(self):
+        command = factory.make_name("command")
+        self.assertThat(
+            context.call({CURRENT_COMMAND: command}, get_current_command),
+            Equals(command))
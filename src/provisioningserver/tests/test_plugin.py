@@ -21,9 +21,16 @@ from provisioningserver.plugin import (
     Options,
     ProvisioningServiceMaker,
 )
+from provisioningserver.rackdservices.boot_image_watcher import (
+    BootImageWatcherService,
+)
 from provisioningserver.rackdservices.dhcp_probe_service import (
     DHCPProbeService,
 )
+from provisioningserver.rackdservices.http import (
+    HTTPBootMetricsResource,
+    HTTPBootResource,
+)
 from provisioningserver.rackdservices.image import BootImageEndpointService
 from provisioningserver.rackdservices.image_download_service import (
     ImageDownloadService,
@@ -105,8 +112,8 @@ class TestProvisioningServiceMaker(MAASTestCase):
         self.assertIsInstance(service, MultiService)
         expected_services = [
             "dhcp_probe", "networks_monitor", "image_download",
-            "lease_socket_service", "node_monitor", "ntp", "rpc", "tftp",
-            "image_service", "service_monitor",
+            "boot_image_watcher", "lease_socket_service", "node_monitor",
+            "ntp", "rpc", "tftp", "image_service", "service_monitor",
             ]
         self.assertThat(service.namedServices, KeysEqual(*expected_services))
         self.assertEqual(
@@ -149,6 +156,13 @@ class TestProvisioningServiceMaker(MAASTestCase):
         image_service = service.getServiceNamed("image_download")
         self.assertIsInstance(image_service, ImageDownloadService)
 
+    def test_boot_image_watcher_service(self):
+        options = Options()
+        service_maker = ProvisioningServiceMaker("Harry", "Hill")
+        service = service_maker.makeService(options, clock=None)
+        boot_image_watcher = service.getServiceNamed("boot_image_watcher")
+        self.assertIsInstance(boot_image_watcher, BootImageWatcherService)
+
     def test_node_monitor_service(self):
         options = Options()
         service_maker = ProvisioningServiceMaker("Harry", "Hill")
@@ -219,6 +233,20 @@ class TestProvisioningServiceMaker(MAASTestCase):
 
         self.assertEqual(resource_root, root)
 
+    def test_image_service_serves_boot_files(self):
+        options = Options()
+        service_maker = ProvisioningServiceMaker("Harry", "Hill")
+        service = service_maker.makeService(options, clock=None)
+        image_service = service.getServiceNamed("image_service")
+        resource = image_service.site.resource
+        boot = resource.getChildWithDefault(b"boot", request=None)
+        self.assertThat(boot, IsInstance(HTTPBootResource))
+        self.assertThat(
+            boot.backend.client_service,
+            Is(service.getServiceNamed("rpc")))
+        metrics = resource.getChildWithDefault(b"boot-metrics", request=None)
+        self.assertThat(metrics, IsInstance(HTTPBootMetricsResource))
+
     def test_lease_socket_service(self):
         options = Options()
         service_maker = ProvisioningServiceMaker("Harry", "Hill")
@@ -0,0 +1,399 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Utilities for receiving interface change events over rtnetlink."""
+
+__all__ = [
+    "NetlinkInterfaceState",
+    "NetlinkMonitor",
+    "parse_rtnetlink_events",
+]
+
+from collections import namedtuple
+from errno import (
+    EAGAIN,
+    ENOBUFS,
+    ENOENT,
+    EWOULDBLOCK,
+)
+import socket
+import struct
+
+from netaddr import IPAddress
+from provisioningserver.logger import LegacyLogger
+from twisted.internet import interfaces
+from zope.interface import implementer
+
+
+log = LegacyLogger()
+
+# Not every Python build exposes AF_NETLINK (it is Linux-only).
+AF_NETLINK = getattr(socket, "AF_NETLINK", 16)
+NETLINK_ROUTE = 0
+
+# Multicast groups from <linux/rtnetlink.h>.
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+RTMGRP_INTERFACES = (
+    RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR |
+    RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_ROUTE)
+
+# struct nlmsghdr: length, type, flags, sequence, port ID.
+NLMSGHDR = '=LHHLL'
+NLMSGHDR_LEN = struct.calcsize(NLMSGHDR)
+
+# struct ifinfomsg: family, pad, type, index, flags, change.
+IFINFOMSG = '=BxHiII'
+IFINFOMSG_LEN = struct.calcsize(IFINFOMSG)
+
+# struct ifaddrmsg: family, prefixlen, flags, scope, index.
+IFADDRMSG = '=BBBBI'
+IFADDRMSG_LEN = struct.calcsize(IFADDRMSG)
+
+# struct rtmsg: family, dst_len, src_len, tos, table, protocol, scope, type,
+# flags.
+RTMSG = '=BBBBBBBBI'
+RTMSG_LEN = struct.calcsize(RTMSG)
+
+# struct rtattr: length, type.
+RTATTR = '=HH'
+RTATTR_LEN = struct.calcsize(RTATTR)
+
+NLMSG_NOOP = 1
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLMSG_OVERRUN = 4
+
+
+class RTM:
+    """rtnetlink message types that MAAS needs to understand."""
+    NEWLINK = 16
+    DELLINK = 17
+    NEWADDR = 20
+    DELADDR = 21
+    NEWROUTE = 24
+    DELROUTE = 25
+
+
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_MASTER = 10
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_TABLE = 15
+
+# Routing tables that are not interesting to MAAS (e.g. local addresses,
+# which are already covered by address events).
+RT_TABLE_LOCAL = 255
+
+# Only the administrative and operational flags influence the interface
+# definition; ignore flags such as IFF_RUNNING flapping as a side effect of
+# statistics updates.
+IFF_UP = 0x1
+IFF_LOWER_UP = 0x10000
+IFF_INTERESTING = IFF_UP | IFF_LOWER_UP
+
+
+LinkEvent = namedtuple("LinkEvent", (
+    "added",
+    "index",
+    "name",
+    "flags",
+    "mtu",
+    "master",
+))
+
+AddressEvent = namedtuple("AddressEvent", (
+    "added",
+    "index",
+    "family",
+    "address",
+    "prefixlen",
+))
+
+RouteEvent = namedtuple("RouteEvent", (
+    "added",
+    "family",
+    "table",
+    "destination",
+    "prefixlen",
+    "gateway",
+    "oif",
+))
+
+
+def _align(length):
+    """Round `length` up to the netlink 4-byte alignment."""
+    return (length + 3) & ~3
+
+
+def parse_rtattrs(data):
+    """Parse a sequence of `struct rtattr` into a dictionary of bytes."""
+    attrs = {}
+    offset = 0
+    while offset + RTATTR_LEN <= len(data):
+        length, rta_type = struct.unpack_from(RTATTR, data, offset)
+        if length < RTATTR_LEN:
+            break
+        attrs[rta_type] = data[offset + RTATTR_LEN:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def _decode_address(family, value):
+    """Return `value` as a string IP address, or `None` if absent."""
+    if value is None:
+        return None
+    return str(IPAddress(int.from_bytes(value, "big"), version=(
+        6 if family == socket.AF_INET6 else 4)))
+
+
+def _decode_int(value):
+    if value is None:
+        return None
+    return struct.unpack('=I', value[:4])[0]
+
+
+def _parse_link(msg_type, payload):
+    _, _, index, flags, _ = struct.unpack_from(IFINFOMSG, payload)
+    attrs = parse_rtattrs(payload[IFINFOMSG_LEN:])
+    name = attrs.get(IFLA_IFNAME, b"").rstrip(b"\0").decode("utf-8")
+    return LinkEvent(
+        msg_type == RTM.NEWLINK, index, name, flags & IFF_INTERESTING,
+        _decode_int(attrs.get(IFLA_MTU)), _decode_int(attrs.get(IFLA_MASTER)))
+
+
+def _parse_addr(msg_type, payload):
+    family, prefixlen, _, _, index = struct.unpack_from(IFADDRMSG, payload)
+    attrs = parse_rtattrs(payload[IFADDRMSG_LEN:])
+    address = attrs.get(IFA_LOCAL, attrs.get(IFA_ADDRESS))
+    return AddressEvent(
+        msg_type == RTM.NEWADDR, index, family,
+        _decode_address(family, address), prefixlen)
+
+
+def _parse_route(msg_type, payload):
+    family, dst_len, _, _, table, _, _, _, _ = struct.unpack_from(
+        RTMSG, payload)
+    attrs = parse_rtattrs(payload[RTMSG_LEN:])
+    if RTA_TABLE in attrs:
+        table = _decode_int(attrs[RTA_TABLE])
+    return RouteEvent(
+        msg_type == RTM.NEWROUTE, family, table,
+        _decode_address(family, attrs.get(RTA_DST)), dst_len,
+        _decode_address(family, attrs.get(RTA_GATEWAY)),
+        _decode_int(attrs.get(RTA_OIF)))
+
+
+_PARSERS = {
+    RTM.NEWLINK: _parse_link,
+    RTM.DELLINK: _parse_link,
+    RTM.NEWADDR: _parse_addr,
+    RTM.DELADDR: _parse_addr,
+    RTM.NEWROUTE: _parse_route,
+    RTM.DELROUTE: _parse_route,
+}
+
+
+def parse_rtnetlink_events(data):
+    """Parse the rtnetlink messages in `data`.
+
+    Messages that MAAS doesn't care about are silently skipped, as are
+    truncated or malformed messages.
+
+    :return: A list of `LinkEvent`, `AddressEvent` and `RouteEvent` tuples.
+    """
+    events = []
+    offset = 0
+    while offset + NLMSGHDR_LEN <= len(data):
+        length, msg_type, _, _, _ = struct.unpack_from(NLMSGHDR, data, offset)
+        if length < NLMSGHDR_LEN or offset + length > len(data):
+            break
+        parser = _PARSERS.get(msg_type)
+        if parser is not None:
+            payload = data[offset + NLMSGHDR_LEN:offset + length]
+            try:
+                events.append(parser(msg_type, payload))
+            except (struct.error, ValueError) as e:
+                log.msg("Ignoring malformed rtnetlink message: %s" % e)
+        offset += _align(length)
+    return events
+
+
+class NetlinkInterfaceState:
+    """Incrementally maintained model of links, addresses, and routes.
+
+    The kernel sends notifications for changes that do not alter anything
+    that MAAS records (e.g. a link message for a statistics update, or a
+    re-announcement of an existing address). This model is used to filter
+    those out, so that only real changes trigger interface recording.
+    """
+
+    def __init__(self):
+        self.links = {}
+        self.addresses = set()
+        self.routes = set()
+
+    def clear(self):
+        """Forget everything; e.g. after a full refresh or overrun."""
+        self.links.clear()
+        self.addresses.clear()
+        self.routes.clear()
+
+    def apply(self, event):
+        """Apply the given event to the model.
+
+        :return: True if the model changed, False otherwise.
+        """
+        if isinstance(event, LinkEvent):
+            return self._applyLink(event)
+        elif isinstance(event, AddressEvent):
+            key = event._replace(added=None)
+            return self._applyToSet(self.addresses, key, event.added)
+        elif isinstance(event, RouteEvent):
+            if event.table == RT_TABLE_LOCAL:
+                return False
+            key = event._replace(added=None)
+            return self._applyToSet(self.routes, key, event.added)
+        else:
+            return False
+
+    def _applyLink(self, event):
+        if event.added:
+            link = event._replace(added=None)
+            if self.links.get(event.index) == link:
+                return False
+            self.links[event.index] = link
+            return True
+        else:
+            # Deleting a link implicitly deletes its addresses and routes.
+            self.addresses = {
+                address for address in self.addresses
+                if address.index != event.index
+            }
+            self.routes = {
+                route for route in self.routes if route.oif != event.index
+            }
+            self.links.pop(event.index, None)
+            return True
+
+    @staticmethod
+    def _applyToSet(container, key, added):
+        if added:
+            if key in container:
+                return False
+            container.add(key)
+            return True
+        else:
+            # A deletion is always considered a change; the model may not
+            # have seen the original addition.
+            container.discard(key)
+            return True
+
+
+def make_netlink_socket(groups=RTMGRP_INTERFACES):
+    """Return a non-blocking rtnetlink socket subscribed to `groups`."""
+    sock = socket.socket(AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    try:
+        sock.setblocking(False)
+        sock.bind((0, groups))
+    except:
+        sock.close()
+        raise
+    return sock
+
+
+@implementer(interfaces.IReadDescriptor)
+class NetlinkMonitor:
+    """Watch rtnetlink for interface changes from within the reactor.
+
+    `callback` is called with a list of the events that changed the
+    `NetlinkInterfaceState` model. If the kernel reports that it dropped
+    messages (``ENOBUFS``), the model is reset and `callback` is called with
+    `None`, which means "something changed, but it's not known what".
+
+    :param callback: A callable accepting a list of events (or `None`).
+    :param reactor: The `IReactorFDSet` to register with.
+    """
+
+    # The size of the receive buffer; large enough for a burst of changes on
+    # a host with many VLANs.
+    bufsize = 1 << 16
+
+    def __init__(self, callback, reactor):
+        super().__init__()
+        self.callback = callback
+        self.reactor = reactor
+        self.state = NetlinkInterfaceState()
+        self.socket = None
+
+    def logPrefix(self):
+        return "netlink"
+
+    def fileno(self):
+        return -1 if self.socket is None else self.socket.fileno()
+
+    def startReading(self):
+        """Open the netlink socket and add it to the reactor.
+
+        :raise OSError: If the socket cannot be created (e.g. on a kernel
+            or in a container without netlink support).
+        """
+        if self.socket is None:
+            self.socket = make_netlink_socket()
+            self.reactor.addReader(self)
+
+    def stopReading(self):
+        """Remove the netlink socket from the reactor and close it."""
+        if self.socket is not None:
+            try:
+                self.reactor.removeReader(self)
+            except IOError as error:
+                # See `PostgresListenerService.stopReading`.
+                if error.errno != ENOENT:
+                    raise
+            finally:
+                self.socket.close()
+                self.socket = None
+
+    def doRead(self):
+        """Read and dispatch all pending netlink messages."""
+        changes = []
+        while self.socket is not None:
+            try:
+                data = self.socket.recv(self.bufsize)
+            except OSError as error:
+                if error.errno in (EAGAIN, EWOULDBLOCK):
+                    break
+                elif error.errno == ENOBUFS:
+                    # The kernel dropped messages; the model can no longer
+                    # be trusted.
+                    self.state.clear()
+                    changes = None
+                    continue
+                else:
+                    raise
+            else:
+                if len(data) == 0:
+                    break
+                events = [
+                    event for event in parse_rtnetlink_events(data)
+                    if self.state.apply(event)
+                ]
+                if changes is not None:
+                    changes.extend(events)
+        if changes is None or len(changes) > 0:
+            self.callback(changes)
+
+    def connectionLost(self, reason):
+        log.msg("Stopped monitoring netlink: %s" % reason.getErrorMessage())
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
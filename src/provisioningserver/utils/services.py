@@ -47,6 +47,7 @@ from provisioningserver.utils.network import (
     enumerate_ipv4_addresses,
     get_all_interfaces_definition,
 )
+from provisioningserver.utils.netlink import NetlinkMonitor
 from provisioningserver.utils.shell import select_c_utf8_bytes_locale
 from provisioningserver.utils.twisted import (
     callOut,
@@ -947,13 +948,27 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
     Parse ``/etc/network/interfaces`` and the output from ``ip addr show`` to
     update MAAS's records of network interfaces on this host.
 
+    When rtnetlink is available, link, address, and route changes are
+    observed as they happen and trigger an interface update shortly after.
+    The (expensive) full interface definition is otherwise only gathered
+    once every `consistency_interval` seconds, as a consistency check.
+
     :param clock: An `IReactor` instance.
     """
 
     interval = timedelta(seconds=30).total_seconds()
 
+    # How often to gather the full interface definition when rtnetlink is
+    # telling us about changes.
+    consistency_interval = timedelta(minutes=10).total_seconds()
+
+    # How long to wait for a burst of rtnetlink events (e.g. an interface
+    # being brought up with several addresses) to settle before updating.
+    netlink_settle_delay = 2.0
+
     def __init__(
-            self, clock=None, enable_monitoring=True, enable_beaconing=True):
+            self, clock=None, enable_monitoring=True, enable_beaconing=True,
+            enable_netlink=True):
         # Order is very important here. First we set the clock to the passed-in
         # reactor, so that unit tests can fake out the clock if necessary.
         # Then we call super(). The superclass will set up the structures
@@ -965,8 +980,17 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         super().__init__()
         self.enable_monitoring = enable_monitoring
         self.enable_beaconing = enable_beaconing
+        self.enable_netlink = enable_netlink
         # The last successfully recorded interfaces.
         self._recorded = None
+        # The last gathered interfaces, when they were gathered, and whether
+        # rtnetlink has since told us that they're out of date.
+        self._interfaces = None
+        self._interfaces_gathered = None
+        self._interfaces_stale = True
+        self._updating = False
+        self._netlink = None
+        self._netlink_call = None
         self._monitored = frozenset()
         self._beaconing = frozenset()
         self._monitoring_state = {}
@@ -985,6 +1009,15 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         self.interface_monitor.setServiceParent(self)
         self.beaconing_protocol = None
 
+    def _getClock(self):
+        return reactor if self.clock is None else self.clock
+
+    def startService(self):
+        super().startService()
+        # Don't watch netlink when running the test suite/dev env.
+        if self.enable_netlink and not is_dev_environment():
+            self._startNetlinkMonitor()
+
     @inlineCallbacks
     def updateInterfaces(self):
         """Update interfaces, catching and logging errors.
@@ -995,8 +1028,21 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
         responsible = self._assumeSoleResponsibility()
         if responsible:
             interfaces = None
+            self._updating = True
             try:
-                interfaces = yield maybeDeferred(self.getInterfaces)
+                if self._shouldGatherInterfaces():
+                    # Clear the stale flag first so that changes reported
+                    # while gathering cause another update.
+                    self._interfaces_stale = False
+                    try:
+                        interfaces = yield maybeDeferred(self.getInterfaces)
+                    except:
+                        self._interfaces_stale = True
+                        raise
+                    self._interfaces = interfaces
+                    self._interfaces_gathered = self._getClock().seconds()
+                else:
+                    interfaces = self._interfaces
                 yield self._updateInterfaces(interfaces)
             except BaseException as e:
                 msg = (
@@ -1004,6 +1050,74 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
                     "configuration: %s; interfaces: %r" % (e, interfaces)
                 )
                 log.err(None, msg)
+            finally:
+                self._updating = False
+
+    def _shouldGatherInterfaces(self):
+        """Return True if the full interface definition must be gathered.
+
+        Without rtnetlink this is always the case. With it, only when a change
+        has been reported or the consistency interval has elapsed.
+        """
+        if self._netlink is None or self._interfaces_stale:
+            return True
+        elif self._interfaces_gathered is None:
+            return True
+        else:
+            elapsed = self._getClock().seconds() - self._interfaces_gathered
+            return elapsed >= self.consistency_interval
+
+    def _startNetlinkMonitor(self):
+        """Start observing interface changes with rtnetlink.
+
+        If rtnetlink cannot be used the full interface definition is gathered
+        every `interval` seconds instead.
+        """
+        monitor = NetlinkMonitor(self._netlinkChanged, reactor)
+        try:
+            monitor.startReading()
+        except OSError as e:
+            maaslog.warning(
+                "Unable to monitor interface changes with netlink (%s); "
+                "falling back to polling every %d seconds." % (
+                    e, self.interval))
+        else:
+            self._netlink = monitor
+
+    def _stopNetlinkMonitor(self):
+        if self._netlink_call is not None:
+            if self._netlink_call.active():
+                self._netlink_call.cancel()
+            self._netlink_call = None
+        if self._netlink is not None:
+            self._netlink.stopReading()
+            self._netlink = None
+
+    def _netlinkChanged(self, events):
+        """Called by the `NetlinkMonitor` when interfaces have changed.
+
+        Updates are deferred by `netlink_settle_delay` seconds so that a
+        burst of events results in a single update.
+        """
+        if events is None:
+            log.msg("Netlink messages were lost; refreshing interfaces.")
+        else:
+            log.msg("Netlink reported %d interface change(s)." % len(events))
+        self._interfaces_stale = True
+        if self._netlink_call is None:
+            self._netlink_call = self._getClock().callLater(
+                self.netlink_settle_delay, self._netlinkUpdate)
+
+    def _netlinkUpdate(self):
+        self._netlink_call = None
+        if not self.running or not self._interfaces_stale:
+            return
+        elif self._updating:
+            # Try again once the update in progress has finished.
+            self._netlink_call = self._getClock().callLater(
+                self.netlink_settle_delay, self._netlinkUpdate)
+        else:
+            return self.updateInterfaces()
 
     def getInterfaces(self):
         """Get the current network interfaces configuration.
@@ -1050,6 +1164,7 @@ class NetworksMonitoringService(MultiService, metaclass=ABCMeta):
 
         Ensures that sole responsibility for monitoring networks is released.
         """
+        self._stopNetlinkMonitor()
         d = super().stopService()
         if self.beaconing_protocol is not None:
             self.beaconing_protocol.stopProtocol()
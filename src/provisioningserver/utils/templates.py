@@ -0,0 +1,81 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""A cache of parsed Tempita templates."""
+
+__all__ = [
+    "TemplateCache",
+]
+
+from collections import OrderedDict
+import copy
+import os
+from threading import Lock
+
+import tempita
+
+
+class TemplateCache:
+    """A cache of parsed templates, keyed by path and modification time.
+
+    Loading a template from the cache costs only a ``stat``, so templates
+    that are edited, replaced, or removed on disk are noticed straight away,
+    without restarting anything. Parsing only happens when a file is new or
+    has changed.
+
+    :ivar hits: The number of loads satisfied from the cache.
+    :ivar misses: The number of loads that read and parsed a file.
+    """
+
+    def __init__(self, template_class=tempita.Template, size=256):
+        super(TemplateCache, self).__init__()
+        self.template_class = template_class
+        self.size = size
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.templates = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+    def load(self, path, encoding="UTF-8", get_template=None):
+        """Load the template at `path`.
+
+        :param get_template: If given, the template returned will use this to
+            load templates that it includes or inherits from. Otherwise it
+            will load them by filename, as `Template.from_filename` does.
+        :raise OSError: If `path` cannot be read, e.g. it does not exist.
+        :return: An instance of `template_class`.
+        """
+        st = os.stat(path)
+        stamp = st.st_mtime_ns, st.st_size, st.st_ino
+        key = path, encoding
+        with self.lock:
+            try:
+                cached_stamp, template = self.templates.pop(key)
+            except KeyError:
+                template = None
+            else:
+                if cached_stamp == stamp:
+                    self.hits += 1
+                else:
+                    template = None
+            if template is None:
+                self.misses += 1
+            else:
+                self.templates[key] = stamp, template
+        if template is None:
+            template = self.template_class.from_filename(
+                path, encoding=encoding)
+            with self.lock:
+                self.templates[key] = stamp, template
+                while len(self.templates) > self.size:
+                    self.templates.popitem(last=False)
+        if get_template is not None:
+            # Parsed templates are not changed by rendering, so a shallow
+            # copy is enough to give this one a different loader.
+            template = copy.copy(template)
+            template.get_template = get_template
+        return template
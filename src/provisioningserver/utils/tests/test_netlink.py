@@ -0,0 +1,198 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for ``provisioningserver.utils.netlink``."""
+
+__all__ = []
+
+from errno import (
+    EAGAIN,
+    ENOBUFS,
+)
+import socket
+import struct
+from unittest.mock import (
+    call,
+    Mock,
+)
+
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCallsMatch,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from provisioningserver.utils import netlink
+from provisioningserver.utils.netlink import (
+    AddressEvent,
+    IFF_UP,
+    IFINFOMSG,
+    IFADDRMSG,
+    IFA_LOCAL,
+    IFLA_IFNAME,
+    LinkEvent,
+    NetlinkInterfaceState,
+    NetlinkMonitor,
+    NLMSGHDR,
+    NLMSGHDR_LEN,
+    parse_rtnetlink_events,
+    RouteEvent,
+    RT_TABLE_LOCAL,
+    RTA_DST,
+    RTA_OIF,
+    RTM,
+    RTMSG,
+)
+from testtools.matchers import Equals
+
+
+def make_rtattr(rta_type, value):
+    length = 4 + len(value)
+    padding = b"\0" * (((length + 3) & ~3) - length)
+    return struct.pack("=HH", length, rta_type) + value + padding
+
+
+def make_message(msg_type, payload):
+    return struct.pack(
+        NLMSGHDR, NLMSGHDR_LEN + len(payload), msg_type, 0, 0, 0) + payload
+
+
+def make_link_message(msg_type, index, name, flags=IFF_UP):
+    payload = struct.pack(IFINFOMSG, socket.AF_UNSPEC, 1, index, flags, 0)
+    payload += make_rtattr(IFLA_IFNAME, name.encode("utf-8") + b"\0")
+    return make_message(msg_type, payload)
+
+
+def make_addr_message(msg_type, index, address, prefixlen):
+    payload = struct.pack(
+        IFADDRMSG, socket.AF_INET, prefixlen, 0, 0, index)
+    payload += make_rtattr(IFA_LOCAL, socket.inet_aton(address))
+    return make_message(msg_type, payload)
+
+
+def make_route_message(msg_type, destination, prefixlen, oif, table=254):
+    payload = struct.pack(
+        RTMSG, socket.AF_INET, prefixlen, 0, 0, table, 0, 0, 0, 0)
+    payload += make_rtattr(RTA_DST, socket.inet_aton(destination))
+    payload += make_rtattr(RTA_OIF, struct.pack("=I", oif))
+    return make_message(msg_type, payload)
+
+
+class TestParseRTNetlinkEvents(MAASTestCase):
+
+    def test__parses_link_messages(self):
+        data = make_link_message(RTM.NEWLINK, 3, "eth0")
+        data += make_link_message(RTM.DELLINK, 4, "eth1")
+        self.assertThat(parse_rtnetlink_events(data), Equals([
+            LinkEvent(True, 3, "eth0", IFF_UP, None, None),
+            LinkEvent(False, 4, "eth1", IFF_UP, None, None),
+        ]))
+
+    def test__parses_address_messages(self):
+        data = make_addr_message(RTM.NEWADDR, 3, "192.168.0.1", 24)
+        self.assertThat(parse_rtnetlink_events(data), Equals([
+            AddressEvent(True, 3, socket.AF_INET, "192.168.0.1", 24),
+        ]))
+
+    def test__parses_route_messages(self):
+        data = make_route_message(RTM.DELROUTE, "10.0.0.0", 8, 3)
+        self.assertThat(parse_rtnetlink_events(data), Equals([
+            RouteEvent(False, socket.AF_INET, 254, "10.0.0.0", 8, None, 3),
+        ]))
+
+    def test__ignores_unknown_messages(self):
+        data = make_message(netlink.NLMSG_DONE, b"\0\0\0\0")
+        data += make_link_message(RTM.NEWLINK, 3, "eth0")
+        self.assertThat(parse_rtnetlink_events(data), Equals([
+            LinkEvent(True, 3, "eth0", IFF_UP, None, None),
+        ]))
+
+    def test__ignores_truncated_messages(self):
+        data = make_link_message(RTM.NEWLINK, 3, "eth0")
+        self.assertThat(parse_rtnetlink_events(data[:-4]), Equals([]))
+
+
+class TestNetlinkInterfaceState(MAASTestCase):
+
+    def test__new_link_is_a_change(self):
+        state = NetlinkInterfaceState()
+        event = LinkEvent(True, 3, "eth0", IFF_UP, 1500, None)
+        self.assertTrue(state.apply(event))
+
+    def test__repeated_link_is_not_a_change(self):
+        state = NetlinkInterfaceState()
+        event = LinkEvent(True, 3, "eth0", IFF_UP, 1500, None)
+        state.apply(event)
+        self.assertFalse(state.apply(event))
+
+    def test__link_flag_change_is_a_change(self):
+        state = NetlinkInterfaceState()
+        state.apply(LinkEvent(True, 3, "eth0", IFF_UP, 1500, None))
+        self.assertTrue(
+            state.apply(LinkEvent(True, 3, "eth0", 0, 1500, None)))
+
+    def test__repeated_address_is_not_a_change(self):
+        state = NetlinkInterfaceState()
+        event = AddressEvent(True, 3, socket.AF_INET, "10.0.0.1", 8)
+        self.assertTrue(state.apply(event))
+        self.assertFalse(state.apply(event))
+        self.assertTrue(state.apply(event._replace(added=False)))
+
+    def test__local_table_routes_are_ignored(self):
+        state = NetlinkInterfaceState()
+        event = RouteEvent(
+            True, socket.AF_INET, RT_TABLE_LOCAL, "10.0.0.1", 32, None, 3)
+        self.assertFalse(state.apply(event))
+
+    def test__deleting_link_forgets_its_addresses_and_routes(self):
+        state = NetlinkInterfaceState()
+        state.apply(AddressEvent(True, 3, socket.AF_INET, "10.0.0.1", 8))
+        state.apply(RouteEvent(True, socket.AF_INET, 254, None, 0, None, 3))
+        state.apply(LinkEvent(False, 3, "eth0", 0, None, None))
+        self.assertThat(state.addresses, Equals(set()))
+        self.assertThat(state.routes, Equals(set()))
+
+
+class TestNetlinkMonitor(MAASTestCase):
+
+    def make_monitor(self, *results):
+        callback = Mock()
+        monitor = NetlinkMonitor(callback, Mock())
+        monitor.socket = Mock()
+        monitor.socket.recv.side_effect = list(results) + [
+            BlockingIOError(EAGAIN, "again")]
+        return monitor, callback
+
+    def test__reports_changes(self):
+        data = make_link_message(RTM.NEWLINK, 3, "eth0")
+        monitor, callback = self.make_monitor(data, data)
+        monitor.doRead()
+        self.assertThat(callback, MockCalledOnceWith([
+            LinkEvent(True, 3, "eth0", IFF_UP, None, None),
+        ]))
+
+    def test__does_not_report_when_nothing_changed(self):
+        data = make_link_message(RTM.NEWLINK, 3, "eth0")
+        monitor, callback = self.make_monitor(data)
+        monitor.doRead()
+        callback.reset_mock()
+        monitor.socket.recv.side_effect = [
+            data, BlockingIOError(EAGAIN, "again")]
+        monitor.doRead()
+        self.assertThat(callback, MockNotCalled())
+
+    def test__reports_unknown_change_on_overrun(self):
+        data = make_link_message(RTM.NEWLINK, 3, "eth0")
+        monitor, callback = self.make_monitor(
+            OSError(ENOBUFS, "no buffers"), data)
+        monitor.doRead()
+        self.assertThat(callback, MockCallsMatch(call(None)))
+
+    def test__stopReading_removes_reader_and_closes_socket(self):
+        monitor, _ = self.make_monitor()
+        sock = monitor.socket
+        monitor.stopReading()
+        self.assertThat(
+            monitor.reactor.removeReader, MockCalledOnceWith(monitor))
+        self.assertThat(sock.close, MockCalledOnceWith())
+        self.assertIsNone(monitor.socket)
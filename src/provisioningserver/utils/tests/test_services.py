@@ -78,10 +78,11 @@ class StubNetworksMonitoringService(NetworksMonitoringService):
 
     def __init__(
             self, enable_monitoring=False, enable_beaconing=False,
-            *args, **kwargs):
+            enable_netlink=False, *args, **kwargs):
         super().__init__(
             *args, enable_monitoring=enable_monitoring,
-            enable_beaconing=enable_beaconing, **kwargs)
+            enable_beaconing=enable_beaconing,
+            enable_netlink=enable_netlink, **kwargs)
         self.iterations = DeferredQueue()
         self.interfaces = []
         self.update_interface__calls = 0
@@ -303,6 +304,68 @@ class TestNetworksMonitoringService(MAASTestCase):
         # ... interfaces ARE recorded.
         self.assertThat(service.interfaces, Not(Equals([])))
 
+    @inlineCallbacks
+    def test_does_not_gather_interfaces_when_netlink_reports_no_change(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.return_value = {}
+        clock = Clock()
+        service = self.makeService(clock=clock)
+        service._netlink = Mock()
+        yield service.updateInterfaces()
+        yield service.updateInterfaces()
+        self.assertThat(get_interfaces, MockCalledOnceWith())
+
+    @inlineCallbacks
+    def test_gathers_interfaces_after_consistency_interval(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.return_value = {}
+        clock = Clock()
+        service = self.makeService(clock=clock)
+        service._netlink = Mock()
+        yield service.updateInterfaces()
+        clock.advance(service.consistency_interval)
+        yield service.updateInterfaces()
+        self.assertThat(get_interfaces, MockCallsMatch(call(), call()))
+
+    @inlineCallbacks
+    def test_netlink_change_triggers_update_after_settling(self):
+        get_interfaces = self.patch(services, "get_all_interfaces_definition")
+        get_interfaces.side_effect = [sentinel.config1, sentinel.config2]
+        clock = Clock()
+        service = self.makeService(clock=clock)
+        service._netlink = Mock()
+        service.running = True
+        yield service.updateInterfaces()
+        # A burst of events results in a single update.
+        service._netlinkChanged([sentinel.event1])
+        service._netlinkChanged([sentinel.event2])
+        self.assertThat(service.update_interface__calls, Equals(1))
+        clock.advance(service.netlink_settle_delay)
+        yield service.iterations.get()
+        yield service.iterations.get()
+        self.assertThat(service.update_interface__calls, Equals(2))
+        self.assertThat(service.interfaces, Equals(
+            [sentinel.config1, sentinel.config2]))
+
+    def test_netlink_change_waits_for_update_in_progress(self):
+        clock = Clock()
+        service = self.makeService(clock=clock)
+        service.running = True
+        service._updating = True
+        service._netlinkChanged(None)
+        clock.advance(service.netlink_settle_delay)
+        self.assertThat(service.update_interface__calls, Equals(0))
+        self.assertThat(service._netlink_call, Not(Is(None)))
+        service._stopNetlinkMonitor()
+
+    def test_falls_back_to_polling_if_netlink_unavailable(self):
+        startReading = self.patch(services.NetlinkMonitor, "startReading")
+        startReading.side_effect = OSError()
+        service = self.makeService()
+        service._startNetlinkMonitor()
+        self.assertThat(service._netlink, Is(None))
+        self.assertTrue(service._shouldGatherInterfaces())
+
 
 class TestJSONPerLineProtocol(MAASTestCase):
     """Tests for `JSONPerLineProtocol`."""
@@ -0,0 +1,82 @@
+# Copyright 2017 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `provisioningserver.utils.templates`."""
+
+__all__ = []
+
+import os
+
+from maastesting.testcase import MAASTestCase
+from provisioningserver.utils.templates import TemplateCache
+import tempita
+
+
+class TestTemplateCache(MAASTestCase):
+
+    def test__load_parses_template(self):
+        path = self.make_file(contents=b"Hello {{name}}")
+        template = TemplateCache().load(path)
+        self.assertIsInstance(template, tempita.Template)
+        self.assertEqual(path, template.name)
+        self.assertEqual("Hello world", template.substitute(name="world"))
+
+    def test__load_reuses_template_until_changed(self):
+        path = self.make_file(contents=b"one")
+        cache = TemplateCache()
+        template = cache.load(path)
+        self.assertIs(template, cache.load(path))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        with open(path, "w") as fd:
+            fd.write("two, changed")
+        self.assertEqual("two, changed", cache.load(path).substitute())
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+    def test__load_notices_replaced_template(self):
+        path = self.make_file(contents=b"one")
+        cache = TemplateCache()
+        cache.load(path)
+        replacement = self.make_file(contents=b"two")
+        os.rename(replacement, path)
+        self.assertEqual("two", cache.load(path).substitute())
+
+    def test__load_raises_when_template_removed(self):
+        path = self.make_file(contents=b"one")
+        cache = TemplateCache()
+        cache.load(path)
+        os.unlink(path)
+        self.assertRaises(FileNotFoundError, cache.load, path)
+
+    def test__load_uses_template_class(self):
+
+        class MyTemplate(tempita.Template):
+            pass
+
+        path = self.make_file()
+        template = TemplateCache(MyTemplate).load(path)
+        self.assertIsInstance(template, MyTemplate)
+
+    def test__load_sets_get_template_on_copy(self):
+        path = self.make_file(contents=b'{{inherit "base"}}child')
+        cache = TemplateCache()
+        base = tempita.Template("base: {{self.body}}")
+        template = cache.load(path, get_template=lambda name, parent: base)
+        self.assertEqual("base: child", template.substitute())
+        self.assertIsNot(template, cache.load(path))
+        self.assertIsNot(
+            template.get_template, cache.load(path).get_template)
+
+    def test__evicts_least_recently_used(self):
+        paths = [self.make_file() for _ in range(3)]
+        cache = TemplateCache(size=2)
+        for path in paths:
+            cache.load(path)
+        self.assertEqual(
+            [(path, "UTF-8") for path in paths[1:]], list(cache.templates))
+
+    def test__clear(self):
+        cache = TemplateCache()
+        cache.load(self.make_file())
+        cache.clear()
+        self.assertEqual(
+            ({}, 0, 0), (dict(cache.templates), cache.hits, cache.misses))
@@ -71,6 +71,8 @@ from provisioningserver.utils.twisted import (
     terminateProcess,
     ThreadPool,
     ThreadPoolLimiter,
+    ThreadPoolQueue,
+    ThreadPoolScheduler,
     ThreadUnpool,
 )
 from testscenarios import multiply_scenarios
@@ -1720,6 +1722,157 @@ class TestThreadPoolLimiter(MAASTestCase):
         self.assertThat(pool.lock.tokens, Equals(1))
 
 
+class FakeThreadPool:
+    """A thread-pool that records calls; they're finished by the test."""
+
+    start = sentinel.start
+    started = sentinel.started
+    stop = sentinel.stop
+
+    def __init__(self, maxthreads):
+        super(FakeThreadPool, self).__init__()
+        self.max = maxthreads
+        self.calls = []
+
+    def callInThreadWithCallback(self, onResult, func, *args, **kwargs):
+        self.calls.append((onResult, func, args, kwargs))
+
+    def finish(self, func):
+        """Run the first started call to `func`."""
+        for started in self.calls:
+            onResult, called, args, kwargs = started
+            if called is func:
+                self.calls.remove(started)
+                onResult(True, func(*args, **kwargs))
+                break
+        else:
+            raise AssertionError("%r was not started." % (func,))
+
+    @property
+    def started_funcs(self):
+        return [func for _, func, _, _ in self.calls]
+
+
+class TestThreadPoolScheduler(MAASTestCase):
+    """Tests for `ThreadPoolScheduler`."""
+
+    queues = (
+        ThreadPoolQueue("boot", priority=0, limit=None, max_wait=None),
+        ThreadPoolQueue("default", priority=1, limit=None, max_wait=None),
+        ThreadPoolQueue("bulk", priority=2, limit=1, max_wait=10.0),
+    )
+
+    def make_scheduler(self, maxthreads=2, reserved=0):
+        clock = Clock()
+        clock.callFromThread = lambda f, *args, **kwargs: f(*args, **kwargs)
+        pool = FakeThreadPool(maxthreads)
+        self.queue = None
+        scheduler = ThreadPoolScheduler(
+            pool, self.queues, lambda: self.queue,
+            reserved=reserved, clock=clock)
+        return scheduler
+
+    def call(self, scheduler, queue, func, callback=None):
+        self.queue = queue
+        try:
+            scheduler.callInThreadWithCallback(callback, func)
+        finally:
+            self.queue = None
+
+    def make_funcs(self, count):
+        return [Mock(name="func%d" % index) for index in range(count)]
+
+    def test__init(self):
+        scheduler = self.make_scheduler(maxthreads=3, reserved=1)
+        self.assertThat(scheduler, MatchesStructure(
+            capacity=Equals(3), reserved=Equals(1), running=Equals(0),
+            bestPriority=Equals(0), start=Equals(scheduler.pool.start),
+            started=Equals(scheduler.pool.started),
+            stop=Equals(scheduler.pool.stop)))
+
+    def test__init_rejects_missing_default_queue(self):
+        self.assertRaises(
+            ValueError, ThreadPoolScheduler, FakeThreadPool(1),
+            self.queues[:1], lambda: None)
+
+    def test__calls_are_started_while_threads_are_free(self):
+        scheduler = self.make_scheduler(maxthreads=2)
+        funcs = self.make_funcs(3)
+        for func in funcs:
+            self.call(scheduler, "default", func)
+        self.assertThat(scheduler.pool.started_funcs, Equals(funcs[:2]))
+        self.assertThat(scheduler.getQueueDepths()["default"], Equals((1, 2)))
+        self.assertThat(scheduler.working, HasLength(3))
+
+    def test__unknown_queue_uses_default(self):
+        scheduler = self.make_scheduler(maxthreads=0)
+        self.call(scheduler, factory.make_name("queue"), Mock())
+        self.call(scheduler, None, Mock())
+        self.assertThat(scheduler.getQueueDepths()["default"], Equals((2, 0)))
+
+    def test__better_priority_goes_first(self):
+        scheduler = self.make_scheduler(maxthreads=1)
+        blocker, bulk, default, boot = self.make_funcs(4)
+        self.call(scheduler, "default", blocker)
+        self.call(scheduler, "bulk", bulk)
+        self.call(scheduler, "default", default)
+        self.call(scheduler, "boot", boot)
+        scheduler.pool.finish(blocker)
+        self.assertThat(scheduler.pool.started_funcs, Equals([boot]))
+        scheduler.pool.finish(boot)
+        self.assertThat(scheduler.pool.started_funcs, Equals([default]))
+        scheduler.pool.finish(default)
+        self.assertThat(scheduler.pool.started_funcs, Equals([bulk]))
+
+    def test__queue_limit_is_respected(self):
+        scheduler = self.make_scheduler(maxthreads=3)
+        bulk1, bulk2 = self.make_funcs(2)
+        self.call(scheduler, "bulk", bulk1)
+        self.call(scheduler, "bulk", bulk2)
+        self.assertThat(scheduler.pool.started_funcs, Equals([bulk1]))
+        scheduler.pool.finish(bulk1)
+        self.assertThat(scheduler.pool.started_funcs, Equals([bulk2]))
+
+    def test__reserved_threads_are_kept_for_best_priority(self):
+        scheduler = self.make_scheduler(maxthreads=2, reserved=1)
+        default1, default2, boot = self.make_funcs(3)
+        self.call(scheduler, "default", default1)
+        self.call(scheduler, "default", default2)
+        self.assertThat(scheduler.pool.started_funcs, Equals([default1]))
+        self.call(scheduler, "boot", boot)
+        self.assertThat(scheduler.pool.started_funcs, Equals([default1, boot]))
+
+    def test__starved_calls_jump_the_queue(self):
+        scheduler = self.make_scheduler(maxthreads=1)
+        blocker, bulk, default = self.make_funcs(3)
+        self.call(scheduler, "default", blocker)
+        self.call(scheduler, "bulk", bulk)
+        scheduler.clock.advance(10.0)
+        self.call(scheduler, "default", default)
+        scheduler.pool.finish(blocker)
+        self.assertThat(scheduler.pool.started_funcs, Equals([bulk]))
+
+    def test__callback_is_called_with_result(self):
+        scheduler = self.make_scheduler()
+        func, callback = Mock(return_value=sentinel.result), Mock()
+        self.call(scheduler, "default", func, callback)
+        scheduler.pool.finish(func)
+        self.assertThat(callback, MockCalledOnceWith(True, sentinel.result))
+        self.assertThat(scheduler.running, Equals(0))
+
+    def test__callback_is_called_when_underlying_pool_breaks(self):
+        scheduler = self.make_scheduler()
+        exception_type = factory.make_exception_type()
+        citwc = self.patch(scheduler.pool, "callInThreadWithCallback")
+        citwc.side_effect = exception_type
+        callback = Mock()
+        self.call(scheduler, "default", Mock(), callback)
+        self.assertThat(callback, MockCalledOnceWith(False, ANY))
+        [success, result] = callback.call_args[0]
+        self.assertThat(result.value, IsInstance(exception_type))
+        self.assertThat(scheduler.running, Equals(0))
+
+
 class TestMakeDeferredWithProcessProtocol(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
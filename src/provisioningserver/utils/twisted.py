@@ -26,12 +26,16 @@ __all__ = [
     'synchronous',
     'ThreadPool',
     'ThreadPoolLimiter',
+    'ThreadPoolQueue',
+    'ThreadPoolScheduler',
     'ThreadUnpool',
     ]
 
 from collections import (
     defaultdict,
+    deque,
     Iterable,
+    namedtuple,
 )
 from functools import (
     partial,
@@ -990,6 +994,196 @@ class ThreadPoolLimiter:
             log.err, "Critical failure arranging call in thread")
 
 
+ThreadPoolQueue = namedtuple(
+    "ThreadPoolQueue", ("name", "priority", "limit", "max_wait"))
+ThreadPoolQueue.__doc__ = """\
+A named queue of calls waiting for a thread in a `ThreadPoolScheduler`.
+
+:ivar name: The name of the queue.
+:ivar priority: Calls in queues with a lower priority number are started
+    before calls in queues with a higher number.
+:ivar limit: The maximum number of calls from this queue that may run at
+    once, or `None` for no limit (other than the scheduler's capacity).
+:ivar max_wait: Once a call has waited this many seconds it is started
+    ahead of calls in queues with a better priority, so that the queue is
+    not starved. `None` means that calls wait for as long as it takes.
+"""
+
+
+class _ThreadPoolQueueState:
+    """The pending and running calls of a `ThreadPoolQueue`."""
+
+    def __init__(self, queue):
+        super(_ThreadPoolQueueState, self).__init__()
+        self.queue = queue
+        self.pending = deque()
+        self.running = 0
+
+    def isReady(self):
+        """Is there a call waiting, and room for it to run?"""
+        if len(self.pending) == 0:
+            return False
+        elif self.queue.limit is None:
+            return True
+        else:
+            return self.running < self.queue.limit
+
+    def waitedSince(self):
+        """When the oldest pending call was queued."""
+        return self.pending[0][0]
+
+
+class ThreadPoolScheduler:
+    """Schedule calls into a thread-pool from named, prioritised, queues.
+
+    This wraps another thread-pool, like `ThreadPoolLimiter`, but instead of
+    starting calls in the order they arrive, it holds them in the queue named
+    by `select` until one of `capacity` threads is free. Calls are then
+    started from the queue with the best priority, oldest first, subject to
+    each queue's limit on concurrency and to starvation protection (see
+    `ThreadPoolQueue`).
+
+    The last `reserved` threads are kept for queues with the best priority
+    only: work in those queues never waits behind work from other queues for
+    longer than it takes one call to finish.
+
+    Like `ThreadPoolLimiter`, this must be used from the reactor thread.
+    """
+
+    def __init__(
+            self, pool, queues, select, *, default="default",
+            capacity=None, reserved=0, clock=reactor):
+        """Initialise a new `ThreadPoolScheduler`.
+
+        :param pool: The thread-pool in which to run calls.
+        :param queues: An iterable of `ThreadPoolQueue`.
+        :param select: A no-argument callable that returns the name of the
+            queue to put the current call into, or `None`. It is called in the
+            context of `callInThreadWithCallback`.
+        :param default: The name of the queue to use when `select` returns
+            `None` or the name of an unknown queue.
+        :param capacity: The maximum number of calls to run at once. Defaults
+            to the maximum number of threads in `pool`.
+        :param reserved: The number of threads reserved for queues with the
+            best priority.
+        """
+        super(ThreadPoolScheduler, self).__init__()
+        self.pool = pool
+        self.queues = {queue.name: _ThreadPoolQueueState(queue)
+                       for queue in queues}
+        if default not in self.queues:
+            raise ValueError("Default queue %r is not defined." % (default,))
+        self.select = select
+        self.default = default
+        self.capacity = pool.max if capacity is None else capacity
+        self.reserved = reserved
+        self.running = 0
+        self.clock = clock
+        self.bestPriority = min(
+            state.queue.priority for state in self.queues.values())
+
+    start = property(attrgetter("pool.start"))
+    started = property(attrgetter("pool.started"))
+    stop = property(attrgetter("pool.stop"))
+
+    @property
+    def working(self):
+        """Calls that are running or waiting to run.
+
+        This is compatible with `ThreadPool.working`, which is checked to see
+        if a pool has gone quiet.
+        """
+        return [None] * (self.running + sum(
+            len(state.pending) for state in self.queues.values()))
+
+    def getQueueDepths(self):
+        """Return a dict of queue names to (pending, running) tuples."""
+        return {
+            name: (len(state.pending), state.running)
+            for name, state in self.queues.items()
+        }
+
+    def callInThread(self, func, *args, **kwargs):
+        """Schedules a call in the underlying pool."""
+        return self.callInThreadWithCallback(None, func, *args, **kwargs)
+
+    def callInThreadWithCallback(self, onResult, func, *args, **kwargs):
+        """Schedules a call in the underlying pool.
+
+        The call is queued in the queue chosen by `select`, and started once
+        there's a free thread and no more deserving call is waiting.
+        """
+        state = self.queues.get(self.select(), None)
+        if state is None:
+            state = self.queues[self.default]
+        state.pending.append(
+            (self.clock.seconds(), onResult, func, args, kwargs))
+        self._dispatch()
+
+    def _choose(self):
+        """Choose the queue from which to start the next call, or `None`."""
+        free = self.capacity - self.running
+        if free <= 0:
+            return None
+        ready = [
+            state for state in self.queues.values() if state.isReady() and (
+                free > self.reserved or
+                state.queue.priority == self.bestPriority)
+        ]
+        if len(ready) == 0:
+            return None
+        now = self.clock.seconds()
+        starved = [
+            state for state in ready if state.queue.max_wait is not None and
+            now - state.waitedSince() >= state.queue.max_wait
+        ]
+        if len(starved) == 0:
+            return min(ready, key=lambda state: (
+                state.queue.priority, state.waitedSince()))
+        else:
+            return min(starved, key=_ThreadPoolQueueState.waitedSince)
+
+    def _dispatch(self):
+        """Start as many calls as the queues' limits allow."""
+        state = self._choose()
+        while state is not None:
+            _, onResult, func, args, kwargs = state.pending.popleft()
+            self._start(state, onResult, func, args, kwargs)
+            state = self._choose()
+
+    def _start(self, state, onResult, func, args, kwargs):
+        state.running += 1
+        self.running += 1
+
+        if onResult is None:
+            def callback(success, result):
+                # Ignore the result; it was never wanted anyway.
+                self.clock.callFromThread(self._finished, state)
+        else:
+            def callback(success, result):
+                # Make the callback before freeing the thread.
+                try:
+                    onResult(success, result)
+                finally:
+                    self.clock.callFromThread(self._finished, state)
+
+        try:
+            self.pool.callInThreadWithCallback(
+                callback, func, *args, **kwargs)
+        except:
+            state.running -= 1
+            self.running -= 1
+            if onResult is None:
+                log.err(None, "Critical failure arranging call in thread")
+            else:
+                onResult(False, Failure())
+
+    def _finished(self, state):
+        state.running -= 1
+        self.running -= 1
+        self._dispatch()
+
+
 def makeDeferredWithProcessProtocol():
     """Returns a (`Deferred`, `ProcessProtocol`) tuple.
 